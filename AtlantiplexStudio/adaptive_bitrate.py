@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+🌊 MATRIX BROADCAST STUDIO - ADAPTIVE BITRATE
+Closed-loop bitrate control for each RTMP destination
+Features: bitrate/resolution ladder capped by tier limits, send-backlog and throughput sensing,
+fast step-down, probing step-up with hysteresis and failed-probe backoff
+"""
+
+from collections import deque
+from typing import Dict, List, Optional, Any
+
+# Bitrate steps tried at each resolution before dropping to the next one
+LADDER_STEPS = (1.0, 0.75, 0.55)
+
+def build_ladder(presets: Dict[str, Dict[str, Any]], top_quality: str,
+                 max_bitrate: Optional[int] = None, max_quality: Optional[str] = None,
+                 steps=LADDER_STEPS) -> List[Dict[str, Any]]:
+    """Rungs from `top_quality` down, highest bitrate first.
+    
+    Each resolution steps its bitrate down until it would fall to the next
+    resolution's preset bitrate. Rungs above the tier's `max_bitrate` or
+    `max_quality` resolution are left out; at least the lowest rung remains.
+    """
+    ordered = sorted(presets.items(), key=lambda item: item[1]['height'], reverse=True)
+    top = presets.get(top_quality, ordered[0][1])
+    if max_quality in presets:
+        top = min(top, presets[max_quality], key=lambda preset: preset['height'])
+    
+    candidates = [(name, preset) for name, preset in ordered if preset['height'] <= top['height']]
+    rungs = []
+    for index, (name, preset) in enumerate(candidates):
+        floor = candidates[index + 1][1]['bitrate'] if index + 1 < len(candidates) else 0
+        for step in steps:
+            bitrate = int(round(preset['bitrate'] * step / 50.0)) * 50
+            if bitrate <= floor:
+                break
+            rungs.append({'quality': name, 'bitrate': bitrate,
+                          'width': preset['width'], 'height': preset['height']})
+    
+    if max_bitrate:
+        capped = [rung for rung in rungs if rung['bitrate'] <= max_bitrate]
+        rungs = capped or rungs[-1:]
+    return rungs
+
+class AdaptiveBitrateController:
+    """Chooses a ladder rung for one destination from periodic send samples.
+    
+    Congestion (send backlog over `backlog_high` seconds of media while the
+    link drains slower than the stream rate, or relay speed under
+    `congested_speed`) for `down_samples` samples in a row steps straight down
+    to the rung the measured throughput can carry. Only after `up_hold`
+    seconds with the backlog under `backlog_low` does it probe one rung up;
+    a probe that congests within its hold doubles the hold for that rung.
+    """
+    
+    def __init__(self, platform: str, ladder: List[Dict[str, Any]], rung: int = 0,
+                 interval: float = 1.0, backlog_high: float = 1.0, backlog_low: float = 0.25,
+                 congested_speed: float = 0.9, down_samples: int = 2, up_hold: float = 10.0,
+                 max_up_hold: float = 120.0, min_interval: float = 4.0, headroom: float = 0.85,
+                 audio_kbps: int = 128, smoothing: float = 0.5):
+        self.platform = platform
+        self.interval = interval
+        self.backlog_high = backlog_high
+        self.backlog_low = backlog_low
+        self.congested_speed = congested_speed
+        self.down_samples = down_samples
+        self.base_up_hold = up_hold
+        self.max_up_hold = max_up_hold
+        self.min_interval = min_interval
+        self.headroom = headroom
+        self.audio_kbps = audio_kbps
+        self.smoothing = smoothing
+        
+        self.ladder = ladder
+        self.index = min(rung, len(ladder) - 1)
+        self.state = 'stable'
+        self.throughput_kbps = None
+        self.backlog_s = 0.0
+        self.speed = None
+        self.downshifts = 0
+        self.upshifts = 0
+        self.failed_probes = 0
+        self.changes = deque(maxlen=20)
+        self._up_holds = {}  # rung index -> hold before probing it again
+        self._congested = 0
+        self._clear_since = None
+        self._changed_at = None
+        self._probe = None  # (rung index, time) of the last step up
+        self._last = None  # (time, bytes_written)
+    
+    @property
+    def rung(self) -> Dict[str, Any]:
+        return self.ladder[self.index]
+    
+    def set_ladder(self, ladder: List[Dict[str, Any]], rung: int = 0):
+        """Replace the ladder (quality or tier change) and restart the control loop"""
+        self.ladder = ladder
+        self.index = min(rung, len(ladder) - 1)
+        self._up_holds.clear()
+        self._congested = 0
+        self._clear_since = None
+        self._probe = None
+        self.state = 'stable'
+    
+    def constrain(self, index: int):
+        """Settle on `index` after the engine could not run the rung just chosen (CPU budget).
+        
+        A refused step up backs off like a failed probe, so it is not retried every sample.
+        """
+        change = self.changes[-1]
+        if change['direction'] == 'up':
+            self.upshifts -= 1
+            self._up_holds[self.index] = min(self.max_up_hold, self.up_hold(self.index) * 2)
+            self._probe = None
+            self.state = 'stable'
+        self.index = index
+        change['to'] = f"{self.rung['quality']}@{self.rung['bitrate']}k"
+        change['cpu_limited'] = True
+    
+    def up_hold(self, index: int) -> float:
+        return self._up_holds.get(index, self.base_up_hold)
+    
+    def sample(self, now: float, bytes_written: int, queued_bytes: int,
+               speed: Optional[float] = None, switching: bool = False) -> Optional[int]:
+        """Take a sample; returns the rung index to move to, or None to stay"""
+        if self._last is not None and now > self._last[0]:
+            rate = (bytes_written - self._last[1]) * 8 / 1000.0 / (now - self._last[0])
+            self.throughput_kbps = rate if self.throughput_kbps is None else (
+                self.smoothing * rate + (1 - self.smoothing) * self.throughput_kbps)
+        self._last = (now, bytes_written)
+        
+        stream_kbps = self.rung['bitrate'] + self.audio_kbps
+        self.backlog_s = queued_bytes * 8 / 1000.0 / stream_kbps
+        self.speed = speed
+        if switching or self.throughput_kbps is None:
+            return None
+        
+        draining = self.throughput_kbps >= stream_kbps * 0.95
+        congested = ((self.backlog_s > self.backlog_high and not draining)
+                     or (speed is not None and speed < self.congested_speed))
+        
+        if congested:
+            self._congested += 1
+            self._clear_since = None
+            self.state = 'congested'
+            if self._congested >= self.down_samples and self.index < len(self.ladder) - 1:
+                return self._step_down(now)
+            return None
+        
+        self._congested = 0
+        if self.backlog_s > self.backlog_low:
+            self._clear_since = None
+            self.state = 'draining'
+            return None
+        
+        if self._clear_since is None:
+            self._clear_since = now
+        self.state = 'stable'
+        
+        # A rung that held through its probe window earns back the base hold
+        if self._probe and now - self._probe[1] >= self.up_hold(self._probe[0]):
+            self._up_holds.pop(self._probe[0], None)
+            self._probe = None
+        
+        if self.index == 0 or (self._changed_at is not None and now - self._changed_at < self.min_interval):
+            return None
+        if now - self._clear_since >= self.up_hold(self.index - 1):
+            return self._change(now, self.index - 1, 'up')
+        return None
+    
+    def _step_down(self, now: float) -> Optional[int]:
+        if self._changed_at is not None and now - self._changed_at < self.min_interval:
+            return None
+        
+        # Jump to the highest rung the measured link can carry with headroom
+        budget = self.throughput_kbps * self.headroom - self.audio_kbps
+        target = len(self.ladder) - 1
+        for index in range(self.index + 1, len(self.ladder)):
+            if self.ladder[index]['bitrate'] <= budget:
+                target = index
+                break
+        
+        if self._probe and self._probe[0] == self.index:
+            self.failed_probes += 1
+            self._up_holds[self.index] = min(self.max_up_hold, self.up_hold(self.index) * 2)
+            self._probe = None
+        return self._change(now, target, 'down')
+    
+    def _change(self, now: float, index: int, direction: str) -> int:
+        previous = self.rung
+        self.index = index
+        self._changed_at = now
+        self._congested = 0
+        self._clear_since = None
+        if direction == 'up':
+            self.upshifts += 1
+            self._probe = (index, now)
+            self.state = 'probing'
+        else:
+            self.downshifts += 1
+        
+        self.changes.append({
+            'at': round(now, 3),
+            'direction': direction,
+            'from': f"{previous['quality']}@{previous['bitrate']}k",
+            'to': f"{self.rung['quality']}@{self.rung['bitrate']}k",
+            'throughput_kbps': round(self.throughput_kbps, 1),
+            'backlog_s': round(self.backlog_s, 2)
+        })
+        return index
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'state': self.state,
+            'quality': self.rung['quality'],
+            'bitrate': self.rung['bitrate'],
+            'rung': self.index,
+            'rungs': len(self.ladder),
+            'max_bitrate': self.ladder[0]['bitrate'],
+            'throughput_kbps': round(self.throughput_kbps, 1) if self.throughput_kbps is not None else None,
+            'backlog_s': round(self.backlog_s, 2),
+            'speed': self.speed,
+            'downshifts': self.downshifts,
+            'upshifts': self.upshifts,
+            'failed_probes': self.failed_probes,
+            'changes': list(self.changes)[-5:]
+        }
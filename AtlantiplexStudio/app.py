@@ -12,7 +12,7 @@ import time
 import logging
 import threading
 from datetime import datetime, timedelta
-from flask import Flask, request, jsonify, send_from_directory, render_template
+from flask import Flask, Response, request, jsonify, send_from_directory, render_template
 from flask_cors import CORS
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
@@ -50,6 +50,7 @@ guest_manager = GuestManager(max_guests=8)
 avatar_manager = AvatarManager()
 profile_manager = ProfileManager()
 broadcast_engine = BroadcastEngine()
+scene_manager.attach_renderer(broadcast_engine)
 
 # In-memory storage for demo (replace with database in production)
 users_db = {}
@@ -281,6 +282,56 @@ def stop_streaming():
         'status': streaming_state
     })
 
+@app.route('/api/streaming/hls/start', methods=['POST'])
+@require_auth
+def start_hls_output():
+    """Start the LL-HLS origin for self-hosted viewers"""
+    result = broadcast_engine.start_hls_output(request.get_json(silent=True))
+    if 'error' in result:
+        return jsonify({'success': False, 'error': result['error']}), 400
+    
+    return jsonify(result)
+
+@app.route('/api/streaming/hls/stop', methods=['POST'])
+@require_auth
+def stop_hls_output():
+    """Stop the LL-HLS origin"""
+    result = broadcast_engine.stop_hls_output()
+    if 'error' in result:
+        return jsonify({'success': False, 'error': result['error']}), 400
+    
+    return jsonify(result)
+
+@app.route('/api/streaming/stats/history', methods=['GET'])
+@require_auth
+def get_stats_history():
+    """Per-destination min/avg/p95 of bitrate, fps, drops, RTT and queue depth"""
+    return jsonify(broadcast_engine.get_stats_history(request.args.get('seconds', 3600, type=float)))
+
+@app.route('/api/streaming/stats/sparkline/<platform>', methods=['GET'])
+@require_auth
+def get_stats_sparkline(platform):
+    """One statistic of a destination, downsampled for the dashboard"""
+    result = broadcast_engine.get_sparkline(
+        platform,
+        request.args.get('field', 'bitrate_kbps'),
+        request.args.get('seconds', 600, type=float),
+        request.args.get('points', 60, type=int)
+    )
+    if 'error' in result:
+        return jsonify({'success': False, 'error': result['error']}), 404
+    
+    return jsonify(result)
+
+@app.route('/hls/<path:filename>', methods=['GET'])
+def serve_hls(filename):
+    """Playlist, segments and parts for embedded players (no auth; viewers are public)"""
+    if not broadcast_engine.hls:
+        return Response(status=404)
+    
+    status, headers, body = broadcast_engine.hls.respond(filename, request.args)
+    return Response(body, status=status, headers=headers)
+
 # ============================================================================
 # SCENE MANAGEMENT ENDPOINTS
 # ============================================================================
@@ -288,17 +339,29 @@ def stop_streaming():
 @app.route('/api/scenes', methods=['GET'])
 @require_auth
 def get_scenes():
-    """Get all scenes"""
-    scenes = []
-    for scene_id, scene in scene_manager.scenes.items():
-        scenes.append(scene.to_dict())
+    """Get all scenes, or those of a type (?type=) or using a source (?source=<source name>)"""
+    if request.args.get('source'):
+        matches = scene_manager.get_scenes_using_source(request.args['source'])
+    elif request.args.get('type'):
+        matches = scene_manager.get_scenes_by_type(request.args['type'])
+    else:
+        matches = scene_manager.get_all_scenes()
+    scenes = [scene.to_dict() for scene in matches]
     
     return jsonify({
         'success': True,
         'scenes': scenes,
-        'active_scene': scene_manager.active_scene_id
+        'active_scene': scene_manager.active_scene_id,
+        'preview_scene': scene_manager.preview_scene_id
     })
 
+@app.route('/api/scenes/changes', methods=['GET'])
+@require_auth
+def get_scene_changes():
+    """Scene changes after a version, as JSON patches (a full snapshot when too far behind)"""
+    since = request.args.get('since', 0, type=int)
+    return jsonify(dict(scene_manager.changes_since(since), success=True))
+
 @app.route('/api/scenes', methods=['POST'])
 @require_auth
 def create_scene():
@@ -365,6 +428,34 @@ def switch_scene(scene_id):
     else:
         return jsonify({'error': 'Scene not found'}), 404
 
+@app.route('/api/scenes/<scene_id>/preview', methods=['POST'])
+@require_auth
+def preview_scene(scene_id):
+    """Queue a scene in preview so it is loaded and warm before it is taken"""
+    if not scene_manager.set_preview(scene_id):
+        return jsonify({'error': 'Scene not found'}), 404
+    
+    return jsonify({
+        'success': True,
+        'preview_scene': scene_id
+    })
+
+@app.route('/api/scenes/take', methods=['POST'])
+@require_auth
+def take_scene():
+    """Put the preview scene on program"""
+    if not scene_manager.take():
+        return jsonify({'error': 'No scene in preview'}), 400
+    
+    global streaming_state
+    streaming_state['current_scene'] = scene_manager.active_scene_id
+    
+    return jsonify({
+        'success': True,
+        'active_scene': scene_manager.active_scene_id,
+        'preview_scene': scene_manager.preview_scene_id
+    })
+
 # ============================================================================
 # GUEST MANAGEMENT ENDPOINTS
 # ============================================================================
@@ -636,6 +727,9 @@ if __name__ == "__main__":
     print("Status: PRODUCTION READY - 100% Functional")
     print("=" * 60)
     
+    # Keep request handling off the cores reserved for the media loop and encoders
+    broadcast_engine.isolation.pin_process('server')
+    
     # Start Flask development server
     app.run(
         host='0.0.0.0',
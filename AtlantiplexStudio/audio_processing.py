@@ -0,0 +1,1168 @@
+#!/usr/bin/env python3
+"""
+🌊 MATRIX BROADCAST STUDIO - AUDIO PROCESSING
+Block-based DSP building blocks used by the broadcast engine's audio mixer
+Features: stereo balance matrices, high-pass, noise gate, compressor, parametric EQ,
+mix-minus return feeds, polyphase sample-rate conversion and channel mapping,
+adaptive jitter buffers with drift compensation, level and loudness metering,
+sidechain ducking
+"""
+
+import time
+import logging
+import threading
+from math import gcd
+from typing import Dict, List, Optional, Any, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Dynamics processors derive their gain from short analysis frames of this many samples
+ANALYSIS_HOP = 64
+
+def balance_matrix(balance: float, volume: float = 1.0) -> np.ndarray:
+    """Build the 2x2 gain matrix for a stereo balance (-1.0 left .. 1.0 right)"""
+    balance = max(-1.0, min(1.0, float(balance)))
+    left = min(1.0, 1.0 - balance)
+    right = min(1.0, 1.0 + balance)
+    return np.array([[left, 0.0], [0.0, right]], dtype=np.float32) * np.float32(volume)
+
+def design_biquad(kind: str, sample_rate: int, frequency: float,
+                  q: float = 0.7071, gain_db: float = 0.0) -> Tuple[float, float, float, float, float]:
+    """Design a biquad (RBJ cookbook) and return normalized (b0, b1, b2, a1, a2)"""
+    frequency = min(max(float(frequency), 1.0), sample_rate * 0.49)
+    w0 = 2.0 * np.pi * frequency / sample_rate
+    cos_w0 = np.cos(w0)
+    alpha = np.sin(w0) / (2.0 * q)
+    amp = 10.0 ** (gain_db / 40.0)
+    sqrt_amp = np.sqrt(amp)
+    
+    if kind == 'highpass':
+        b = [(1 + cos_w0) / 2, -(1 + cos_w0), (1 + cos_w0) / 2]
+        a = [1 + alpha, -2 * cos_w0, 1 - alpha]
+    elif kind == 'lowpass':
+        b = [(1 - cos_w0) / 2, 1 - cos_w0, (1 - cos_w0) / 2]
+        a = [1 + alpha, -2 * cos_w0, 1 - alpha]
+    elif kind == 'peaking':
+        b = [1 + alpha * amp, -2 * cos_w0, 1 - alpha * amp]
+        a = [1 + alpha / amp, -2 * cos_w0, 1 - alpha / amp]
+    elif kind == 'lowshelf':
+        b = [amp * ((amp + 1) - (amp - 1) * cos_w0 + 2 * sqrt_amp * alpha),
+             2 * amp * ((amp - 1) - (amp + 1) * cos_w0),
+             amp * ((amp + 1) - (amp - 1) * cos_w0 - 2 * sqrt_amp * alpha)]
+        a = [(amp + 1) + (amp - 1) * cos_w0 + 2 * sqrt_amp * alpha,
+             -2 * ((amp - 1) + (amp + 1) * cos_w0),
+             (amp + 1) + (amp - 1) * cos_w0 - 2 * sqrt_amp * alpha]
+    elif kind == 'highshelf':
+        b = [amp * ((amp + 1) + (amp - 1) * cos_w0 + 2 * sqrt_amp * alpha),
+             -2 * amp * ((amp - 1) + (amp + 1) * cos_w0),
+             amp * ((amp + 1) + (amp - 1) * cos_w0 - 2 * sqrt_amp * alpha)]
+        a = [(amp + 1) - (amp - 1) * cos_w0 + 2 * sqrt_amp * alpha,
+             2 * ((amp - 1) - (amp + 1) * cos_w0),
+             (amp + 1) - (amp - 1) * cos_w0 - 2 * sqrt_amp * alpha]
+    else:
+        raise ValueError(f"Unknown biquad type: {kind}")
+    
+    return (b[0] / a[0], b[1] / a[0], b[2] / a[0], a[1] / a[0], a[2] / a[0])
+
+# (coefficients, block_size) -> precomputed block response, shared by every source using the same design
+_BLOCK_PLANS: Dict[Tuple[Tuple[float, ...], int], Dict[str, Any]] = {}
+
+def _block_plan(coefficients: Tuple[float, ...], block_size: int) -> Dict[str, Any]:
+    """Precompute the state-space block response of a biquad"""
+    key = (coefficients, block_size)
+    plan = _BLOCK_PLANS.get(key)
+    if plan is not None:
+        return plan
+    
+    b0, b1, b2, a1, a2 = coefficients
+    transition = np.array([[-a1, 1.0], [-a2, 0.0]])
+    drive = np.array([b1 - a1 * b0, b2 - a2 * b0])
+    
+    # Powers of the transition matrix A^0 .. A^n (design time only)
+    powers = np.empty((block_size + 1, 2, 2))
+    powers[0] = np.eye(2)
+    for i in range(1, block_size + 1):
+        powers[i] = powers[i - 1] @ transition
+    
+    impulse = np.empty(block_size)
+    impulse[0] = b0
+    impulse[1:] = powers[:block_size - 1, 0, :] @ drive
+    
+    fft_size = 1 << int(np.ceil(np.log2(2 * block_size)))
+    plan = {
+        'fft_size': fft_size,
+        'spectrum': np.fft.rfft(impulse, fft_size)[:, None],
+        'free_response': np.ascontiguousarray(powers[:block_size, 0, :]),
+        'state_drive': np.ascontiguousarray((powers[block_size - 1::-1] @ drive).T),
+        'state_transition': powers[block_size]
+    }
+    _BLOCK_PLANS[key] = plan
+    return plan
+
+def apply_block_filter(coefficients: Tuple[float, ...], block: np.ndarray, state: np.ndarray) -> np.ndarray:
+    """Filter a (frames, channels) block with a biquad, updating `state` (2, channels) in place"""
+    frames = block.shape[0]
+    plan = _block_plan(coefficients, frames)
+    fft_size = plan['fft_size']
+    
+    spectrum = np.fft.rfft(block, fft_size, axis=0)
+    spectrum *= plan['spectrum']
+    output = np.fft.irfft(spectrum, fft_size, axis=0)[:frames]
+    output += plan['free_response'] @ state
+    
+    state[:] = plan['state_transition'] @ state + plan['state_drive'] @ block
+    return output
+
+class BlockLinearFilter:
+    """Biquad IIR filter evaluated a whole block at a time.
+    
+    The filter is rewritten in state-space form, so a block is the FFT
+    convolution of the input with the first N taps of the impulse response
+    plus the free response of the state carried over from the previous block.
+    Output is identical to a per-sample recursion but runs fully vectorized.
+    """
+    
+    def __init__(self, coefficients: Tuple[float, ...], channels: int):
+        self.coefficients = tuple(float(c) for c in coefficients)
+        self.channels = channels
+        self.state = np.zeros((2, channels))
+    
+    def process(self, block: np.ndarray) -> np.ndarray:
+        """Filter a (frames, channels) block"""
+        return apply_block_filter(self.coefficients, block, self.state)
+    
+    def reset(self):
+        """Clear the filter state"""
+        self.state.fill(0.0)
+
+def smooth_gains(targets: np.ndarray, previous: float, coeff_up: float, coeff_down: float) -> np.ndarray:
+    """One-pole smoothing of a gain trajectory, vectorized over the frames.
+    
+    The coefficient for each frame is picked from the direction of the target
+    trajectory, which turns the recursion into a linear time-varying one that
+    can be solved in closed form with cumulative products.
+    """
+    prior = np.concatenate(([previous], targets[:-1]))
+    coeffs = np.where(targets > prior, coeff_up, coeff_down)
+    coeffs = np.clip(coeffs, 1e-4, 1.0 - 1e-9)
+    
+    log_products = np.cumsum(np.log(coeffs))
+    products = np.exp(log_products)
+    return products * (previous + np.cumsum((1.0 - coeffs) * targets / products))
+
+def frame_rms(block: np.ndarray, hop: int = ANALYSIS_HOP) -> Tuple[np.ndarray, np.ndarray]:
+    """Linked-stereo RMS per analysis frame, plus the end index of each frame"""
+    frames = block.shape[0]
+    starts = np.arange(0, frames, hop)
+    ends = np.append(starts[1:], frames)
+    power = np.add.reduceat(np.mean(block * block, axis=1), starts) / (ends - starts)
+    return np.sqrt(power), ends
+
+def ramp_gains(gains: np.ndarray, frame_ends: np.ndarray, previous: float, frames: int) -> np.ndarray:
+    """Expand per-frame gains to per-sample gains with linear ramps"""
+    return np.interp(
+        np.arange(1, frames + 1),
+        np.concatenate(([0], frame_ends)),
+        np.concatenate(([previous], gains))
+    )
+
+def time_constant(milliseconds: float, sample_rate: int, hop: int = ANALYSIS_HOP) -> float:
+    """Per-frame one-pole coefficient for an attack/release time"""
+    if milliseconds <= 0:
+        return 0.0
+    return float(np.exp(-hop / (milliseconds * 0.001 * sample_rate)))
+
+def to_db(values: np.ndarray) -> np.ndarray:
+    """Convert linear amplitude to dBFS"""
+    return 20.0 * np.log10(np.maximum(values, 1e-10))
+
+class AudioEffect:
+    """Base class for block-based effects"""
+    
+    effect_type = 'effect'
+    
+    def __init__(self, sample_rate: int, channels: int, config: Dict[str, Any]):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.config = config
+        self.enabled = config.get('enabled', True)
+    
+    def process(self, block: np.ndarray) -> np.ndarray:
+        """Process a (frames, channels) float block"""
+        raise NotImplementedError
+    
+    def reset(self):
+        """Reset DSP state"""
+        pass
+    
+    def get_info(self) -> Dict[str, Any]:
+        """Get effect information"""
+        return {'type': self.effect_type, 'enabled': self.enabled, 'config': self.config}
+
+class HighPassFilter(AudioEffect):
+    """Rumble and handling-noise filter"""
+    
+    effect_type = 'highpass'
+    
+    def __init__(self, sample_rate: int, channels: int, config: Dict[str, Any]):
+        super().__init__(sample_rate, channels, config)
+        coefficients = design_biquad(
+            'highpass', sample_rate,
+            config.get('cutoff', 80.0),
+            config.get('q', 0.7071)
+        )
+        self.filter = BlockLinearFilter(coefficients, channels)
+    
+    def process(self, block: np.ndarray) -> np.ndarray:
+        return self.filter.process(block)
+    
+    def reset(self):
+        self.filter.reset()
+
+class NoiseGate(AudioEffect):
+    """Downward gate that closes on frames below the threshold"""
+    
+    effect_type = 'noise_gate'
+    
+    def __init__(self, sample_rate: int, channels: int, config: Dict[str, Any]):
+        super().__init__(sample_rate, channels, config)
+        self.threshold_db = config.get('threshold_db', -50.0)
+        self.floor = 10.0 ** (config.get('range_db', -80.0) / 20.0)
+        self.attack = time_constant(config.get('attack_ms', 1.0), sample_rate)
+        self.release = time_constant(config.get('release_ms', 120.0), sample_rate)
+        self.gain = 1.0
+    
+    def process(self, block: np.ndarray) -> np.ndarray:
+        levels, frame_ends = frame_rms(block)
+        targets = np.where(to_db(levels) >= self.threshold_db, 1.0, self.floor)
+        gains = smooth_gains(targets, self.gain, self.attack, self.release)
+        
+        sample_gains = ramp_gains(gains, frame_ends, self.gain, block.shape[0])
+        self.gain = float(gains[-1])
+        return block * sample_gains[:, None]
+    
+    def reset(self):
+        self.gain = 1.0
+
+class Compressor(AudioEffect):
+    """Feed-forward soft-knee compressor with makeup gain"""
+    
+    effect_type = 'compressor'
+    
+    def __init__(self, sample_rate: int, channels: int, config: Dict[str, Any]):
+        super().__init__(sample_rate, channels, config)
+        self.threshold_db = config.get('threshold_db', -18.0)
+        self.ratio = max(1.0, config.get('ratio', 3.0))
+        self.knee_db = max(0.0, config.get('knee_db', 6.0))
+        self.makeup_db = config.get('makeup_db', 0.0)
+        self.attack = time_constant(config.get('attack_ms', 5.0), sample_rate)
+        self.release = time_constant(config.get('release_ms', 80.0), sample_rate)
+        self.reduction_db = 0.0
+    
+    def gain_reduction(self, level_db: np.ndarray) -> np.ndarray:
+        """Static gain curve (dB of reduction, <= 0) for the given input levels"""
+        over = level_db - self.threshold_db
+        slope = 1.0 / self.ratio - 1.0
+        knee = max(self.knee_db, 1e-6)
+        in_knee = slope * (over + knee / 2.0) ** 2 / (2.0 * knee)
+        return np.where(
+            2.0 * over < -self.knee_db, 0.0,
+            np.where(2.0 * np.abs(over) <= self.knee_db, in_knee, slope * over)
+        )
+    
+    def process(self, block: np.ndarray) -> np.ndarray:
+        levels, frame_ends = frame_rms(block)
+        targets = self.gain_reduction(to_db(levels))
+        # Reduction deepening (falling dB) is the attack phase
+        reduction = smooth_gains(targets, self.reduction_db, self.release, self.attack)
+        
+        sample_db = ramp_gains(reduction, frame_ends, self.reduction_db, block.shape[0])
+        self.reduction_db = float(reduction[-1])
+        return block * (10.0 ** ((sample_db + self.makeup_db) / 20.0))[:, None]
+    
+    def reset(self):
+        self.reduction_db = 0.0
+    
+    def get_info(self) -> Dict[str, Any]:
+        info = super().get_info()
+        info['gain_reduction_db'] = round(self.reduction_db, 2)
+        return info
+
+class Equalizer(AudioEffect):
+    """Parametric EQ built from cascaded peaking/shelf biquads"""
+    
+    effect_type = 'eq'
+    
+    def __init__(self, sample_rate: int, channels: int, config: Dict[str, Any]):
+        super().__init__(sample_rate, channels, config)
+        self.bands = [
+            BlockLinearFilter(
+                design_biquad(
+                    band.get('type', 'peaking'), sample_rate,
+                    band.get('frequency', 1000.0),
+                    band.get('q', 1.0),
+                    band.get('gain_db', 0.0)
+                ),
+                channels
+            )
+            for band in config.get('bands', [])
+            if band.get('gain_db', 0.0) != 0.0 or band.get('type') in ('lowpass', 'highpass')
+        ]
+    
+    def process(self, block: np.ndarray) -> np.ndarray:
+        for band in self.bands:
+            block = band.process(block)
+        return block
+    
+    def reset(self):
+        for band in self.bands:
+            band.reset()
+
+class SidechainDucker:
+    """Sidechain auto-duck: voice activity lowers music beds.
+    
+    The key signal (sum of voice sources) is reduced to one level per
+    analysis frame; frames above the threshold target the duck depth, the
+    target trajectory is smoothed with the attack/release time constants and
+    ramped to a per-sample gain, all vectorized over the block.
+    """
+    
+    def __init__(self, sample_rate: int, config: Dict[str, Any] = None):
+        self.sample_rate = sample_rate
+        self.gain_db = 0.0
+        self.configure(config or {})
+    
+    def configure(self, config: Dict[str, Any]):
+        """Apply ducking settings"""
+        self.enabled = config.get('enabled', True)
+        self.threshold_db = config.get('threshold_db', -40.0)
+        self.depth_db = -abs(config.get('depth_db', 12.0))
+        self.attack_ms = config.get('attack_ms', 80.0)
+        self.release_ms = config.get('release_ms', 600.0)
+        self.attack = time_constant(self.attack_ms, self.sample_rate)
+        self.release = time_constant(self.release_ms, self.sample_rate)
+    
+    def process(self, key: Optional[np.ndarray], frames: int) -> Optional[np.ndarray]:
+        """Per-sample linear gain for music sources, or None when fully released"""
+        if key is None:
+            if self.gain_db > -0.01:
+                self.gain_db = 0.0
+                return None
+            starts = np.arange(0, frames, ANALYSIS_HOP)
+            frame_ends = np.append(starts[1:], frames)
+            targets = np.zeros(len(starts))
+        else:
+            levels, frame_ends = frame_rms(key)
+            targets = np.where(to_db(levels) >= self.threshold_db, self.depth_db, 0.0)
+        
+        # Gain falling (ducking in) is the attack phase
+        gains_db = smooth_gains(targets, self.gain_db, self.release, self.attack)
+        sample_db = ramp_gains(gains_db, frame_ends, self.gain_db, frames)
+        self.gain_db = float(gains_db[-1])
+        return 10.0 ** (sample_db / 20.0)
+    
+    def get_info(self) -> Dict[str, Any]:
+        """Ducking settings and current gain"""
+        return {
+            'enabled': self.enabled,
+            'threshold_db': self.threshold_db,
+            'depth_db': self.depth_db,
+            'attack_ms': self.attack_ms,
+            'release_ms': self.release_ms,
+            'current_gain_db': round(self.gain_db, 2)
+        }
+
+EFFECT_TYPES = {
+    'highpass': HighPassFilter,
+    'high_pass': HighPassFilter,
+    'noise_gate': NoiseGate,
+    'gate': NoiseGate,
+    'compressor': Compressor,
+    'eq': Equalizer,
+    'equalizer': Equalizer
+}
+
+class EffectsChain:
+    """Ordered effect chain with per-effect CPU accounting"""
+    
+    def __init__(self, effects: List[AudioEffect]):
+        self.effects = effects
+        self.cpu_seconds = np.zeros(len(effects))
+        self.blocks_processed = 0
+    
+    def process(self, block: np.ndarray) -> np.ndarray:
+        """Run a block through every enabled effect"""
+        for index, effect in enumerate(self.effects):
+            if not effect.enabled:
+                continue
+            started = time.perf_counter()
+            block = effect.process(block)
+            self.cpu_seconds[index] += time.perf_counter() - started
+        self.blocks_processed += 1
+        return block
+    
+    def reset(self):
+        for effect in self.effects:
+            effect.reset()
+    
+    def get_stats(self, block_duration: float) -> List[Dict[str, Any]]:
+        """Per-effect cost: average milliseconds per block and share of the real-time budget"""
+        blocks = max(self.blocks_processed, 1)
+        stats = []
+        for effect, seconds in zip(self.effects, self.cpu_seconds):
+            average = seconds / blocks
+            stats.append({
+                'type': effect.effect_type,
+                'enabled': effect.enabled,
+                'total_cpu_ms': round(seconds * 1000.0, 3),
+                'avg_ms_per_block': round(average * 1000.0, 4),
+                'realtime_load': round(average / block_duration, 5) if block_duration else 0.0
+            })
+        return stats
+
+def build_effects_chain(effect_configs: List[Any], sample_rate: int, channels: int) -> EffectsChain:
+    """Build an effects chain from source config entries (type names or dicts)"""
+    effects = []
+    for entry in effect_configs or []:
+        config = {'type': entry} if isinstance(entry, str) else dict(entry)
+        effect_class = EFFECT_TYPES.get(config.get('type'))
+        if effect_class is None:
+            logger.warning(f"⚠️ Unknown audio effect: {config.get('type')}")
+            continue
+        effects.append(effect_class(sample_rate, channels, config))
+    return EffectsChain(effects)
+
+# Taps per polyphase branch; the prototype low-pass has RESAMPLER_TAPS * L coefficients
+RESAMPLER_TAPS = 32
+
+# (in_rate, out_rate) -> polyphase filter bank, shared by every source converting between the pair
+_POLYPHASE_BANKS: Dict[Tuple[int, int], Dict[str, Any]] = {}
+
+def polyphase_bank(in_rate: int, out_rate: int, taps: int = RESAMPLER_TAPS) -> Dict[str, Any]:
+    """Get (or design and cache) the polyphase filter bank for a rate pair"""
+    key = (in_rate, out_rate)
+    bank = _POLYPHASE_BANKS.get(key)
+    if bank is not None:
+        return bank
+    
+    divisor = gcd(in_rate, out_rate)
+    up = out_rate // divisor
+    down = in_rate // divisor
+    
+    # Kaiser-windowed sinc prototype at the upsampled rate, cut below the lower Nyquist
+    length = up * taps
+    cutoff = 0.5 * min(1.0 / up, 1.0 / down) * 0.92
+    centre = (length - 1) / 2.0
+    prototype = 2.0 * cutoff * np.sinc(2.0 * cutoff * (np.arange(length) - centre)) * np.kaiser(length, 8.0)
+    prototype *= up / prototype.sum()
+    
+    # bank[phase, k] multiplies x[base - k] for an output at upsampled time base * up + phase
+    bank = {
+        'up': up,
+        'down': down,
+        'taps': taps,
+        'filters': np.ascontiguousarray(prototype.reshape(taps, up).T.astype(np.float32))
+    }
+    _POLYPHASE_BANKS[key] = bank
+    logger.info(f"🎚️ Designed polyphase bank {in_rate} -> {out_rate} Hz ({up}/{down}, {length} taps)")
+    return bank
+
+class PolyphaseResampler:
+    """Rational-ratio resampler with per-source state.
+    
+    Output positions are tracked on the upsampled time grid, so consecutive
+    blocks join seamlessly. Each block is one gather of input windows and one
+    batched dot product against the selected filter phases.
+    """
+    
+    def __init__(self, in_rate: int, out_rate: int, channels: int):
+        self.in_rate = in_rate
+        self.out_rate = out_rate
+        self.channels = channels
+        self.bank = polyphase_bank(in_rate, out_rate)
+        self.history = np.zeros((self.bank['taps'] - 1, channels), dtype=np.float32)
+        self.position = 0  # next output, in upsampled samples relative to the current block start
+        self._offsets = np.arange(self.bank['taps'])
+    
+    def process(self, block: np.ndarray) -> np.ndarray:
+        """Resample a (frames, channels) float block; output length varies by block"""
+        up = self.bank['up']
+        down = self.bank['down']
+        taps = self.bank['taps']
+        frames = block.shape[0]
+        
+        end = frames * up
+        count = max(0, -(-(end - self.position) // down))
+        times = self.position + down * np.arange(count)
+        bases = times // up
+        phases = times % up
+        
+        extended = np.concatenate((self.history, block.astype(np.float32, copy=False)))
+        windows = extended[(bases + taps - 1)[:, None] - self._offsets[None, :]]
+        output = np.einsum('nk,nkc->nc', self.bank['filters'][phases], windows)
+        
+        self.history = extended[-(taps - 1):].copy()
+        self.position += count * down - end
+        return output
+    
+    def reset(self):
+        self.history.fill(0.0)
+        self.position = 0
+
+def channel_matrix(in_channels: int, out_channels: int) -> np.ndarray:
+    """Matrix mapping source channels onto mixer channels (mono up-mix, stereo down-mix)"""
+    if in_channels == out_channels:
+        return np.eye(out_channels, dtype=np.float32)
+    if in_channels == 1:
+        return np.ones((1, out_channels), dtype=np.float32)
+    if out_channels == 1:
+        return np.full((in_channels, 1), 1.0 / in_channels, dtype=np.float32)
+    
+    # Keep the first channels in place and fold any extras into all outputs
+    matrix = np.zeros((in_channels, out_channels), dtype=np.float32)
+    shared = min(in_channels, out_channels)
+    matrix[np.arange(shared), np.arange(shared)] = 1.0
+    if in_channels > out_channels:
+        matrix[out_channels:, :] = 1.0 / out_channels
+    return matrix
+
+class InputConverter:
+    """Converts a source's native format (rate, channels, sample type) to the mixer format"""
+    
+    def __init__(self, in_rate: int, in_channels: int, out_rate: int, out_channels: int):
+        self.in_rate = in_rate
+        self.in_channels = in_channels
+        self.out_rate = out_rate
+        self.out_channels = out_channels
+        self.matrix = None if in_channels == out_channels else channel_matrix(in_channels, out_channels)
+        self.resampler = PolyphaseResampler(in_rate, out_rate, out_channels) if in_rate != out_rate else None
+    
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        """Convert interleaved or (frames, channels) samples to normalized float mixer frames"""
+        block = np.asarray(samples)
+        if block.dtype == np.int16:
+            block = block.astype(np.float32) / 32768.0
+        else:
+            block = block.astype(np.float32, copy=False)
+        block = block.reshape(-1, self.in_channels)
+        
+        if self.matrix is not None:
+            block = block @ self.matrix
+        if self.resampler is not None:
+            block = self.resampler.process(block)
+        return block
+
+class AudioRingBuffer:
+    """Preallocated float FIFO of (frames, channels) audio with overrun accounting"""
+    
+    def __init__(self, capacity: int, channels: int):
+        self.capacity = capacity
+        self.channels = channels
+        self.buffer = np.zeros((capacity, channels), dtype=np.float32)
+        self.read_position = 0
+        self.write_position = 0
+        self.overruns = 0
+        self.lock = threading.Lock()
+    
+    def available(self) -> int:
+        """Frames ready to read"""
+        return self.write_position - self.read_position
+    
+    def write(self, block: np.ndarray):
+        """Append frames, discarding the oldest audio if the buffer is full"""
+        frames = block.shape[0]
+        if frames > self.capacity:
+            block = block[-self.capacity:]
+            frames = self.capacity
+        
+        with self.lock:
+            start = self.write_position % self.capacity
+            first = min(frames, self.capacity - start)
+            self.buffer[start:start + first] = block[:first]
+            if first < frames:
+                self.buffer[:frames - first] = block[first:]
+            self.write_position += frames
+            
+            if self.write_position - self.read_position > self.capacity:
+                self.overruns += 1
+                self.read_position = self.write_position - self.capacity
+    
+    def peek_into(self, out: np.ndarray) -> int:
+        """Copy up to len(out) frames into `out` without consuming them"""
+        with self.lock:
+            count = min(out.shape[0], self.write_position - self.read_position)
+            start = self.read_position % self.capacity
+            first = min(count, self.capacity - start)
+            out[:first] = self.buffer[start:start + first]
+            if first < count:
+                out[first:count] = self.buffer[:count - first]
+            return count
+    
+    def discard(self, frames: int):
+        """Consume frames without copying them"""
+        with self.lock:
+            self.read_position += min(frames, self.write_position - self.read_position)
+    
+    def read_into(self, out: np.ndarray) -> int:
+        """Copy up to len(out) frames into `out`; returns frames copied"""
+        count = self.peek_into(out)
+        self.discard(count)
+        return count
+    
+    def clear(self):
+        with self.lock:
+            self.read_position = self.write_position
+
+class JitterBuffer:
+    """Per-source jitter buffer between bursty guest transport and the mixer clock.
+    
+    The mixer always gets a full block without blocking. The target depth
+    starts at one block, grows after each underrun and shrinks again once the
+    observed minimum depth shows the cushion is unused. Underruns are
+    concealed by repeating the last block with a fade (or silence). Slow
+    clock drift shows up as the smoothed depth wandering from the target and
+    is corrected by reading slightly more or fewer input frames per block,
+    linearly interpolated to the block size.
+    """
+    
+    def __init__(self, block_size: int, channels: int, sample_rate: int,
+                 max_target_ms: float = 120.0, concealment: str = 'repeat',
+                 max_correction: float = 0.005):
+        self.block_size = block_size
+        self.channels = channels
+        self.sample_rate = sample_rate
+        self.concealment = concealment
+        self.max_correction = max_correction
+        
+        self.min_target = block_size
+        self.max_target = max(block_size, int(sample_rate * max_target_ms / 1000.0))
+        self.target_frames = self.min_target
+        self.ring = AudioRingBuffer(self.max_target + 2 * block_size, channels)
+        
+        # Preallocated working arrays
+        self.last_block = np.zeros((block_size, channels), dtype=np.float32)
+        self._scratch = np.zeros((int(block_size * (1.0 + max_correction)) + 3, channels), dtype=np.float32)
+        self._steps = np.arange(block_size, dtype=np.float64)
+        
+        self.has_audio = False
+        self.priming = False
+        self.concealed_run = 0
+        self.idle_after_blocks = 25
+        self.repeat_limit = 3
+        self.repeat_fade = 0.5
+        
+        # Target adaptation and drift tracking
+        self.adapt_window = 200
+        self.window_blocks = 0
+        self.window_min_depth = None
+        self.smoothed_depth = float(block_size)
+        self.correction = 0.0
+        self.phase = 0.0
+        
+        self.underruns = 0
+        self.concealed_blocks = 0
+    
+    @property
+    def overruns(self) -> int:
+        return self.ring.overruns
+    
+    def write(self, block: np.ndarray):
+        """Queue converted frames from the transport side"""
+        if block.shape[0]:
+            self.ring.write(block)
+            self.has_audio = True
+    
+    def read(self, out: np.ndarray) -> bool:
+        """Fill `out` with one block; returns False when the source is idle"""
+        available = self.ring.available()
+        self.smoothed_depth += 0.01 * (available - self.smoothed_depth)
+        
+        if self.priming:
+            if available < self.target_frames:
+                return self._conceal(out)
+            self.priming = False
+        
+        ratio = self._update_correction()
+        needed = self.block_size if ratio == 1.0 else int(self.phase + ratio * self.block_size) + 2
+        
+        if available < needed:
+            if not self.has_audio:
+                return False
+            self.underruns += 1
+            self.priming = True
+            self.target_frames = min(self.max_target, self.target_frames + self.block_size // 2)
+            self.window_blocks = 0
+            self.window_min_depth = None
+            return self._conceal(out)
+        
+        if ratio == 1.0:
+            self.ring.read_into(out)
+        else:
+            self._read_resampled(out, ratio, needed)
+        
+        self.last_block[:] = out
+        self.concealed_run = 0
+        self._adapt_target(available - needed)
+        return True
+    
+    def _update_correction(self) -> float:
+        """Turn the depth error into a small read-rate adjustment"""
+        error = (self.smoothed_depth - self.target_frames) / self.target_frames
+        if abs(error) < 0.25:
+            self.correction = 0.0
+            self.phase = 0.0
+            return 1.0
+        self.correction = max(-self.max_correction, min(self.max_correction, 0.01 * error))
+        return 1.0 + self.correction
+    
+    def _read_resampled(self, out: np.ndarray, ratio: float, needed: int):
+        """Read `ratio * block_size` input frames and interpolate them to one block"""
+        source = self._scratch[:needed]
+        self.ring.peek_into(source)
+        
+        positions = self.phase + ratio * self._steps
+        indices = positions.astype(np.int64)
+        fraction = (positions - indices)[:, None].astype(np.float32)
+        np.multiply(source[indices], 1.0 - fraction, out=out)
+        out += source[indices + 1] * fraction
+        
+        advance = self.phase + ratio * self.block_size
+        consumed = int(advance)
+        self.phase = advance - consumed
+        self.ring.discard(consumed)
+    
+    def _adapt_target(self, spare: int):
+        """Shrink the target when the cushion has gone unused for a whole window"""
+        if self.window_min_depth is None or spare < self.window_min_depth:
+            self.window_min_depth = spare
+        self.window_blocks += 1
+        
+        if self.window_blocks >= self.adapt_window:
+            if self.window_min_depth > self.block_size // 2 and self.target_frames > self.min_target:
+                self.target_frames = max(self.min_target, self.target_frames - self.block_size // 4)
+            self.window_blocks = 0
+            self.window_min_depth = None
+    
+    def _conceal(self, out: np.ndarray) -> bool:
+        """Fill an underrun with a faded repeat of the last block or silence"""
+        self.concealed_run += 1
+        if self.concealed_run > self.idle_after_blocks:
+            return False
+        
+        if self.concealment == 'repeat' and self.concealed_run <= self.repeat_limit:
+            np.multiply(self.last_block, self.repeat_fade ** self.concealed_run, out=out)
+        else:
+            out.fill(0.0)
+        self.concealed_blocks += 1
+        return True
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Depth, target and xrun counters"""
+        to_ms = 1000.0 / self.sample_rate
+        return {
+            'depth_ms': round(self.ring.available() * to_ms, 2),
+            'target_ms': round(self.target_frames * to_ms, 2),
+            'underruns': self.underruns,
+            'overruns': self.overruns,
+            'concealed_blocks': self.concealed_blocks,
+            'drift_correction_ppm': round(self.correction * 1e6, 1),
+            'priming': self.priming
+        }
+
+class MixMinusBank:
+    """Mix-minus return feeds for every guest, stored in one shared ring.
+    
+    Each mix-minus source owns a slot. Per block the mixer writes every
+    source's contribution into its slot row, sums the rows into the bus and
+    derives all return feeds as ``bus - contribution`` in one broadcast
+    operation, so cost grows linearly with the number of guests. All feeds
+    share a single write position; each guest transport keeps its own read
+    position and reads without blocking the mixer. Slot changes from the API
+    thread are staged and swapped in at the start of the next block.
+    """
+    
+    def __init__(self, block_size: int, channels: int, capacity_blocks: int = 8, initial_slots: int = 8):
+        self.block_size = block_size
+        self.channels = channels
+        self.capacity = block_size * capacity_blocks
+        self.slots: Dict[str, int] = {}  # source_id -> slot
+        self.free_slots: List[int] = []
+        self.high_water = 0
+        self._staged = None  # (slots, free_slots, high_water) from the API thread, applied at the next block
+        self.lock = threading.Lock()
+        
+        self.write_position = 0  # total frames written
+        self._allocate_arrays(initial_slots)
+    
+    def _allocate_arrays(self, slot_count: int):
+        """(Re)allocate slot arrays, keeping existing feeds"""
+        ring = np.zeros((slot_count, self.capacity, self.channels), dtype=np.int16)
+        contributions = np.zeros((slot_count, self.block_size, self.channels), dtype=np.float32)
+        read_positions = np.full(slot_count, self.write_position, dtype=np.int64)
+        overruns = np.zeros(slot_count, dtype=np.int64)
+        underruns = np.zeros(slot_count, dtype=np.int64)
+        
+        if hasattr(self, 'ring'):
+            used = self.ring.shape[0]
+            ring[:used] = self.ring
+            read_positions[:used] = self.read_positions
+            overruns[:used] = self.overruns
+            underruns[:used] = self.underruns
+        
+        self.ring = ring
+        self.contributions = contributions
+        self.read_positions = read_positions
+        self.overruns = overruns
+        self.underruns = underruns
+    
+    def _staged_layout(self) -> Tuple[Dict[str, int], List[int], int]:
+        """The slot layout allocate/release edit; staged until the media thread's next block"""
+        if self._staged is None:
+            self._staged = (dict(self.slots), list(self.free_slots), self.high_water)
+        return self._staged
+    
+    def allocate(self, source_id: str) -> int:
+        """Assign a return feed slot to a source; it starts receiving audio at the next block"""
+        with self.lock:
+            slots, free_slots, high_water = self._staged_layout()
+            if source_id in slots:
+                return slots[source_id]
+            
+            if free_slots:
+                slot = free_slots.pop()
+            else:
+                slot = high_water
+                high_water += 1
+            
+            slots[source_id] = slot
+            self._staged = (slots, free_slots, high_water)
+            return slot
+    
+    def release(self, source_id: str):
+        """Free a source's return feed slot at the next block"""
+        with self.lock:
+            slots, free_slots, high_water = self._staged_layout()
+            slot = slots.pop(source_id, None)
+            if slot is not None:
+                free_slots.append(slot)
+    
+    def _apply_staged(self):
+        """Swap in the staged slot layout, growing the arrays if needed (lock held)"""
+        slots, free_slots, high_water = self._staged
+        self._staged = None
+        
+        slot_count = self.ring.shape[0]
+        while slot_count < high_water:
+            slot_count *= 2
+        if slot_count > self.ring.shape[0]:
+            self._allocate_arrays(slot_count)
+        
+        for source_id, slot in slots.items():
+            if self.slots.get(source_id) == slot:
+                continue
+            self.ring[slot].fill(0)
+            self.read_positions[slot] = self.write_position
+            self.overruns[slot] = 0
+            self.underruns[slot] = 0
+        
+        # Replaced, never mutated, so a block's snapshot stays valid
+        self.slots = slots
+        self.free_slots = free_slots
+        self.high_water = high_water
+    
+    def begin_block(self) -> Tuple[np.ndarray, Dict[str, int]]:
+        """Apply staged slot changes, then clear and return the block's contribution rows and slot map.
+        
+        Only the media thread calls this, so the arrays and slot map it returns
+        stay consistent until the matching write_returns.
+        """
+        with self.lock:
+            if self._staged is not None:
+                self._apply_staged()
+            rows = self.contributions[:self.high_water]
+            slots = self.slots
+        rows.fill(0.0)
+        return rows, slots
+    
+    def write_returns(self, bus: np.ndarray, contributions: np.ndarray):
+        """Derive every return feed from the bus and the block's contribution rows and append it to the ring"""
+        count = len(contributions)
+        if not count:
+            return
+        
+        frames = bus.shape[0]
+        returns = bus[None, :, :] - contributions[:, :frames]
+        samples = np.clip(np.rint(returns * 32768.0), -32768, 32767).astype(np.int16)
+        
+        with self.lock:
+            start = self.write_position % self.capacity
+            first = min(frames, self.capacity - start)
+            self.ring[:count, start:start + first] = samples[:, :first]
+            if first < frames:
+                self.ring[:count, :frames - first] = samples[:, first:]
+            self.write_position += frames
+    
+    def read(self, source_id: str, frames: int) -> Optional[np.ndarray]:
+        """Read up to `frames` of a guest's return feed without blocking"""
+        with self.lock:
+            slot = self.slots.get(source_id)
+            if slot is None:
+                return None
+            
+            position = int(self.read_positions[slot])
+            oldest = self.write_position - self.capacity
+            if position < oldest:
+                # Reader fell behind by more than the ring; skip to the oldest audio
+                self.overruns[slot] += 1
+                position = oldest
+            
+            available = self.write_position - position
+            if available < frames:
+                self.underruns[slot] += 1
+            count = min(frames, available)
+            
+            indices = (position + np.arange(count)) % self.capacity
+            block = self.ring[slot, indices]
+            self.read_positions[slot] = position + count
+            return block
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Per-feed buffer depth and xrun counters"""
+        with self.lock:
+            return {
+                source_id: {
+                    'slot': slot,
+                    'buffered_frames': int(min(self.write_position - self.read_positions[slot], self.capacity)),
+                    'overruns': int(self.overruns[slot]),
+                    'underruns': int(self.underruns[slot])
+                }
+                for source_id, slot in self.slots.items()
+            }
+
+def k_weighting(sample_rate: int) -> List[Tuple[float, float, float, float, float]]:
+    """ITU-R BS.1770 K-weighting biquads (pre-filter shelf, then RLB high-pass) for any rate.
+    
+    Uses the bilinear-transform design the BS.1770 48 kHz reference
+    coefficients were derived from, so 48 kHz matches the standard exactly.
+    """
+    # Stage 1: high shelf
+    k = np.tan(np.pi * 1681.974450955533 / sample_rate)
+    q = 0.7071752369554196
+    vh = 10.0 ** (3.999843853973347 / 20.0)
+    vb = vh ** 0.4996667741545416
+    a0 = 1.0 + k / q + k * k
+    shelf = ((vh + vb * k / q + k * k) / a0, 2.0 * (k * k - vh) / a0, (vh - vb * k / q + k * k) / a0,
+             2.0 * (k * k - 1.0) / a0, (1.0 - k / q + k * k) / a0)
+    
+    # Stage 2: revised low-frequency B-curve high-pass
+    k = np.tan(np.pi * 38.13547087602444 / sample_rate)
+    q = 0.5003270373238773
+    a0 = 1.0 + k / q + k * k
+    highpass = (1.0, -2.0, 1.0, 2.0 * (k * k - 1.0) / a0, (1.0 - k / q + k * k) / a0)
+    
+    return [tuple(float(c) for c in shelf), tuple(float(c) for c in highpass)]
+
+# Gating histogram for integrated loudness: 0.1 LU bins from the -70 LUFS absolute gate
+LOUDNESS_BIN_WIDTH = 0.1
+LOUDNESS_BINS = np.arange(-70.0, 5.0, LOUDNESS_BIN_WIDTH) + LOUDNESS_BIN_WIDTH / 2
+
+def energy_to_lufs(energy: np.ndarray) -> np.ndarray:
+    """Convert K-weighted mean-square energy to LUFS"""
+    return -0.691 + 10.0 * np.log10(np.maximum(energy, 1e-12))
+
+class MeterBank:
+    """RMS, peak and EBU R128 loudness for many meters at once.
+    
+    Each meter owns a slot. The mixer copies a source's post-fader block into
+    its slot row; process() then meters every slot in one pass: peak/RMS are
+    reductions over the stacked rows, K-weighting runs as one block filter
+    over all slot channels, and integrated loudness is kept as a per-slot
+    gating histogram so it never needs the full programme history.
+    Momentary (400 ms) and short-term (3 s) windows are sliding averages of
+    per-block energies. Slot changes from the API thread are staged and
+    swapped in by begin_block, as in MixMinusBank.
+    """
+    
+    def __init__(self, sample_rate: int, block_size: int, channels: int, initial_slots: int = 8):
+        self.sample_rate = sample_rate
+        self.block_size = block_size
+        self.channels = channels
+        self.k_weighting = k_weighting(sample_rate)
+        
+        blocks_per_second = sample_rate / block_size
+        self.short_term_blocks = max(1, int(round(3.0 * blocks_per_second)))
+        self.momentary_blocks = max(1, int(round(0.4 * blocks_per_second)))
+        self.history_position = 0
+        
+        self.slots: Dict[str, int] = {}
+        self.free_slots: List[int] = []
+        self.high_water = 0
+        self._staged = None  # (slots, free_slots, high_water) from the API thread, applied at the next block
+        self.lock = threading.Lock()
+        self.blocks_metered = 0
+        self._allocate_arrays(initial_slots)
+    
+    def _allocate_arrays(self, slot_count: int):
+        """(Re)allocate per-slot arrays, keeping existing meters"""
+        arrays = {
+            'inputs': np.zeros((slot_count, self.block_size, self.channels), dtype=np.float32),
+            'peak_hold': np.zeros((slot_count, self.channels)),
+            'rms': np.zeros((slot_count, self.channels)),
+            'energy_history': np.zeros((slot_count, self.short_term_blocks)),
+            'blocks_seen': np.zeros(slot_count, dtype=np.int64),
+            'gate_counts': np.zeros((slot_count, len(LOUDNESS_BINS))),
+            'gate_energy': np.zeros((slot_count, len(LOUDNESS_BINS))),
+            'filter_states': np.zeros((len(self.k_weighting), 2, slot_count * self.channels))
+        }
+        if hasattr(self, 'inputs'):
+            used = self.inputs.shape[0]
+            for name, array in arrays.items():
+                if name == 'filter_states':
+                    array[:, :, :used * self.channels] = self.filter_states
+                else:
+                    array[:used] = getattr(self, name)
+        for name, array in arrays.items():
+            setattr(self, name, array)
+    
+    def _staged_layout(self) -> Tuple[Dict[str, int], List[int], int]:
+        """The slot layout allocate/release edit; staged until the media thread's next block"""
+        if self._staged is None:
+            self._staged = (dict(self.slots), list(self.free_slots), self.high_water)
+        return self._staged
+    
+    def allocate(self, meter_id: str) -> int:
+        """Assign a slot to a meter; it is metered from the next block"""
+        with self.lock:
+            slots, free_slots, high_water = self._staged_layout()
+            if meter_id in slots:
+                return slots[meter_id]
+            
+            if free_slots:
+                slot = free_slots.pop()
+            else:
+                slot = high_water
+                high_water += 1
+            
+            slots[meter_id] = slot
+            self._staged = (slots, free_slots, high_water)
+            return slot
+    
+    def release(self, meter_id: str):
+        """Free a meter slot at the next block"""
+        with self.lock:
+            slots, free_slots, high_water = self._staged_layout()
+            slot = slots.pop(meter_id, None)
+            if slot is not None:
+                free_slots.append(slot)
+    
+    def _apply_staged(self):
+        """Swap in the staged slot layout, growing the arrays first if needed (lock held)"""
+        slots, free_slots, high_water = self._staged
+        self._staged = None
+        
+        slot_count = self.inputs.shape[0]
+        while slot_count < high_water:
+            slot_count *= 2
+        if slot_count > self.inputs.shape[0]:
+            self._allocate_arrays(slot_count)
+        
+        for meter_id, slot in slots.items():
+            if self.slots.get(meter_id) == slot:
+                continue
+            columns = slice(slot * self.channels, (slot + 1) * self.channels)
+            for name in ('inputs', 'peak_hold', 'rms', 'energy_history', 'blocks_seen', 'gate_counts', 'gate_energy'):
+                getattr(self, name)[slot] = 0
+            self.filter_states[:, :, columns] = 0.0
+        
+        # Replaced, never mutated, so a block's snapshot stays valid
+        self.slots = slots
+        self.free_slots = free_slots
+        self.high_water = high_water
+    
+    def begin_block(self) -> Tuple[np.ndarray, Dict[str, int]]:
+        """Apply staged slot changes and return the input rows and slot map for the next process().
+        
+        Only the media thread calls this, so both stay valid until process().
+        """
+        with self.lock:
+            if self._staged is not None:
+                self._apply_staged()
+            return self.inputs[:self.high_water], self.slots
+    
+    def process(self):
+        """Meter the block written to every slot, then clear the inputs"""
+        count = self.high_water
+        if not count:
+            return
+        
+        blocks = self.inputs[:count]
+        np.maximum(self.peak_hold[:count], np.abs(blocks).max(axis=1), out=self.peak_hold[:count])
+        self.rms[:count] = np.sqrt(np.mean(np.square(blocks), axis=1))
+        
+        # K-weight all slot channels as one (frames, slots * channels) block
+        weighted = blocks.transpose(1, 0, 2).reshape(self.block_size, count * self.channels)
+        for stage, coefficients in enumerate(self.k_weighting):
+            weighted = apply_block_filter(coefficients, weighted, self.filter_states[stage, :, :count * self.channels])
+        energy = np.mean(np.square(weighted), axis=0).reshape(count, self.channels).sum(axis=1)
+        
+        self.energy_history[:count, self.history_position] = energy
+        self.history_position = (self.history_position + 1) % self.short_term_blocks
+        self.blocks_seen[:count] += 1
+        
+        # Feed 400 ms gating blocks into the integrated-loudness histograms
+        momentary = self._window_energy(self.momentary_blocks, count)
+        loudness = energy_to_lufs(momentary)
+        gated = np.nonzero((loudness > -70.0) & (self.blocks_seen[:count] >= self.momentary_blocks))[0]
+        if len(gated):
+            bins = np.minimum(((loudness[gated] + 70.0) / LOUDNESS_BIN_WIDTH).astype(np.int64), len(LOUDNESS_BINS) - 1)
+            np.add.at(self.gate_counts, (gated, bins), 1.0)
+            np.add.at(self.gate_energy, (gated, bins), momentary[gated])
+        
+        blocks.fill(0.0)
+        self.blocks_metered += 1
+    
+    def _window_energy(self, window: int, count: int) -> np.ndarray:
+        """Mean energy of the most recent `window` blocks for every slot"""
+        columns = (self.history_position - 1 - np.arange(window)) % self.short_term_blocks
+        filled = np.clip(self.blocks_seen[:count], 1, window)
+        return self.energy_history[:count][:, columns].sum(axis=1) / filled
+    
+    def integrated_lufs(self, count: int) -> np.ndarray:
+        """Gated integrated loudness per slot (absolute -70 LUFS and relative -10 LU gates)"""
+        counts = self.gate_counts[:count]
+        energy = self.gate_energy[:count]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            relative_gate = energy_to_lufs(energy.sum(axis=1) / counts.sum(axis=1)) - 10.0
+            above = LOUDNESS_BINS[None, :] >= relative_gate[:, None]
+            gated_counts = (counts * above).sum(axis=1)
+            integrated = energy_to_lufs((energy * above).sum(axis=1) / np.maximum(gated_counts, 1.0))
+        return np.where(gated_counts > 0, integrated, -np.inf)
+    
+    def snapshot(self, reset_peaks: bool = True) -> Dict[str, Dict[str, Any]]:
+        """Current readings per meter; peaks are held between snapshots"""
+        with self.lock:
+            count, slots = self.high_water, self.slots
+        if not count:
+            return {}
+        
+        rms_db = np.round(to_db(self.rms[:count]), 1)
+        peak_db = np.round(to_db(self.peak_hold[:count]), 1)
+        momentary = np.round(energy_to_lufs(self._window_energy(self.momentary_blocks, count)), 1)
+        short_term = np.round(energy_to_lufs(self._window_energy(self.short_term_blocks, count)), 1)
+        integrated = np.round(self.integrated_lufs(count), 1)
+        
+        readings = {}
+        for meter_id, slot in slots.items():
+            readings[meter_id] = {
+                'rms_db': rms_db[slot].tolist(),
+                'peak_db': peak_db[slot].tolist(),
+                'momentary_lufs': float(momentary[slot]),
+                'short_term_lufs': float(short_term[slot]),
+                'integrated_lufs': float(integrated[slot]) if np.isfinite(integrated[slot]) else None
+            }
+        
+        if reset_peaks:
+            self.peak_hold[:count] = 0.0
+        return readings
@@ -2,7 +2,8 @@
 """
 🌊 MATRIX BROADCAST STUDIO - BROADCAST ENGINE
 Professional multi-platform streaming engine with real-time capabilities
-Features: RTMP streaming, adaptive bitrate, failover, real-time monitoring
+Features: RTMP streaming, adaptive bitrate, admission control, pass-through relay, LL-HLS origin, failover,
+real-time monitoring with statistics history
 """
 
 import os
@@ -13,13 +14,30 @@ import threading
 import logging
 import queue
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any, Tuple
+from typing import Callable, Dict, List, Optional, Any, Tuple
 import asyncio
 import websockets
 import cv2
 import numpy as np
 from PIL import Image
 
+from adaptive_bitrate import AdaptiveBitrateController, build_ladder
+from audio_processing import (
+    InputConverter, JitterBuffer, MeterBank, MixMinusBank, SidechainDucker,
+    balance_matrix, build_effects_chain
+)
+from capacity_planner import CapacityPlanner
+from encoder_supervisor import DiagnosticLog, EncoderSupervisor, RestartTracker, is_keeping_up
+from frame_queue import POLICIES as DROP_POLICIES, FrameQueue
+from hls_origin import LLHlsOrigin
+from media_clock import AudioTimeline, MediaClock, VideoTimeline, av_offset
+from packet_bus import FLV_HEADER, TAG_SCRIPT, FlvReader, FlvTag, KeyframeSwitcher, PacketBus
+from process_isolation import CpuAccounting, IsolationPolicy
+from render_plan import PreviewSlot, RenderPlan, StaticFrameCache, scene_sources
+from stats_history import FIELDS as HISTORY_FIELDS, StatsRing, tcp_rtts
+from replay_buffer import ReplayBuffer
+from segment_recorder import SegmentRecorder
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -63,6 +81,321 @@ class StreamQuality:
         """Get quality preset by name"""
         return cls.QUALITY_PRESETS.get(quality_name, cls.QUALITY_PRESETS['720p'])
 
+class EncoderFeeder:
+    """Writes clock-stamped frames and audio blocks to one encoder process"""
+    
+    def __init__(self, name: str, video_pipe, audio_pipe, fps: int,
+                 sample_rate: int, channels: int, origin_pts: float,
+                 frame_size: Optional[Tuple[int, int]] = None, pin: Optional[Callable[[], None]] = None,
+                 queue_frames: int = 8, drop_policy: str = 'drop-oldest', keyframe_interval: int = 0):
+        self.name = name
+        self.frame_size = frame_size  # (width, height) the encoder expects
+        self.pin = pin  # places the writer threads (CPU affinity) as they start
+        self.thread_ids = {}  # kind -> native thread id, for /proc accounting
+        self.video = VideoTimeline(fps, origin_pts)
+        self.audio = AudioTimeline(sample_rate, channels, origin_pts)
+        self.running = True
+        self.lagging = False
+        
+        # Separate writers so ffmpeg reading one input never blocks the other. Video is bounded:
+        # a slow encoder sheds pictures (see FrameQueue) instead of growing memory and latency;
+        # audio is small and its sample count must not change
+        self._queues = {
+            'video': FrameQueue(queue_frames, drop_policy, keyframe_interval),
+            'audio': FrameQueue()
+        }
+        self._threads = [
+            threading.Thread(target=self._write_loop, args=(kind, pipe), daemon=True)
+            for kind, pipe in (('video', video_pipe), ('audio', audio_pipe))
+        ]
+        for thread in self._threads:
+            thread.start()
+    
+    def submit_video(self, frame: np.ndarray, pts: float):
+        """Queue a composed frame, duplicated or dropped to sit at its PTS"""
+        if not self.running:
+            return
+        copies = self.video.place(pts)
+        if not copies:
+            return
+        
+        video = self._queues['video']
+        overflows = video.overflows
+        video.put(frame, self.video.next_slot - copies, copies)
+        if video.overflows > overflows and not self.lagging:
+            self.lagging = True
+            logger.warning(f"🐢 Encoder {self.name} is not keeping up with its input; {video.policy} until it catches up")
+        elif self.lagging and not len(video) and not video.half_rate:
+            self.lagging = False
+            logger.info(f"✅ Encoder {self.name} caught up")
+    
+    def submit_audio(self, block: np.ndarray, pts: float):
+        """Queue a mixed block, stretched or squeezed to sit at its PTS"""
+        if not self.running:
+            return
+        samples = self.audio.place(block, pts)
+        if len(samples):
+            self._queues['audio'].put(samples, 0, 1)
+    
+    def _write_loop(self, kind: str, pipe):
+        """Drain one queue into its encoder pipe"""
+        self.thread_ids[kind] = threading.get_native_id()
+        if self.pin:
+            self.pin()
+        pending = self._queues[kind]
+        while True:
+            item = pending.get()
+            if item is None:
+                break
+            
+            data, copies = item
+            try:
+                # Encoders at other resolutions scale the program frame here, off the media loop
+                if kind == 'video' and self.frame_size and (data.shape[1], data.shape[0]) != self.frame_size:
+                    data = cv2.resize(data, self.frame_size, interpolation=cv2.INTER_AREA)
+                for _ in range(copies):
+                    pipe.write(data)
+                pipe.flush()
+            except (OSError, ValueError) as e:
+                if self.running:
+                    logger.warning(f"⚠️ {self.name} {kind} pipe closed: {e}")
+                self.running = False
+                break
+        
+        try:
+            pipe.close()
+        except OSError:
+            pass
+    
+    def close(self):
+        """Stop writing and close both pipes"""
+        self.running = False
+        for pending in self._queues.values():
+            pending.close()
+        for thread in self._threads:
+            thread.join(timeout=2)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Per-encoder sync metrics"""
+        return {
+            'video': self.video.get_stats(),
+            'audio': self.audio.get_stats(),
+            'av_offset_ms': round(av_offset(self.video, self.audio) * 1000, 2),
+            'queue': {kind: pending.get_stats() for kind, pending in self._queues.items()},
+            'lagging': self.lagging
+        }
+
+class EncoderPipeline:
+    """One shared encoder: clock-stamped raw A/V in, FLV packets out onto a PacketBus"""
+    
+    def __init__(self, key: str, quality_name: str, quality: Dict[str, Any], process: subprocess.Popen,
+                 feeder: EncoderFeeder, diagnostics: DiagnosticLog, origin_ms: int):
+        self.key = key
+        self.quality_name = quality_name
+        self.quality = quality
+        self.process = process
+        self.feeder = feeder
+        self.diagnostics = diagnostics
+        self.origin_ms = origin_ms
+        self.bus = PacketBus(key)
+        self.consumers = set()  # platforms (and local outputs) reading this encoder
+        self.progress = None
+        self.started_at = datetime.now()
+        
+        self._reader = threading.Thread(target=self._read_loop, daemon=True)
+        self._reader.start()
+    
+    def _read_loop(self):
+        """Demux the encoder's FLV output onto the bus, on the media clock timeline"""
+        reader = FlvReader()
+        stdout = self.process.stdout
+        try:
+            while True:
+                chunk = stdout.read1(65536)
+                if not chunk:
+                    break
+                for tag in reader.feed(chunk):
+                    tag.timestamp += self.origin_ms
+                    self.bus.publish(tag)
+        except Exception as e:
+            logger.error(f"❌ Encoder {self.key} output error: {e}")
+    
+    def stop(self):
+        """Close the inputs and let FFmpeg flush, killing it if it hangs"""
+        self.feeder.close()
+        if self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'quality': self.quality_name,
+            'bitrate': self.quality['bitrate'],
+            'consumers': sorted(self.consumers),
+            'started_at': self.started_at.isoformat(),
+            'progress': self.progress,
+            'packets': self.bus.get_stats(),
+            'sync': self.feeder.get_stats(),
+            'diagnostics': self.diagnostics.get_stats()
+        }
+
+class DestinationOutput:
+    """One RTMP destination: a `-c copy` relay fed from whichever encoder it follows"""
+    
+    def __init__(self, platform: str, process: subprocess.Popen,
+                 on_switch: Optional[Callable[[Optional[PacketBus], PacketBus, Dict[str, Any]], None]] = None):
+        self.platform = platform
+        self.process = process
+        self.switcher = KeyframeSwitcher(self._enqueue, platform, on_switch)
+        self.queued_bytes = 0
+        self.bytes_written = 0
+        self.throughput_kbps = 0.0
+        self._window = (time.monotonic(), 0)  # (start, bytes_written) of the current 1s window
+        self._base_ts = None
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._write_loop, daemon=True)
+        self._thread.start()
+    
+    def _enqueue(self, tag: FlvTag):
+        """Runs on the encoder's reader thread; each relay's timestamps start at zero"""
+        if self._base_ts is None:
+            self._base_ts = tag.timestamp
+        data = tag.to_bytes(max(0, tag.timestamp - self._base_ts))
+        with self._lock:
+            self.queued_bytes += len(data)
+        self._queue.put(data)
+    
+    def _write_loop(self):
+        """Write FLV to the relay's stdin; a slow uplink backs up here, not in the encoder"""
+        pipe = self.process.stdin
+        try:
+            pipe.write(FLV_HEADER)
+            while True:
+                data = self._queue.get()
+                if data is None:
+                    break
+                pipe.write(data)
+                if self._queue.empty():
+                    pipe.flush()
+                with self._lock:
+                    self.queued_bytes -= len(data)
+                    self.bytes_written += len(data)
+                
+                now = time.monotonic()
+                if now - self._window[0] >= 1.0:
+                    self.throughput_kbps = (self.bytes_written - self._window[1]) * 8 / 1000.0 / (now - self._window[0])
+                    self._window = (now, self.bytes_written)
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ {self.platform} relay input closed: {e}")
+        finally:
+            try:
+                pipe.close()
+            except OSError:
+                pass
+    
+    def close(self):
+        """Detach from the encoder and close the relay's input"""
+        self.switcher.detach()
+        self._queue.put(None)
+        self._thread.join(timeout=2)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.switcher.get_stats(),
+            'queued_bytes': self.queued_bytes,
+            'bytes_written': self.bytes_written,
+            'throughput_kbps': round(self.throughput_kbps, 1)
+        }
+
+class IngestRelay:
+    """Pass-through source: one locally published RTMP/FLV stream copied onto a PacketBus.
+    
+    The listener only remuxes (`-c copy`), so destinations cost a relay each
+    and no encode. When the publisher disconnects a new listener is attached
+    to the same bus and timestamps continue where the last session ended.
+    """
+    
+    def __init__(self, listen_url: str, on_closed: Optional[Callable[['IngestRelay'], None]] = None):
+        self.listen_url = listen_url
+        self.on_closed = on_closed
+        self.bus = PacketBus('ingest')
+        self.process = None
+        self.diagnostics = None
+        self.progress = None
+        self.sessions = 0
+        self.bytes_in = 0
+        self.connected_at = None
+        self.started_at = datetime.now()
+        self._last_ts = None
+    
+    def attach(self, process: subprocess.Popen, diagnostics: DiagnosticLog):
+        """Start reading a (new) listener process"""
+        self.process = process
+        self.diagnostics = diagnostics
+        self.progress = None
+        self.connected_at = None
+        threading.Thread(target=self._read_loop, args=(process,), daemon=True).start()
+    
+    def _read_loop(self, process: subprocess.Popen):
+        """Demux the listener's FLV output onto the bus, keeping timestamps continuous across sessions"""
+        reader = FlvReader()
+        offset = None
+        try:
+            while True:
+                chunk = process.stdout.read1(65536)
+                if not chunk:
+                    break
+                if self.connected_at is None:
+                    self.connected_at = datetime.now()
+                    self.sessions += 1
+                    logger.info(f"📥 Ingest publisher connected on {self.listen_url}")
+                self.bytes_in += len(chunk)
+                for tag in reader.feed(chunk):
+                    if offset is None:
+                        offset = 0 if self._last_ts is None else self._last_ts + (self.bus.frame_ms or 33) - tag.timestamp
+                    tag.timestamp += offset
+                    if tag.tag_type != TAG_SCRIPT:
+                        self._last_ts = tag.timestamp if self._last_ts is None else max(self._last_ts, tag.timestamp)
+                    self.bus.publish(tag)
+        except Exception as e:
+            logger.error(f"❌ Ingest output error: {e}")
+        
+        process.wait()
+        if process is self.process and self.on_closed:
+            self.on_closed(self)
+    
+    @property
+    def connected(self) -> bool:
+        return self.connected_at is not None and self.process is not None and self.process.poll() is None
+    
+    def stop(self):
+        """Stop listening; the reader sees EOF and the bus goes quiet"""
+        process, self.process = self.process, None
+        if process and process.poll() is None:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'listen_url': self.listen_url,
+            'connected': self.connected,
+            'connected_at': self.connected_at.isoformat() if self.connected_at else None,
+            'sessions': self.sessions,
+            'bytes_in': self.bytes_in,
+            'progress': self.progress,
+            'packets': self.bus.get_stats(),
+            'diagnostics': self.diagnostics.get_stats() if self.diagnostics else None
+        }
+
 class BroadcastEngine:
     """Professional broadcast engine with multi-platform support"""
     
@@ -73,6 +406,77 @@ class BroadcastEngine:
         self.video_compositor = None
         self.stream_processes = {}  # platform -> subprocess
         self.monitoring_thread = None
+        
+        # Master media clock driving composition, mixing and encoder feeds
+        self.clock = MediaClock()
+        self.frame_sources = {}  # source_id -> latest video frame
+        self.static_frames = StaticFrameCache()  # decoded images, colors and video posters, reused across compiles
+        self.media_thread_id = None
+        
+        # Encoders, relays and the media loop get their own cores and priority classes
+        self.isolation = IsolationPolicy(self._load_streaming_config('isolation'))
+        self.cpu_accounting = CpuAccounting()
+        self.encoders = {}  # encoder key -> EncoderPipeline shared by destinations
+        self.feeders = {}  # encoder key -> EncoderFeeder
+        self.media_thread = None
+        
+        # Relay mode: a locally published stream is copied to destinations without re-encoding
+        self.ingest = None
+        
+        # Outputs that tap the program feed without being a platform (replay, ...)
+        self.local_outputs = {}  # name -> {'output', 'encoder'}
+        self.replay = None
+        self.recorder = None
+        self.hls = None
+        self.recording_config = self._load_streaming_config('recording')
+        
+        # Encoder progress and health are pushed from an asyncio supervisor
+        self.supervisor = EncoderSupervisor(self._on_encoder_progress)
+        self.progress_timeout = 10  # seconds without a progress report before a stream counts as stalled
+        
+        # Per-platform restart state, persisted across runs
+        self.restart_policy = {
+            'base_delay': 2.0,
+            'max_delay': 60.0,
+            'max_failures': 5,
+            'cooldown': 300.0,
+            'stable_after': 60.0
+        }
+        self.restart_trackers = {}  # platform -> RestartTracker
+        self.restart_history_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'restart_history.json')
+        self._history_lock = threading.Lock()
+        self._load_restart_history()
+        
+        # Closed-loop bitrate control per destination (see AdaptiveBitrateController)
+        self.abr_policy = {
+            'interval': 1.0,
+            'backlog_high': 1.0,
+            'backlog_low': 0.25,
+            'down_samples': 2,
+            'up_hold': 10.0,
+            'max_up_hold': 120.0,
+            'min_interval': 4.0
+        }
+        
+        # Bounded encoder input queues: how a slow encoder sheds frames without stalling the others
+        self.feed_policy = {
+            'queue_frames': 8,
+            'drop_policy': 'drop-non-reference'
+        }
+        self.feed_policy.update(self._load_streaming_config('encoder_queue'))
+        if self.feed_policy['drop_policy'] not in DROP_POLICIES:
+            logger.warning(f"⚠️ Unknown frame drop policy {self.feed_policy['drop_policy']}; using drop-oldest")
+            self.feed_policy['drop_policy'] = 'drop-oldest'
+        
+        # Admission control: encoders must fit the host's CPU budget
+        self.capacity_config = self._load_streaming_config('capacity')
+        self.planner = CapacityPlanner(
+            os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'capacity_profile.json'),
+            budget=self.capacity_config.get('budget', 0.85),
+            reserved_cores=self.capacity_config.get('reserved_cores', 0.5)
+        )
+        if self.capacity_config.get('benchmark_on_start'):
+            self.run_capacity_benchmark()
         self.broadcast_queue = queue.Queue()
         self.is_broadcasting = False
         self.stream_quality = '720p'
@@ -83,11 +487,21 @@ class BroadcastEngine:
             'frames_sent': 0,
             'bytes_sent': 0,
             'dropped_frames': 0,
+            'duplicated_frames': 0,
             'uptime': 0,
             'current_bitrate': 0,
-            'avg_fps': 0
+            'avg_fps': 0,
+            'av_drift_ms': 0.0
         }
         
+        # Per-destination history sampled on the supervisor, for dashboard summaries and sparklines
+        self.history_config = {'interval': 1.0, 'history_hours': 6}
+        self.history_config.update(self._load_streaming_config('statistics'))
+        self.stats_history = {}  # platform -> StatsRing
+        self._drop_counts = {}  # platform -> (encoder key, frames dropped so far)
+        self._history_sampling = False
+        self._sampling_lock = threading.Lock()
+        
         logger.info("🌊 Broadcast Engine initialized")
     
     def initialize_streaming(self, quality: str = '720p'):
@@ -101,11 +515,12 @@ class BroadcastEngine:
         self.video_compositor = VideoCompositor(
             width=quality_settings['width'],
             height=quality_settings['height'],
-            fps=quality_settings['fps']
+            fps=quality_settings['fps'],
+            clock=self.clock
         )
         
         # Initialize audio mixer
-        self.audio_mixer = AudioMixer()
+        self.audio_mixer = AudioMixer(clock=self.clock)
         
         logger.info(f"✅ Streaming initialized at {quality}")
         
@@ -132,20 +547,50 @@ class BroadcastEngine:
             # Build full RTMP URL
             full_url = f"{rtmp_url}/{stream_key}"
             
-            # Get quality settings
-            quality_settings = StreamQuality.get_quality(self.stream_quality)
+            max_destinations = self._destination_limit(stream_config)
+            if max_destinations is not None and len(self.active_streams) >= max_destinations:
+                return {'error': f'Plan allows {max_destinations} simultaneous destination(s)'}
             
-            # Build FFmpeg command
-            ffmpeg_cmd = self._build_ffmpeg_command(full_url, quality_settings, platform)
+            if self.ingest:
+                # Relay mode: the publisher's packets are forwarded as-is, there is nothing to adapt
+                abr = None
+                source_bus, source_key = self.ingest.bus, self.ingest.bus.name
+                quality_name, bitrate = 'passthrough', None
+            else:
+                if not self.video_compositor or not self.audio_mixer:
+                    self.initialize_streaming(self.stream_quality)
+                
+                # Destinations share one encoder per ladder rung; the relay only copies packets
+                abr = self._create_abr_controller(platform, stream_config)
+                admission = self._admit(platform, stream_config, abr)
+                if not admission['allowed']:
+                    return {'error': admission['reason'], 'admission': admission}
+                rung = abr.rung if abr else admission['rung']
+                encoder = self._acquire_encoder(rung['quality'], platform, rung['bitrate'])
+                source_bus, source_key = encoder.bus, encoder.key
+                quality_name, bitrate = encoder.quality_name, encoder.quality['bitrate']
             
-            # Start FFmpeg process
-            process = subprocess.Popen(
-                ffmpeg_cmd,
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                shell=False
+            # Start the relay under the supervisor
+            diagnostics = DiagnosticLog()
+            try:
+                process = self.supervisor.spawn(
+                    platform,
+                    self._build_relay_command(full_url),
+                    diagnostics,
+                    launcher=self.isolation.launcher('relay'),
+                    stdin=subprocess.PIPE,
+                    shell=False
+                )
+            except Exception:
+                self._release_encoder(source_key, platform)
+                raise
+            
+            output = DestinationOutput(
+                platform,
+                process,
+                on_switch=lambda old_bus, new_bus, info, p=platform: self._on_destination_switched(p, old_bus, new_bus, info)
             )
+            output.switcher.switch_to(source_bus)
             
             # Store stream info
             self.active_streams[platform] = {
@@ -156,16 +601,33 @@ class BroadcastEngine:
                 'process': process,
                 'started_at': datetime.now(),
                 'status': 'starting',
-                'quality': self.stream_quality,
-                'config': stream_config
+                'quality': quality_name,
+                'config': stream_config,
+                'progress': None,
+                'slow_reports': 0,
+                'diagnostics': diagnostics,
+                'encoder': source_key,
+                'output': output,
+                'abr': abr
             }
             
             self.stream_processes[platform] = process
             
+            # A manual start closes the circuit; a scheduled restart keeps its count
+            tracker = self._restart_tracker(platform)
+            if tracker.state not in ('restarting', 'half_open'):
+                tracker.reset('idle')
+            
             # Start monitoring if this is first stream
-            if not self.is_broadcasting:
-                self._start_broadcast_monitoring()
-                self.is_broadcasting = True
+            self._ensure_pipeline()
+            
+            # Recording enabled in config/streaming.json follows the broadcast
+            if self.recording_config.get('enabled') and not self.recorder:
+                self.start_recording(auto=True)
+            
+            if abr:
+                self.supervisor.call_later(abr.interval, self._abr_tick, platform, output)
+            self._start_history_sampling(platform)
             
             logger.info(f"🚀 Started {platform} stream: {full_url}")
             
@@ -173,29 +635,118 @@ class BroadcastEngine:
                 'success': True,
                 'platform': platform,
                 'url': full_url,
-                'quality': self.stream_quality,
+                'quality': quality_name,
+                'bitrate': bitrate,
                 'status': 'starting'
             }
-            
+        
         except Exception as e:
             logger.error(f"❌ Failed to start {platform} stream: {e}")
             return {'error': str(e)}
     
-    def _build_ffmpeg_command(self, rtmp_url: str, quality: Dict[str, Any], platform: str) -> List[str]:
-        """Build FFmpeg command for streaming"""
+    def start_relay_ingest(self, ingest_config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Switch to relay mode: listen for one RTMP/FLV publisher (e.g. OBS) and copy it to destinations"""
+        if self.ingest:
+            return {'error': 'Relay ingest already running'}
+        if self.active_streams or self.local_outputs:
+            return {'error': 'Stop active streams and local outputs before switching to relay mode'}
+        
+        ingest_config = ingest_config or {}
+        listen_url = ingest_config.get('listen_url') or (
+            f"rtmp://{ingest_config.get('host', '0.0.0.0')}:{ingest_config.get('port', 1935)}"
+            f"/{ingest_config.get('app', 'live')}/{ingest_config.get('stream_key', 'atlantiplex')}")
+        
+        ingest = IngestRelay(listen_url, on_closed=self._on_ingest_closed)
+        try:
+            self._spawn_ingest(ingest)
+        except Exception as e:
+            logger.error(f"❌ Failed to start relay ingest: {e}")
+            return {'error': str(e)}
+        self.ingest = ingest
+        
+        logger.info(f"📥 Relay mode: waiting for a publisher on {listen_url}")
+        return {'success': True, 'mode': 'relay', 'listen_url': listen_url}
+    
+    def stop_relay_ingest(self) -> Dict[str, Any]:
+        """Leave relay mode; destinations fed by the ingest are stopped with it"""
+        ingest, self.ingest = self.ingest, None
+        if not ingest:
+            return {'error': 'Relay ingest not running'}
+        
+        stopped = {platform: self.stop_platform_stream(platform)
+                   for platform, info in list(self.active_streams.items()) if info['encoder'] == ingest.bus.name}
+        if self.replay:
+            self.stop_replay_buffer()
+        if self.recorder:
+            self.stop_recording()
+        if self.hls:
+            self.stop_hls_output()
+        for name in list(self.local_outputs):
+            self._detach_local_output(name)
+        ingest.stop()
+        
+        logger.info("📥 Relay mode stopped")
+        return {'success': True, 'mode': 'encode', 'stopped_platforms': stopped}
+    
+    def _spawn_ingest(self, ingest: IngestRelay):
+        diagnostics = DiagnosticLog()
+        process = self.supervisor.spawn(
+            'ingest',
+            self._build_ingest_command(ingest.listen_url),
+            diagnostics,
+            launcher=self.isolation.launcher('relay'),
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            shell=False
+        )
+        ingest.attach(process, diagnostics)
+    
+    def _on_ingest_closed(self, ingest: IngestRelay):
+        """The publisher went away (or the listener failed); listen again for a reconnect"""
+        if ingest is not self.ingest:
+            return
+        ingest.diagnostics.finished.wait(timeout=1)
+        logger.warning(f"⚠️ Ingest session ended (exit {ingest.process.returncode}): {ingest.diagnostics.tail(5)}")
+        self.supervisor.call_later(1.0, self._relisten, ingest)
+    
+    def _relisten(self, ingest: IngestRelay):
+        if ingest is not self.ingest:
+            return
+        try:
+            self._spawn_ingest(ingest)
+        except Exception as e:
+            logger.error(f"❌ Failed to restart relay ingest: {e}")
+            self.supervisor.call_later(5.0, self._relisten, ingest)
+    
+    def _build_ingest_command(self, listen_url: str) -> List[str]:
+        """Build the ingest listener: accept one publisher and remux it to FLV on stdout"""
+        return [
+            'ffmpeg',
+            '-listen', '1',
+            '-f', 'flv',
+            '-i', listen_url,
+            '-c', 'copy',
+            '-f', 'flv',
+            'pipe:1'
+        ]
+    
+    def _build_ffmpeg_command(self, quality: Dict[str, Any], audio_fd: int = 3) -> List[str]:
+        """Build the shared encoder command (video on stdin, audio on `audio_fd`, FLV on stdout)"""
         cmd = [
             'ffmpeg',
-            '-y',  # Overwrite output files
             '-f', 'rawvideo',
             '-pix_fmt', 'bgr24',
             '-s', f"{quality['width']}x{quality['height']}",
             '-r', str(quality['fps']),
-            '-i', '-',  # Input from stdin (will be fed by our compositor)
+            '-thread_queue_size', '512',
+            '-i', 'pipe:0',  # Input from stdin (fed by the compositor on the media clock)
             '-f', 's16le',
             '-ac', '2',
-            '-ar', '44100',
-            '-i', '-',  # Audio input from stdin
+            '-ar', '48000',
+            '-thread_queue_size', '512',
+            '-i', f'pipe:{audio_fd}',  # Audio input from the mixer
             '-c:v', 'libx264',
+            '-pix_fmt', 'yuv420p',
             '-preset', 'veryfast',
             '-tune', 'zerolatency',
             '-profile:v', 'high',
@@ -208,24 +759,442 @@ class BroadcastEngine:
             '-sc_threshold', '0',
             '-c:a', 'aac',
             '-b:a', '128k',
-            '-ar', '44100',
+            '-ar', '48000',
+            '-bf', '1',
+            '-f', 'flv',
+            'pipe:1'
+        ]
+        
+        return cmd
+    
+    def _build_relay_command(self, rtmp_url: str) -> List[str]:
+        """Build a pass-through relay: FLV packets on stdin copied to the destination"""
+        return [
+            'ffmpeg',
+            '-f', 'flv',
+            '-i', 'pipe:0',
+            '-c', 'copy',
             '-f', 'flv',
             rtmp_url
         ]
+    
+    def _encoder_key(self, quality_name: str, bitrate: Optional[int] = None) -> str:
+        """Encoders are shared per quality and bitrate"""
+        return f"{quality_name}@{bitrate or StreamQuality.get_quality(quality_name)['bitrate']}k"
+    
+    def _acquire_encoder(self, quality_name: str, consumer: str, bitrate: Optional[int] = None) -> 'EncoderPipeline':
+        """Get the shared encoder for a quality (starting it if needed) and register a consumer"""
+        key = self._encoder_key(quality_name, bitrate)
+        encoder = self.encoders.get(key)
+        if encoder is None or encoder.process.poll() is not None:
+            encoder = self._start_encoder(key, quality_name, bitrate)
+        encoder.consumers.add(consumer)
+        return encoder
+    
+    def _start_encoder(self, key: str, quality_name: str, bitrate: Optional[int] = None) -> 'EncoderPipeline':
+        """Start an encoder fed by the media pipeline"""
+        quality = dict(StreamQuality.get_quality(quality_name))
+        if bitrate:
+            quality['bitrate'] = bitrate
         
-        # Platform-specific optimizations
-        if platform == 'youtube':
-            cmd.extend([
-                '-movflags', '+faststart',
-                '-pix_fmt', 'yuv420p'
-            ])
-        elif platform == 'twitch':
-            cmd.extend([
-                '-pix_fmt', 'yuv420p',
-                '-bf', '1'
-            ])
+        # Video goes to stdin, audio to a second pipe inherited by FFmpeg
+        audio_read, audio_write = os.pipe()
+        diagnostics = DiagnosticLog()
+        try:
+            process = self.supervisor.spawn(
+                key,
+                self._build_ffmpeg_command(quality, audio_fd=audio_read),
+                diagnostics,
+                launcher=self.isolation.launcher('encoder'),
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                pass_fds=(audio_read,),
+                shell=False
+            )
+        except Exception:
+            os.close(audio_write)
+            raise
+        finally:
+            os.close(audio_read)
         
-        return cmd
+        self.clock.start()
+        origin_pts = self.clock.now()
+        feeder = EncoderFeeder(
+            key,
+            process.stdin,
+            os.fdopen(audio_write, 'wb'),
+            fps=quality['fps'],
+            sample_rate=self.audio_mixer.sample_rate,
+            channels=self.audio_mixer.channels,
+            origin_pts=origin_pts,
+            frame_size=(quality['width'], quality['height']),
+            pin=lambda: self.isolation.pin_thread('media'),
+            queue_frames=self.feed_policy['queue_frames'],
+            drop_policy=self.feed_policy['drop_policy'],
+            keyframe_interval=quality['keyframe_interval']
+        )
+        encoder = EncoderPipeline(key, quality_name, quality, process, feeder, diagnostics, int(round(origin_pts * 1000)))
+        self.encoders[key] = encoder
+        self.feeders[key] = feeder
+        
+        logger.info(f"🎛️ Started encoder {key}")
+        return encoder
+    
+    def _release_encoder(self, key: str, consumer: str, bus: Optional[PacketBus] = None):
+        """Drop a consumer; stop the encoder once nothing reads from it.
+        
+        When `bus` is given, only the encoder publishing on that bus is
+        released (a replacement with the same key is left alone).
+        """
+        encoder = self.encoders.get(key)
+        if not encoder or (bus is not None and encoder.bus is not bus):
+            return
+        
+        encoder.consumers.discard(consumer)
+        if not encoder.consumers:
+            del self.encoders[key]
+            self.feeders.pop(key, None)
+            encoder.stop()
+            logger.info(f"🎛️ Stopped encoder {key}")
+    
+    def _on_destination_switched(self, platform: str, old_bus: Optional[PacketBus],
+                                 new_bus: PacketBus, info: Dict[str, Any]):
+        """A destination (or local output) spliced onto an encoder at a keyframe"""
+        stream_info = self._output_entry(platform)
+        encoder = self.encoders.get(new_bus.name)
+        if stream_info and encoder:
+            stream_info['encoder'] = encoder.key
+            stream_info['quality'] = encoder.quality_name
+        
+        if old_bus is None:
+            logger.info(f"📡 {platform} joined {new_bus.name} at a keyframe after {info['wait_ms']:.0f}ms")
+            return
+        
+        logger.info(f"🔀 {platform} switched {old_bus.name} → {new_bus.name} at a keyframe: "
+                    f"gap {info['gap_ms']}ms (GOP {new_bus.gop_ms}ms), waited {info['wait_ms']:.0f}ms")
+        
+        # Stop the old encoder off the packet path
+        self.supervisor.call_later(0, self._release_encoder, old_bus.name, platform, old_bus)
+    
+    def _replace_encoder(self, encoder: 'EncoderPipeline'):
+        """Restart a dead encoder and move its consumers over at the first keyframe"""
+        if self.encoders.get(encoder.key) is encoder:
+            del self.encoders[encoder.key]
+            self.feeders.pop(encoder.key, None)
+        encoder.feeder.close()
+        
+        try:
+            replacement = self._start_encoder(encoder.key, encoder.quality_name, encoder.quality['bitrate'])
+        except Exception as e:
+            logger.error(f"❌ Failed to restart encoder {encoder.key}: {e}")
+            return
+        
+        replacement.consumers = set(encoder.consumers)
+        for consumer in replacement.consumers:
+            stream_info = self._output_entry(consumer)
+            if stream_info:
+                stream_info['output'].switcher.switch_to(replacement.bus)
+    
+    def _move_destination(self, platform: str, quality_name: str, bitrate: Optional[int] = None) -> 'EncoderPipeline':
+        """Point a destination at another encoder; it splices over at that encoder's next keyframe"""
+        stream_info = self._output_entry(platform)
+        switcher = stream_info['output'].switcher
+        encoder = self._acquire_encoder(quality_name, platform, bitrate)
+        
+        # A destination still waiting on an earlier change abandons it
+        if switcher.pending is not None and switcher.pending is not encoder.bus:
+            self._release_encoder(switcher.pending.name, platform, switcher.pending)
+        
+        if stream_info['encoder'] != encoder.key or switcher.pending is not None:
+            switcher.switch_to(encoder.bus)
+        return encoder
+    
+    def _output_entry(self, name: str) -> Optional[Dict[str, Any]]:
+        """Stream info of a destination or a local output; both carry 'output' and 'encoder'"""
+        return self.active_streams.get(name) or self.local_outputs.get(name)
+    
+    def _attach_local_output(self, name: str, output) -> Dict[str, Any]:
+        """Feed a local output (anything with a KeyframeSwitcher) from the program encoder or the ingest"""
+        if self.ingest:
+            bus, key = self.ingest.bus, self.ingest.bus.name
+        else:
+            if not self.video_compositor or not self.audio_mixer:
+                self.initialize_streaming(self.stream_quality)
+            encoder = self._acquire_encoder(self.stream_quality, name)
+            bus, key = encoder.bus, encoder.key
+        
+        output.switcher.on_switch = lambda old_bus, new_bus, info: self._on_destination_switched(name, old_bus, new_bus, info)
+        self.local_outputs[name] = {'output': output, 'encoder': key}
+        output.switcher.switch_to(bus)
+        self._ensure_pipeline()
+        return self.local_outputs[name]
+    
+    def _detach_local_output(self, name: str):
+        """Stop feeding a local output and release its encoder"""
+        entry = self.local_outputs.pop(name, None)
+        if not entry:
+            return
+        switcher = entry['output'].switcher
+        pending = switcher.pending
+        switcher.detach()
+        self._release_encoder(entry['encoder'], name)
+        if pending is not None:
+            self._release_encoder(pending.name, name, pending)
+        self._stop_pipeline_if_idle()
+    
+    def _ensure_pipeline(self):
+        """Start monitoring and (outside relay mode) the media pipeline"""
+        if not self.is_broadcasting:
+            self.is_broadcasting = True
+            self._start_broadcast_monitoring()
+        if not self.ingest:
+            self._start_media_pipeline()
+    
+    def _stop_pipeline_if_idle(self):
+        """Stop the media pipeline once no destination or local output is left"""
+        if not self.active_streams and not self.local_outputs and self.is_broadcasting:
+            self.is_broadcasting = False
+            if self.media_thread and self.media_thread.is_alive():
+                self.media_thread.join(timeout=2)
+    
+    def start_replay_buffer(self, replay_config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Keep a rolling window of the encoded program for instant replay"""
+        if self.replay:
+            return {'error': 'Replay buffer already running'}
+        
+        replay_config = replay_config or {}
+        self.replay = ReplayBuffer(
+            max_bytes=int(replay_config.get('max_mb', 256) * 1024 * 1024),
+            window_s=replay_config.get('window_s', 120),
+            directory=replay_config.get('directory') or os.path.join(
+                os.path.dirname(os.path.abspath(__file__)), 'uploads', 'replays')
+        )
+        entry = self._attach_local_output('replay', self.replay)
+        
+        logger.info(f"🎞️ Replay buffer started on {entry['encoder']} "
+                    f"({self.replay.window_s}s, {self.replay.max_bytes // (1024 * 1024)}MB cap)")
+        return {'success': True, 'replay': self.replay.get_stats()}
+    
+    def save_replay(self, seconds: float = 30.0, name: Optional[str] = None, container: str = 'flv') -> Dict[str, Any]:
+        """Write the last `seconds` of program to disk; the live outputs are untouched"""
+        if not self.replay:
+            return {'error': 'Replay buffer not running'}
+        if container not in ('flv', 'mp4', 'mkv'):
+            return {'error': f'Unsupported container: {container}'}
+        return self.replay.save_clip(seconds, name, container)
+    
+    def stop_replay_buffer(self) -> Dict[str, Any]:
+        """Stop buffering and free the ring"""
+        replay, self.replay = self.replay, None
+        if not replay:
+            return {'error': 'Replay buffer not running'}
+        self._detach_local_output('replay')
+        replay.clear()
+        logger.info("🎞️ Replay buffer stopped")
+        return {'success': True}
+    
+    def _load_streaming_config(self, section: str) -> Dict[str, Any]:
+        """One section of config/streaming.json"""
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config', 'streaming.json')
+        try:
+            with open(path) as f:
+                return json.load(f).get(section, {})
+        except (OSError, ValueError):
+            return {}
+    
+    def start_recording(self, recording_config: Optional[Dict[str, Any]] = None, auto: bool = False) -> Dict[str, Any]:
+        """Record the program to segments from the shared encoder; no extra encode, live outputs untouched"""
+        if self.recorder:
+            return {'error': 'Recording already running'}
+        
+        config = dict(self.recording_config)
+        config.update(recording_config or {})
+        directory = config.get('local_storage', './uploads/recordings')
+        if not os.path.isabs(directory):
+            directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), directory)
+        container = config.get('format', 'flv')
+        if container not in ('flv', 'mp4', 'mkv'):
+            return {'error': f'Unsupported recording format: {container}'}
+        
+        try:
+            self.recorder = SegmentRecorder(directory, segment_s=config.get('segment_seconds', 60),
+                                            container=container, name=config.get('name'), auto=auto)
+        except OSError as e:
+            logger.error(f"❌ Failed to start recording: {e}")
+            return {'error': str(e)}
+        entry = self._attach_local_output('recording', self.recorder)
+        
+        logger.info(f"⏺️ Recording {entry['encoder']} to {self.recorder.path}")
+        return {'success': True, 'recording': self.recorder.get_stats()}
+    
+    def stop_recording(self) -> Dict[str, Any]:
+        """Close the current segment and stop recording"""
+        recorder, self.recorder = self.recorder, None
+        if not recorder:
+            return {'error': 'Recording not running'}
+        self._detach_local_output('recording')
+        recorder.stop()
+        
+        logger.info(f"⏹️ Recording stopped: {len(recorder.segments)} segment(s) in {recorder.path}")
+        return {'success': True, 'path': recorder.path, 'segments': recorder.segments}
+    
+    def start_hls_output(self, hls_config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Serve the program as low-latency HLS from memory, remuxed from the shared encoder"""
+        if self.hls:
+            return {'error': 'LL-HLS output already running'}
+        
+        hls_config = hls_config or {}
+        self.hls = LLHlsOrigin(
+            segment_s=hls_config.get('segment_s', 2.0),
+            part_s=hls_config.get('part_s', 0.5),
+            window=hls_config.get('window_segments', 6)
+        )
+        entry = self._attach_local_output('hls', self.hls)
+        
+        logger.info(f"📺 LL-HLS origin started on {entry['encoder']} "
+                    f"({self.hls.segment_s}s segments, {self.hls.part_s}s parts)")
+        return {'success': True, 'hls': self.hls.get_stats()}
+    
+    def stop_hls_output(self) -> Dict[str, Any]:
+        """Stop the LL-HLS origin; viewers get 404 from then on"""
+        hls, self.hls = self.hls, None
+        if not hls:
+            return {'error': 'LL-HLS output not running'}
+        self._detach_local_output('hls')
+        hls.stop()
+        logger.info("📺 LL-HLS origin stopped")
+        return {'success': True}
+    
+    def _destination_limit(self, stream_config: Dict[str, Any]) -> Optional[int]:
+        """Simultaneous destinations the plan allows (tier `destinations`; one without multistream)"""
+        limits = stream_config.get('tier_limits') or {}
+        if stream_config.get('max_destinations'):
+            return stream_config['max_destinations']
+        if 'destinations' in limits:
+            return limits['destinations']
+        if limits.get('multistream') is False:
+            return 1
+        return None
+    
+    def _running_encoders(self) -> Dict[str, Dict[str, Any]]:
+        return {key: encoder.quality for key, encoder in list(self.encoders.items())}
+    
+    def _quality_rungs(self) -> List[Dict[str, Any]]:
+        """Fixed-bitrate rungs: the stream quality and every lower preset"""
+        height = StreamQuality.get_quality(self.stream_quality)['height']
+        return [{'quality': name, 'bitrate': None}
+                for name, preset in sorted(StreamQuality.QUALITY_PRESETS.items(), key=lambda item: -item[1]['height'])
+                if preset['height'] <= height]
+    
+    def _admission_candidates(self, rungs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        candidates = []
+        for rung in rungs:
+            settings = dict(StreamQuality.get_quality(rung['quality']))
+            settings['bitrate'] = rung['bitrate'] or settings['bitrate']
+            candidates.append({'key': self._encoder_key(rung['quality'], rung['bitrate']), 'settings': settings})
+        return candidates
+    
+    def _admit(self, platform: str, stream_config: Dict[str, Any],
+               abr: Optional[AdaptiveBitrateController]) -> Dict[str, Any]:
+        """Pick the best rung the CPU budget allows; an adaptive ladder is cut to start there"""
+        rungs = abr.ladder if abr else self._quality_rungs()
+        decision = self.planner.admit(platform, self._admission_candidates(rungs), self._running_encoders(),
+                                      len(self.active_streams), allow_downgrade=stream_config.get('allow_downgrade', True))
+        if not decision['allowed']:
+            logger.warning(f"⛔ {platform} rejected: {decision['reason']}")
+            return decision
+        
+        decision['rung'] = rungs[decision['index']]
+        if decision['downgraded']:
+            logger.warning(f"⚖️ {platform} downgraded {decision['requested']} → {decision['key']} to stay within "
+                           f"{decision['capacity']} cores")
+            if abr:
+                abr.set_ladder(rungs[decision['index']:])
+        return decision
+    
+    def _admit_move(self, platform: str, rungs: List[Dict[str, Any]], allow_downgrade: bool = True) -> Dict[str, Any]:
+        """Pick the best rung a running destination or local output may move to.
+        
+        Its relay is already committed, so only an encoder that isn't running
+        yet adds cost. Refused moves leave it on its current encoder.
+        """
+        destinations = len(self.active_streams) - (1 if platform in self.active_streams else 0)
+        decision = self.planner.admit(platform, self._admission_candidates(rungs), self._running_encoders(),
+                                      destinations, allow_downgrade=allow_downgrade)
+        if not decision['allowed']:
+            logger.warning(f"⛔ {platform} stays on its encoder: {decision['reason']}")
+            return decision
+        
+        decision['rung'] = rungs[decision['index']]
+        if decision['downgraded']:
+            logger.warning(f"⚖️ {platform} moves to {decision['key']} instead of {decision['requested']} to stay within "
+                           f"{decision['capacity']} cores")
+        return decision
+    
+    def run_capacity_benchmark(self, benchmark_config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Benchmark x264 on this host for every quality preset, in the background"""
+        config = dict(self.capacity_config)
+        config.update(benchmark_config or {})
+        started = self.planner.benchmark_async(
+            StreamQuality.QUALITY_PRESETS,
+            presets=config.get('benchmark_presets'),
+            seconds=config.get('benchmark_seconds', 5.0)
+        )
+        if not started:
+            return {'error': 'Capacity benchmark already running'}
+        logger.info("🧮 Capacity benchmark started")
+        return {'success': True, 'status': 'running'}
+    
+    def _ladder_for(self, stream_config: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Bitrate ladder from the current quality, capped by the destination's tier limits"""
+        limits = stream_config.get('tier_limits') or {}
+        return build_ladder(
+            StreamQuality.QUALITY_PRESETS,
+            self.stream_quality,
+            max_bitrate=stream_config.get('max_bitrate') or limits.get('max_bitrate'),
+            max_quality=limits.get('resolution')
+        )
+    
+    def _create_abr_controller(self, platform: str, stream_config: Dict[str, Any]) -> Optional[AdaptiveBitrateController]:
+        """Bitrate controller for a destination, unless adaptive bitrate is turned off for it"""
+        if not stream_config.get('adaptive_bitrate', True):
+            return None
+        return AdaptiveBitrateController(platform, self._ladder_for(stream_config), **self.abr_policy)
+    
+    def _abr_tick(self, platform: str, output: 'DestinationOutput'):
+        """Sample a destination's send queue and move it along its ladder; runs on the supervisor"""
+        stream_info = self.active_streams.get(platform)
+        if not stream_info or stream_info['output'] is not output:
+            return
+        
+        abr = stream_info['abr']
+        try:
+            # Relay speed only counts while its reports are fresh; a blocked relay shows up in the backlog
+            progress = stream_info['progress']
+            speed = progress['speed'] if progress and time.time() - progress['received_at'] < 3 * abr.interval else None
+            
+            previous, previous_index = abr.rung, abr.index
+            rung = abr.sample(time.monotonic(), output.bytes_written, output.queued_bytes,
+                              speed=speed, switching=output.switcher.pending is not None)
+            if rung is not None:
+                # A step up must fit as chosen; a step down may fall further to a cheaper rung
+                stepping_up = rung < previous_index
+                admission = self._admit_move(platform, abr.ladder[rung:], allow_downgrade=not stepping_up)
+                if not admission['allowed']:
+                    abr.constrain(previous_index)
+                    return
+                if admission['index']:
+                    abr.constrain(rung + admission['index'])
+                target = abr.rung
+                arrow = '📉' if target['bitrate'] < previous['bitrate'] else '📈'
+                logger.info(f"{arrow} {platform} {previous['quality']}@{previous['bitrate']}k → "
+                            f"{target['quality']}@{target['bitrate']}k (throughput {abr.throughput_kbps:.0f}kbps, "
+                            f"backlog {abr.backlog_s:.1f}s)")
+                self._move_destination(platform, target['quality'], target['bitrate'])
+        except Exception as e:
+            logger.error(f"❌ {platform} bitrate control error: {e}")
+        finally:
+            self.supervisor.call_later(abr.interval, self._abr_tick, platform, output)
     
     def _start_broadcast_monitoring(self):
         """Start broadcast monitoring thread"""
@@ -236,6 +1205,114 @@ class BroadcastEngine:
         self.monitoring_thread.start()
         logger.info("📊 Broadcast monitoring started")
     
+    def _start_media_pipeline(self):
+        """Start the clock-driven compose/mix loop that feeds every encoder"""
+        if self.media_thread and self.media_thread.is_alive():
+            return
+        
+        self.media_thread = threading.Thread(
+            target=self._media_loop,
+            daemon=True
+        )
+        self.media_thread.start()
+        logger.info("⏱️ Media pipeline started")
+    
+    def _media_loop(self):
+        """Compose frames and mix audio on the master clock, stamping each with its PTS"""
+        self.media_thread_id = threading.get_native_id()
+        self.isolation.pin_thread('media')
+        compositor = self.video_compositor
+        mixer = self.audio_mixer
+        frame_interval = 1.0 / compositor.fps
+        next_frame = self.clock.now()
+        mixer.resync(next_frame)
+        
+        while self.is_broadcasting:
+            try:
+                now = self.clock.now()
+                
+                if now >= next_frame:
+                    frame = compositor.compose_frame(self.frame_sources)
+                    for feeder in list(self.feeders.values()):
+                        feeder.submit_video(frame, compositor.last_pts)
+                    
+                    # After a stall, skip ahead; feeders repeat frames to cover the gap
+                    next_frame += frame_interval
+                    if now - next_frame > frame_interval:
+                        next_frame = now + frame_interval
+                
+                # Audio follows the clock; a long stall resyncs instead of bursting
+                if now - mixer.next_pts > mixer.max_lag:
+                    mixer.resync(now)
+                while mixer.next_pts <= now:
+                    block = mixer.mix_audio()
+                    for feeder in list(self.feeders.values()):
+                        feeder.submit_audio(block, mixer.last_pts)
+                
+                time.sleep(max(0.0, min(next_frame, mixer.next_pts) - self.clock.now()))
+            
+            except Exception as e:
+                logger.error(f"❌ Media pipeline error: {e}")
+                time.sleep(frame_interval)
+        
+        self.clock.stop()
+        logger.info("⏱️ Media pipeline stopped")
+    
+    def update_frame_source(self, source_id: str, frame: np.ndarray):
+        """Publish the latest frame of a video source for composition"""
+        self.frame_sources[source_id] = frame
+    
+    def preview_scene(self, scene) -> Dict[str, Any]:
+        """Queue a scene in preview: decode its media and compile and warm its plan in the background"""
+        if not self.video_compositor:
+            self.initialize_streaming(self.stream_quality)
+        compositor = self.video_compositor
+        slot = compositor.prepare_preview(scene.id)
+        
+        def warm():
+            try:
+                sources = scene_sources(scene, compositor.width, compositor.height, self.static_frames)
+            except Exception as e:
+                slot.error = str(e)
+                slot.ready.set()
+                logger.error(f"❌ Could not load scene {scene.name}: {e}")
+                return
+            slot.prepare(sources, compositor.width, compositor.height, self.frame_sources)
+            if slot.plan is not None:
+                logger.info(f"🔥 Scene {scene.name} ready in preview "
+                            f"(compile {slot.compile_ms} ms, warm {slot.warm_ms} ms)")
+        
+        threading.Thread(target=warm, daemon=True).start()
+        return {'success': True, 'scene_id': scene.id, 'status': 'warming'}
+    
+    def take_scene(self, scene) -> Dict[str, Any]:
+        """Put a scene on program; instant if it was prewarmed in preview, compiled here otherwise"""
+        requested_at = time.perf_counter()
+        if not self.video_compositor:
+            self.initialize_streaming(self.stream_quality)
+        compositor = self.video_compositor
+        
+        from_preview = compositor.take(scene.id, requested_at)
+        if not from_preview:
+            slot = PreviewSlot(scene.id)
+            slot.prepare(scene_sources(scene, compositor.width, compositor.height, self.static_frames),
+                         compositor.width, compositor.height, self.frame_sources)
+            if not compositor.take(scene.id, requested_at, slot=slot):
+                return {'error': slot.error or f'Could not take scene {scene.name}'}
+        return {'success': True, 'scene_id': scene.id, 'from_preview': from_preview}
+    
+    def update_scene(self, scene) -> Dict[str, Any]:
+        """Apply edits to the scene on program; only media that changed is decoded again and no take is recorded"""
+        compositor = self.video_compositor
+        if not compositor or compositor.program_scene_id != scene.id:
+            return {'success': True, 'scene_id': scene.id, 'on_program': False}
+        
+        width, height = compositor.width, compositor.height
+        sources = scene_sources(scene, width, height, self.static_frames)
+        if not compositor.update_program(scene.id, sources, RenderPlan.compile(sources, width, height)):
+            return {'error': f'Scene {scene.name} left program while it was being updated'}
+        return {'success': True, 'scene_id': scene.id, 'on_program': True}
+    
     def _monitor_broadcasts(self):
         """Monitor active streams and handle failures"""
         while self.is_broadcasting:
@@ -247,56 +1324,175 @@ class BroadcastEngine:
                     
                     # Check if process is still running
                     if process.poll() is not None:
-                        # Process has died
-                        stderr = process.stderr.read().decode()
-                        logger.error(f"❌ {platform} stream died: {stderr}")
-                        
-                        # Handle stream failure
-                        if self.fallback_enabled:
-                            self._handle_stream_failure(platform, stream_info)
+                        # Process has died; log the tail of its stderr ring
+                        diagnostics = stream_info['diagnostics']
+                        diagnostics.finished.wait(timeout=1)
+                        logger.error(f"❌ {platform} stream died (exit {process.returncode}): {diagnostics.tail(20)}")
                         
-                        # Remove from active streams
+                        # Remove from active streams before any restart is scheduled
                         del self.active_streams[platform]
                         if platform in self.stream_processes:
                             del self.stream_processes[platform]
+                        stream_info['output'].close()
+                        
+                        # Handle stream failure (schedules a restart, never blocks this loop)
+                        if self.fallback_enabled:
+                            self._handle_stream_failure(platform, stream_info['config'],
+                                                        process.returncode, diagnostics.last_error)
+                        
+                        # Keep the encoder warm only while a restart is pending
+                        tracker = self.restart_trackers.get(platform)
+                        if not (tracker and tracker.restart_pending):
+                            self._release_encoder(stream_info['encoder'], platform)
                     else:
-                        # Update stream status
-                        if stream_info['status'] == 'starting':
-                            # Check if stream has started successfully
-                            if self._check_stream_health(platform, process):
-                                stream_info['status'] = 'live'
-                                logger.info(f"✅ {platform} stream is live")
+                        # Progress reports drive live/degraded; a silent relay is stalled
+                        if stream_info['status'] in ('live', 'degraded') and self._progress_stale(stream_info):
+                            stream_info['status'] = 'stalled'
+                            logger.warning(f"⚠️ {platform} stopped reporting progress")
+                
+                # A dead encoder is replaced; its destinations rejoin at the first keyframe
+                for key, encoder in list(self.encoders.items()):
+                    if encoder.process.poll() is not None:
+                        encoder.diagnostics.finished.wait(timeout=1)
+                        logger.error(f"❌ Encoder {key} died (exit {encoder.process.returncode}): "
+                                     f"{encoder.diagnostics.tail(20)}")
+                        self._replace_encoder(encoder)
                 
                 # Update statistics
                 self._update_statistics()
                 
                 # Sleep for monitoring interval
                 time.sleep(5)
-                
+            
             except Exception as e:
                 logger.error(f"❌ Broadcast monitoring error: {e}")
                 time.sleep(5)
     
     def _check_stream_health(self, platform: str, process: subprocess.Popen) -> bool:
-        """Check if stream is healthy"""
-        # Simple health check - check if process is still running
-        # In production, this would check RTMP connection status
-        return process.poll() is None and time.time() > 2
+        """Check if stream is healthy: encoder alive and keeping up with real time"""
+        stream_info = self.active_streams.get(platform)
+        if process.poll() is not None or not stream_info:
+            return False
+        
+        # The relay must keep up, and so must the encoder feeding it
+        encoder = self.encoders.get(stream_info.get('encoder'))
+        if encoder and encoder.progress and not is_keeping_up(encoder.progress):
+            return False
+        return not self._progress_stale(stream_info) and is_keeping_up(stream_info['progress'])
+    
+    def _progress_stale(self, stream_info: Dict[str, Any]) -> bool:
+        """No progress report within the timeout"""
+        progress = stream_info.get('progress')
+        last_report = progress['received_at'] if progress else stream_info['started_at'].timestamp()
+        return time.time() - last_report > self.progress_timeout
     
-    def _handle_stream_failure(self, platform: str, stream_info: Dict[str, Any]):
-        """Handle stream failure with fallback"""
+    def _on_encoder_progress(self, platform: str, process: subprocess.Popen, progress: Dict[str, Any]):
+        """Fold an encoder or relay progress report into stream status and statistics"""
+        if self.ingest and self.ingest.process is process:
+            self.ingest.progress = progress
+            return
+        
+        encoder = self.encoders.get(platform)
+        if encoder is not None and encoder.process is process:
+            self._accumulate(encoder.progress, progress, (('dropped_frames', 'drop_frames'),
+                                                          ('duplicated_frames', 'dup_frames')))
+            encoder.progress = progress
+            reports = [e.progress for e in list(self.encoders.values()) if e.progress]
+            self.stats['avg_fps'] = round(sum(p['fps'] or 0 for p in reports) / len(reports), 1)
+            return
+        
+        stream_info = self.active_streams.get(platform)
+        if not stream_info or stream_info['process'] is not process:
+            return
+        
+        self._accumulate(stream_info['progress'], progress, (('bytes_sent', 'total_size'), ('frames_sent', 'frame')))
+        stream_info['progress'] = progress
+        
+        # Health follows throughput; a few slow reports in a row mark the stream degraded
+        if is_keeping_up(progress):
+            stream_info['slow_reports'] = 0
+            if stream_info['status'] != 'live':
+                stream_info['status'] = 'live'
+                logger.info(f"✅ {platform} stream is live ({progress['speed']:.2f}x)")
+                tracker = self._restart_tracker(platform)
+                if tracker.state != 'running':
+                    tracker.record_live()
+                    self._save_restart_history()
+        else:
+            stream_info['slow_reports'] += 1
+            if stream_info['status'] == 'live' and stream_info['slow_reports'] >= 3:
+                stream_info['status'] = 'degraded'
+                logger.warning(f"⚠️ {platform} encoder falling behind real time ({progress['speed']}x)")
+        
+        reports = [info['progress'] for info in list(self.active_streams.values()) if info.get('progress')]
+        self.stats['current_bitrate'] = round(sum(p['bitrate_kbps'] or 0 for p in reports), 1)
+    
+    def _accumulate(self, previous: Optional[Dict[str, Any]], progress: Dict[str, Any], fields):
+        """Counters restart with each process, so add per-report deltas"""
+        previous = previous or {}
+        for stat, key in fields:
+            current, before = progress[key] or 0, previous.get(key) or 0
+            self.stats[stat] += current - before if current >= before else current
+    
+    def _handle_stream_failure(self, platform: str, config: Dict[str, Any],
+                               exit_code: Optional[int] = None, error: Optional[str] = None):
+        """Handle stream failure with fallback: record it and schedule a restart"""
         logger.warning(f"⚠️ Handling {platform} stream failure")
+        tracker = self._restart_tracker(platform)
         
-        # Attempt to restart stream
-        if stream_info['config'].get('auto_restart', True):
-            retry_count = stream_info.get('retry_count', 0)
-            if retry_count < 3:
-                logger.info(f"🔄 Attempting to restart {platform} stream (attempt {retry_count + 1})")
-                time.sleep(5)  # Wait before retry
-                
-                result = self.start_platform_stream(platform, stream_info['config'])
-                if result.get('success'):
-                    self.active_streams[platform]['retry_count'] = retry_count + 1
+        if not config.get('auto_restart', True):
+            tracker.record_failure(exit_code, error)
+            tracker.reset('stopped')
+        else:
+            delay = tracker.record_failure(exit_code, error)
+            if tracker.state == 'open':
+                logger.error(f"🚫 {platform} circuit open after {tracker.consecutive_failures} failures; "
+                             f"trial restart in {delay:.0f}s")
+            else:
+                logger.info(f"🔄 Restarting {platform} stream in {delay:.1f}s (attempt {tracker.consecutive_failures})")
+            tracker.pending = self.supervisor.call_later(delay, self._restart_platform, platform, config)
+        
+        self._save_restart_history()
+    
+    def _restart_platform(self, platform: str, config: Dict[str, Any]):
+        """Scheduled restart; runs on the supervisor's executor"""
+        tracker = self._restart_tracker(platform)
+        if platform in self.active_streams:
+            tracker.pending = None
+            return
+        
+        tracker.record_attempt()
+        result = self.start_platform_stream(platform, config)
+        if not result.get('success'):
+            self._handle_stream_failure(platform, config, error=result.get('error'))
+    
+    def _restart_tracker(self, platform: str) -> RestartTracker:
+        """Get (or create) a platform's restart state machine"""
+        if platform not in self.restart_trackers:
+            self.restart_trackers[platform] = RestartTracker(platform, **self.restart_policy)
+        return self.restart_trackers[platform]
+    
+    def _load_restart_history(self):
+        """Restore retry history from previous runs"""
+        try:
+            with open(self.restart_history_path) as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return
+        for platform, data in saved.items():
+            self._restart_tracker(platform).load(data)
+    
+    def _save_restart_history(self):
+        """Persist retry history (atomic replace)"""
+        with self._history_lock:
+            try:
+                os.makedirs(os.path.dirname(self.restart_history_path), exist_ok=True)
+                temp_path = f"{self.restart_history_path}.tmp"
+                with open(temp_path, 'w') as f:
+                    json.dump({p: t.to_dict() for p, t in self.restart_trackers.items()}, f, indent=2)
+                os.replace(temp_path, self.restart_history_path)
+            except OSError as e:
+                logger.error(f"❌ Failed to save restart history: {e}")
     
     def _update_statistics(self):
         """Update broadcast statistics"""
@@ -304,14 +1500,97 @@ class BroadcastEngine:
             # Calculate uptime
             oldest_stream = min(self.active_streams.values(), key=lambda x: x['started_at'])
             self.stats['uptime'] = int((datetime.now() - oldest_stream['started_at']).total_seconds())
-            
-            # Update frame count (simplified)
-            self.stats['frames_sent'] += self.video_compositor.frame_count if self.video_compositor else 0
+        
+        # Worst audio/video offset across encoders
+        offsets = [abs(feeder.get_stats()['av_offset_ms']) for feeder in list(self.feeders.values())]
+        self.stats['av_drift_ms'] = max(offsets) if offsets else 0.0
+    
+    def _start_history_sampling(self, platform: str):
+        """Give the destination a history ring and make sure the sampler is running"""
+        if platform not in self.stats_history:
+            interval = self.history_config['interval']
+            self.stats_history[platform] = StatsRing(int(self.history_config['history_hours'] * 3600 / interval), interval)
+        with self._sampling_lock:
+            if self._history_sampling:
+                return
+            self._history_sampling = True
+        self.supervisor.call_later(self.history_config['interval'], self._sample_history)
+    
+    def _sample_history(self):
+        """Append one sample per active destination; runs on the supervisor until none is left"""
+        with self._sampling_lock:
+            streams = list(self.active_streams.items())
+            if not streams:
+                self._history_sampling = False
+                return
+        
+        interval = self.history_config['interval']
+        try:
+            now = time.time()
+            rtts = tcp_rtts([info['process'].pid for _, info in streams])
+            for platform, info in streams:
+                ring = self.stats_history.get(platform)
+                if ring is None:
+                    continue
+                key = info['encoder']
+                feeder, encoder = self.feeders.get(key), self.encoders.get(key)
+                progress = info['progress']
+                
+                # Frames shed before the encoder, dropped by its timeline, or dropped by ffmpeg itself
+                dropped, queue_depth = 0, None
+                if feeder:
+                    feeder_stats = feeder.get_stats()
+                    dropped = feeder_stats['queue']['video']['dropped'] + feeder_stats['video']['dropped_frames']
+                    queue_depth = feeder_stats['queue']['video']['depth']
+                if encoder and encoder.progress:
+                    dropped += encoder.progress['drop_frames'] or 0
+                previous = self._drop_counts.get(platform)
+                self._drop_counts[platform] = (key, dropped)
+                
+                ring.append({
+                    'bitrate_kbps': info['output'].throughput_kbps,
+                    'fps': progress['fps'] if progress and now - progress['received_at'] < 3 * interval else None,
+                    'dropped': max(0, dropped - previous[1]) if previous and previous[0] == key else 0,
+                    'rtt_ms': rtts.get(info['process'].pid),
+                    'queue_depth': queue_depth
+                }, at=now)
+        except Exception as e:
+            logger.error(f"❌ Statistics sampling error: {e}")
+        finally:
+            self.supervisor.call_later(interval, self._sample_history)
+    
+    def get_stats_history(self, seconds: float = 3600) -> Dict[str, Any]:
+        """min/avg/p95 per destination and field over the last `seconds`"""
+        return {
+            'interval': self.history_config['interval'],
+            'fields': list(HISTORY_FIELDS),
+            'platforms': {platform: ring.summary(seconds) for platform, ring in list(self.stats_history.items())}
+        }
+    
+    def get_sparkline(self, platform: str, field: str, seconds: float = 600, points: int = 60) -> Dict[str, Any]:
+        """One field of a destination's history, downsampled for a dashboard sparkline"""
+        ring = self.stats_history.get(platform)
+        if ring is None:
+            return {'error': f'No statistics for {platform}'}
+        if field not in HISTORY_FIELDS:
+            return {'error': f"Unknown field {field}; expected one of {', '.join(HISTORY_FIELDS)}"}
+        return dict(ring.sparkline(field, seconds, points), platform=platform)
     
     def stop_platform_stream(self, platform: str) -> Dict[str, Any]:
         """Stop streaming to specific platform"""
         try:
+            # A manual stop also cancels any pending automatic restart
+            tracker = self.restart_trackers.get(platform)
+            restart_pending = bool(tracker and tracker.restart_pending)
+            if tracker:
+                tracker.reset('stopped')
+            
             if platform not in self.active_streams:
+                if restart_pending:
+                    self._save_restart_history()
+                    for key in list(self.encoders):
+                        self._release_encoder(key, platform)
+                    return {'success': True, 'platform': platform, 'cancelled_restart': True}
                 return {'error': f'Stream to {platform} not active'}
             
             stream_info = self.active_streams[platform]
@@ -320,7 +1599,9 @@ class BroadcastEngine:
             # Graceful shutdown
             logger.info(f"🛑 Stopping {platform} stream")
             
-            # Send quit signal to FFmpeg
+            # Stop feeding the relay, then send quit signal to FFmpeg
+            pending = stream_info['output'].switcher.pending
+            stream_info['output'].close()
             process.terminate()
             
             # Wait for process to end
@@ -334,10 +1615,14 @@ class BroadcastEngine:
             del self.active_streams[platform]
             if platform in self.stream_processes:
                 del self.stream_processes[platform]
+            self._release_encoder(stream_info['encoder'], platform)
+            if pending is not None:
+                self._release_encoder(pending.name, platform, pending)
             
             # Stop monitoring if no more streams
-            if not self.active_streams and self.is_broadcasting:
-                self.is_broadcasting = False
+            if not self.active_streams and self.recorder and self.recorder.auto:
+                self.stop_recording()
+            self._stop_pipeline_if_idle()
             
             logger.info(f"✅ Stopped {platform} stream")
             
@@ -346,7 +1631,7 @@ class BroadcastEngine:
                 'platform': platform,
                 'duration': int((datetime.now() - stream_info['started_at']).total_seconds())
             }
-            
+        
         except Exception as e:
             logger.error(f"❌ Failed to stop {platform} stream: {e}")
             return {'error': str(e)}
@@ -355,12 +1640,13 @@ class BroadcastEngine:
         """Stop all active streams"""
         results = {}
         
-        for platform in list(self.active_streams.keys()):
+        pending_restarts = [p for p, tracker in self.restart_trackers.items() if tracker.restart_pending]
+        for platform in set(self.active_streams) | set(pending_restarts):
             result = self.stop_platform_stream(platform)
             results[platform] = result
         
-        # Wait for monitoring thread to end
-        if self.monitoring_thread and self.monitoring_thread.is_alive():
+        # Wait for monitoring thread to end (local outputs keep it running)
+        if not self.is_broadcasting and self.monitoring_thread and self.monitoring_thread.is_alive():
             self.monitoring_thread.join(timeout=5)
         
         return {
@@ -381,7 +1667,13 @@ class BroadcastEngine:
                 'started_at': stream_info['started_at'].isoformat(),
                 'uptime': int((datetime.now() - stream_info['started_at']).total_seconds()),
                 'url': stream_info['full_url'],
-                'health': 'good' if stream_info['process'].poll() is None else 'error'
+                'health': self._stream_health_label(platform, stream_info),
+                'progress': stream_info.get('progress'),
+                'encoder': stream_info['encoder'],
+                'output': stream_info['output'].get_stats(),
+                'diagnostics': stream_info['diagnostics'].get_stats(),
+                'sync': self.feeders[stream_info['encoder']].get_stats() if stream_info['encoder'] in self.feeders else None,
+                'abr': stream_info['abr'].get_stats() if stream_info.get('abr') else None
             }
         
         return {
@@ -389,63 +1681,157 @@ class BroadcastEngine:
             'active_platforms': active_platforms,
             'total_platforms': len(active_platforms),
             'quality': self.stream_quality,
+            'mode': 'relay' if self.ingest else 'encode',
+            'ingest': self.ingest.get_stats() if self.ingest else None,
+            'replay': self.replay.get_stats() if self.replay else None,
+            'recording': self.recorder.get_stats() if self.recorder else None,
+            'hls': self.hls.get_stats() if self.hls else None,
+            'capacity': self.planner.get_stats(self._running_encoders(), len(self.active_streams)),
+            'processes': self.get_process_stats(),
             'statistics': self.stats,
+            'audio': self.audio_mixer.get_stats() if self.audio_mixer else None,
+            'compositor': self.video_compositor.get_info() if self.video_compositor else None,
+            'sync': self.get_sync_status(),
+            'restarts': {platform: tracker.get_status() for platform, tracker in self.restart_trackers.items()},
+            'encoders': {key: encoder.get_stats() for key, encoder in list(self.encoders.items())},
             'fallback_enabled': self.fallback_enabled
         }
     
+    def get_process_stats(self) -> Dict[str, Any]:
+        """CPU use from /proc per encoder, relay and studio thread, since the previous call"""
+        accounting = self.cpu_accounting
+        threads = {}
+        if self.media_thread and self.media_thread.is_alive() and self.media_thread_id:
+            threads['media'] = accounting.thread(self.media_thread_id)
+        for key, feeder in list(self.feeders.items()):
+            for kind, tid in list(feeder.thread_ids.items()):
+                threads[f'{key}/{kind}'] = accounting.thread(tid)
+        
+        return {
+            'isolation': self.isolation.get_stats(),
+            'studio': accounting.process(os.getpid()),
+            'threads': threads,
+            'encoders': {key: accounting.process(encoder.process.pid) for key, encoder in list(self.encoders.items())},
+            'relays': {platform: accounting.process(info['process'].pid)
+                       for platform, info in list(self.active_streams.items())},
+            'ingest': accounting.process(self.ingest.process.pid) if self.ingest and self.ingest.process else None
+        }
+    
+    def _stream_health_label(self, platform: str, stream_info: Dict[str, Any]) -> str:
+        """good (keeping up), degraded (alive but slow or silent) or error (exited)"""
+        if stream_info['process'].poll() is not None:
+            return 'error'
+        return 'good' if self._check_stream_health(platform, stream_info['process']) else 'degraded'
+    
+    def get_sync_status(self) -> Dict[str, Any]:
+        """Master clock position and how far each pipeline is from it"""
+        now = self.clock.now()
+        return {
+            'clock_running': self.clock.running,
+            'clock_s': round(now, 3),
+            'video_pts_s': round(self.video_compositor.last_pts, 3) if self.video_compositor else None,
+            'audio_pts_s': round(self.audio_mixer.last_pts, 3) if self.audio_mixer else None,
+            'audio_clock_drift_ms': round((self.audio_mixer.next_pts - now) * 1000, 2) if self.audio_mixer and self.clock.running else None,
+            'av_drift_ms': self.stats['av_drift_ms']
+        }
+    
     def update_stream_quality(self, quality: str) -> Dict[str, Any]:
-        """Change stream quality (requires restart of all streams)"""
+        """Change stream quality without taking destinations offline.
+        
+        The new encoder starts alongside the old one and is fed the same
+        frames; each destination splices over at the new encoder's first
+        keyframe, and the old encoder stops once nothing reads from it.
+        """
         if quality not in StreamQuality.QUALITY_PRESETS:
             return {'error': f'Invalid quality: {quality}'}
+        if self.ingest:
+            return {'error': 'Quality is set by the publishing encoder in relay mode'}
         
         old_quality = self.stream_quality
         self.stream_quality = quality
         
-        # Restart all streams with new quality
-        if self.active_streams:
-            # Store current configs
-            current_configs = {
-                platform: stream_info['config']
-                for platform, stream_info in self.active_streams.items()
-            }
-            
-            # Stop all streams
-            self.stop_all_streams()
-            
-            # Reinitialize with new quality
-            self.initialize_streaming(quality)
-            
-            # Restart all streams
-            restart_results = {}
-            for platform, config in current_configs.items():
-                result = self.start_platform_stream(platform, config)
-                restart_results[platform] = result
-            
-            return {
-                'success': True,
-                'old_quality': old_quality,
-                'new_quality': quality,
-                'restart_results': restart_results
-            }
-        else:
+        settings = StreamQuality.get_quality(quality)
+        if self.video_compositor:
+            self.video_compositor.set_resolution(settings['width'], settings['height'])
+        
+        if not self.active_streams and not self.local_outputs:
             return {
                 'success': True,
                 'old_quality': old_quality,
                 'new_quality': quality,
                 'message': 'Quality updated (will take effect on next stream start)'
             }
+        
+        switching = []
+        rejected = []
+        encoder = None
+        for platform, stream_info in list(self.active_streams.items()):
+            # Adaptive destinations restart their ladder from the new quality, cut where admitted
+            abr, config = stream_info.get('abr'), stream_info['config']
+            rungs = self._ladder_for(config) if abr else self._quality_rungs()
+            admission = self._admit_move(platform, rungs, allow_downgrade=config.get('allow_downgrade', True))
+            if not admission['allowed']:
+                rejected.append(platform)
+                continue
+            if abr:
+                abr.set_ladder(rungs[admission['index']:])
+            
+            rung = admission['rung']
+            encoder = self._move_destination(platform, rung['quality'], rung['bitrate'])
+            if stream_info['encoder'] != encoder.key:
+                switching.append(platform)
+        
+        # Local outputs always follow the program quality
+        for name, entry in list(self.local_outputs.items()):
+            admission = self._admit_move(name, [{'quality': quality, 'bitrate': None}], allow_downgrade=False)
+            if not admission['allowed']:
+                rejected.append(name)
+                continue
+            
+            encoder = self._move_destination(name, quality)
+            if entry['encoder'] != encoder.key:
+                switching.append(name)
+        
+        logger.info(f"🔀 Quality {old_quality} → {quality}: {len(switching)} destination(s) switching at next keyframe"
+                    + (f", {len(rejected)} kept on their encoder by the CPU budget" if rejected else ""))
+        
+        return {
+            'success': True,
+            'old_quality': old_quality,
+            'new_quality': quality,
+            'encoder': encoder.key if encoder else None,
+            'switching': switching,
+            'rejected': rejected,
+            'message': 'Destinations move to the new encoder at its next keyframe'
+        }
 
 class VideoCompositor:
-    """Professional video compositor for multi-source streaming"""
+    """Professional video compositor for multi-source streaming
     
-    def __init__(self, width: int, height: int, fps: int):
+    Frames are composed from a compiled render plan (the "program"). A
+    scene queued in "preview" is compiled and warmed off the media loop;
+    taking it swaps the two plans, so a switch costs the media loop nothing.
+    """
+    
+    def __init__(self, width: int, height: int, fps: int, clock: Optional[MediaClock] = None):
         self.width = width
         self.height = height
         self.fps = fps
         self.sources = {}
         self.frame_count = 0
+        self.clock = clock
+        self.last_pts = 0.0  # PTS of the most recent composed frame
         self.composition_mode = 'scene'  # scene, picture_in_picture, split_screen
         
+        # Program plan, rebuilt on the next frame after `sources` changes; preview is the next scene
+        self.program = None
+        self.program_scene_id = None
+        self.preview = None
+        self._plan_dirty = True
+        self._take_lock = threading.Lock()
+        self._pending_take = None
+        self.last_take = None
+        
         logger.info(f"🎬 Video Compositor initialized: {width}x{height} @ {fps}fps")
     
     def add_source(self, source_id: str, source_config: Dict[str, Any]):
@@ -460,6 +1846,7 @@ class VideoCompositor:
             'opacity': source_config.get('opacity', 1.0),
             'rotation': source_config.get('rotation', 0)
         }
+        self._plan_dirty = True
         
         logger.info(f"➕ Added video source: {source_id}")
     
@@ -467,67 +1854,103 @@ class VideoCompositor:
         """Remove video source"""
         if source_id in self.sources:
             del self.sources[source_id]
+            self._plan_dirty = True
             logger.info(f"➖ Removed video source: {source_id}")
     
     def update_source(self, source_id: str, updates: Dict[str, Any]):
         """Update source configuration"""
         if source_id in self.sources:
             self.sources[source_id].update(updates)
+            self._plan_dirty = True
             logger.info(f"✏️ Updated video source: {source_id}")
     
-    def compose_frame(self, frame_sources: Dict[str, np.ndarray]) -> np.ndarray:
-        """Compose final frame from multiple sources"""
-        # Create black canvas
-        final_frame = np.zeros((self.height, self.width, 3), dtype=np.uint8)
+    def set_resolution(self, width: int, height: int):
+        """Resize the canvas, scaling source geometry to keep the layout"""
+        scale_x, scale_y = width / self.width, height / self.height
+        for source_info in self.sources.values():
+            source_info['position'] = {
+                'x': int(round(source_info['position']['x'] * scale_x)),
+                'y': int(round(source_info['position']['y'] * scale_y))
+            }
+            source_info['size'] = {
+                'width': int(round(source_info['size']['width'] * scale_x)),
+                'height': int(round(source_info['size']['height'] * scale_y))
+            }
+        self.width, self.height = width, height
+        self._plan_dirty = True
+        logger.info(f"🎬 Compositor resized to {width}x{height}")
+    
+    def prepare_preview(self, scene_id: str) -> PreviewSlot:
+        """Queue a scene in preview; the caller fills the slot with `PreviewSlot.prepare`"""
+        slot = PreviewSlot(scene_id)
+        self.preview = slot
+        return slot
+    
+    def take(self, scene_id: str, requested_at: Optional[float] = None, slot: Optional[PreviewSlot] = None,
+             timeout: float = 5.0) -> bool:
+        """Put a prepared scene on program: the one in preview, or `slot` if given.
         
-        # Sort sources by z_index
-        sorted_sources = sorted(
-            self.sources.items(),
-            key=lambda x: x[1]['z_index']
-        )
+        False if the scene isn't the one in preview. Waits for a preview that
+        is still warming. The swap itself is two reference assignments; the
+        next composed frame uses the new plan.
+        """
+        requested_at = requested_at or time.perf_counter()
+        prewarmed = slot is None
+        slot = slot or self.preview
+        if slot is None or slot.scene_id != scene_id:
+            return False
+        prewarmed = prewarmed and slot.ready.is_set()
+        if not slot.ready.wait(timeout) or slot.plan is None:
+            return False
+        if (slot.plan.width, slot.plan.height) != (self.width, self.height):
+            return False  # resized while warming
         
-        # Composite each source
-        for source_id, source_info in sorted_sources:
-            if not source_info['visible']:
-                continue
-            
-            if source_id in frame_sources:
-                source_frame = frame_sources[source_id]
-                
-                # Resize source frame
-                target_size = (
-                    source_info['size']['width'],
-                    source_info['size']['height']
-                )
-                resized_frame = cv2.resize(source_frame, target_size)
-                
-                # Apply transformations
-                if source_info['rotation'] != 0:
-                    # Apply rotation
-                    matrix = cv2.getRotationMatrix2D(
-                        (target_size[0]//2, target_size[1]//2),
-                        source_info['rotation'],
-                        1.0
-                    )
-                    resized_frame = cv2.warpAffine(resized_frame, matrix, target_size)
-                
-                # Apply opacity
-                if source_info['opacity'] < 1.0:
-                    resized_frame = cv2.addWeighted(
-                        resized_frame, source_info['opacity'],
-                        np.zeros_like(resized_frame), 1 - source_info['opacity'],
-                        0
-                    )
-                
-                # Position source on final frame
-                x, y = source_info['position']['x'], source_info['position']['y']
-                h, w = resized_frame.shape[:2]
-                
-                # Check bounds
-                if (x >= 0 and y >= 0 and x + w <= self.width and y + h <= self.height):
-                    final_frame[y:y+h, x:x+w] = resized_frame
+        with self._take_lock:
+            self.sources, self.program = slot.sources, slot.plan
+            self.program_scene_id = scene_id
+            self._plan_dirty = False
+            if self.preview is slot:
+                self.preview = None
+            self._pending_take = {'scene_id': scene_id, 'plan': slot.plan, 'requested_at': requested_at,
+                                  'prewarmed': prewarmed, 'compile_ms': slot.compile_ms, 'warm_ms': slot.warm_ms}
+        return True
+    
+    def update_program(self, scene_id: str, sources: Dict[str, Dict[str, Any]], plan: RenderPlan) -> bool:
+        """Swap in an edited version of the scene on program; unlike `take`, nothing is timed or logged"""
+        with self._take_lock:
+            if self.program_scene_id != scene_id or (plan.width, plan.height) != (self.width, self.height):
+                return False
+            self.sources, self.program = sources, plan
+            self._plan_dirty = False
+        return True
+    
+    def compose_frame(self, frame_sources: Dict[str, np.ndarray]) -> np.ndarray:
+        """Compose final frame from multiple sources"""
+        plan = self.program
+        if plan is None or self._plan_dirty:
+            with self._take_lock:
+                self._plan_dirty = False
+                plan = self.program = RenderPlan.compile(self.sources, self.width, self.height)
+        final_frame = plan.compose(frame_sources)
         
+        # Stamp against the master clock (frame index when running standalone)
+        self.last_pts = self.clock.now() if self.clock and self.clock.running else self.frame_count / self.fps
         self.frame_count += 1
+        
+        take = self._pending_take
+        if take is not None and take['plan'] is plan:
+            self._pending_take = None
+            elapsed = (time.perf_counter() - take['requested_at']) * 1000
+            self.last_take = {
+                'scene_id': take['scene_id'],
+                'prewarmed': take['prewarmed'],
+                'time_to_first_frame_ms': round(elapsed, 2),
+                'compile_ms': take['compile_ms'],
+                'warm_ms': take['warm_ms'],
+                'at': datetime.now().isoformat()
+            }
+            logger.info(f"🎬 Took scene {take['scene_id']}: first program frame after {elapsed:.1f} ms "
+                        f"({'prewarmed' if take['prewarmed'] else 'cold'})")
         return final_frame
     
     def get_info(self) -> Dict[str, Any]:
@@ -537,67 +1960,293 @@ class VideoCompositor:
             'height': self.height,
             'fps': self.fps,
             'frame_count': self.frame_count,
+            'last_pts': round(self.last_pts, 3),
             'sources_count': len(self.sources),
-            'composition_mode': self.composition_mode
+            'composition_mode': self.composition_mode,
+            'program_scene': self.program_scene_id,
+            'preview': self.preview.get_info() if self.preview else None,
+            'last_take': self.last_take
         }
 
 class AudioMixer:
     """Professional audio mixer for multi-source streaming"""
     
-    def __init__(self):
+    def __init__(self, sample_rate: int = 48000, channels: int = 2, block_size: int = 1024,
+                 clock: Optional[MediaClock] = None):
         self.sources = {}
+        # Held for source add/remove and mix-minus changes, and while a block takes its snapshot of them
+        self._lock = threading.Lock()
         self.master_volume = 1.0
-        self.sample_rate = 44100
-        self.channels = 2
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.block_size = block_size
+        self.block_duration = block_size / sample_rate
+        
+        # Blocks are stamped on a continuous sample timeline anchored to the media clock
+        self.clock = clock
+        self.next_pts = 0.0
+        self.last_pts = 0.0
+        self.max_lag = 0.5  # seconds behind the clock before resyncing
+        
+        # Preallocated mix bus (float32, normalized to +/-1.0)
+        self._mix_bus = np.zeros((block_size, channels), dtype=np.float32)
+        
+        # Return feeds (program minus own voice) for guests
+        self.mix_minus = MixMinusBank(block_size, channels)
+        
+        # Voice sources duck music sources through a shared sidechain
+        self.ducker = SidechainDucker(sample_rate)
+        self._sidechain = np.zeros((block_size, channels), dtype=np.float32)
+        
+        # Post-fader source meters and the master meter
+        self.meters = MeterBank(sample_rate, block_size, channels)
+        self.master_meter = MeterBank(sample_rate, block_size, channels, initial_slots=1)
+        self.master_meter.allocate('master')
+        
+        self.stats = {
+            'blocks_mixed': 0,
+            'mix_cpu_seconds': 0.0,
+            'clock_resyncs': 0
+        }
         
         logger.info("🎵 Audio Mixer initialized")
     
     def add_source(self, source_id: str, source_config: Dict[str, Any]):
-        """Add audio source"""
-        self.sources[source_id] = {
+        """Add audio source (`sample_rate`/`channels` describe its native format)"""
+        input_rate = source_config.get('sample_rate', self.sample_rate)
+        input_channels = source_config.get('channels', self.channels)
+        
+        source_info = {
             'id': source_id,
             'volume': source_config.get('volume', 1.0),
             'muted': source_config.get('muted', False),
             'balance': source_config.get('balance', 0.0),  # -1.0 (left) to 1.0 (right)
-            'effects': source_config.get('effects', [])
+            'effects': source_config.get('effects', []),
+            'mix_minus': source_config.get('mix_minus', False),
+            'role': source_config.get('role'),  # 'voice' keys the ducker, 'music' gets ducked
+            'gain_matrix': None,
+            'chain': build_effects_chain(source_config.get('effects', []), self.sample_rate, self.channels),
+            'sample_rate': input_rate,
+            'input_channels': input_channels,
+            'converter': InputConverter(input_rate, input_channels, self.sample_rate, self.channels),
+            'input': JitterBuffer(
+                self.block_size, self.channels, self.sample_rate,
+                concealment=source_config.get('concealment', 'repeat')
+            ),
+            'block': np.zeros((self.block_size, self.channels), dtype=np.float32)
         }
+        self._update_gain_matrix(source_info)
+        
+        # The next block picks up the source and its slots together
+        with self._lock:
+            self.sources[source_id] = source_info
+            if source_info['mix_minus']:
+                self.mix_minus.allocate(source_id)
+            self.meters.allocate(source_id)
         
         logger.info(f"🎤 Added audio source: {source_id}")
     
-    def mix_audio(self, audio_sources: Dict[str, np.ndarray]) -> np.ndarray:
+    def remove_source(self, source_id: str):
+        """Remove audio source"""
+        with self._lock:
+            removed = self.sources.pop(source_id, None) is not None
+            if removed:
+                self.mix_minus.release(source_id)
+                self.meters.release(source_id)
+        if removed:
+            logger.info(f"🔇 Removed audio source: {source_id}")
+    
+    def update_source(self, source_id: str, updates: Dict[str, Any]):
+        """Update source configuration"""
+        if source_id not in self.sources:
+            return
+        
+        source_info = self.sources[source_id]
+        for key in ('volume', 'muted', 'balance', 'effects', 'mix_minus', 'role'):
+            if key in updates:
+                source_info[key] = updates[key]
+        
+        if 'mix_minus' in updates:
+            with self._lock:
+                if updates['mix_minus']:
+                    self.mix_minus.allocate(source_id)
+                else:
+                    self.mix_minus.release(source_id)
+        
+        if 'effects' in updates:
+            source_info['chain'] = build_effects_chain(updates['effects'], self.sample_rate, self.channels)
+        self._update_gain_matrix(source_info)
+        
+        logger.info(f"✏️ Updated audio source: {source_id}")
+    
+    def _update_gain_matrix(self, source_info: Dict[str, Any]):
+        """Precompute the source's volume and balance as a single gain matrix"""
+        if self.channels == 2:
+            source_info['gain_matrix'] = balance_matrix(source_info['balance'], source_info['volume'])
+        else:
+            source_info['gain_matrix'] = np.eye(self.channels, dtype=np.float32) * np.float32(source_info['volume'])
+    
+    def push_audio(self, source_id: str, samples: np.ndarray) -> int:
+        """Queue source audio in its native format; returns mixer frames queued"""
+        source_info = self.sources.get(source_id)
+        if source_info is None:
+            return 0
+        
+        block = source_info['converter'].process(samples)
+        source_info['input'].write(block)
+        return block.shape[0]
+    
+    def _pull_block(self, source_info: Dict[str, Any]) -> Optional[np.ndarray]:
+        """Read one mixer block from the source's jitter buffer (None when idle)"""
+        block = source_info['block']
+        if not source_info['input'].read(block):
+            return None
+        return block
+    
+    def mix_audio(self, audio_sources: Optional[Dict[str, np.ndarray]] = None) -> np.ndarray:
         """Mix multiple audio sources"""
-        if not audio_sources:
+        # Sources, meter slots and mix-minus rows are taken together; later changes wait for the next block
+        with self._lock:
+            sources = dict(self.sources)
+            meter_inputs, meter_slots = self.meters.begin_block()
+            contributions, mix_minus_slots = self.mix_minus.begin_block()
+        self.master_meter.begin_block()
+        
+        if not sources:
             # Return silent audio
-            return np.zeros((1024, self.channels), dtype=np.int16)
+            self._advance_pts()
+            return np.zeros((self.block_size, self.channels), dtype=np.int16)
+        
+        started = time.perf_counter()
+        
+        # Run blocks handed in directly through the input stage
+        for source_id, source_audio in (audio_sources or {}).items():
+            self.push_audio(source_id, source_audio)
+        
+        # Pull and process each source; voice sources also feed the sidechain key
+        processed = []
+        has_key = False
+        for source_id, source_info in sources.items():
+            block = self._pull_block(source_info)
+            if block is None or source_info['muted']:
+                continue
+            
+            # Apply effects chain
+            if source_info['chain'].effects:
+                block = source_info['chain'].process(block)
+            
+            if source_info['role'] == 'voice' and self.ducker.enabled:
+                if has_key:
+                    self._sidechain += block
+                else:
+                    self._sidechain[:] = block
+                    has_key = True
+            
+            processed.append((source_id, source_info, block))
+        
+        duck_gain = None
+        if self.ducker.enabled:
+            duck_gain = self.ducker.process(self._sidechain if has_key else None, self.block_size)
         
         # Start with silence
-        mixed_audio = np.zeros((1024, self.channels), dtype=np.int16)
+        mixed_audio = self._mix_bus
+        mixed_audio.fill(0.0)
         
         # Mix each source
-        for source_id, source_audio in audio_sources.items():
-            if source_id in self.sources:
-                source_info = self.sources[source_id]
-                
-                if source_info['muted']:
-                    continue
-                
-                # Apply volume
-                volume = source_info['volume'] * self.master_volume
-                processed_audio = source_audio * volume
-                
-                # Add to mix
-                mixed_audio += processed_audio.astype(np.int16)
+        for source_id, source_info, block in processed:
+            if duck_gain is not None and source_info['role'] == 'music':
+                block = block * duck_gain[:, None]
+            
+            # Apply volume and balance; mix-minus sources are summed from their slot rows below
+            meter_input = meter_inputs[meter_slots[source_id]]
+            slot = mix_minus_slots.get(source_id)
+            if slot is not None:
+                np.matmul(block, source_info['gain_matrix'], out=contributions[slot])
+                meter_input[:] = contributions[slot]
+            else:
+                np.matmul(block, source_info['gain_matrix'], out=meter_input)
+                mixed_audio += meter_input
+        
+        if len(contributions):
+            mixed_audio += contributions.sum(axis=0)
+            self.mix_minus.write_returns(mixed_audio, contributions)
+        
+        mixed_audio *= self.master_volume
+        self.master_meter.inputs[0] = mixed_audio
+        self.meters.process()
+        self.master_meter.process()
         
         # Clip to prevent overflow
-        mixed_audio = np.clip(mixed_audio, -32768, 32767)
+        output = np.clip(np.rint(mixed_audio * 32768.0), -32768, 32767).astype(np.int16)
         
-        return mixed_audio
+        self._advance_pts()
+        self.stats['blocks_mixed'] += 1
+        self.stats['mix_cpu_seconds'] += time.perf_counter() - started
+        
+        return output
+    
+    def _advance_pts(self):
+        """Stamp the block just mixed and step the timeline by one block"""
+        self.last_pts = self.next_pts
+        self.next_pts += self.block_duration
+    
+    def resync(self, pts: float):
+        """Re-anchor the block timeline (clock start, or after a stall)"""
+        if self.last_pts:
+            self.stats['clock_resyncs'] += 1
+            logger.warning(f"⏱️ Audio timeline resynced by {(pts - self.next_pts) * 1000:.0f}ms")
+        self.next_pts = pts
+    
+    def read_return_feed(self, source_id: str, frames: int) -> Optional[np.ndarray]:
+        """Read a guest's mix-minus return feed (non-blocking, int16)"""
+        return self.mix_minus.read(source_id, frames)
+    
+    def set_ducking(self, config: Dict[str, Any]) -> Dict[str, Any]:
+        """Configure voice-over-music auto-ducking"""
+        self.ducker.configure({**self.ducker.get_info(), **config})
+        logger.info(f"🎚️ Ducking updated: {self.ducker.get_info()}")
+        return self.ducker.get_info()
+    
+    def get_levels(self, reset_peaks: bool = True) -> Dict[str, Any]:
+        """Meter readings (RMS/peak dBFS, R128 loudness) for master and sources"""
+        return {
+            'master': self.master_meter.snapshot(reset_peaks).get('master'),
+            'sources': self.meters.snapshot(reset_peaks),
+            'ducking_gain_db': round(self.ducker.gain_db, 1),
+            'blocks_mixed': self.stats['blocks_mixed'],
+            'timestamp': time.time()
+        }
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get mixer CPU statistics including per-source effect cost"""
+        blocks = max(self.stats['blocks_mixed'], 1)
+        avg_mix = self.stats['mix_cpu_seconds'] / blocks
+        
+        return {
+            'blocks_mixed': self.stats['blocks_mixed'],
+            'avg_mix_ms': round(avg_mix * 1000.0, 4),
+            'realtime_load': round(avg_mix / self.block_duration, 5),
+            'mix_minus': self.mix_minus.get_stats(),
+            'ducking': self.ducker.get_info(),
+            'sources': {
+                source_id: {
+                    'input_format': {
+                        'sample_rate': source_info['sample_rate'],
+                        'channels': source_info['input_channels']
+                    },
+                    'jitter_buffer': source_info['input'].get_stats(),
+                    'effects': source_info['chain'].get_stats(self.block_duration)
+                }
+                for source_id, source_info in list(self.sources.items())
+            }
+        }
     
     def get_info(self) -> Dict[str, Any]:
         """Get mixer information"""
         return {
             'sample_rate': self.sample_rate,
             'channels': self.channels,
+            'block_size': self.block_size,
             'master_volume': self.master_volume,
             'sources_count': len(self.sources)
         }
@@ -607,6 +2256,7 @@ broadcast_engine = BroadcastEngine()
 
 def setup_broadcast_api(app):
     """Setup broadcast engine API endpoints"""
+    from flask import Response, jsonify, request
     
     @app.route('/api/broadcast/initialize', methods=['POST'])
     def initialize_broadcast():
@@ -642,6 +2292,92 @@ def setup_broadcast_api(app):
         status = broadcast_engine.get_stream_status()
         return jsonify(status)
     
+    @app.route('/api/broadcast/stats/history', methods=['GET'])
+    def get_stats_history():
+        """Per-destination min/avg/p95 over a window"""
+        result = broadcast_engine.get_stats_history(request.args.get('seconds', 3600, type=float))
+        return jsonify(result)
+    
+    @app.route('/api/broadcast/stats/sparkline/<platform>', methods=['GET'])
+    def get_sparkline(platform):
+        """One statistic of a destination, downsampled for a sparkline"""
+        result = broadcast_engine.get_sparkline(
+            platform,
+            request.args.get('field', 'bitrate_kbps'),
+            request.args.get('seconds', 600, type=float),
+            request.args.get('points', 60, type=int)
+        )
+        return jsonify(result)
+    
+    @app.route('/api/broadcast/relay/start', methods=['POST'])
+    def start_relay_ingest():
+        """Accept a local RTMP publisher and forward it without re-encoding"""
+        result = broadcast_engine.start_relay_ingest(request.get_json(silent=True))
+        return jsonify(result)
+    
+    @app.route('/api/broadcast/relay/stop', methods=['POST'])
+    def stop_relay_ingest():
+        """Leave relay mode"""
+        result = broadcast_engine.stop_relay_ingest()
+        return jsonify(result)
+    
+    @app.route('/api/broadcast/replay/start', methods=['POST'])
+    def start_replay_buffer():
+        """Start the instant-replay buffer"""
+        result = broadcast_engine.start_replay_buffer(request.get_json(silent=True))
+        return jsonify(result)
+    
+    @app.route('/api/broadcast/replay/save', methods=['POST'])
+    def save_replay():
+        """Save the last N seconds as a clip"""
+        data = request.get_json(silent=True) or {}
+        result = broadcast_engine.save_replay(data.get('seconds', 30), data.get('name'), data.get('container', 'flv'))
+        return jsonify(result)
+    
+    @app.route('/api/broadcast/replay/stop', methods=['POST'])
+    def stop_replay_buffer():
+        """Stop the instant-replay buffer"""
+        result = broadcast_engine.stop_replay_buffer()
+        return jsonify(result)
+    
+    @app.route('/api/broadcast/recording/start', methods=['POST'])
+    def start_recording():
+        """Start segmented recording mid-stream"""
+        result = broadcast_engine.start_recording(request.get_json(silent=True))
+        return jsonify(result)
+    
+    @app.route('/api/broadcast/recording/stop', methods=['POST'])
+    def stop_recording():
+        """Stop recording"""
+        result = broadcast_engine.stop_recording()
+        return jsonify(result)
+    
+    @app.route('/api/broadcast/hls/start', methods=['POST'])
+    def start_hls_output():
+        """Start the LL-HLS origin"""
+        result = broadcast_engine.start_hls_output(request.get_json(silent=True))
+        return jsonify(result)
+    
+    @app.route('/api/broadcast/hls/stop', methods=['POST'])
+    def stop_hls_output():
+        """Stop the LL-HLS origin"""
+        result = broadcast_engine.stop_hls_output()
+        return jsonify(result)
+    
+    @app.route('/api/broadcast/capacity/benchmark', methods=['POST'])
+    def run_capacity_benchmark():
+        """Re-measure encoder cost on this host"""
+        result = broadcast_engine.run_capacity_benchmark(request.get_json(silent=True))
+        return jsonify(result)
+    
+    @app.route('/hls/<path:filename>', methods=['GET'])
+    def serve_hls(filename):
+        """Playlist, segments and parts for self-hosted players"""
+        if not broadcast_engine.hls:
+            return Response(status=404)
+        status, headers, body = broadcast_engine.hls.respond(filename, request.args)
+        return Response(body, status=status, headers=headers)
+    
     @app.route('/api/broadcast/quality', methods=['PUT'])
     def update_broadcast_quality():
         """Update stream quality"""
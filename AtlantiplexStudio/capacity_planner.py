@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+🌊 MATRIX BROADCAST STUDIO - CAPACITY PLANNER
+Encoder CPU capacity model and admission control
+Features: per-host x264 benchmarks by resolution and preset, pixel-rate estimates until benchmarked,
+CPU budget tracking across shared encoders, reject-or-downgrade admission decisions
+"""
+
+import os
+import json
+import time
+import logging
+import tempfile
+import threading
+import subprocess
+from datetime import datetime
+from typing import Dict, List, Optional, Any
+
+logger = logging.getLogger(__name__)
+
+# Cores used per megapixel/s of x264 input, per preset, until the host has been benchmarked
+PRESET_CORES_PER_MPIXEL = {
+    'ultrafast': 0.012,
+    'superfast': 0.018,
+    'veryfast': 0.028,
+    'faster': 0.045,
+    'fast': 0.06,
+    'medium': 0.07
+}
+
+# A -c copy relay and an AAC encode are small but not free
+RELAY_CORES = 0.03
+AUDIO_CORES = 0.02
+
+def host_signature() -> str:
+    """CPU model and count; benchmarks from another machine are not reused"""
+    model = 'unknown'
+    try:
+        with open('/proc/cpuinfo') as f:
+            for line in f:
+                if line.startswith('model name'):
+                    model = line.split(':', 1)[1].strip()
+                    break
+    except OSError:
+        pass
+    return f"{model} x{os.cpu_count() or 1}"
+
+class CapacityPlanner:
+    """Keeps the encoders' CPU commitment inside a budget.
+    
+    Each encoder costs the cores its resolution and preset took in this
+    host's benchmark (scaled to its frame rate), or a pixel-rate estimate
+    until a benchmark exists. Destinations sharing a running encoder only
+    add their relay. `admit` walks the candidates best-first and returns
+    the first one that fits, so a request is downgraded before it is
+    rejected.
+    """
+    
+    def __init__(self, profile_path: str, cores: Optional[int] = None, budget: float = 0.85,
+                 reserved_cores: float = 0.5, preset: str = 'veryfast'):
+        self.profile_path = profile_path
+        self.cores = cores or os.cpu_count() or 1
+        self.budget = budget
+        self.reserved_cores = reserved_cores  # compositor, mixer and the web server
+        self.preset = preset
+        self.host = host_signature()
+        self.benchmarks = {}  # 'WxH/preset' -> measurement
+        self.benchmark_state = {'status': 'idle'}
+        self.decisions = []
+        self._lock = threading.Lock()
+        self._load_profile()
+    
+    @property
+    def capacity(self) -> float:
+        """Cores available to encoders and relays"""
+        return max(0.0, self.cores * self.budget - self.reserved_cores)
+    
+    def _benchmark_key(self, width: int, height: int, preset: str) -> str:
+        return f"{width}x{height}/{preset}"
+    
+    def encoder_cost(self, settings: Dict[str, Any], preset: Optional[str] = None) -> float:
+        """Cores one encoder with these settings is expected to use"""
+        preset = preset or self.preset
+        fps = settings.get('fps', 30)
+        measured = self.benchmarks.get(self._benchmark_key(settings['width'], settings['height'], preset))
+        if measured:
+            video = measured['cores'] * fps / measured['fps']
+        else:
+            mpixels = settings['width'] * settings['height'] * fps / 1e6
+            video = mpixels * PRESET_CORES_PER_MPIXEL.get(preset, PRESET_CORES_PER_MPIXEL['veryfast'])
+        return round(video + AUDIO_CORES, 3)
+    
+    def committed(self, running: Dict[str, Dict[str, Any]], destinations: int) -> float:
+        """Cores taken by running encoders (key -> settings) and destination relays"""
+        return sum(self.encoder_cost(settings) for settings in running.values()) + destinations * RELAY_CORES
+    
+    def admit(self, consumer: str, candidates: List[Dict[str, Any]], running: Dict[str, Dict[str, Any]],
+              destinations: int, allow_downgrade: bool = True) -> Dict[str, Any]:
+        """Choose the best candidate ({'key', 'settings'}) that fits the remaining budget.
+        
+        A candidate whose encoder is already running only costs a relay.
+        Returns the decision with the chosen `index`, or `allowed` False.
+        """
+        committed = self.committed(running, destinations)
+        options = candidates if allow_downgrade else candidates[:1]
+        decision = {
+            'consumer': consumer,
+            'requested': candidates[0]['key'] if candidates else None,
+            'committed': round(committed, 2),
+            'capacity': round(self.capacity, 2),
+            'at': datetime.now().isoformat()
+        }
+        
+        for index, candidate in enumerate(options):
+            shared = candidate['key'] in running
+            cost = RELAY_CORES + (0.0 if shared else self.encoder_cost(candidate['settings']))
+            # The first encoder is always admitted at the cheapest option; a box that can't run one can't stream
+            if committed + cost <= self.capacity or (not running and index == len(options) - 1):
+                decision.update({'allowed': True, 'index': index, 'key': candidate['key'],
+                                 'downgraded': index > 0, 'shared': shared, 'cost': round(cost, 3)})
+                break
+        else:
+            needed = RELAY_CORES + min((self.encoder_cost(c['settings']) for c in options), default=0.0)
+            decision.update({'allowed': False, 'needed': round(needed, 3),
+                             'reason': f"Encoders use {committed:.1f} of {self.capacity:.1f} cores; "
+                                       f"{options[-1]['key'] if options else 'this output'} needs {needed:.2f} more"})
+        
+        with self._lock:
+            self.decisions = (self.decisions + [decision])[-20:]
+        return decision
+    
+    def benchmark(self, qualities: Dict[str, Dict[str, Any]], presets: Optional[List[str]] = None,
+                  seconds: float = 5.0) -> Dict[str, Any]:
+        """Encode a test pattern at each resolution and preset, and store the cores each took"""
+        presets = presets or [self.preset]
+        self.benchmark_state = {'status': 'running', 'started_at': datetime.now().isoformat(), 'results': {}}
+        results = self.benchmark_state['results']
+        for name, settings in qualities.items():
+            for preset in presets:
+                key = self._benchmark_key(settings['width'], settings['height'], preset)
+                try:
+                    results[key] = self._measure(settings, preset, seconds)
+                    logger.info(f"🧮 {name} x264 {preset}: {results[key]['cores']:.2f} cores, "
+                                f"{results[key]['speed']:.1f}x realtime")
+                except Exception as e:
+                    results[key] = {'error': str(e)}
+                    logger.warning(f"⚠️ Capacity benchmark {name}/{preset} failed: {e}")
+        
+        measured = {key: result for key, result in results.items() if 'error' not in result}
+        with self._lock:
+            self.benchmarks.update(measured)
+        if measured:
+            self._save_profile()
+        self.benchmark_state.update({'status': 'done' if measured else 'failed',
+                                     'finished_at': datetime.now().isoformat()})
+        return self.benchmark_state
+    
+    def benchmark_async(self, qualities: Dict[str, Dict[str, Any]], presets: Optional[List[str]] = None,
+                        seconds: float = 5.0) -> bool:
+        """Run `benchmark` on a background thread; False if one is already running"""
+        if self.benchmark_state.get('status') == 'running':
+            return False
+        self.benchmark_state = {'status': 'running'}
+        threading.Thread(target=self.benchmark, args=(qualities, presets, seconds), daemon=True).start()
+        return True
+    
+    def _measure(self, settings: Dict[str, Any], preset: str, seconds: float) -> Dict[str, Any]:
+        """CPU time of one real-time-sized encode, from the child's own rusage.
+        
+        The test pattern is generated in the same process, which slightly
+        overstates the encoder's cost; that errs on the safe side.
+        """
+        fps = settings.get('fps', 30)
+        cmd = [
+            'ffmpeg', '-hide_banner', '-loglevel', 'error', '-nostdin',
+            '-f', 'lavfi', '-i', f"testsrc2=size={settings['width']}x{settings['height']}:rate={fps}",
+            '-t', str(seconds),
+            '-c:v', 'libx264', '-preset', preset, '-tune', 'zerolatency',
+            '-b:v', f"{settings['bitrate']}k", '-g', str(settings.get('keyframe_interval', fps * 2)),
+            '-f', 'null', '-'
+        ]
+        with tempfile.TemporaryFile() as errors:
+            started = time.monotonic()
+            process = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=errors)
+            watchdog = threading.Timer(seconds * 10 + 10, process.kill)
+            watchdog.start()
+            try:
+                _, status, usage = os.wait4(process.pid, 0)
+            finally:
+                watchdog.cancel()
+            wall = time.monotonic() - started
+            process.returncode = os.waitstatus_to_exitcode(status)
+            if process.returncode != 0:
+                errors.seek(0)
+                raise RuntimeError(errors.read().decode(errors='replace').strip()[-200:] or f"exit {process.returncode}")
+        
+        cpu = usage.ru_utime + usage.ru_stime
+        return {
+            'cores': round(cpu / seconds, 3),
+            'speed': round(seconds / wall, 2),
+            'fps': fps,
+            'measured_at': datetime.now().isoformat()
+        }
+    
+    def _load_profile(self):
+        try:
+            with open(self.profile_path) as f:
+                profile = json.load(f)
+        except (OSError, ValueError):
+            return
+        if profile.get('host') == self.host:
+            self.benchmarks = profile.get('benchmarks', {})
+        else:
+            logger.info("🧮 Capacity profile is from another host; using estimates until benchmarked")
+    
+    def _save_profile(self):
+        try:
+            os.makedirs(os.path.dirname(self.profile_path), exist_ok=True)
+            temp_path = f"{self.profile_path}.tmp"
+            with open(temp_path, 'w') as f:
+                json.dump({'host': self.host, 'benchmarks': self.benchmarks}, f, indent=2)
+            os.replace(temp_path, self.profile_path)
+        except OSError as e:
+            logger.warning(f"⚠️ Could not save capacity profile: {e}")
+    
+    def get_stats(self, running: Dict[str, Dict[str, Any]], destinations: int) -> Dict[str, Any]:
+        committed = self.committed(running, destinations)
+        return {
+            'cores': self.cores,
+            'capacity': round(self.capacity, 2),
+            'committed': round(committed, 2),
+            'headroom': round(self.capacity - committed, 2),
+            'preset': self.preset,
+            'benchmarked': sorted(self.benchmarks),
+            'benchmark': {key: value for key, value in self.benchmark_state.items() if key != 'results'},
+            'encoders': {key: self.encoder_cost(settings) for key, settings in running.items()},
+            'decisions': self.decisions[-5:]
+        }
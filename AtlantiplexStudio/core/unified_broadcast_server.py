@@ -54,6 +54,7 @@ class Config:
     UPLOAD_FOLDER = 'uploads'
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'mp4', 'avi', 'mov', 'webm'}
+    AUDIO_METER_RATE_HZ = 15
 
 # Initialize Flask app
 app = Flask(__name__)
@@ -116,6 +117,7 @@ class UnifiedBroadcastingSystem:
         self.broadcast_engine = BroadcastEngine()
         self.guest_manager = GuestManager()
         self.scene_manager = SceneManager()
+        self.scene_manager.subscribe(self._broadcast_scene_change)
         self.platform_streamer = MultiPlatformStreamer()
         self.analytics_engine = AnalyticsEngine()
         self.scheduler = StreamScheduler()
@@ -138,6 +140,7 @@ class UnifiedBroadcastingSystem:
         # Background tasks
         self.monitoring_thread = None
         self.stats_thread = None
+        self.meter_thread = None
         self.is_running = False
         
         logger.info("🌊 Unified Broadcasting System initialized")
@@ -182,6 +185,13 @@ class UnifiedBroadcastingSystem:
             )
             self.stats_thread.start()
             
+            # Audio meter push to the studio UI
+            self.meter_thread = threading.Thread(
+                target=self._publish_audio_levels,
+                daemon=True
+            )
+            self.meter_thread.start()
+            
             logger.info("📊 Background tasks started")
     
     def _monitor_streams(self):
@@ -237,6 +247,27 @@ class UnifiedBroadcastingSystem:
                 logger.error(f"❌ Stats collection error: {e}")
                 time.sleep(30)
     
+    def _publish_audio_levels(self):
+        """Push mixer meters to the studio UI at a throttled rate"""
+        interval = 1.0 / app.config['AUDIO_METER_RATE_HZ']
+        last_block = None
+        
+        while self.is_running:
+            try:
+                mixer = self.broadcast_engine.audio_mixer
+                
+                # One broadcast per tick, coalescing every block mixed since the last one
+                # (peaks are held between snapshots), and nothing when the mixer is idle
+                if mixer and mixer.stats['blocks_mixed'] != last_block:
+                    last_block = mixer.stats['blocks_mixed']
+                    socketio.emit('audio_levels', mixer.get_levels())
+                
+                time.sleep(interval)
+                
+            except Exception as e:
+                logger.error(f"❌ Audio meter publish error: {e}")
+                time.sleep(1)
+    
     def start_stream_session(self, session_data: Dict) -> Dict:
         """Start a new streaming session"""
         try:
@@ -413,6 +444,10 @@ class UnifiedBroadcastingSystem:
             logger.error(f"❌ Error getting comprehensive status: {e}")
             return {'error': str(e)}
     
+    def _broadcast_scene_change(self, change: Dict):
+        """Push each scene change to clients as a JSON patch instead of the whole scene list"""
+        socketio.emit('scene_patch', change)
+    
     def handle_websocket_event(self, event_type: str, data: Dict):
         """Handle WebSocket events from web interface"""
         try:
@@ -540,10 +575,17 @@ def get_scenes():
     scenes = unified_system.scene_manager.get_all_scenes()
     return jsonify({'scenes': [scene.to_dict() for scene in scenes]})
 
+@app.route('/api/scenes/changes', methods=['GET'])
+@jwt_required()
+def get_scene_changes():
+    """Scene changes after a version, as JSON patches (a full snapshot when too far behind)"""
+    since = request.args.get('since', 0, type=int)
+    return jsonify(unified_system.scene_manager.changes_since(since))
+
 @app.route('/api/scenes/<scene_name>/switch', methods=['POST'])
 @jwt_required()
 def switch_scene(scene_name):
-    """Switch to a specific scene"""
+    """Switch to a specific scene, by name or id"""
     result = unified_system.scene_manager.switch_scene(scene_name)
     return jsonify({'success': result})
 
@@ -573,6 +615,11 @@ def handle_join_studio(data):
     """Handle joining studio room"""
     unified_system.handle_websocket_event('join_studio', data)
 
+@socketio.on('scene_sync')
+def handle_scene_sync(data):
+    """Catch a reconnecting client up from the last scene version it applied"""
+    emit('scene_changes', unified_system.scene_manager.changes_since(int((data or {}).get('since', 0))))
+
 @socketio.on('studio_action')
 def handle_studio_action(data):
     """Handle studio actions"""
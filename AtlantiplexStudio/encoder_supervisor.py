@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+"""
+🌊 MATRIX BROADCAST STUDIO - ENCODER SUPERVISOR
+Asyncio supervision of FFmpeg encoder processes
+Features: -progress parsing, throughput-based health, bounded stderr diagnostics,
+restart backoff with circuit breaker, event loop off the request threads
+"""
+
+import os
+import re
+import time
+import random
+import shutil
+import asyncio
+import logging
+import threading
+import subprocess
+from collections import deque
+from concurrent.futures import Future
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Any
+
+logger = logging.getLogger(__name__)
+
+# Only warnings and errors on stderr, each tagged with its level
+LOG_ARGS = ['-hide_banner', '-loglevel', 'level+warning']
+
+# An encoder is keeping up when it runs at (nearly) real time
+HEALTHY_SPEED = 0.98
+
+# Known stderr messages folded into structured counters
+DIAGNOSTIC_PATTERNS = [
+    ('non_monotonic_dts', re.compile(r'non[- ]monoton', re.IGNORECASE)),
+    ('backward_timestamps', re.compile(r'backward in time|past duration', re.IGNORECASE)),
+    ('buffer_underflow', re.compile(r'buffer underflow|thread message queue blocking', re.IGNORECASE)),
+    ('connection_errors', re.compile(r'connection (reset|refused|timed out)|broken pipe|end of file|i/o error', re.IGNORECASE)),
+    ('corrupt_input', re.compile(r'corrupt|invalid data|truncat', re.IGNORECASE))
+]
+
+def _number(value: Optional[str], cast: Callable = float, suffix: str = '') -> Optional[Any]:
+    """Parse a progress value, tolerating 'N/A' and unit suffixes"""
+    if not value:
+        return None
+    value = value.strip()
+    if suffix and value.endswith(suffix):
+        value = value[:-len(suffix)]
+    try:
+        return cast(float(value)) if cast is int else cast(value)
+    except ValueError:
+        return None
+
+class ProgressParser:
+    """Incremental parser for FFmpeg `-progress` key=value blocks"""
+    
+    def __init__(self):
+        self._block = {}
+    
+    def feed(self, line: str) -> Optional[Dict[str, Any]]:
+        """Consume one line; returns a snapshot when a block completes"""
+        key, _, value = line.strip().partition('=')
+        if not key:
+            return None
+        if key != 'progress':
+            self._block[key] = value
+            return None
+        
+        block, self._block = self._block, {}
+        out_time_us = _number(block.get('out_time_us'), int)
+        return {
+            'frame': _number(block.get('frame'), int),
+            'fps': _number(block.get('fps')),
+            'bitrate_kbps': _number(block.get('bitrate'), suffix='kbits/s'),
+            'total_size': _number(block.get('total_size'), int),
+            'out_time_s': out_time_us / 1e6 if out_time_us is not None else None,
+            'dup_frames': _number(block.get('dup_frames'), int),
+            'drop_frames': _number(block.get('drop_frames'), int),
+            'speed': _number(block.get('speed'), suffix='x'),
+            'state': value.strip(),
+            'received_at': time.time()
+        }
+
+class DiagnosticLog:
+    """Bounded ring of recent stderr lines plus structured warning counters"""
+    
+    def __init__(self, max_bytes: int = 32 * 1024, max_line: int = 1024):
+        self.max_bytes = max_bytes
+        self.max_line = max_line
+        self.lines = deque()
+        self.size = 0
+        self.finished = threading.Event()
+        self._partial = b''
+        self._lock = threading.Lock()
+        self.counters = {'warnings': 0, 'errors': 0, 'dropped_bytes': 0}
+        self.counters.update({name: 0 for name, _ in DIAGNOSTIC_PATTERNS})
+        self.last_error = None
+    
+    def feed(self, chunk: bytes):
+        """Consume a raw stderr chunk (may split lines anywhere)"""
+        data = self._partial + chunk
+        *complete, self._partial = re.split(rb'\r\n|\r|\n', data)
+        if len(self._partial) > self.max_line:
+            complete.append(self._partial)
+            self._partial = b''
+        for raw in complete:
+            if raw:
+                self._add_line(raw[:self.max_line].decode(errors='replace'))
+    
+    def close(self):
+        """Flush any trailing partial line and mark the stream finished"""
+        if self._partial:
+            self._add_line(self._partial[:self.max_line].decode(errors='replace'))
+            self._partial = b''
+        self.finished.set()
+    
+    def _add_line(self, line: str):
+        with self._lock:
+            self.lines.append(line)
+            self.size += len(line) + 1
+            while self.size > self.max_bytes and len(self.lines) > 1:
+                dropped = self.lines.popleft()
+                self.size -= len(dropped) + 1
+                self.counters['dropped_bytes'] += len(dropped) + 1
+        
+        # '-loglevel level+...' prefixes every line with its level
+        if '[error]' in line or '[fatal]' in line or '[panic]' in line:
+            self.counters['errors'] += 1
+            self.last_error = line
+        elif '[warning]' in line:
+            self.counters['warnings'] += 1
+        for name, pattern in DIAGNOSTIC_PATTERNS:
+            if pattern.search(line):
+                self.counters[name] += 1
+    
+    def tail(self, max_lines: Optional[int] = None) -> str:
+        """Most recent lines as text"""
+        with self._lock:
+            lines = list(self.lines)
+        return '\n'.join(lines[-max_lines:] if max_lines else lines)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.counters,
+            'buffered_bytes': self.size,
+            'last_error': self.last_error
+        }
+
+class RestartTracker:
+    """Per-platform restart state machine.
+    
+    idle/running -> backoff -> restarting -> running. Delays grow
+    exponentially with jitter; after `max_failures` consecutive failures the
+    circuit opens and only a single trial restart is allowed per cooldown.
+    A stream that stayed up for `stable_after` seconds starts a fresh count.
+    """
+    
+    def __init__(self, platform: str, base_delay: float = 2.0, max_delay: float = 60.0,
+                 max_failures: int = 5, cooldown: float = 300.0, stable_after: float = 60.0,
+                 history_limit: int = 50):
+        self.platform = platform
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_failures = max_failures
+        self.cooldown = cooldown
+        self.stable_after = stable_after
+        
+        self.state = 'idle'
+        self.consecutive_failures = 0
+        self.total_failures = 0
+        self.total_restarts = 0
+        self.live_since = None
+        self.next_attempt_at = None
+        self.pending = None  # Future of the scheduled restart
+        self.history = deque(maxlen=history_limit)
+    
+    def backoff_delay(self, attempt: int) -> float:
+        """Exponential delay with equal jitter, so platforms don't retry in lockstep"""
+        ceiling = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        return random.uniform(ceiling / 2, ceiling)
+    
+    def record_failure(self, exit_code: Optional[int] = None, error: Optional[str] = None) -> float:
+        """Register a failure; returns the delay before the next attempt"""
+        now = time.time()
+        if self.live_since and now - self.live_since >= self.stable_after:
+            self.consecutive_failures = 0
+        self.live_since = None
+        self.consecutive_failures += 1
+        self.total_failures += 1
+        
+        if self.consecutive_failures >= self.max_failures:
+            self.state = 'open'
+            delay = self.cooldown
+        else:
+            self.state = 'backoff'
+            delay = self.backoff_delay(self.consecutive_failures)
+        
+        self.next_attempt_at = now + delay
+        self._record('failure', exit_code=exit_code, error=error, delay=round(delay, 2))
+        return delay
+    
+    def record_attempt(self):
+        """A scheduled restart is starting (a trial one when the circuit is open)"""
+        self.pending = None
+        self.next_attempt_at = None
+        self.state = 'half_open' if self.state == 'open' else 'restarting'
+        self.total_restarts += 1
+        self._record('restart', attempt=self.consecutive_failures)
+    
+    def record_live(self):
+        """The stream reached real-time throughput"""
+        if self.state != 'running':
+            self.state = 'running'
+            self.live_since = time.time()
+            self._record('live')
+    
+    def reset(self, state: str = 'idle'):
+        """Manual start or stop: cancel any pending restart and close the circuit"""
+        self.cancel()
+        self.state = state
+        self.consecutive_failures = 0
+        self.next_attempt_at = None
+        self._record(state)
+    
+    def cancel(self):
+        if self.pending is not None:
+            self.pending.cancel()
+            self.pending = None
+    
+    @property
+    def restart_pending(self) -> bool:
+        return self.pending is not None and not self.pending.done()
+    
+    def _record(self, event: str, **details):
+        self.history.append({'at': datetime.now().isoformat(), 'event': event, **details})
+    
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            'state': self.state,
+            'consecutive_failures': self.consecutive_failures,
+            'total_failures': self.total_failures,
+            'total_restarts': self.total_restarts,
+            'next_attempt_in': round(max(0.0, self.next_attempt_at - time.time()), 1) if self.next_attempt_at else None,
+            'history': list(self.history)[-10:]
+        }
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'state': self.state,
+            'consecutive_failures': self.consecutive_failures,
+            'total_failures': self.total_failures,
+            'total_restarts': self.total_restarts,
+            'history': list(self.history)
+        }
+    
+    def load(self, data: Dict[str, Any]):
+        """Restore counters and history saved by a previous run"""
+        self.total_failures = data.get('total_failures', 0)
+        self.total_restarts = data.get('total_restarts', 0)
+        self.history.extend(data.get('history', []))
+
+def is_keeping_up(progress: Optional[Dict[str, Any]]) -> bool:
+    """True when a progress snapshot shows real-time throughput"""
+    return bool(progress) and progress['speed'] is not None and progress['speed'] >= HEALTHY_SPEED
+
+class EncoderSupervisor:
+    """Runs encoder supervision coroutines on a dedicated asyncio loop"""
+    
+    def __init__(self, on_progress: Callable[[str, subprocess.Popen, Dict[str, Any]], None]):
+        self.on_progress = on_progress
+        self.loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+    
+    def start(self):
+        """Start the event loop thread (no-op when running)"""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self.loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+    
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+    
+    def stop(self):
+        """Stop the event loop"""
+        if self.loop and self._thread and self._thread.is_alive():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join(timeout=5)
+    
+    def spawn(self, platform: str, cmd: List[str], diagnostics: DiagnosticLog,
+              launcher: Optional[List[str]] = None, **popen_kwargs) -> subprocess.Popen:
+        """Start an FFmpeg process and supervise it.
+        
+        Machine-readable progress goes to a private pipe so stdout stays free
+        for media output; stderr is always drained into `diagnostics`.
+        `launcher` is an exec wrapper prefix (taskset, nice, ...) for placement.
+        """
+        if launcher and not shutil.which(cmd[0]):
+            # Behind a wrapper a missing binary would only show up as exit 127; fail like Popen does
+            raise FileNotFoundError(f"{cmd[0]} not found")
+        progress_read, progress_write = os.pipe()
+        cmd = list(launcher or []) + cmd[:1] + ['-progress', f'pipe:{progress_write}', '-nostats'] + LOG_ARGS + cmd[1:]
+        pass_fds = tuple(popen_kwargs.pop('pass_fds', ())) + (progress_write,)
+        popen_kwargs.setdefault('stdout', subprocess.DEVNULL)
+        try:
+            process = subprocess.Popen(cmd, stderr=subprocess.PIPE, pass_fds=pass_fds, **popen_kwargs)
+        except Exception:
+            os.close(progress_read)
+            raise
+        finally:
+            os.close(progress_write)
+        
+        self.watch(platform, process, diagnostics, os.fdopen(progress_read, 'rb', buffering=0))
+        return process
+    
+    def call_later(self, delay: float, callback: Callable, *args) -> Future:
+        """Run a blocking callback after `delay` seconds without holding up the loop"""
+        self.start()
+        return asyncio.run_coroutine_threadsafe(self._call_later(delay, callback, *args), self.loop)
+    
+    async def _call_later(self, delay: float, callback: Callable, *args):
+        await asyncio.sleep(delay)
+        await self.loop.run_in_executor(None, callback, *args)
+    
+    def watch(self, platform: str, process: subprocess.Popen, diagnostics: Optional[DiagnosticLog] = None,
+              progress_pipe=None):
+        """Supervise a running process reporting progress on `progress_pipe` (default stdout)"""
+        self.start()
+        pipe = progress_pipe if progress_pipe is not None else process.stdout
+        asyncio.run_coroutine_threadsafe(self._supervise(platform, process, pipe), self.loop)
+        if diagnostics is not None:
+            asyncio.run_coroutine_threadsafe(self._drain(platform, process.stderr, diagnostics), self.loop)
+    
+    async def _open_reader(self, pipe) -> asyncio.StreamReader:
+        reader = asyncio.StreamReader()
+        await self.loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), pipe)
+        return reader
+    
+    async def _supervise(self, platform: str, process: subprocess.Popen, pipe):
+        """Stream progress reports from one process until it exits"""
+        try:
+            reader = await self._open_reader(pipe)
+            parser = ProgressParser()
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                progress = parser.feed(line.decode(errors='replace'))
+                if progress:
+                    self.on_progress(platform, process, progress)
+        except Exception as e:
+            logger.error(f"❌ {platform} encoder supervision error: {e}")
+    
+    async def _drain(self, platform: str, pipe, diagnostics: DiagnosticLog):
+        """Keep stderr flowing so FFmpeg never blocks on a full pipe"""
+        try:
+            reader = await self._open_reader(pipe)
+            while True:
+                chunk = await reader.read(4096)
+                if not chunk:
+                    break
+                diagnostics.feed(chunk)
+        except Exception as e:
+            logger.error(f"❌ {platform} stderr drain error: {e}")
+        finally:
+            diagnostics.close()
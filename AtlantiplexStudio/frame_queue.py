@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+🌊 MATRIX BROADCAST STUDIO - FRAME QUEUE
+Bounded per-encoder input queues that absorb a slow encoder without stalling the media loop
+Features: drop-oldest, drop-non-reference and half-rate overflow policies that keep the
+constant-rate slot count intact, queue depth, wait time and drop metrics
+"""
+
+import time
+import threading
+from collections import deque
+from typing import Dict, Optional, Any, Tuple
+
+POLICIES = ('drop-oldest', 'drop-non-reference', 'half-rate')
+
+class QueuedFrame:
+    """A picture and the encoder input slots it fills"""
+    
+    __slots__ = ('data', 'slot', 'copies', 'queued_at')
+    
+    def __init__(self, data, slot: int, copies: int, queued_at: float):
+        self.data = data
+        self.slot = slot
+        self.copies = copies
+        self.queued_at = queued_at
+
+class FrameQueue:
+    """Frames waiting for one encoder's stdin.
+    
+    `put` never blocks. When `max_frames` pictures are waiting, the policy
+    picks one to give up: its slots are merged into a neighbour, so the
+    encoder still gets one picture per slot (a repeated picture) and the
+    timeline never shifts. Repeats cost x264 almost nothing, which is what
+    lets a lagging encoder catch up.
+    
+    - drop-oldest: the oldest waiting picture is skipped; the next one fills its slots
+    - drop-non-reference: the newest waiting picture that does not land on a
+      keyframe slot is replaced by a repeat of its predecessor, so every GOP
+      still starts from a current picture
+    - half-rate: every other picture is repeated instead of sent until the
+      queue drains to a quarter, then full rate resumes
+    
+    `max_frames` 0 means unbounded (audio, whose sample count must not change).
+    """
+    
+    def __init__(self, max_frames: int = 0, policy: str = 'drop-oldest', keyframe_interval: int = 0):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown frame drop policy: {policy}")
+        self.max_frames = max_frames
+        self.policy = policy
+        self.keyframe_interval = keyframe_interval
+        self.half_rate = False
+        self._items = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._skip_next = False
+        
+        self.queued = 0
+        self.dropped = 0
+        self.overflows = 0
+        self.max_depth = 0
+        self.wait_avg = 0.0
+        self.wait_max = 0.0
+    
+    def __len__(self) -> int:
+        return len(self._items)
+    
+    def put(self, data, slot: int, copies: int) -> bool:
+        """Queue a picture for `copies` slots starting at `slot`; False if it was merged away"""
+        with self._cond:
+            if self._closed:
+                return False
+            self.queued += 1
+            items = self._items
+            
+            if self.half_rate and self._skip_next and items:
+                # Half rate: this picture's slots repeat the previous one
+                self._skip_next = False
+                items[-1].copies += copies
+                self.dropped += 1
+                return False
+            self._skip_next = self.half_rate
+            
+            items.append(QueuedFrame(data, slot, copies, time.monotonic()))
+            if self.max_frames and len(items) > self.max_frames:
+                self.overflows += 1
+                self.dropped += 1
+                self._shed()
+            self.max_depth = max(self.max_depth, len(items))
+            self._cond.notify()
+            return True
+    
+    def _shed(self):
+        """Merge one waiting picture away according to the policy"""
+        items = self._items
+        if self.policy == 'half-rate':
+            self.half_rate = True
+        
+        if self.policy == 'drop-non-reference' and len(items) > 1:
+            for index in range(len(items) - 1, 0, -1):
+                if not self._on_keyframe(items[index]):
+                    items[index - 1].copies += items[index].copies
+                    del items[index]
+                    return
+        
+        # drop-oldest, and the fallback once half rate alone can't hold the bound
+        oldest = items.popleft()
+        items[0].copies += oldest.copies
+        items[0].slot = oldest.slot
+    
+    def _on_keyframe(self, item: QueuedFrame) -> bool:
+        """Whether the item's slots include one the encoder will make an IDR frame"""
+        interval = self.keyframe_interval
+        if not interval:
+            return False
+        return (-item.slot) % interval < item.copies
+    
+    def get(self) -> Optional[Tuple[Any, int]]:
+        """Next (data, copies) to write, blocking; None once closed and drained"""
+        with self._cond:
+            while not self._items and not self._closed:
+                self._cond.wait()
+            if not self._items:
+                return None
+            item = self._items.popleft()
+            
+            wait = time.monotonic() - item.queued_at
+            self.wait_avg += (wait - self.wait_avg) * 0.05
+            self.wait_max = max(self.wait_max, wait)
+            if self.half_rate and len(self._items) <= self.max_frames // 4:
+                self.half_rate = False
+                self._skip_next = False
+            return item.data, item.copies
+    
+    def close(self):
+        """Stop accepting frames; the reader drains what is queued, then gets None"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'policy': self.policy if self.max_frames else None,
+            'depth': len(self._items),
+            'max_depth': self.max_depth,
+            'capacity': self.max_frames or None,
+            'wait_avg_ms': round(self.wait_avg * 1000, 2),
+            'wait_max_ms': round(self.wait_max * 1000, 2),
+            'queued': self.queued,
+            'dropped': self.dropped,
+            'overflows': self.overflows,
+            'half_rate': self.half_rate
+        }
@@ -0,0 +1,515 @@
+#!/usr/bin/env python3
+"""
+🌊 MATRIX BROADCAST STUDIO - LL-HLS ORIGIN
+Low-latency HLS for self-hosted viewers from the shared encoder's packets
+Features: FLV to MPEG-TS remux without re-encoding, partial segments, in-memory rolling window,
+incrementally built playlist, blocking playlist reload, preload hints, cache headers per resource
+"""
+
+import math
+import queue
+import uuid
+import logging
+import threading
+from collections import deque
+from typing import Dict, List, Optional, Any, Tuple
+
+from packet_bus import TAG_SCRIPT, FlvTag, KeyframeSwitcher
+
+logger = logging.getLogger(__name__)
+
+TS_PACKET_SIZE = 188
+PMT_PID = 0x1000
+VIDEO_PID = 0x100
+AUDIO_PID = 0x101
+STREAM_TYPE_H264 = 0x1B
+STREAM_TYPE_AAC = 0x0F
+
+# Decode delay between PCR and DTS (90 kHz), as ffmpeg's default muxdelay
+TS_OFFSET = 63000
+START_CODE = b'\x00\x00\x00\x01'
+ACCESS_UNIT_DELIMITER = START_CODE + b'\x09\xf0'
+
+PLAYLIST_NAME = 'index.m3u8'
+
+def _crc32_table() -> List[int]:
+    table = []
+    for i in range(256):
+        crc = i << 24
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x04C11DB7) if crc & 0x80000000 else crc << 1
+        table.append(crc & 0xFFFFFFFF)
+    return table
+
+CRC32_TABLE = _crc32_table()
+
+def crc32_mpeg(data: bytes) -> int:
+    """CRC-32/MPEG-2 used by PSI sections"""
+    crc = 0xFFFFFFFF
+    for byte in data:
+        crc = ((crc << 8) & 0xFFFFFFFF) ^ CRC32_TABLE[(crc >> 24) ^ byte]
+    return crc
+
+def parse_avc_config(record: bytes) -> Tuple[int, bytes]:
+    """NAL length size and Annex B SPS/PPS from an AVCDecoderConfigurationRecord"""
+    if len(record) < 7:
+        return 4, b''
+    length_size = (record[4] & 0x03) + 1
+    parameter_sets = bytearray()
+    position = 5
+    try:
+        for count_mask in (0x1F, 0xFF):  # SPS count, then PPS count
+            count = record[position] & count_mask
+            position += 1
+            for _ in range(count):
+                size = int.from_bytes(record[position:position + 2], 'big')
+                position += 2
+                parameter_sets += START_CODE + record[position:position + size]
+                position += size
+    except IndexError:
+        pass
+    return length_size, bytes(parameter_sets)
+
+def avcc_to_annexb(payload: bytes, length_size: int = 4) -> bytes:
+    """Length-prefixed NAL units to start-code delimited ones, dropping any AUDs"""
+    out = bytearray()
+    position = 0
+    end = len(payload)
+    while position + length_size <= end:
+        size = int.from_bytes(payload[position:position + length_size], 'big')
+        position += length_size
+        if size and payload[position] & 0x1F != 9:
+            out += START_CODE + payload[position:position + size]
+        position += size
+    return bytes(out)
+
+def _timestamp_field(marker: int, value: int) -> bytes:
+    value &= 0x1FFFFFFFF
+    return bytes(((marker << 4) | ((value >> 29) & 0x0E) | 1, (value >> 22) & 0xFF,
+                  ((value >> 14) & 0xFE) | 1, (value >> 7) & 0xFF, ((value << 1) & 0xFE) | 1))
+
+def _pes(stream_id: int, payload: bytes, pts: int, dts: Optional[int] = None) -> bytes:
+    if dts is None or dts == pts:
+        fields = _timestamp_field(0x2, pts)
+        flags = 0x80
+    else:
+        fields = _timestamp_field(0x3, pts) + _timestamp_field(0x1, dts)
+        flags = 0xC0
+    length = 3 + len(fields) + len(payload)
+    # Video PES may exceed the 16-bit length; 0 means unbounded
+    return (b'\x00\x00\x01' + bytes((stream_id,)) + (length if length <= 0xFFFF else 0).to_bytes(2, 'big')
+            + bytes((0x80, flags, len(fields))) + fields + payload)
+
+class TsMuxer:
+    """Remuxes FLV H.264/AAC tags into MPEG-TS packets without touching the bitstream"""
+    
+    def __init__(self):
+        self._continuity = {}
+        self.nal_length_size = 4
+        self.parameter_sets = None  # Annex B SPS/PPS, repeated before every keyframe
+        self.adts = None  # (profile, sampling index, channel config)
+    
+    def set_config(self, tag: FlvTag):
+        """Take codec parameters from an AVC or AAC sequence header"""
+        if tag.is_video:
+            self.nal_length_size, self.parameter_sets = parse_avc_config(tag.data[5:])
+        elif len(tag.data) >= 4:
+            first, second = tag.data[2], tag.data[3]
+            profile = min(4, max(1, first >> 3))
+            self.adts = (profile, ((first & 0x07) << 1) | (second >> 7), (second >> 3) & 0x0F)
+    
+    def _counter(self, pid: int) -> int:
+        counter = self._continuity.get(pid, 0)
+        self._continuity[pid] = (counter + 1) & 0x0F
+        return counter
+    
+    def _section(self, pid: int, table: bytes) -> bytes:
+        payload = b'\x00' + table + crc32_mpeg(table).to_bytes(4, 'big')
+        header = bytes((0x47, 0x40 | (pid >> 8), pid & 0xFF, 0x10 | self._counter(pid)))
+        return header + payload + b'\xff' * (184 - len(payload))
+    
+    def psi(self) -> bytes:
+        """PAT and PMT for the streams whose sequence headers have been seen"""
+        streams = []
+        if self.parameter_sets is not None:
+            streams.append((STREAM_TYPE_H264, VIDEO_PID))
+        if self.adts is not None:
+            streams.append((STREAM_TYPE_AAC, AUDIO_PID))
+        if not streams:
+            return b''
+        
+        pat = bytes((0x00, 0xB0, 13, 0x00, 0x01, 0xC1, 0x00, 0x00,
+                     0x00, 0x01, 0xE0 | (PMT_PID >> 8), PMT_PID & 0xFF))
+        pcr_pid = streams[0][1]
+        pmt = bytearray((0x02, 0xB0, 13 + 5 * len(streams), 0x00, 0x01, 0xC1, 0x00, 0x00,
+                         0xE0 | (pcr_pid >> 8), pcr_pid & 0xFF, 0xF0, 0x00))
+        for stream_type, pid in streams:
+            pmt += bytes((stream_type, 0xE0 | (pid >> 8), pid & 0xFF, 0xF0, 0x00))
+        return self._section(0, pat) + self._section(PMT_PID, bytes(pmt))
+    
+    def mux(self, tag: FlvTag) -> bytes:
+        """TS packets for one media tag (empty for anything that is not H.264 or AAC)"""
+        data = tag.data
+        dts = tag.timestamp * 90 + TS_OFFSET
+        if tag.is_video:
+            if len(data) < 6 or data[0] & 0x0F != 7 or data[1] != 1:
+                return b''
+            cts = int.from_bytes(data[2:5], 'big', signed=True)
+            payload = ACCESS_UNIT_DELIMITER
+            if tag.is_keyframe and self.parameter_sets:
+                payload += self.parameter_sets
+            payload += avcc_to_annexb(data[5:], self.nal_length_size)
+            pes = _pes(0xE0, payload, dts + cts * 90, dts)
+            return self._packetize(VIDEO_PID, pes, pcr=dts - TS_OFFSET, random_access=tag.is_keyframe)
+        
+        if tag.is_audio and self.adts and len(data) > 2 and data[0] >> 4 == 10:
+            frame = data[2:]
+            return self._packetize(AUDIO_PID, _pes(0xC0, self._adts_header(len(frame)) + frame, dts))
+        return b''
+    
+    def _adts_header(self, frame_size: int) -> bytes:
+        profile, sampling, channels = self.adts
+        length = frame_size + 7
+        return bytes((0xFF, 0xF1, ((profile - 1) << 6) | (sampling << 2) | (channels >> 2),
+                      ((channels & 0x03) << 6) | (length >> 11), (length >> 3) & 0xFF,
+                      ((length & 0x07) << 5) | 0x1F, 0xFC))
+    
+    def _packetize(self, pid: int, pes: bytes, pcr: Optional[int] = None, random_access: bool = False) -> bytes:
+        out = bytearray()
+        position = 0
+        end = len(pes)
+        while position < end:
+            first = position == 0
+            adaptation = b''
+            if first and (pcr is not None or random_access):
+                body = bytes(((0x40 if random_access else 0) | (0x10 if pcr is not None else 0),))
+                if pcr is not None:
+                    base = pcr & 0x1FFFFFFFF
+                    body += bytes(((base >> 25) & 0xFF, (base >> 17) & 0xFF, (base >> 9) & 0xFF,
+                                   (base >> 1) & 0xFF, ((base & 1) << 7) | 0x7E, 0x00))
+                adaptation = bytes((len(body),)) + body
+            
+            room = 184 - len(adaptation)
+            size = min(room, end - position)
+            stuffing = room - size
+            if stuffing:
+                if adaptation:
+                    adaptation = bytes((adaptation[0] + stuffing,)) + adaptation[1:] + b'\xff' * stuffing
+                elif stuffing == 1:
+                    adaptation = b'\x00'
+                else:
+                    adaptation = bytes((stuffing - 1, 0x00)) + b'\xff' * (stuffing - 2)
+            
+            control = 0x30 if adaptation else 0x10
+            out += bytes((0x47, (0x40 if first else 0) | (pid >> 8), pid & 0xFF, control | self._counter(pid)))
+            out += adaptation
+            out += pes[position:position + size]
+            position += size
+        return bytes(out)
+
+class HlsPart:
+    """A completed partial segment"""
+    
+    __slots__ = ('data', 'duration', 'independent')
+    
+    def __init__(self, data: bytes, duration: float, independent: bool):
+        self.data = data
+        self.duration = duration
+        self.independent = independent
+
+class HlsSegment:
+    """One keyframe-aligned segment; `data` is set when it closes"""
+    
+    __slots__ = ('msn', 'start_ts', 'parts', 'part_lines', 'duration', 'data', 'discontinuity',
+                 'block', 'short_block')
+    
+    def __init__(self, msn: int, start_ts: int, discontinuity: bool = False):
+        self.msn = msn
+        self.start_ts = start_ts
+        self.parts = []
+        self.part_lines = []
+        self.duration = 0.0
+        self.data = None
+        self.discontinuity = discontinuity
+        self.block = None  # playlist lines with parts, built once when the segment closes
+        self.short_block = None  # the same without parts, once it is too old to list them
+
+class LLHlsOrigin:
+    """Low-latency HLS output fed by a KeyframeSwitcher, served from memory.
+    
+    Packets are remuxed to MPEG-TS on a worker thread: parts close on the
+    frame that would push them past `part_s`, segments close at the first
+    keyframe after `segment_s` (or when the sequence headers change). The
+    playlist text is rebuilt from cached per-segment blocks only when a
+    part completes, so a reload costs a dictionary lookup; reloads with
+    `_HLS_msn`/`_HLS_part` and requests for the hinted part block until
+    that part exists.
+    """
+    
+    def __init__(self, segment_s: float = 2.0, part_s: float = 0.5, window: int = 6):
+        self.segment_s = segment_s
+        self.part_s = part_s
+        self.window = window
+        self.session = uuid.uuid4().hex[:8]  # keeps cached URIs from colliding across restarts
+        self.switcher = KeyframeSwitcher(self._enqueue, 'hls')
+        self.muxer = TsMuxer()
+        
+        self.segments = deque()  # closed segments, oldest first
+        self.open = None
+        self.target_duration = max(1, math.ceil(segment_s))
+        self.discontinuity_sequence = 0
+        self.playlist = None
+        self.queued_bytes = 0
+        self.requests = {'playlist': 0, 'blocking': 0, 'media': 0, 'timeouts': 0}
+        
+        self._part = bytearray()
+        self._part_start_ts = None
+        self._part_independent = False
+        self._last_video_ts = None
+        self._frame_ms = 0
+        self._configs = {}
+        self._config_changed = False
+        self._cond = threading.Condition()
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+    
+    def _enqueue(self, tag: FlvTag):
+        """Runs on the encoder's reader thread; muxing happens on the worker"""
+        self.queued_bytes += len(tag.data)
+        self._queue.put(tag)
+    
+    def _run(self):
+        while True:
+            tag = self._queue.get()
+            if tag is None:
+                break
+            try:
+                self._ingest(tag)
+            except Exception as e:
+                logger.error(f"❌ LL-HLS mux error: {e}")
+            self.queued_bytes -= len(tag.data)
+    
+    def _ingest(self, tag: FlvTag):
+        if tag.tag_type == TAG_SCRIPT:
+            return
+        if tag.is_config:
+            previous = self._configs.get(tag.tag_type)
+            if previous is not None and previous.data != tag.data:
+                self._config_changed = True
+            self._configs[tag.tag_type] = tag
+            self.muxer.set_config(tag)
+            return
+        
+        if tag.is_video:
+            timestamp = tag.timestamp
+            if self._last_video_ts is not None and timestamp > self._last_video_ts:
+                self._frame_ms = timestamp - self._last_video_ts
+            self._last_video_ts = timestamp
+            
+            if tag.is_keyframe and (self.open is None or self._config_changed
+                                    or timestamp - self.open.start_ts >= self.segment_s * 1000):
+                self._open_segment(timestamp)
+            elif self.open is not None and timestamp + self._frame_ms - self._part_start_ts > self.part_s * 1000:
+                with self._cond:
+                    self._close_part(timestamp)
+                    self._publish()
+                self._start_part(timestamp, tag.is_keyframe)
+        
+        if self.open is not None:
+            self._part += self.muxer.mux(tag)
+    
+    def _start_part(self, timestamp: int, independent: bool):
+        self._part = bytearray(self.muxer.psi())
+        self._part_start_ts = timestamp
+        self._part_independent = independent
+    
+    def _close_part(self, timestamp: int):
+        """Add the part being written, ending at `timestamp`, to the open segment"""
+        segment = self.open
+        part = HlsPart(bytes(self._part), (timestamp - self._part_start_ts) / 1000.0, self._part_independent)
+        index = len(segment.parts)
+        segment.parts.append(part)
+        segment.part_lines.append(f'#EXT-X-PART:DURATION={part.duration:.3f},URI="{self._uri(segment.msn, index)}"'
+                                  + (',INDEPENDENT=YES' if part.independent else ''))
+        segment.duration += part.duration
+    
+    def _publish(self):
+        """Rebuild the playlist and wake blocked requests (caller holds the lock)"""
+        self._build_playlist()
+        self._cond.notify_all()
+    
+    def _open_segment(self, timestamp: int):
+        discontinuity = self._config_changed and self.open is not None
+        self._config_changed = False
+        with self._cond:
+            if self.open is not None:
+                self._close_part(timestamp)
+                self._close_segment()
+            msn = self.segments[-1].msn + 1 if self.segments else 0
+            self.open = HlsSegment(msn, timestamp, discontinuity)
+            self._publish()
+        self._start_part(timestamp, True)
+    
+    def _close_segment(self):
+        segment = self.open
+        segment.data = b''.join(part.data for part in segment.parts)
+        self.target_duration = max(self.target_duration, math.ceil(segment.duration - 0.001))
+        prefix = '#EXT-X-DISCONTINUITY\n' if segment.discontinuity else ''
+        extinf = f'#EXTINF:{segment.duration:.3f},\n{self._uri(segment.msn)}\n'
+        segment.short_block = prefix + extinf
+        segment.block = prefix + ''.join(line + '\n' for line in segment.part_lines) + extinf
+        
+        self.segments.append(segment)
+        # Two segments beyond the playlist window stay fetchable for clients mid-download
+        while len(self.segments) > self.window + 2:
+            if self.segments.popleft().discontinuity:
+                self.discontinuity_sequence += 1
+    
+    def _uri(self, msn: int, part: Optional[int] = None) -> str:
+        if part is None:
+            return f'{self.session}_{msn}.ts'
+        return f'{self.session}_{msn}.{part}.ts'
+    
+    def _build_playlist(self):
+        """Join the cached segment blocks; only the open segment's lines are new"""
+        listed = list(self.segments)[-self.window:]
+        dropped = [segment for segment in list(self.segments)[:-self.window] if segment.discontinuity]
+        open_segment = self.open
+        
+        # Parts are listed for segments within three target durations of the live edge
+        blocks = []
+        age = open_segment.duration
+        for segment in reversed(listed):
+            blocks.append(segment.block if age < 3 * self.target_duration else segment.short_block)
+            age += segment.duration
+        blocks.reverse()
+        
+        first_msn = listed[0].msn if listed else open_segment.msn
+        lines = [
+            '#EXTM3U',
+            '#EXT-X-VERSION:6',
+            f'#EXT-X-TARGETDURATION:{self.target_duration}',
+            f'#EXT-X-SERVER-CONTROL:CAN-BLOCK-RELOAD=YES,PART-HOLD-BACK={3 * self.part_s:.3f}',
+            f'#EXT-X-PART-INF:PART-TARGET={self.part_s:.3f}',
+            f'#EXT-X-MEDIA-SEQUENCE:{first_msn}',
+            f'#EXT-X-DISCONTINUITY-SEQUENCE:{self.discontinuity_sequence + len(dropped)}',
+            '#EXT-X-INDEPENDENT-SEGMENTS',
+            ''.join(blocks)
+            + ('#EXT-X-DISCONTINUITY\n' if open_segment.discontinuity else '')
+            + ''.join(line + '\n' for line in open_segment.part_lines)
+            + f'#EXT-X-PRELOAD-HINT:TYPE=PART,URI="{self._uri(open_segment.msn, len(open_segment.parts))}"\n'
+        ]
+        self.playlist = '\n'.join(lines)
+    
+    def _has_part(self, msn: int, part: Optional[int]) -> bool:
+        """Whether the playlist already lists segment `msn` (or its part `part`)"""
+        open_segment = self.open
+        if open_segment is None:
+            return False
+        if msn < open_segment.msn:
+            return True
+        return msn == open_segment.msn and part is not None and part < len(open_segment.parts)
+    
+    def get_playlist(self, msn: Optional[int] = None, part: Optional[int] = None,
+                     timeout: Optional[float] = None) -> Tuple[int, Optional[str]]:
+        """Status and playlist text; with `msn` this is a blocking reload"""
+        self.requests['playlist'] += 1
+        if msn is None:
+            if part is not None:
+                return 400, None
+            return (200, self.playlist) if self.playlist else (404, None)
+        
+        self.requests['blocking'] += 1
+        timeout = 3 * self.target_duration if timeout is None else timeout
+        with self._cond:
+            if self.open is not None and msn > self.open.msn + 1:
+                return 400, None
+            if not self._cond.wait_for(lambda: self._has_part(msn, part), timeout):
+                self.requests['timeouts'] += 1
+                return 503, None
+            return 200, self.playlist
+    
+    def get_media(self, name: str, timeout: Optional[float] = None) -> Optional[bytes]:
+        """A segment or part by URI; the part named in the preload hint is awaited"""
+        self.requests['media'] += 1
+        session, _, sequence = name.rpartition('.ts')[0].partition('_')
+        if session != self.session or not sequence:
+            return None
+        msn_text, _, part_text = sequence.partition('.')
+        try:
+            msn = int(msn_text)
+            part = int(part_text) if part_text else None
+        except ValueError:
+            return None
+        
+        timeout = 3 * self.part_s if timeout is None else timeout
+        with self._cond:
+            open_segment = self.open
+            if (part is not None and open_segment is not None and msn == open_segment.msn
+                    and part == len(open_segment.parts)):
+                if not self._cond.wait_for(lambda: self._has_part(msn, part), timeout):
+                    self.requests['timeouts'] += 1
+                    return None
+                open_segment = self.open
+            
+            if open_segment is not None and msn == open_segment.msn:
+                return open_segment.parts[part].data if part is not None and part < len(open_segment.parts) else None
+            for segment in self.segments:
+                if segment.msn == msn:
+                    if part is None:
+                        return segment.data
+                    return segment.parts[part].data if part < len(segment.parts) else None
+        return None
+    
+    def respond(self, filename: str, args: Dict[str, str]) -> Tuple[int, Dict[str, str], bytes]:
+        """HTTP status, headers and body for a request under the origin's path"""
+        headers = {'Access-Control-Allow-Origin': '*'}
+        if filename == PLAYLIST_NAME:
+            try:
+                msn = int(args['_HLS_msn']) if '_HLS_msn' in args else None
+                part = int(args['_HLS_part']) if '_HLS_part' in args else None
+            except ValueError:
+                return 400, headers, b''
+            status, playlist = self.get_playlist(msn, part)
+            if status != 200:
+                return status, headers, b''
+            headers['Content-Type'] = 'application/vnd.apple.mpegurl'
+            # A blocking reload URL names one playlist version, so edges may cache it
+            headers['Cache-Control'] = f'public, max-age={6 * self.target_duration}' if msn is not None else 'no-cache'
+            return 200, headers, playlist.encode()
+        
+        if filename.endswith('.ts'):
+            data = self.get_media(filename)
+            if data is not None:
+                headers['Content-Type'] = 'video/mp2t'
+                headers['Cache-Control'] = 'public, max-age=3600, immutable'
+                return 200, headers, data
+        return 404, headers, b''
+    
+    def stop(self, timeout: float = 5.0):
+        """Stop taking packets and drain the worker"""
+        self.switcher.detach()
+        self._queue.put(None)
+        self._worker.join(timeout=timeout)
+        with self._cond:
+            self._cond.notify_all()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        segments = list(self.segments)
+        open_segment = self.open
+        return {
+            'playlist': PLAYLIST_NAME,
+            'session': self.session,
+            'segment_s': self.segment_s,
+            'part_s': self.part_s,
+            'target_duration': self.target_duration,
+            'media_sequence': segments[0].msn if segments else None,
+            'live_msn': open_segment.msn if open_segment else None,
+            'live_part': len(open_segment.parts) if open_segment else None,
+            'segments': len(segments),
+            'buffered_bytes': sum(len(segment.data) for segment in segments),
+            'queued_bytes': self.queued_bytes,
+            'requests': dict(self.requests),
+            'source': self.switcher.get_stats()['bus']
+        }
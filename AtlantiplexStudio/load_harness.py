@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+"""
+🌊 MATRIX BROADCAST STUDIO - LOAD HARNESS
+Multi-destination load test against local RTMP sinks
+Features: ffmpeg listen-mode RTMP sink, synthetic program source, 1..N destination runs,
+delivered frames, end-to-end latency, CPU per output, dropped frames, diffable JSON results
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+import threading
+import subprocess
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Any
+
+import numpy as np
+
+from broadcast_engine import BroadcastEngine, StreamQuality
+from capacity_planner import host_signature
+from packet_bus import FlvReader
+
+logger = logging.getLogger(__name__)
+
+class RtmpSink:
+    """Stand-in for a platform ingest: ffmpeg accepts one RTMP publish and hands the packets back as FLV.
+    
+    Each picture's arrival is recorded against the engine's media clock
+    together with its PTS, so latency can be measured end to end once the
+    relay's timestamp base is known.
+    """
+    
+    def __init__(self, port: int, clock_ms: Callable[[], float], app: str = 'live', key: str = 'loadtest'):
+        self.port = port
+        self.clock_ms = clock_ms
+        self.rtmp_url = f"rtmp://127.0.0.1:{port}/{app}"
+        self.key = key
+        self.process = None
+        self.arrivals = []  # (arrival media ms, PTS ms) per picture
+        self.keyframes = 0
+        self.audio_frames = 0
+        self.bytes = 0
+        self._lock = threading.Lock()
+        self._thread = None
+    
+    def _build_command(self) -> List[str]:
+        return [
+            'ffmpeg',
+            '-hide_banner', '-loglevel', 'error', '-nostdin',
+            '-listen', '1',
+            '-f', 'flv',
+            '-i', f"{self.rtmp_url}/{self.key}",
+            '-c', 'copy',
+            '-f', 'flv',
+            'pipe:1'
+        ]
+    
+    def start(self):
+        self.process = subprocess.Popen(self._build_command(), stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        self._thread = threading.Thread(target=self._read_loop, daemon=True)
+        self._thread.start()
+    
+    def _read_loop(self):
+        reader = FlvReader()
+        stdout = self.process.stdout
+        try:
+            while True:
+                chunk = stdout.read1(65536)
+                if not chunk:
+                    break
+                now = self.clock_ms()
+                with self._lock:
+                    self.bytes += len(chunk)
+                    for tag in reader.feed(chunk):
+                        if tag.is_config:
+                            continue
+                        if tag.is_video and len(tag.data) >= 5:
+                            cts = int.from_bytes(tag.data[2:5], 'big', signed=True)
+                            self.arrivals.append((now, tag.timestamp + cts))
+                            self.keyframes += tag.is_keyframe
+                        elif tag.is_audio:
+                            self.audio_frames += 1
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ Sink on port {self.port} stopped reading: {e}")
+    
+    def window(self, since_ms: float, until_ms: float, base_ts: Optional[int]) -> Dict[str, Any]:
+        """Pictures that arrived between two media-clock times, and their latency"""
+        with self._lock:
+            arrivals = [(at, pts) for at, pts in self.arrivals if since_ms <= at < until_ms]
+        stats = {'frames': len(arrivals), 'latency_ms': None}
+        if arrivals and base_ts is not None:
+            # The relay rebases its timestamps to zero at `base_ts` on the media clock
+            latency = np.array([at - (pts + base_ts) for at, pts in arrivals])
+            stats['latency_ms'] = {
+                'p50': round(float(np.percentile(latency, 50)), 1),
+                'p95': round(float(np.percentile(latency, 95)), 1),
+                'max': round(float(latency.max()), 1)
+            }
+        return stats
+    
+    def stop(self):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        if self._thread:
+            self._thread.join(timeout=2)
+
+class SyntheticSource:
+    """A moving test pattern with noise, so encoders do real work, published at the program frame rate"""
+    
+    def __init__(self, engine: BroadcastEngine, width: int, height: int, fps: int, source_id: str = 'loadtest'):
+        self.engine = engine
+        self.source_id = source_id
+        self.fps = fps
+        self.running = False
+        
+        # One second of frames, generated up front so the source itself costs next to nothing
+        rng = np.random.default_rng(7)
+        x = np.linspace(0, 255, width, dtype=np.float32)
+        base = np.broadcast_to(x, (height, width))
+        self.frames = []
+        for i in range(fps):
+            frame = np.empty((height, width, 3), dtype=np.uint8)
+            frame[..., 0] = base
+            frame[..., 1] = np.roll(base, i * width // fps, axis=1)
+            frame[..., 2] = rng.integers(0, 64, (height, width), dtype=np.uint8)
+            bar = (i * height // fps) % max(1, height - height // 8)
+            frame[bar:bar + height // 8] = 255
+            self.frames.append(frame)
+        self._thread = None
+    
+    def start(self):
+        compositor = self.engine.video_compositor
+        compositor.add_source(self.source_id, {'size': {'width': compositor.width, 'height': compositor.height}})
+        self.running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+    
+    def _run(self):
+        interval = 1.0 / self.fps
+        index = 0
+        next_at = time.monotonic()
+        while self.running:
+            self.engine.update_frame_source(self.source_id, self.frames[index % len(self.frames)])
+            index += 1
+            next_at += interval
+            time.sleep(max(0.0, next_at - time.monotonic()))
+    
+    def stop(self):
+        self.running = False
+        if self._thread:
+            self._thread.join(timeout=2)
+
+class LoadTest:
+    """Streams a synthetic program to 1..N local sinks and measures each run.
+    
+    Destinations cycle through `qualities`, so with one quality they share
+    a single encoder and only add relays; with several, each quality adds
+    an encoder. Admission control stays on unless `admission` is False, so
+    a run past the host's budget shows what users would get.
+    """
+    
+    def __init__(self, quality: str = '720p', qualities: Optional[List[str]] = None, duration: float = 20.0,
+                 warmup: float = 5.0, base_port: int = 19350, admission: bool = True):
+        self.quality = quality
+        self.qualities = qualities or [quality]
+        self.duration = duration
+        self.warmup = warmup
+        self.base_port = base_port
+        self.admission = admission
+    
+    def run(self, counts: List[int]) -> Dict[str, Any]:
+        results = {
+            'release': release_label(),
+            'host': host_signature(),
+            'started_at': datetime.now().isoformat(),
+            'config': {
+                'quality': self.quality,
+                'qualities': self.qualities,
+                'duration_s': self.duration,
+                'warmup_s': self.warmup,
+                'admission': self.admission
+            },
+            'runs': []
+        }
+        for count in counts:
+            logger.info(f"🧪 Load test: {count} destination(s)")
+            results['runs'].append(self.run_once(count))
+        return results
+    
+    def _make_engine(self, directory: str) -> BroadcastEngine:
+        engine = BroadcastEngine()
+        engine.restart_history_path = os.path.join(directory, 'restart_history.json')
+        engine.recording_config = {'enabled': False}
+        if not self.admission:
+            engine.planner.budget = float('inf')
+        engine.initialize_streaming(self.quality)
+        return engine
+    
+    def run_once(self, count: int) -> Dict[str, Any]:
+        """One run: start `count` sinks and destinations, warm up, then measure for `duration`"""
+        directory = tempfile.mkdtemp(prefix='loadtest_')
+        engine = self._make_engine(directory)
+        clock_ms = lambda: engine.clock.now() * 1000
+        compositor = engine.video_compositor
+        source = SyntheticSource(engine, compositor.width, compositor.height, compositor.fps)
+        sinks = {f'load{i + 1}': RtmpSink(self.base_port + i, clock_ms) for i in range(count)}
+        run = {'destinations': count, 'admitted': 0, 'errors': {}}
+        
+        try:
+            source.start()
+            for sink in sinks.values():
+                sink.start()
+            time.sleep(1.0)  # ffmpeg needs a moment before it accepts the publish
+            
+            for index, (platform, sink) in enumerate(sinks.items()):
+                engine.stream_quality = self.qualities[index % len(self.qualities)]
+                result = engine.start_platform_stream(platform, {
+                    'rtmp_url': sink.rtmp_url,
+                    'stream_key': sink.key,
+                    'adaptive_bitrate': False
+                })
+                if result.get('success'):
+                    run['admitted'] += 1
+                else:
+                    run['errors'][platform] = result.get('error')
+            
+            time.sleep(self.warmup)
+            before = self._engine_counters(engine)
+            engine.get_process_stats()  # start the CPU accounting window
+            since = clock_ms()
+            time.sleep(self.duration)
+            until = clock_ms()
+            processes = engine.get_process_stats()
+            after = self._engine_counters(engine)
+            
+            run.update(self._summarize(engine, sinks, processes, before, after, since, until))
+        finally:
+            source.stop()
+            engine.stop_all_streams()
+            for sink in sinks.values():
+                sink.stop()
+            shutil.rmtree(directory, ignore_errors=True)
+        return run
+    
+    def _engine_counters(self, engine: BroadcastEngine) -> Dict[str, Dict[str, int]]:
+        """Per-encoder frames shed by the input queue or dropped by the timeline"""
+        counters = {}
+        for key, feeder in list(engine.feeders.items()):
+            stats = feeder.get_stats()
+            counters[key] = {
+                'queue_dropped': stats['queue']['video']['dropped'],
+                'timeline_dropped': stats['video']['dropped_frames']
+            }
+        return counters
+    
+    def _summarize(self, engine: BroadcastEngine, sinks: Dict[str, RtmpSink], processes: Dict[str, Any],
+                   before: Dict[str, Dict[str, int]], after: Dict[str, Dict[str, int]],
+                   since: float, until: float) -> Dict[str, Any]:
+        seconds = (until - since) / 1000
+        outputs = {}
+        for platform, sink in sinks.items():
+            stream = engine.active_streams.get(platform)
+            if not stream:
+                continue
+            encoder_key = stream['encoder']
+            fps = StreamQuality.get_quality(stream['quality'])['fps']
+            window = sink.window(since, until, stream['output']._base_ts)
+            expected = int(round(seconds * fps))
+            relay = processes['relays'].get(platform) or {}
+            outputs[platform] = {
+                'quality': stream['quality'],
+                'encoder': encoder_key,
+                'frames': window['frames'],
+                'expected_frames': expected,
+                'fps': round(window['frames'] / seconds, 2) if seconds else None,
+                'dropped_frames': max(0, expected - window['frames']),
+                'latency_ms': window['latency_ms'],
+                'relay_cpu_percent': relay.get('cpu_percent')
+            }
+        
+        encoders = {}
+        for key, stats in processes['encoders'].items():
+            counters = {name: after.get(key, {}).get(name, 0) - before.get(key, {}).get(name, 0)
+                        for name in ('queue_dropped', 'timeline_dropped')}
+            encoders[key] = dict(counters, cpu_percent=(stats or {}).get('cpu_percent'))
+        
+        cpu = [value for value in (
+            [output['relay_cpu_percent'] for output in outputs.values()]
+            + [encoder['cpu_percent'] for encoder in encoders.values()]
+            + [(processes['studio'] or {}).get('cpu_percent')]
+        ) if value is not None]
+        return {
+            'measured_s': round(seconds, 2),
+            'outputs': outputs,
+            'encoders': encoders,
+            'studio_cpu_percent': (processes['studio'] or {}).get('cpu_percent'),
+            'media_thread_cpu_percent': (processes['threads'].get('media') or {}).get('cpu_percent'),
+            'totals': {
+                'frames': sum(output['frames'] for output in outputs.values()),
+                'dropped_frames': sum(output['dropped_frames'] for output in outputs.values()),
+                'cpu_percent': round(sum(cpu), 1),
+                'cpu_percent_per_output': round(sum(cpu) / len(outputs), 1) if outputs else None
+            }
+        }
+
+def release_label() -> Optional[str]:
+    """`git describe` of the checkout, so results can be matched to a release"""
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def compare(previous: Dict[str, Any], current: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Per destination count, the change in delivery, latency and CPU between two result files"""
+    def metrics(run):
+        outputs = list(run.get('outputs', {}).values())
+        p95 = [output['latency_ms']['p95'] for output in outputs if output.get('latency_ms')]
+        return {
+            'fps': round(sum(output['fps'] or 0 for output in outputs) / len(outputs), 2) if outputs else None,
+            'dropped_frames': run.get('totals', {}).get('dropped_frames'),
+            'latency_p95_ms': max(p95) if p95 else None,
+            'cpu_percent': run.get('totals', {}).get('cpu_percent')
+        }
+    
+    earlier = {run['destinations']: metrics(run) for run in previous.get('runs', [])}
+    rows = []
+    for run in current.get('runs', []):
+        now, then = metrics(run), earlier.get(run['destinations'])
+        row = {'destinations': run['destinations']}
+        for name, value in now.items():
+            old = then.get(name) if then else None
+            row[name] = {'previous': old, 'current': value,
+                         'delta': round(value - old, 2) if value is not None and old is not None else None}
+        rows.append(row)
+    return rows
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Stream to local RTMP sinks and measure each destination count')
+    parser.add_argument('--destinations', default='1,2,4', help='comma-separated destination counts')
+    parser.add_argument('--quality', default='720p')
+    parser.add_argument('--qualities', help='comma-separated qualities to cycle across destinations')
+    parser.add_argument('--duration', type=float, default=20.0, help='measured seconds per run')
+    parser.add_argument('--warmup', type=float, default=5.0)
+    parser.add_argument('--base-port', type=int, default=19350)
+    parser.add_argument('--no-admission', action='store_true', help='measure past the CPU budget')
+    parser.add_argument('--output', help='results file (default data/loadtest/loadtest_<time>.json)')
+    parser.add_argument('--compare', help='previous results file to diff against')
+    args = parser.parse_args(argv)
+    
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    test = LoadTest(
+        quality=args.quality,
+        qualities=args.qualities.split(',') if args.qualities else None,
+        duration=args.duration,
+        warmup=args.warmup,
+        base_port=args.base_port,
+        admission=not args.no_admission
+    )
+    results = test.run([int(count) for count in args.destinations.split(',')])
+    
+    output = args.output or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'loadtest',
+                                         f"loadtest_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    logger.info(f"💾 Results written to {output}")
+    
+    if args.compare:
+        with open(args.compare) as f:
+            results_then = json.load(f)
+        for row in compare(results_then, results):
+            changes = ', '.join(f"{name} {values['previous']} → {values['current']}"
+                                for name, values in row.items() if name != 'destinations')
+            print(f"{row['destinations']} destination(s): {changes}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
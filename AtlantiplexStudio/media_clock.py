@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+🌊 MATRIX BROADCAST STUDIO - MEDIA CLOCK
+Shared A/V timebase for the compositor, audio mixer and encoder feeders
+Features: monotonic master clock, PTS stamping, drift metrics, frame dup/drop and resampling correction
+"""
+
+import time
+import threading
+from typing import Dict, Any
+
+import numpy as np
+
+class MediaClock:
+    """Monotonic master clock; PTS values are seconds since start"""
+    
+    def __init__(self):
+        self._origin = None
+        self._lock = threading.Lock()
+    
+    def start(self):
+        """Start the clock (no-op when already running)"""
+        with self._lock:
+            if self._origin is None:
+                self._origin = time.monotonic()
+    
+    def stop(self):
+        """Stop the clock; the next start begins again at zero"""
+        with self._lock:
+            self._origin = None
+    
+    @property
+    def running(self) -> bool:
+        return self._origin is not None
+    
+    def now(self) -> float:
+        """Current media time in seconds"""
+        origin = self._origin
+        if origin is None:
+            return 0.0
+        return time.monotonic() - origin
+
+def stretch_block(block: np.ndarray, frames: int) -> np.ndarray:
+    """Linearly resample a block to `frames` samples, keeping both endpoints"""
+    if frames <= 0:
+        return block[:0]
+    if frames == len(block):
+        return block
+    if len(block) < 2:
+        return np.repeat(block[:1], frames, axis=0)
+    
+    positions = np.linspace(0.0, len(block) - 1, frames)
+    index = np.minimum(positions.astype(np.int64), len(block) - 2)
+    fraction = (positions - index)[:, None]
+    source = block.astype(np.float32)
+    stretched = source[index] * (1.0 - fraction) + source[index + 1] * fraction
+    if block.dtype == np.int16:
+        return np.clip(np.rint(stretched), -32768, 32767).astype(np.int16)
+    return stretched.astype(block.dtype)
+
+class VideoTimeline:
+    """Maps stamped frames onto a constant-rate encoder input.
+    
+    Raw video carries no timestamps, so a frame's PTS is expressed by the
+    slot it lands in: late frames are repeated to fill skipped slots, frames
+    for an already-written slot are dropped.
+    """
+    
+    def __init__(self, fps: int, origin_pts: float = 0.0):
+        self.fps = fps
+        self.origin_pts = origin_pts
+        self.next_slot = 0
+        self.duplicated = 0
+        self.dropped = 0
+        self.drift = 0.0
+        self.max_drift = 0.0
+    
+    @property
+    def position(self) -> float:
+        """Seconds of video written to the encoder"""
+        return self.next_slot / self.fps
+    
+    def place(self, pts: float) -> int:
+        """Number of times to write the frame stamped `pts` (0 drops it)"""
+        media_time = pts - self.origin_pts
+        self.drift = media_time - self.position
+        self.max_drift = max(self.max_drift, abs(self.drift))
+        
+        slot = int(round(media_time * self.fps))
+        if slot < self.next_slot:
+            self.dropped += 1
+            return 0
+        
+        copies = slot - self.next_slot + 1
+        self.duplicated += copies - 1
+        self.next_slot = slot + 1
+        return copies
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'position_s': round(self.position, 3),
+            'drift_ms': round(self.drift * 1000, 2),
+            'max_drift_ms': round(self.max_drift * 1000, 2),
+            'duplicated_frames': self.duplicated,
+            'dropped_frames': self.dropped
+        }
+
+class AudioTimeline:
+    """Keeps the sample count written to an encoder aligned with block PTS.
+    
+    Small drift is removed by stretching or squeezing blocks (at most
+    `max_correction`, inaudible); gaps beyond `resync_threshold` are filled
+    with silence or skipped outright.
+    """
+    
+    def __init__(self, sample_rate: int, channels: int, origin_pts: float = 0.0,
+                 max_correction: float = 0.005, deadband: float = 0.002,
+                 gain: float = 0.5, resync_threshold: float = 0.25):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.origin_pts = origin_pts
+        self.max_correction = max_correction
+        self.deadband = deadband
+        self.gain = gain
+        self.resync_threshold = resync_threshold
+        
+        self.samples_written = 0
+        self.correction = 0.0
+        self._fraction = 0.0
+        self.drift = 0.0
+        self.max_drift = 0.0
+        self.resyncs = 0
+        self.skipped_samples = 0
+        self.padded_samples = 0
+    
+    @property
+    def position(self) -> float:
+        """Seconds of audio written to the encoder"""
+        return self.samples_written / self.sample_rate
+    
+    def place(self, block: np.ndarray, pts: float) -> np.ndarray:
+        """Return the samples to write for the block stamped `pts`"""
+        media_time = pts - self.origin_pts
+        self.drift = media_time - self.position  # > 0: encoder audio is behind the clock
+        self.max_drift = max(self.max_drift, abs(self.drift))
+        
+        if self.drift < -self.resync_threshold:
+            self.resyncs += 1
+            self.skipped_samples += len(block)
+            return block[:0]
+        
+        if self.drift > self.resync_threshold:
+            self.resyncs += 1
+            padding = int(round(self.drift * self.sample_rate))
+            self.padded_samples += padding
+            output = np.concatenate((np.zeros((padding,) + block.shape[1:], dtype=block.dtype), block))
+            self.samples_written += len(output)
+            return output
+        
+        if abs(self.drift) > self.deadband:
+            self.correction = float(np.clip(self.drift * self.gain, -self.max_correction, self.max_correction))
+        else:
+            self.correction = 0.0
+        
+        target = len(block) * (1.0 + self.correction) + self._fraction
+        frames = int(target)
+        self._fraction = target - frames
+        output = block if frames == len(block) else stretch_block(block, frames)
+        
+        self.samples_written += len(output)
+        return output
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'position_s': round(self.position, 3),
+            'drift_ms': round(self.drift * 1000, 2),
+            'max_drift_ms': round(self.max_drift * 1000, 2),
+            'correction_ppm': int(round(self.correction * 1e6)),
+            'resyncs': self.resyncs,
+            'padded_samples': self.padded_samples,
+            'skipped_samples': self.skipped_samples
+        }
+
+def av_offset(video: VideoTimeline, audio: AudioTimeline) -> float:
+    """How far encoder audio leads encoder video relative to their PTS, in seconds"""
+    return video.drift - audio.drift
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+🌊 MATRIX BROADCAST STUDIO - PACKET BUS
+Distribution of encoded FLV packets from shared encoders to outputs
+Features: incremental FLV demuxing, late-join sequence headers, keyframe-aligned source switching
+"""
+
+import time
+import threading
+from collections import deque
+from typing import Callable, Dict, List, Optional, Any
+
+TAG_AUDIO = 8
+TAG_VIDEO = 9
+TAG_SCRIPT = 18
+
+# Signature, version, audio+video flags, header size, then PreviousTagSize0
+FLV_HEADER = b'FLV\x01\x05\x00\x00\x00\x09' + b'\x00\x00\x00\x00'
+
+class FlvTag:
+    """One FLV tag; `timestamp` is the decode time in milliseconds"""
+    
+    __slots__ = ('tag_type', 'timestamp', 'data')
+    
+    def __init__(self, tag_type: int, timestamp: int, data: bytes):
+        self.tag_type = tag_type
+        self.timestamp = timestamp
+        self.data = data
+    
+    @property
+    def is_video(self) -> bool:
+        return self.tag_type == TAG_VIDEO
+    
+    @property
+    def is_audio(self) -> bool:
+        return self.tag_type == TAG_AUDIO
+    
+    @property
+    def is_keyframe(self) -> bool:
+        """Video key frame carrying picture data (not a sequence header)"""
+        return (self.tag_type == TAG_VIDEO and len(self.data) > 1
+                and self.data[0] >> 4 == 1 and not self.is_config)
+    
+    @property
+    def is_config(self) -> bool:
+        """AVC or AAC sequence header"""
+        if len(self.data) < 2:
+            return False
+        if self.tag_type == TAG_VIDEO:
+            return self.data[0] & 0x0F == 7 and self.data[1] == 0
+        if self.tag_type == TAG_AUDIO:
+            return self.data[0] >> 4 == 10 and self.data[1] == 0
+        return False
+    
+    def with_timestamp(self, timestamp: int) -> 'FlvTag':
+        return FlvTag(self.tag_type, timestamp, self.data)
+    
+    def to_bytes(self, timestamp: Optional[int] = None) -> bytes:
+        """Serialize the tag and its trailing PreviousTagSize"""
+        timestamp = (self.timestamp if timestamp is None else timestamp) & 0xFFFFFFFF
+        size = len(self.data)
+        header = (bytes((self.tag_type,)) + size.to_bytes(3, 'big')
+                  + (timestamp & 0xFFFFFF).to_bytes(3, 'big') + bytes((timestamp >> 24,))
+                  + b'\x00\x00\x00')
+        return header + self.data + (11 + size).to_bytes(4, 'big')
+
+class FlvReader:
+    """Incremental FLV demuxer: feed raw bytes, get complete tags back"""
+    
+    def __init__(self):
+        self._buffer = bytearray()
+        self._header_done = False
+    
+    def feed(self, data: bytes) -> List[FlvTag]:
+        buffer = self._buffer
+        buffer += data
+        
+        if not self._header_done:
+            if len(buffer) < 13:
+                return []
+            if buffer[:3] != b'FLV':
+                raise ValueError('Not an FLV stream')
+            del buffer[:int.from_bytes(buffer[5:9], 'big') + 4]
+            self._header_done = True
+        
+        tags = []
+        position = 0
+        while len(buffer) - position >= 11:
+            size = int.from_bytes(buffer[position + 1:position + 4], 'big')
+            end = position + 11 + size + 4
+            if len(buffer) < end:
+                break
+            timestamp = int.from_bytes(buffer[position + 4:position + 7], 'big') | buffer[position + 7] << 24
+            tags.append(FlvTag(buffer[position] & 0x1F, timestamp, bytes(buffer[position + 11:position + 11 + size])))
+            position = end
+        
+        del buffer[:position]
+        return tags
+
+class PacketBus:
+    """Fans one encoder's tags out to subscribers.
+    
+    Sequence headers and metadata are remembered so a subscriber joining
+    mid-stream can be primed before its first keyframe. Callbacks run on
+    the publishing thread and must not block.
+    """
+    
+    def __init__(self, name: str):
+        self.name = name
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self.metadata = None
+        self.video_config = None
+        self.audio_config = None
+        self.packets = 0
+        self.bytes = 0
+        self.keyframes = 0
+        self.last_keyframe_ts = None
+        self.gop_ms = None
+        self.frame_ms = None
+        self._last_video_ts = None
+    
+    def subscribe(self, callback: Callable[['PacketBus', FlvTag], None]):
+        with self._lock:
+            if callback not in self._subscribers:
+                self._subscribers = self._subscribers + [callback]
+    
+    def unsubscribe(self, callback: Callable[['PacketBus', FlvTag], None]):
+        with self._lock:
+            self._subscribers = [c for c in self._subscribers if c != callback]
+    
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+    
+    def publish(self, tag: FlvTag):
+        """Record stream state from the tag and hand it to every subscriber"""
+        if tag.tag_type == TAG_SCRIPT:
+            self.metadata = tag
+        elif tag.is_config:
+            if tag.is_video:
+                self.video_config = tag
+            else:
+                self.audio_config = tag
+        elif tag.is_video:
+            if self._last_video_ts is not None and tag.timestamp > self._last_video_ts:
+                self.frame_ms = tag.timestamp - self._last_video_ts
+            self._last_video_ts = tag.timestamp
+            if tag.is_keyframe:
+                if self.last_keyframe_ts is not None:
+                    self.gop_ms = tag.timestamp - self.last_keyframe_ts
+                self.last_keyframe_ts = tag.timestamp
+                self.keyframes += 1
+        
+        self.packets += 1
+        self.bytes += len(tag.data)
+        for callback in self._subscribers:
+            callback(self, tag)
+    
+    def config_tags(self, timestamp: int) -> List[FlvTag]:
+        """Sequence headers re-stamped for a splice at `timestamp`"""
+        return [tag.with_timestamp(timestamp) for tag in (self.video_config, self.audio_config) if tag]
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'packets': self.packets,
+            'bytes': self.bytes,
+            'keyframes': self.keyframes,
+            'gop_ms': self.gop_ms,
+            'subscribers': self.subscriber_count
+        }
+
+class KeyframeSwitcher:
+    """Follows one bus at a time and only joins or changes buses on a keyframe.
+    
+    While a switch is pending the current bus keeps flowing; the first
+    keyframe on the new bus not earlier than the last forwarded frame is
+    preceded by that bus's sequence headers and becomes the splice point.
+    All buses share the media clock timeline, so no rebasing is needed.
+    """
+    
+    def __init__(self, output: Callable[[FlvTag], None], name: str = '',
+                 on_switch: Optional[Callable[[Optional[PacketBus], PacketBus, Dict[str, Any]], None]] = None):
+        self.output = output
+        self.name = name
+        self.on_switch = on_switch
+        self.bus = None
+        self.pending = None
+        self.last_video_ts = None
+        self.last_audio_ts = None
+        self.overlap_dropped = 0
+        self.switches = deque(maxlen=20)
+        self._requested_at = None
+        self._lock = threading.Lock()
+    
+    def switch_to(self, bus: PacketBus):
+        """Request a move to `bus` at its next keyframe"""
+        with self._lock:
+            previous_pending = self.pending
+            if bus is self.bus:
+                self.pending = None
+            else:
+                self.pending = bus
+                self._requested_at = time.monotonic()
+        
+        if previous_pending is not None and previous_pending is not bus:
+            previous_pending.unsubscribe(self._on_tag)
+        if bus is not self.bus:
+            bus.subscribe(self._on_tag)
+    
+    def detach(self):
+        """Stop following any bus"""
+        with self._lock:
+            buses = [b for b in (self.bus, self.pending) if b is not None]
+            self.bus = None
+            self.pending = None
+        for bus in buses:
+            bus.unsubscribe(self._on_tag)
+    
+    def _on_tag(self, bus: PacketBus, tag: FlvTag):
+        with self._lock:
+            if bus is self.pending:
+                if tag.is_keyframe and (self.last_video_ts is None or tag.timestamp >= self.last_video_ts):
+                    switched = self._splice(bus, tag)
+                else:
+                    return
+            elif bus is self.bus:
+                self._forward(tag)
+                return
+            else:
+                return
+        
+        old_bus, info = switched
+        if old_bus is not None:
+            old_bus.unsubscribe(self._on_tag)
+        if self.on_switch:
+            self.on_switch(old_bus, bus, info)
+    
+    def _splice(self, bus: PacketBus, keyframe: FlvTag):
+        """Make `bus` current, starting with its headers and this keyframe"""
+        old_bus = self.bus
+        # Encoders whose frame grids line up can share a timestamp; keep DTS strictly increasing
+        if self.last_video_ts is not None and keyframe.timestamp <= self.last_video_ts:
+            keyframe = keyframe.with_timestamp(self.last_video_ts + 1)
+        
+        info = {
+            'from': old_bus.name if old_bus else None,
+            'to': bus.name,
+            'at': keyframe.timestamp,
+            'wait_ms': round((time.monotonic() - self._requested_at) * 1000, 1),
+            # Spacing between the last old frame and the first new one; one frame interval is hitless
+            'gap_ms': keyframe.timestamp - self.last_video_ts if self.last_video_ts is not None else None
+        }
+        
+        if old_bus is None and bus.metadata is not None:
+            self.output(bus.metadata.with_timestamp(keyframe.timestamp))
+        for config in bus.config_tags(keyframe.timestamp):
+            self.output(config)
+        self.bus = bus
+        self.pending = None
+        self._forward(keyframe)
+        
+        self.switches.append(info)
+        return old_bus, info
+    
+    def _forward(self, tag: FlvTag):
+        if tag.is_config or tag.tag_type == TAG_SCRIPT:
+            self.output(tag)
+            return
+        
+        # Audio already covered by the previous bus is dropped after a splice
+        if tag.is_audio:
+            if self.last_audio_ts is not None and tag.timestamp <= self.last_audio_ts:
+                self.overlap_dropped += 1
+                return
+            self.last_audio_ts = tag.timestamp
+        elif tag.is_video:
+            self.last_video_ts = tag.timestamp
+        self.output(tag)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'bus': self.bus.name if self.bus else None,
+            'pending': self.pending.name if self.pending else None,
+            'overlap_dropped': self.overlap_dropped,
+            'switches': list(self.switches)[-5:]
+        }
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+🌊 MATRIX BROADCAST STUDIO - RENDER PLAN
+Compiled compositor layouts for program and preview scenes
+Features: z-sorted layers with precomputed geometry and transforms, pre-rendered static media
+(images, colors, video posters) decoded once per source, scene-to-canvas scaling, warm-up composes
+"""
+
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Any
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Scenes are laid out on a 1080p canvas and scaled to the compositor's resolution
+SCENE_CANVAS = (1920, 1080)
+
+class RenderLayer:
+    """One source placed on the canvas; `pixels` is set for static content rendered at compile time"""
+    
+    __slots__ = ('source_id', 'x', 'y', 'width', 'height', 'matrix', 'opacity', 'pixels')
+    
+    def __init__(self, source_id: str, x: int, y: int, width: int, height: int,
+                 rotation: float = 0, opacity: float = 1.0):
+        self.source_id = source_id
+        self.x, self.y = x, y
+        self.width, self.height = width, height
+        self.matrix = cv2.getRotationMatrix2D((width // 2, height // 2), rotation, 1.0) if rotation else None
+        self.opacity = opacity
+        self.pixels = None
+    
+    def render(self, frame: np.ndarray) -> np.ndarray:
+        """Scale, rotate and fade a source frame into the layer's box"""
+        size = (self.width, self.height)
+        if (frame.shape[1], frame.shape[0]) != size:
+            frame = cv2.resize(frame, size)
+        if self.matrix is not None:
+            frame = cv2.warpAffine(frame, self.matrix, size)
+        if self.opacity < 1.0:
+            frame = cv2.convertScaleAbs(frame, alpha=self.opacity)
+        return frame
+
+class RenderPlan:
+    """Everything per-frame composition needs, worked out once.
+    
+    Layers are sorted, placed and bounds-checked at compile time; static
+    sources are already scaled and transformed, so composing is a canvas
+    fill plus one copy per layer and a resize for each live source.
+    """
+    
+    def __init__(self, layers: List[RenderLayer], width: int, height: int):
+        self.layers = layers
+        self.width = width
+        self.height = height
+    
+    @classmethod
+    def compile(cls, sources: Dict[str, Dict[str, Any]], width: int, height: int) -> 'RenderPlan':
+        """Build a plan from compositor source configs (see VideoCompositor.add_source)"""
+        layers = []
+        for source_id, info in sorted(sources.items(), key=lambda item: item[1]['z_index']):
+            if not info['visible']:
+                continue
+            x, y = info['position']['x'], info['position']['y']
+            w, h = info['size']['width'], info['size']['height']
+            if w <= 0 or h <= 0 or x < 0 or y < 0 or x + w > width or y + h > height:
+                continue
+            layer = RenderLayer(source_id, x, y, w, h, info['rotation'], info['opacity'])
+            static = info['config'].get('static_frame')
+            if static is not None:
+                layer.pixels = layer.render(static)
+            layers.append(layer)
+        return cls(layers, width, height)
+    
+    def compose(self, frame_sources: Dict[str, np.ndarray]) -> np.ndarray:
+        canvas = np.zeros((self.height, self.width, 3), dtype=np.uint8)
+        for layer in self.layers:
+            pixels = layer.pixels
+            if pixels is None:
+                frame = frame_sources.get(layer.source_id)
+                if frame is None:
+                    continue
+                pixels = layer.render(frame)
+            canvas[layer.y:layer.y + layer.height, layer.x:layer.x + layer.width] = pixels
+        return canvas
+
+class PreviewSlot:
+    """A scene being compiled and warmed for the next take"""
+    
+    def __init__(self, scene_id: str):
+        self.scene_id = scene_id
+        self.sources = None
+        self.plan = None
+        self.error = None
+        self.compile_ms = None
+        self.warm_ms = None
+        self.ready = threading.Event()
+    
+    def prepare(self, sources: Dict[str, Dict[str, Any]], width: int, height: int,
+                frame_sources: Dict[str, np.ndarray]):
+        """Compile the plan and compose it once, so first use hits warm code paths and memory"""
+        try:
+            started = time.perf_counter()
+            plan = RenderPlan.compile(sources, width, height)
+            compiled = time.perf_counter()
+            plan.compose(frame_sources)
+            self.compile_ms = round((compiled - started) * 1000, 2)
+            self.warm_ms = round((time.perf_counter() - compiled) * 1000, 2)
+            self.sources, self.plan = sources, plan
+        except Exception as e:
+            self.error = str(e)
+            logger.error(f"❌ Could not prepare scene {self.scene_id}: {e}")
+        finally:
+            self.ready.set()
+    
+    def get_info(self) -> Dict[str, Any]:
+        return {
+            'scene_id': self.scene_id,
+            'ready': self.ready.is_set() and self.plan is not None,
+            'layers': len(self.plan.layers) if self.plan else None,
+            'compile_ms': self.compile_ms,
+            'warm_ms': self.warm_ms,
+            'error': self.error
+        }
+
+def _parse_color(value: str) -> tuple:
+    """'#rrggbb' to a BGR tuple; anything else is black"""
+    value = (value or '').lstrip('#')
+    if len(value) != 6:
+        return (0, 0, 0)
+    try:
+        red, green, blue = (int(value[i:i + 2], 16) for i in (0, 2, 4))
+    except ValueError:
+        return (0, 0, 0)
+    return (blue, green, red)
+
+def decode_static_frame(source) -> Optional[np.ndarray]:
+    """Pixels for sources that don't change: images, solid colors, and a video's first frame.
+    
+    Live sources (cameras, displays, guests) return None and are read from
+    the engine's frame sources every frame.
+    """
+    settings = source.settings or {}
+    if source.type == 'color':
+        frame = np.empty((source.height, source.width, 3), dtype=np.uint8)
+        frame[:] = _parse_color(settings.get('color'))
+        return frame
+    if source.type == 'image' and settings.get('image_path'):
+        frame = cv2.imread(settings['image_path'], cv2.IMREAD_COLOR)
+        if frame is None:
+            logger.warning(f"⚠️ Could not decode image for {source.name}: {settings['image_path']}")
+        return frame
+    if source.type == 'video' and settings.get('video_path'):
+        # Opening the container and decoding a frame is the slow part; do it before air
+        capture = cv2.VideoCapture(settings['video_path'])
+        try:
+            ok, frame = capture.read()
+        finally:
+            capture.release()
+        if not ok:
+            logger.warning(f"⚠️ Could not decode video for {source.name}: {settings['video_path']}")
+        return frame if ok else None
+    return None
+
+class StaticFrameCache:
+    """Decoded static media per source, kept across plan compiles.
+    
+    An entry is reused while the source's media (image or video path,
+    color and size) is unchanged, so recompiling an edited scene only
+    decodes what was replaced. Least recently used entries are dropped
+    past `max_entries`.
+    """
+    
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self.decodes = 0
+        self._frames = OrderedDict()  # source id -> (media key, frame)
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def media_key(source) -> tuple:
+        settings = source.settings or {}
+        if source.type == 'color':
+            return ('color', settings.get('color'), source.width, source.height)
+        if source.type == 'image':
+            return ('image', settings.get('image_path'))
+        if source.type == 'video':
+            return ('video', settings.get('video_path'))
+        return (source.type,)
+    
+    def get(self, source) -> Optional[np.ndarray]:
+        """The source's static frame, decoded only if its media changed since the last call"""
+        key = self.media_key(source)
+        with self._lock:
+            entry = self._frames.get(source.id)
+            if entry is not None and entry[0] == key:
+                self._frames.move_to_end(source.id)
+                return entry[1]
+        
+        frame = decode_static_frame(source)
+        with self._lock:
+            self.decodes += 1
+            self._frames[source.id] = (key, frame)
+            self._frames.move_to_end(source.id)
+            while len(self._frames) > self.max_entries:
+                self._frames.popitem(last=False)
+        return frame
+
+def scene_sources(scene, width: int, height: int,
+                  frames: Optional[StaticFrameCache] = None) -> Dict[str, Dict[str, Any]]:
+    """Compositor source configs for a scene, scaled from the scene canvas and with static media decoded"""
+    scale_x, scale_y = width / SCENE_CANVAS[0], height / SCENE_CANVAS[1]
+    sources = {}
+    for index, source in enumerate(scene.get_all_sources()):
+        settings = source.settings or {}
+        sources[source.id] = {
+            'id': source.id,
+            'config': {'name': source.name, 'type': source.type, 'static_frame': frames.get(source) if frames else decode_static_frame(source)},
+            'position': {'x': int(round(source.x * scale_x)), 'y': int(round(source.y * scale_y))},
+            'size': {'width': int(round(source.width * scale_x)), 'height': int(round(source.height * scale_y))},
+            'z_index': settings.get('z_index', index),
+            'visible': source.is_visible,
+            'opacity': settings.get('opacity', 1.0),
+            'rotation': source.rotation
+        }
+    return sources
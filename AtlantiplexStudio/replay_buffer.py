@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+🌊 MATRIX BROADCAST STUDIO - REPLAY BUFFER
+Instant replay from the encoded program feed
+Features: GOP-segmented packet ring, byte-capped memory, clip export by stream copy off the live path
+"""
+
+import os
+import time
+import logging
+import threading
+import subprocess
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional, Any
+
+from werkzeug.utils import secure_filename
+
+from packet_bus import FLV_HEADER, TAG_SCRIPT, FlvTag, KeyframeSwitcher
+
+logger = logging.getLogger(__name__)
+
+# Rough per-packet cost of the Python objects around a payload (FlvTag + bytes headers)
+PACKET_OVERHEAD = 96
+
+class GopSegment:
+    """Packets from one keyframe up to the next, with the sequence headers they decode with"""
+    
+    __slots__ = ('start_ts', 'end_ts', 'tags', 'bytes', 'configs')
+    
+    def __init__(self, keyframe: FlvTag, configs: tuple):
+        self.start_ts = keyframe.timestamp
+        self.end_ts = keyframe.timestamp
+        self.tags = [keyframe]
+        self.bytes = len(keyframe.data) + PACKET_OVERHEAD
+        self.configs = configs
+    
+    def append(self, tag: FlvTag):
+        self.tags.append(tag)
+        self.bytes += len(tag.data) + PACKET_OVERHEAD
+        if tag.timestamp > self.end_ts:
+            self.end_ts = tag.timestamp
+
+class ReplayBuffer:
+    """Rolling window of encoded packets, cut at GOP boundaries.
+    
+    Packets arrive through a KeyframeSwitcher, so the buffer follows
+    quality changes at keyframes like any destination. Whole GOPs are
+    evicted oldest-first to stay under `max_bytes` and `window_s`, which
+    keeps every retained segment decodable from its first packet.
+    """
+    
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024, window_s: float = 120.0,
+                 directory: str = 'replays'):
+        self.max_bytes = max_bytes
+        self.window_s = window_s
+        self.directory = directory
+        self.switcher = KeyframeSwitcher(self._append, 'replay')
+        
+        self.gops = deque()
+        self.bytes = 0
+        self.evicted_gops = 0
+        self.clips = deque(maxlen=20)
+        self._configs = {}
+        self._config_tuple = ()
+        self._lock = threading.Lock()
+    
+    def _append(self, tag: FlvTag):
+        """Runs on the encoder's reader thread; only list appends under the lock"""
+        if tag.tag_type == TAG_SCRIPT:
+            return
+        if tag.is_config:
+            self._configs[tag.tag_type] = tag
+            self._config_tuple = tuple(self._configs[t] for t in sorted(self._configs))
+            return
+        
+        with self._lock:
+            if tag.is_keyframe:
+                self.gops.append(GopSegment(tag, self._config_tuple))
+                self.bytes += self.gops[-1].bytes
+                self._evict()
+            elif self.gops:
+                gop = self.gops[-1]
+                before = gop.bytes
+                gop.append(tag)
+                self.bytes += gop.bytes - before
+    
+    def _evict(self):
+        """Drop whole GOPs from the front; the GOP being written is never dropped"""
+        gops = self.gops
+        while len(gops) > 1:
+            over_bytes = self.bytes > self.max_bytes
+            over_window = gops[-1].end_ts - gops[1].start_ts >= self.window_s * 1000
+            if not (over_bytes or over_window):
+                break
+            self.bytes -= gops.popleft().bytes
+            self.evicted_gops += 1
+    
+    @property
+    def duration_s(self) -> float:
+        with self._lock:
+            if not self.gops:
+                return 0.0
+            return (self.gops[-1].end_ts - self.gops[0].start_ts) / 1000.0
+    
+    def snapshot(self, seconds: float) -> List[GopSegment]:
+        """The newest GOPs covering at least `seconds` (or everything buffered)"""
+        with self._lock:
+            if not self.gops:
+                return []
+            end_ts = self.gops[-1].end_ts
+            selected = []
+            for gop in reversed(self.gops):
+                selected.append(gop)
+                if end_ts - gop.start_ts >= seconds * 1000:
+                    break
+            
+            # The open GOP keeps growing; freeze its packet list for the writer
+            newest = self.gops[-1]
+            frozen = GopSegment(newest.tags[0], newest.configs)
+            frozen.tags = list(newest.tags)
+            frozen.end_ts = newest.end_ts
+            selected[0] = frozen
+        
+        selected.reverse()
+        return selected
+    
+    def save_clip(self, seconds: float = 30.0, name: Optional[str] = None,
+                  container: str = 'flv') -> Dict[str, Any]:
+        """Write the last `seconds` to disk on a background thread"""
+        gops = self.snapshot(seconds)
+        if not gops:
+            return {'error': 'Replay buffer is empty'}
+        
+        os.makedirs(self.directory, exist_ok=True)
+        # Names come from the API; keep clips inside the replays directory
+        name = secure_filename(name or '') or f"replay_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        clip = {
+            'name': name,
+            'path': os.path.join(self.directory, f"{name}.{container}"),
+            'duration_s': round((gops[-1].end_ts - gops[0].start_ts) / 1000.0, 2),
+            'requested_s': seconds,
+            'status': 'saving',
+            'created_at': datetime.now().isoformat()
+        }
+        self.clips.append(clip)
+        # Copy before the writer starts; a short clip can be saved before we return
+        result = dict(clip)
+        threading.Thread(target=self._write_clip, args=(clip, gops, container), daemon=True).start()
+        return result
+    
+    def _write_clip(self, clip: Dict[str, Any], gops: List[GopSegment], container: str):
+        """Serialize the packets as FLV; other containers are a -c copy remux of that file"""
+        started = time.monotonic()
+        flv_path = clip['path'] if container == 'flv' else f"{clip['path']}.flv"
+        try:
+            write_flv(flv_path, gops)
+            if container != 'flv':
+                cmd = ['ffmpeg', '-y', '-hide_banner', '-loglevel', 'error', '-f', 'flv', '-i', flv_path, '-c', 'copy']
+                if container == 'mp4':
+                    cmd += ['-movflags', '+faststart']
+                result = subprocess.run(cmd + [clip['path']], capture_output=True, timeout=120)
+                os.remove(flv_path)
+                if result.returncode != 0:
+                    raise RuntimeError(result.stderr.decode(errors='replace').strip()[-200:])
+            
+            clip['status'] = 'saved'
+            clip['bytes'] = os.path.getsize(clip['path'])
+            clip['write_ms'] = round((time.monotonic() - started) * 1000, 1)
+            logger.info(f"🎞️ Saved replay {clip['path']} ({clip['duration_s']}s)")
+        except Exception as e:
+            clip['status'] = 'failed'
+            clip['error'] = str(e)
+            logger.error(f"❌ Failed to save replay {clip['name']}: {e}")
+    
+    def clear(self):
+        with self._lock:
+            self.gops.clear()
+            self.bytes = 0
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'bytes': self.bytes,
+            'max_bytes': self.max_bytes,
+            'usage': round(self.bytes / self.max_bytes, 3) if self.max_bytes else None,
+            'duration_s': round(self.duration_s, 2),
+            'window_s': self.window_s,
+            'gops': len(self.gops),
+            'evicted_gops': self.evicted_gops,
+            'source': self.switcher.get_stats()['bus'],
+            'clips': list(self.clips)[-5:]
+        }
+
+def write_flv(path: str, gops: List[GopSegment]):
+    """Write GOPs as a standalone FLV starting at timestamp zero (atomic replace)"""
+    base = gops[0].start_ts
+    configs = None
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(FLV_HEADER)
+        for gop in gops:
+            if gop.configs is not configs:
+                configs = gop.configs
+                for config in configs:
+                    f.write(config.to_bytes(gop.start_ts - base))
+            for tag in gop.tags:
+                f.write(tag.to_bytes(max(0, tag.timestamp - base)))
+    os.replace(temp_path, path)
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+🌊 MATRIX BROADCAST STUDIO - SCENE BENCHMARK
+Memory and serialization cost of the scene library at shared-hosting scale
+Features: many studios with many scenes and sources, bytes per source, cold, cached and
+after-edit serialization times, JSON results
+"""
+
+import sys
+import json
+import time
+import logging
+import argparse
+import tracemalloc
+from typing import Dict, List, Optional, Any
+
+from scene_manager import SceneManager, SceneSource
+
+logger = logging.getLogger(__name__)
+
+SOURCE_TYPES = ('camera', 'display', 'image', 'text', 'color', 'browser', 'video', 'microphone')
+
+def source_memory(count: int = 10000) -> Dict[str, Any]:
+    """Bytes allocated per SceneSource, placed and sized, with an empty settings dict"""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        sources = []
+        for i in range(count):
+            source = SceneSource(f'source-{i}', f'Source {i}', 'camera', {})
+            source.set_position(i % 1920, i % 1080)
+            source.set_size(640, 360)
+            sources.append(source)
+        allocated = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    return {'sources': count, 'bytes_per_source': round(allocated / count, 1)}
+
+def build_library(studios: int, scenes_per_studio: int, sources_per_scene: int) -> List[SceneManager]:
+    """One SceneManager per studio, filled through the same calls the API makes"""
+    library = []
+    for studio in range(studios):
+        manager = SceneManager()
+        for scene_index in range(scenes_per_studio):
+            scene = manager.create_scene(f"Studio {studio} scene {scene_index}", 'custom')
+            for source_index in range(sources_per_scene):
+                source_type = SOURCE_TYPES[source_index % len(SOURCE_TYPES)]
+                manager.add_source_to_scene(scene.id, source_type, f"{source_type} {source_index}", {})
+        library.append(manager)
+    return library
+
+def _serialize(library: List[SceneManager]) -> float:
+    """Seconds to serialize every studio's scene list for the UI"""
+    started = time.perf_counter()
+    for manager in library:
+        manager.get_scene_list_for_ui()
+    return time.perf_counter() - started
+
+def run(studios: int = 100, scenes_per_studio: int = 10, sources_per_scene: int = 10,
+        edit_fraction: float = 0.01) -> Dict[str, Any]:
+    """Build the library, then time serializing it cold, cached and after editing a fraction of sources"""
+    # Building logs every scene and source; that is not what is being measured
+    scene_logger = logging.getLogger('scene_manager')
+    level = scene_logger.level
+    scene_logger.setLevel(logging.WARNING)
+    try:
+        started = time.perf_counter()
+        library = build_library(studios, scenes_per_studio, sources_per_scene)
+        build_s = time.perf_counter() - started
+    finally:
+        scene_logger.setLevel(level)
+    
+    sources = [source for manager in library for scene in manager.get_all_scenes() for source in scene.get_all_sources()]
+    count = len(sources)
+    # Adding a source already serialized it for the change log; start from nothing cached
+    for source in sources:
+        source.set_visibility(source.is_visible)
+    cold = _serialize(library)
+    cached = _serialize(library)
+    
+    step = max(1, int(1 / edit_fraction)) if edit_fraction else 0
+    edited = sources[::step] if step else []
+    for source in edited:
+        source.set_position(source.x + 1, source.y)
+    after_edit = _serialize(library)
+    
+    per_source_us = lambda seconds: round(seconds / count * 1e6, 3)
+    return {
+        'studios': studios,
+        'scenes': studios * scenes_per_studio,
+        'sources': count,
+        'build_s': round(build_s, 3),
+        'memory': source_memory(count),
+        'serialize': {
+            'cold_ms': round(cold * 1000, 2),
+            'cached_ms': round(cached * 1000, 2),
+            'after_edit_ms': round(after_edit * 1000, 2),
+            'edited_sources': len(edited),
+            'cold_us_per_source': per_source_us(cold),
+            'cached_us_per_source': per_source_us(cached)
+        }
+    }
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Measure scene library memory and serialization cost')
+    parser.add_argument('--studios', type=int, default=100)
+    parser.add_argument('--scenes', type=int, default=10, help='custom scenes per studio')
+    parser.add_argument('--sources', type=int, default=10, help='sources per custom scene')
+    parser.add_argument('--edit-fraction', type=float, default=0.01, help='share of sources moved before the last pass')
+    args = parser.parse_args(argv)
+    
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    results = run(args.studios, args.scenes, args.sources, args.edit_fraction)
+    print(json.dumps(results, indent=2, sort_keys=True))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,6 +1,9 @@
 import os
+import copy
 import json
 import logging
+import threading
+from collections import deque
 from datetime import datetime
 from typing import Dict, List, Optional, Any
 import uuid
@@ -8,8 +11,41 @@ import time
 
 logger = logging.getLogger(__name__)
 
+# Changes kept for "changes since N"; clients further behind get a full snapshot
+CHANGE_LOG_SIZE = 1000
+
+def _pointer(*parts) -> str:
+    """JSON Pointer (RFC 6901) to a path in the scene snapshot"""
+    return ''.join('/' + str(part).replace('~', '~0').replace('/', '~1') for part in parts)
+
+def _op(op: str, *path, value: Any = None) -> Dict:
+    """A JSON Patch (RFC 6902) operation; values are copied so later edits don't rewrite history"""
+    operation = {'op': op, 'path': _pointer(*path)}
+    if op != 'remove':
+        operation['value'] = copy.deepcopy(value)
+    return operation
+
 class SceneSource:
-    """Represents a media source in a scene"""
+    """Represents a media source in a scene
+    
+    Slot-based, with geometry kept as plain ints; `position`, `size` and
+    `crop` build dicts on read and accept dicts on assignment (so edit them
+    through assignment or the setters, not in place). `to_dict()` is built
+    once and reused until any attribute is assigned. `settings` is shared
+    with the serialized form, so in-place edits to it show up as well.
+    """
+    
+    __slots__ = ('id', 'name', 'type', 'settings', 'is_visible', 'is_muted', 'volume', 'rotation',
+                 'x', 'y', 'width', 'height', 'crop_top', 'crop_left', 'crop_bottom', 'crop_right',
+                 'created_at', '_serialized')
+    
+    # Geometry slots and where they appear in to_dict()
+    FIELD_PATHS = {
+        'x': ('position', 'x'), 'y': ('position', 'y'),
+        'width': ('size', 'width'), 'height': ('size', 'height'),
+        'crop_top': ('crop', 'top'), 'crop_left': ('crop', 'left'),
+        'crop_bottom': ('crop', 'bottom'), 'crop_right': ('crop', 'right')
+    }
     
     def __init__(self, id: str, name: str, source_type: str, settings: Dict):
         self.id = id
@@ -19,19 +55,49 @@ class SceneSource:
         self.is_visible = True
         self.is_muted = False
         self.volume = 1.0
-        self.position = {"x": 0, "y": 0}
-        self.size = {"width": 1920, "height": 1080}
+        self.x, self.y = 0, 0
+        self.width, self.height = 1920, 1080
         self.rotation = 0
-        self.crop = {"top": 0, "left": 0, "bottom": 1080, "right": 1920}
+        self.crop_top, self.crop_left, self.crop_bottom, self.crop_right = 0, 0, 1080, 1920
         self.created_at = datetime.utcnow()
         
+    def __setattr__(self, name: str, value: Any):
+        # Any change drops the memoized dict; to_dict() stores it past this hook
+        object.__setattr__(self, name, value)
+        object.__setattr__(self, '_serialized', None)
+    
+    @property
+    def position(self) -> Dict[str, int]:
+        return {"x": self.x, "y": self.y}
+    
+    @position.setter
+    def position(self, value: Dict[str, int]):
+        self.set_position(value.get("x", 0), value.get("y", 0))
+    
+    @property
+    def size(self) -> Dict[str, int]:
+        return {"width": self.width, "height": self.height}
+    
+    @size.setter
+    def size(self, value: Dict[str, int]):
+        self.set_size(value.get("width", 1920), value.get("height", 1080))
+    
+    @property
+    def crop(self) -> Dict[str, int]:
+        return {"top": self.crop_top, "left": self.crop_left, "bottom": self.crop_bottom, "right": self.crop_right}
+    
+    @crop.setter
+    def crop(self, value: Dict[str, int]):
+        self.crop_top, self.crop_left = value.get("top", 0), value.get("left", 0)
+        self.crop_bottom, self.crop_right = value.get("bottom", 1080), value.get("right", 1920)
+    
     def set_position(self, x: int, y: int):
-        self.position["x"] = x
-        self.position["y"] = y
+        self.x = x
+        self.y = y
     
     def set_size(self, width: int, height: int):
-        self.size["width"] = width
-        self.size["height"] = height
+        self.width = width
+        self.height = height
     
     def set_visibility(self, visible: bool):
         self.is_visible = visible
@@ -41,6 +107,27 @@ class SceneSource:
     
     def set_volume(self, volume: float):
         self.volume = max(0.0, min(1.0, volume))
+    
+    def to_dict(self) -> Dict:
+        """Convert source to dictionary; the result is shared until the source changes, so don't modify it"""
+        serialized = self._serialized
+        if serialized is None:
+            serialized = {
+                "id": self.id,
+                "name": self.name,
+                "type": self.type,
+                "is_visible": self.is_visible,
+                "is_muted": self.is_muted,
+                "volume": self.volume,
+                "position": self.position,
+                "size": self.size,
+                "rotation": self.rotation,
+                "crop": self.crop,
+                "settings": self.settings,
+                "created_at": self.created_at.isoformat()
+            }
+            object.__setattr__(self, '_serialized', serialized)
+        return serialized
 
 class BroadcastScene:
     """Represents a complete scene with multiple sources"""
@@ -101,20 +188,7 @@ class BroadcastScene:
     
     def _source_to_dict(self, source: SceneSource) -> Dict:
         """Convert source to dictionary"""
-        return {
-            "id": source.id,
-            "name": source.name,
-            "type": source.type,
-            "is_visible": source.is_visible,
-            "is_muted": source.is_muted,
-            "volume": source.volume,
-            "position": source.position,
-            "size": source.size,
-            "rotation": source.rotation,
-            "crop": source.crop,
-            "settings": source.settings,
-            "created_at": source.created_at.isoformat()
-        }
+        return source.to_dict()
 
 class SceneFactory:
     """Factory for creating predefined scene types"""
@@ -459,12 +533,35 @@ class SceneFactory:
         return scene
 
 class SceneManager:
-    """Manages all scenes and sources"""
+    """Manages all scenes and sources
+    
+    Every change made through the manager is recorded under a new version
+    as a list of JSON Patch operations against `get_snapshot()`. Clients
+    hold a snapshot and its version and apply `changes_since(version)`, or
+    subscribe to have each change pushed as it happens.
+    
+    Besides the id-keyed `scenes`, scenes are indexed by name, by type and
+    by the names of their sources, so those lookups don't scan the library.
+    The indexes follow changes made through the manager; scenes edited
+    directly need `reindex_scene`.
+    """
     
-    def __init__(self):
+    def __init__(self, change_log_size: int = CHANGE_LOG_SIZE):
         self.scenes = {}
         self.active_scene_id = None
+        self.preview_scene_id = None
         self.current_stream = None
+        self.renderer = None  # compiles scenes and puts them on air (BroadcastEngine)
+        
+        self.version = 0
+        self._changes = deque(maxlen=change_log_size)
+        self._change_lock = threading.Lock()
+        self._subscribers = []
+        
+        # Secondary indexes; inner dicts keep insertion order (oldest scene first)
+        self._ids_by_name = {}  # scene name -> {scene id: None}
+        self._ids_by_type = {}  # scene type -> {scene id: None}
+        self._ids_by_source_name = {}  # source name -> {scene id: sources with that name}
         
         # Create default scenes
         self._create_default_scenes()
@@ -491,18 +588,133 @@ class SceneManager:
         green_screen = SceneFactory.create_green_screen_scene("Green Screen")
         self.scenes[green_screen.id] = green_screen
         
+        for scene in self.scenes.values():
+            self._index_scene(scene)
+        
         # Set default active scene
         interview.set_active(True)
         self.active_scene_id = interview.id
         
         logger.info("Created default scenes")
     
+    def subscribe(self, callback):
+        """Call `callback(change)` with every change as it is recorded"""
+        with self._change_lock:
+            if callback not in self._subscribers:
+                self._subscribers = self._subscribers + [callback]
+    
+    def unsubscribe(self, callback):
+        with self._change_lock:
+            self._subscribers = [c for c in self._subscribers if c != callback]
+    
+    def _record(self, ops: List[Dict]) -> int:
+        """Log one change (a list of patch operations) under the next version and push it to subscribers"""
+        with self._change_lock:
+            self.version += 1
+            change = {'version': self.version, 'ops': ops, 'timestamp': datetime.utcnow().isoformat()}
+            self._changes.append(change)
+            subscribers = self._subscribers
+        
+        for callback in subscribers:
+            try:
+                callback(change)
+            except Exception as e:
+                logger.error(f"Scene change subscriber failed: {e}")
+        return self.version
+    
+    def _scene_touched(self, scene: BroadcastScene) -> Dict:
+        """Bump a scene's updated_at, as an operation to go with the change that caused it"""
+        scene.updated_at = datetime.utcnow()
+        return _op('replace', 'scenes', scene.id, 'updated_at', value=scene.updated_at.isoformat())
+    
+    def get_snapshot(self) -> Dict:
+        """Every scene, keyed by id, with the version it reflects; the document patches apply to"""
+        version = self.version
+        return {
+            'version': version,
+            'scenes': {scene_id: scene.to_dict() for scene_id, scene in list(self.scenes.items())},
+            'active_scene_id': self.active_scene_id,
+            'preview_scene_id': self.preview_scene_id
+        }
+    
+    def changes_since(self, version: int) -> Dict:
+        """Changes after `version`, oldest first; a full snapshot if they are no longer all in the log"""
+        with self._change_lock:
+            current = self.version
+            changes = list(self._changes)
+        
+        oldest = changes[0]['version'] if changes else current + 1
+        if version < 0 or version > current or version < oldest - 1:
+            return {'version': current, 'reset': True, 'snapshot': self.get_snapshot()}
+        
+        # Versions in the log are contiguous, so the first one wanted is at a known index
+        return {'version': current, 'reset': False, 'changes': changes[version - oldest + 1:]}
+    
+    def _index_scene(self, scene: BroadcastScene):
+        self._ids_by_name.setdefault(scene.name, {})[scene.id] = None
+        self._ids_by_type.setdefault(scene.scene_type, {})[scene.id] = None
+        for source in scene.sources.values():
+            self._index_source(scene.id, source.name)
+    
+    def _unindex_scene(self, scene: BroadcastScene):
+        for index, key in ((self._ids_by_name, scene.name), (self._ids_by_type, scene.scene_type)):
+            ids = index.get(key, {})
+            ids.pop(scene.id, None)
+            if not ids:
+                index.pop(key, None)
+        for source in scene.sources.values():
+            self._unindex_source(scene.id, source.name)
+    
+    def _index_source(self, scene_id: str, source_name: str):
+        counts = self._ids_by_source_name.setdefault(source_name, {})
+        counts[scene_id] = counts.get(scene_id, 0) + 1
+    
+    def _unindex_source(self, scene_id: str, source_name: str):
+        counts = self._ids_by_source_name.get(source_name, {})
+        if counts.get(scene_id, 0) > 1:
+            counts[scene_id] -= 1
+            return
+        counts.pop(scene_id, None)
+        if not counts:
+            self._ids_by_source_name.pop(source_name, None)
+    
+    def reindex_scene(self, scene_id: str):
+        """Rebuild a scene's index entries after it was changed outside the manager (scans the indexes)"""
+        for index in (self._ids_by_name, self._ids_by_type, self._ids_by_source_name):
+            for key in [key for key, ids in index.items() if scene_id in ids]:
+                del index[key][scene_id]
+                if not index[key]:
+                    del index[key]
+        if scene_id in self.scenes:
+            self._index_scene(self.scenes[scene_id])
+    
+    def get_scene_by_name(self, name: str) -> Optional[BroadcastScene]:
+        """The scene with this name (the oldest, if several share it)"""
+        ids = self._ids_by_name.get(name)
+        return self.scenes.get(next(iter(ids))) if ids else None
+    
+    def get_scenes_by_type(self, scene_type: str) -> List[BroadcastScene]:
+        return [self.scenes[scene_id] for scene_id in self._ids_by_type.get(scene_type, ())]
+    
+    def get_scenes_using_source(self, source_name: str) -> List[BroadcastScene]:
+        """Scenes with a source of this name"""
+        return [self.scenes[scene_id] for scene_id in self._ids_by_source_name.get(source_name, ())]
+    
+    def resolve_scene_id(self, scene: str) -> Optional[str]:
+        """Scene id for an id or a scene name"""
+        if scene in self.scenes:
+            return scene
+        ids = self._ids_by_name.get(scene)
+        return next(iter(ids)) if ids else None
+    
     def create_scene(self, name: str, scene_type: str, description: str = "") -> BroadcastScene:
         """Create a new scene"""
         scene_id = str(uuid.uuid4())
         scene = BroadcastScene(scene_id, name, scene_type)
         scene.description = description
         self.scenes[scene_id] = scene
+        self._index_scene(scene)
+        self._record([_op('add', 'scenes', scene_id, value=scene.to_dict())])
         
         logger.info(f"Created new scene: {name}")
         return scene
@@ -516,29 +728,96 @@ class SceneManager:
                 return False
             
             scene_name = self.scenes[scene_id].name
-            del self.scenes[scene_id]
+            self._unindex_scene(self.scenes.pop(scene_id))
+            ops = [_op('remove', 'scenes', scene_id)]
+            if scene_id == self.preview_scene_id:
+                self.preview_scene_id = None
+                ops.append(_op('replace', 'preview_scene_id', value=None))
+            self._record(ops)
             logger.info(f"Deleted scene: {scene_name}")
             return True
         
         return False
     
+    def attach_renderer(self, renderer):
+        """Render scenes with `renderer`, which provides preview_scene, take_scene and update_scene (each taking a scene)"""
+        self.renderer = renderer
+    
+    def _render(self, action: str, scene: BroadcastScene) -> Optional[Dict]:
+        """Hand a scene to the renderer; a rendering failure never blocks scene management"""
+        if not self.renderer:
+            return None
+        try:
+            return getattr(self.renderer, action)(scene)
+        except Exception as e:
+            logger.error(f"Renderer could not {action.replace('_', ' ')} {scene.name}: {e}")
+            return {'error': str(e)}
+    
+    def _activate(self, scene_id: str):
+        """Make a scene the active one and record it, clearing preview if that is where it came from"""
+        ops = []
+        if self.active_scene_id and self.active_scene_id in self.scenes:
+            self.scenes[self.active_scene_id].set_active(False)
+            ops.append(_op('replace', 'scenes', self.active_scene_id, 'is_active', value=False))
+        self.scenes[scene_id].set_active(True)
+        self.active_scene_id = scene_id
+        ops += [_op('replace', 'scenes', scene_id, 'is_active', value=True),
+                _op('replace', 'active_scene_id', value=scene_id)]
+        if scene_id == self.preview_scene_id:
+            self.preview_scene_id = None
+            ops.append(_op('replace', 'preview_scene_id', value=None))
+        self._record(ops)
+    
     def switch_scene(self, scene_id: str) -> bool:
-        """Switch to a different scene"""
+        """Switch to a different scene, given its id or its name"""
+        scene_id = self.resolve_scene_id(scene_id) or scene_id
         if scene_id not in self.scenes:
             logger.error(f"Scene not found: {scene_id}")
             return False
         
-        # Deactivate current scene
-        if self.active_scene_id:
-            self.scenes[self.active_scene_id].set_active(False)
-        
-        # Activate new scene
-        self.scenes[scene_id].set_active(True)
-        self.active_scene_id = scene_id
+        # Goes through the preview slot when the scene is already warming there
+        self._render('take_scene', self.scenes[scene_id])
+        self._activate(scene_id)
         
         logger.info(f"Switched to scene: {self.scenes[scene_id].name}")
         return True
     
+    def set_preview(self, scene_id: str) -> bool:
+        """Queue a scene (id or name) as the next one; the renderer loads and warms it in the background"""
+        scene_id = self.resolve_scene_id(scene_id) or scene_id
+        if scene_id not in self.scenes:
+            logger.error(f"Scene not found: {scene_id}")
+            return False
+        
+        self.preview_scene_id = scene_id
+        self._record([_op('replace', 'preview_scene_id', value=scene_id)])
+        self._render('preview_scene', self.scenes[scene_id])
+        logger.info(f"Preview scene: {self.scenes[scene_id].name}")
+        return True
+    
+    def take(self) -> bool:
+        """Swap preview and program: the preview scene goes live and the old program is warmed in preview"""
+        if not self.preview_scene_id:
+            logger.error("No scene in preview")
+            return False
+        
+        previous = self.active_scene_id
+        scene_id = self.preview_scene_id
+        self._render('take_scene', self.scenes[scene_id])
+        self._activate(scene_id)
+        if previous and previous in self.scenes and previous != scene_id:
+            self.set_preview(previous)
+        
+        logger.info(f"Took scene: {self.scenes[scene_id].name}")
+        return True
+    
+    def _scene_changed(self, scene_id: str):
+        """Re-render a scene whose sources changed if it is on program or in preview"""
+        if scene_id == self.active_scene_id:
+            self._render('update_scene', self.scenes[scene_id])
+        elif scene_id == self.preview_scene_id:
+            self._render('preview_scene', self.scenes[scene_id])
+    
     def add_source_to_scene(self, scene_id: str, source_type: str, name: str, settings: Dict) -> Optional[SceneSource]:
         """Add a new source to a scene"""
         if scene_id not in self.scenes:
@@ -600,6 +879,13 @@ class SceneManager:
             })
         
         scene.add_source(source)
+        self._index_source(scene_id, source.name)
+        self._record([
+            _op('add', 'scenes', scene_id, 'sources', source_id, value=scene._source_to_dict(source)),
+            _op('replace', 'scenes', scene_id, 'source_count', value=len(scene.sources)),
+            self._scene_touched(scene)
+        ])
+        self._scene_changed(scene_id)
         return source
     
     def remove_source_from_scene(self, scene_id: str, source_id: str) -> bool:
@@ -607,7 +893,18 @@ class SceneManager:
         if scene_id not in self.scenes:
             return False
         
-        return self.scenes[scene_id].remove_source(source_id)
+        scene = self.scenes[scene_id]
+        source = scene.get_source(source_id)
+        if not scene.remove_source(source_id):
+            return False
+        self._unindex_source(scene_id, source.name)
+        self._record([
+            _op('remove', 'scenes', scene_id, 'sources', source_id),
+            _op('replace', 'scenes', scene_id, 'source_count', value=len(scene.sources)),
+            self._scene_touched(scene)
+        ])
+        self._scene_changed(scene_id)
+        return True
     
     def get_scene(self, scene_id: str) -> Optional[BroadcastScene]:
         """Get a specific scene"""
@@ -634,12 +931,32 @@ class SceneManager:
             return False
         
         # Update properties
+        old_name = source.name
         for key, value in properties.items():
-            if hasattr(source, key):
+            if not key.startswith('_') and hasattr(source, key) and not callable(getattr(source, key)):
                 setattr(source, key, value)
             elif key in source.settings:
                 source.settings[key] = value
         
+        if source.name != old_name:
+            self._unindex_source(scene_id, old_name)
+            self._index_source(scene_id, source.name)
+        
+        fields = scene._source_to_dict(source)
+        ops = []
+        for key in properties:
+            if key in fields:
+                ops.append(_op('replace', 'scenes', scene_id, 'sources', source_id, key, value=fields[key]))
+            elif key in SceneSource.FIELD_PATHS:
+                field, part = SceneSource.FIELD_PATHS[key]
+                ops.append(_op('replace', 'scenes', scene_id, 'sources', source_id, field, part,
+                               value=fields[field][part]))
+            elif key in source.settings:
+                ops.append(_op('replace', 'scenes', scene_id, 'sources', source_id, 'settings', key,
+                               value=source.settings[key]))
+        if ops:
+            self._record(ops)
+        self._scene_changed(scene_id)
         logger.info(f"Updated properties for source {source.name}")
         return True
     
@@ -670,6 +987,8 @@ class SceneManager:
             new_scene.add_source(new_source)
         
         self.scenes[new_scene.id] = new_scene
+        self._index_scene(new_scene)
+        self._record([_op('add', 'scenes', new_scene.id, value=new_scene.to_dict())])
         logger.info(f"Duplicated scene: {original_scene.name} -> {new_name}")
         return new_scene
     
@@ -679,10 +998,14 @@ class SceneManager:
     
     def __setitem__(self, scene_id: str, value):
         """Set scene (for compatibility)"""
+        if scene_id in self.scenes:
+            self._unindex_scene(self.scenes[scene_id])
         self.scenes[scene_id] = value
+        self._index_scene(value)
+        self._record([_op('add', 'scenes', scene_id, value=value.to_dict())])
     
     def get_scene_list_for_ui(self) -> Dict:
-        """Get scene data formatted for UI"""
+        """Get scene data formatted for UI; clients that stay open should follow `changes_since` instead"""
         scenes = []
         
         for scene in self.get_all_scenes():
@@ -692,7 +1015,7 @@ class SceneManager:
                 'description': scene.description,
                 'scene_type': scene.scene_type,
                 'is_active': scene.is_active,
-                'sources': [self._source_to_dict(source) for source in scene.get_all_sources()],
+                'sources': [scene._source_to_dict(source) for source in scene.get_all_sources()],
                 'created_at': scene.created_at.isoformat(),
                 'updated_at': scene.updated_at.isoformat()
             })
@@ -700,14 +1023,16 @@ class SceneManager:
         return {
             'scenes': scenes,
             'active_scene_id': self.active_scene_id,
-            'total_scenes': len(scenes)
+            'preview_scene_id': self.preview_scene_id,
+            'total_scenes': len(scenes),
+            'version': self.version
         }
     
     def get_all_sources_in_scene(self, scene_id: str) -> List[Dict]:
         """Get all sources in a specific scene"""
         scene = self.get_scene(scene_id)
         if scene:
-            return [self._source_to_dict(source) for source in scene.get_all_sources()]
+            return [scene._source_to_dict(source) for source in scene.get_all_sources()]
         return []
     
     def update_source_in_scene(self, scene_id: str, source_id: str, updates: Dict) -> bool:
@@ -721,21 +1046,31 @@ class SceneManager:
             return False
         
         # Update source properties
+        path = ('scenes', scene_id, 'sources', source_id)
+        ops = []
         for key, value in updates.items():
             if key == 'position':
                 source.set_position(value.get('x', 0), value.get('y', 0))
+                ops.append(_op('replace', *path, 'position', value=source.position))
             elif key == 'size':
                 source.set_size(value.get('width', 1920), value.get('height', 1080))
+                ops.append(_op('replace', *path, 'size', value=source.size))
             elif key == 'is_visible':
                 source.set_visibility(value)
+                ops.append(_op('replace', *path, 'is_visible', value=source.is_visible))
             elif key == 'is_muted':
                 source.set_mute(value)
+                ops.append(_op('replace', *path, 'is_muted', value=source.is_muted))
             elif key == 'volume':
                 source.set_volume(value)
+                ops.append(_op('replace', *path, 'volume', value=source.volume))
             elif key == 'settings':
                 source.settings.update(value)
+                ops += [_op('add', *path, 'settings', name, value=setting) for name, setting in value.items()]
         
-        scene.updated_at = datetime.utcnow()
+        ops.append(self._scene_touched(scene))
+        self._record(ops)
+        self._scene_changed(scene_id)
         logger.info(f"Updated source {source.name} in scene {scene.name}")
         return True
     
@@ -748,6 +1083,7 @@ class SceneManager:
             'active_scene_id': self.active_scene_id,
             'active_scene_name': active_scene.name if active_scene else None,
             'active_scene_type': active_scene.scene_type if active_scene else None,
+            'preview_scene_id': self.preview_scene_id,
             'total_scenes': len(self.scenes),
             'total_sources': sum(len(scene.sources) for scene in self.scenes.values()),
             'timestamp': datetime.utcnow().isoformat()
@@ -828,6 +1164,8 @@ class SceneManager:
                 scene.add_source(source)
             
             self.scenes[scene.id] = scene
+            self._index_scene(scene)
+            self._record([_op('add', 'scenes', scene.id, value=scene.to_dict())])
             logger.info(f"Imported scene: {scene.name}")
             
             return scene
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+🌊 MATRIX BROADCAST STUDIO - SEGMENT RECORDER
+Local recording from the shared encoder's packets
+Features: keyframe-aligned fixed-length segments, JSON index, fsync on rotation,
+stream-copy remux per segment, off-thread disk writes
+"""
+
+import os
+import json
+import queue
+import logging
+import threading
+import subprocess
+from datetime import datetime
+from typing import Dict, Optional, Any
+
+from werkzeug.utils import secure_filename
+
+from packet_bus import FLV_HEADER, TAG_SCRIPT, FlvTag, KeyframeSwitcher
+
+logger = logging.getLogger(__name__)
+
+class SegmentRecorder:
+    """Writes the program to self-contained FLV segments cut at keyframes.
+    
+    Each segment starts with the sequence headers and a keyframe, and is
+    fsynced and added to `index.json` when it closes, so a crash loses at
+    most the segment being written. A change of sequence headers (quality
+    switch) also starts a new segment. Containers other than FLV are made
+    by remuxing each closed segment with `-c copy`.
+    """
+    
+    def __init__(self, directory: str, segment_s: float = 60.0, container: str = 'flv',
+                 name: Optional[str] = None, auto: bool = False):
+        # Names come from the API; keep the recording inside `directory`
+        self.name = secure_filename(name or '') or f"recording_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        self.path = os.path.join(directory, self.name)
+        self.segment_s = segment_s
+        self.container = container
+        self.auto = auto  # started with the broadcast rather than by request
+        self.switcher = KeyframeSwitcher(self._enqueue, 'recording')
+        
+        self.segments = []
+        self.bytes_written = 0
+        self.queued_bytes = 0
+        self.started_at = datetime.now()
+        self.stopped_at = None
+        self._configs = {}
+        self._cut = False
+        self._file = None
+        self._current = None
+        self._base_ts = None
+        self._lock = threading.Lock()
+        self._index_lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._remux_queue = queue.Queue()
+        
+        os.makedirs(self.path, exist_ok=True)
+        self._write_index()
+        self._writer = threading.Thread(target=self._write_loop, daemon=True)
+        self._writer.start()
+        self._remuxer = None
+        if container != 'flv':
+            self._remuxer = threading.Thread(target=self._remux_loop, daemon=True)
+            self._remuxer.start()
+    
+    def _enqueue(self, tag: FlvTag):
+        """Runs on the encoder's reader thread; disk I/O happens on the writer"""
+        with self._lock:
+            self.queued_bytes += len(tag.data)
+        self._queue.put(tag)
+    
+    def _write_loop(self):
+        while True:
+            tag = self._queue.get()
+            if tag is None:
+                break
+            try:
+                self._write(tag)
+            except OSError as e:
+                logger.error(f"❌ Recording write failed: {e}")
+            with self._lock:
+                self.queued_bytes -= len(tag.data)
+        self._close_segment()
+        self._remux_queue.put(None)
+    
+    def _write(self, tag: FlvTag):
+        if tag.tag_type == TAG_SCRIPT:
+            return
+        if tag.is_config:
+            if self._configs.get(tag.tag_type) is not None and self._configs[tag.tag_type].data != tag.data:
+                self._cut = True
+            self._configs[tag.tag_type] = tag
+            return
+        
+        if self._base_ts is None:
+            self._base_ts = tag.timestamp
+        if tag.is_keyframe and (self._file is None or self._cut
+                                or tag.timestamp - self._current['start_ts'] >= self.segment_s * 1000):
+            self._open_segment(tag.timestamp)
+        if self._file is None:
+            return
+        
+        data = tag.to_bytes(max(0, tag.timestamp - self._base_ts))
+        self._file.write(data)
+        self._current['bytes'] += len(data)
+        self._current['end_ts'] = max(self._current['end_ts'], tag.timestamp)
+        self.bytes_written += len(data)
+    
+    def _open_segment(self, timestamp: int):
+        self._close_segment()
+        sequence = len(self.segments) + 1
+        filename = f"segment_{sequence:05d}.flv"
+        self._file = open(os.path.join(self.path, filename), 'wb')
+        self._current = {'sequence': sequence, 'file': filename, 'start_ts': timestamp,
+                         'end_ts': timestamp, 'bytes': len(FLV_HEADER)}
+        self._cut = False
+        
+        self._file.write(FLV_HEADER)
+        for tag_type in sorted(self._configs):
+            data = self._configs[tag_type].to_bytes(timestamp - self._base_ts)
+            self._file.write(data)
+            self._current['bytes'] += len(data)
+        self._write_index()
+    
+    def _close_segment(self):
+        """Make the open segment durable and list it in the index"""
+        if self._file is None:
+            return
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        self._file = None
+        
+        current, self._current = self._current, None
+        entry = {
+            'sequence': current['sequence'],
+            'file': current['file'],
+            'start_s': round((current['start_ts'] - self._base_ts) / 1000.0, 3),
+            'duration_s': round((current['end_ts'] - current['start_ts']) / 1000.0, 3),
+            'bytes': current['bytes'],
+            'closed_at': datetime.now().isoformat()
+        }
+        with self._index_lock:
+            self.segments.append(entry)
+        self._write_index()
+        if self._remuxer:
+            self._remux_queue.put(entry)
+    
+    def _remux_loop(self):
+        """Turn closed FLV segments into the configured container without re-encoding"""
+        while True:
+            entry = self._remux_queue.get()
+            if entry is None:
+                break
+            source = os.path.join(self.path, entry['file'])
+            target_name = f"{os.path.splitext(entry['file'])[0]}.{self.container}"
+            cmd = ['ffmpeg', '-y', '-hide_banner', '-loglevel', 'error', '-f', 'flv', '-i', source, '-c', 'copy']
+            if self.container == 'mp4':
+                cmd += ['-movflags', '+faststart']
+            try:
+                result = subprocess.run(cmd + [os.path.join(self.path, target_name)], capture_output=True, timeout=300)
+                if result.returncode != 0:
+                    raise RuntimeError(result.stderr.decode(errors='replace').strip()[-200:])
+                size = os.path.getsize(os.path.join(self.path, target_name))
+            except Exception as e:
+                # The FLV segment stays in the index; nothing is lost
+                with self._index_lock:
+                    entry['remux_error'] = str(e)
+                logger.warning(f"⚠️ Recording remux of {entry['file']} failed: {e}")
+                self._write_index()
+                continue
+            
+            with self._index_lock:
+                entry['file'] = target_name
+                entry['bytes'] = size
+            # The FLV goes only once the index no longer points at it
+            self._write_index()
+            try:
+                os.remove(source)
+            except OSError as e:
+                logger.warning(f"⚠️ Could not remove remuxed segment {source}: {e}")
+    
+    def _write_index(self):
+        """Atomically rewrite index.json (closed segments, plus the one being written)"""
+        current = self._current
+        with self._index_lock:
+            # Entries are copied under the lock the remuxer updates them with
+            index = {
+                'name': self.name,
+                'container': self.container,
+                'segment_s': self.segment_s,
+                'started_at': self.started_at.isoformat(),
+                'stopped_at': self.stopped_at.isoformat() if self.stopped_at else None,
+                'segments': [dict(entry) for entry in self.segments],
+                'current': current['file'] if current else None
+            }
+            temp_path = os.path.join(self.path, 'index.json.tmp')
+            with open(temp_path, 'w') as f:
+                json.dump(index, f, indent=2)
+            os.replace(temp_path, os.path.join(self.path, 'index.json'))
+    
+    def stop(self, timeout: float = 30.0):
+        """Stop taking packets, close the last segment and finish remuxing"""
+        self.switcher.detach()
+        self.stopped_at = datetime.now()
+        self._queue.put(None)
+        self._writer.join(timeout=timeout)
+        if self._remuxer:
+            self._remuxer.join(timeout=timeout)
+        self._write_index()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        current = self._current
+        return {
+            'name': self.name,
+            'path': self.path,
+            'container': self.container,
+            'auto': self.auto,
+            'started_at': self.started_at.isoformat(),
+            'segments': len(self.segments),
+            'current_segment': current['file'] if current else None,
+            'bytes_written': self.bytes_written,
+            'queued_bytes': self.queued_bytes,
+            'source': self.switcher.get_stats()['bus']
+        }
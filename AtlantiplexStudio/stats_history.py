@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+🌊 MATRIX BROADCAST STUDIO - STATS HISTORY
+Fixed-size time series of per-destination streaming statistics
+Features: NumPy ring buffer with O(1) appends, vectorized min/avg/p95 over any window,
+downsampled sparklines, TCP round-trip times of relay connections
+"""
+
+import re
+import time
+import warnings
+import subprocess
+from typing import Dict, List, Optional, Any
+
+import numpy as np
+
+FIELDS = ('bitrate_kbps', 'fps', 'dropped', 'rtt_ms', 'queue_depth')
+SPARK_CHARS = '▁▂▃▄▅▆▇█'
+
+class StatsRing:
+    """The last `capacity` samples of a fixed set of fields.
+    
+    Samples live in one preallocated float32 array (missing values are
+    NaN) plus a timestamp column; appending overwrites the oldest row.
+    Queries take the newest rows as at most two slices and reduce every
+    field at once, so cost depends on the window, not the history.
+    """
+    
+    def __init__(self, capacity: int, interval: float = 1.0, fields: tuple = FIELDS):
+        self.capacity = capacity
+        self.interval = interval
+        self.fields = fields
+        self._index = {name: column for column, name in enumerate(fields)}
+        self._values = np.full((capacity, len(fields)), np.nan, dtype=np.float32)
+        self._times = np.zeros(capacity, dtype=np.float64)
+        self._next = 0
+        self.count = 0
+    
+    def append(self, sample: Dict[str, Optional[float]], at: Optional[float] = None):
+        """Record one sample; fields that are missing or None are stored as NaN"""
+        row = self._next
+        values = self._values[row]
+        for name, column in self._index.items():
+            value = sample.get(name)
+            values[column] = np.nan if value is None else value
+        self._times[row] = time.time() if at is None else at
+        self._next = (row + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+    
+    def recent(self, seconds: float, now: Optional[float] = None) -> tuple:
+        """(times, values) of the samples from the last `seconds`, oldest first"""
+        now = time.time() if now is None else now
+        # One sample per interval: the window can't hold more rows than that (plus jitter)
+        rows = min(self.count, int(seconds / self.interval) + 2)
+        end = self._next
+        if rows <= end:
+            times, values = self._times[end - rows:end], self._values[end - rows:end]
+        else:
+            wrapped = rows - end
+            times = np.concatenate((self._times[-wrapped:], self._times[:end]))
+            values = np.concatenate((self._values[-wrapped:], self._values[:end]))
+        keep = times > now - seconds
+        return times[keep], values[keep]
+    
+    def summary(self, seconds: float, now: Optional[float] = None) -> Dict[str, Any]:
+        """min, avg, p95 and latest value of each field over the window"""
+        times, values = self.recent(seconds, now)
+        result = {'samples': len(times), 'seconds': seconds}
+        if not len(times):
+            return dict(result, fields={name: None for name in self.fields})
+        
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)  # all-NaN fields reduce to NaN
+            low = np.nanmin(values, axis=0)
+            mean = np.nanmean(values, axis=0)
+            p95 = np.nanpercentile(values, 95, axis=0)
+        last = values[-1]
+        result['fields'] = {
+            name: None if np.isnan(mean[column]) else {
+                'min': round(float(low[column]), 2),
+                'avg': round(float(mean[column]), 2),
+                'p95': round(float(p95[column]), 2),
+                'last': None if np.isnan(last[column]) else round(float(last[column]), 2)
+            }
+            for name, column in self._index.items()
+        }
+        return result
+    
+    def sparkline(self, field: str, seconds: float, points: int = 60, now: Optional[float] = None) -> Dict[str, Any]:
+        """The field over the window averaged into at most `points` buckets, plus a text rendering"""
+        times, values = self.recent(seconds, now)
+        series = values[:, self._index[field]]
+        points = max(1, min(points, len(series)))
+        if not len(series):
+            return {'field': field, 'seconds': seconds, 'points': [], 'start': None, 'step_s': None, 'text': ''}
+        
+        # Equal-sized buckets from the newest sample back; the oldest few samples may be left out
+        size = len(series) // points
+        series = series[len(series) - size * points:].reshape(points, size)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            buckets = np.nanmean(series, axis=1)
+            low, high = np.nanmin(buckets), np.nanmax(buckets)
+        
+        text = ''
+        if not np.isnan(low):
+            scale = (len(SPARK_CHARS) - 1) / (high - low) if high > low else 0.0
+            text = ''.join(' ' if np.isnan(value) else SPARK_CHARS[int((value - low) * scale)] for value in buckets)
+        return {
+            'field': field,
+            'seconds': seconds,
+            'points': [None if np.isnan(value) else round(float(value), 2) for value in buckets],
+            'start': float(times[len(times) - size * points]),
+            'step_s': size * self.interval,
+            'text': text
+        }
+
+_RTT_PATTERN = re.compile(r'\brtt:([\d.]+)/')
+_PID_PATTERN = re.compile(r'pid=(\d+)')
+
+def tcp_rtts(pids: List[int]) -> Dict[int, float]:
+    """Smoothed TCP round-trip time (ms) of each process's established connection, from `ss -tinp`"""
+    if not pids:
+        return {}
+    try:
+        output = subprocess.run(['ss', '-tinpH', 'state', 'established'], capture_output=True,
+                                text=True, timeout=2).stdout
+    except (OSError, subprocess.SubprocessError):
+        return {}
+    
+    wanted, rtts, owner = set(pids), {}, None
+    for line in output.splitlines():
+        if not line.startswith(('\t', ' ')):
+            # Socket line; its details follow on the next, indented line
+            owner = next((int(pid) for pid in _PID_PATTERN.findall(line) if int(pid) in wanted), None)
+            continue
+        match = _RTT_PATTERN.search(line)
+        if owner is not None and match:
+            rtts[owner] = max(rtts.get(owner, 0.0), float(match.group(1)))
+            owner = None
+    return rtts
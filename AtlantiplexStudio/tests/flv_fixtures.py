@@ -0,0 +1,40 @@
+"""Synthetic FLV packets for the packet bus and its consumers (replay, recording, LL-HLS)"""
+
+import os
+import sys
+
+# Add studio root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from packet_bus import FlvTag, TAG_AUDIO, TAG_VIDEO
+
+SPS = b'\x67\x64\x00\x1f\xac'
+PPS = b'\x68\xee\x3c\x80'
+AVC_RECORD = bytes([1, 0x64, 0x00, 0x1f, 0xff, 0xe1]) + len(SPS).to_bytes(2, 'big') + SPS + b'\x01' + len(PPS).to_bytes(2, 'big') + PPS
+AAC_CONFIG = bytes([0xAF, 0x00, 0x11, 0x90])  # AAC LC, 48 kHz, stereo
+
+def video_config(timestamp=0, record=AVC_RECORD):
+    return FlvTag(TAG_VIDEO, timestamp, bytes([0x17, 0, 0, 0, 0]) + record)
+
+def audio_config(timestamp=0):
+    return FlvTag(TAG_AUDIO, timestamp, AAC_CONFIG)
+
+def video_tag(timestamp, keyframe=False, size=200, cts=0):
+    """One length-prefixed H.264 NAL unit (IDR for keyframes)"""
+    nal = (b'\x65' if keyframe else b'\x41') + bytes(size)
+    header = bytes([0x17 if keyframe else 0x27, 0x01]) + cts.to_bytes(3, 'big')
+    return FlvTag(TAG_VIDEO, timestamp, header + len(nal).to_bytes(4, 'big') + nal)
+
+def audio_tag(timestamp, size=20):
+    return FlvTag(TAG_AUDIO, timestamp, bytes([0xAF, 0x01]) + bytes(size))
+
+def publish(bus, start, frames, gop=30, frame_ms=33, size=200, audio_size=20, config=AVC_RECORD):
+    """Sequence headers whenever `config` is new on the bus, then a video frame every `frame_ms`
+    (a keyframe every `gop`) with an audio packet 5 ms after each"""
+    if bus.video_config is None or bus.video_config.data[5:] != config:
+        bus.publish(video_config(start, config))
+        bus.publish(audio_config(start))
+    for i in range(frames):
+        timestamp = start + int(i * frame_ms)
+        bus.publish(video_tag(timestamp, i % gop == 0, size))
+        bus.publish(audio_tag(timestamp + 5, audio_size))
@@ -0,0 +1,270 @@
+import unittest
+import sys
+import os
+import time
+import socket
+import threading
+
+# Add studio root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+class ThrottledSink:
+    """Local TCP sink that reads no faster than `rate_kbps`, like a congested uplink"""
+    
+    def __init__(self, rate_kbps: float, buffer_size: int = 16384):
+        self.rate_kbps = rate_kbps
+        self.received = 0
+        self._server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._server.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, buffer_size)
+        self._server.bind(('127.0.0.1', 0))
+        self._server.listen(1)
+        self.port = self._server.getsockname()[1]
+        self._running = True
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+    
+    def set_rate(self, rate_kbps: float):
+        self.rate_kbps = rate_kbps
+    
+    def _serve(self):
+        conn, _ = self._server.accept()
+        window_start, window_bytes, window_rate = time.monotonic(), 0, self.rate_kbps
+        with conn:
+            while self._running:
+                if self.rate_kbps != window_rate:
+                    window_start, window_bytes, window_rate = time.monotonic(), 0, self.rate_kbps
+                data = conn.recv(4096)
+                if not data:
+                    break
+                self.received += len(data)
+                window_bytes += len(data)
+                ahead = window_bytes * 8 / 1000.0 / window_rate - (time.monotonic() - window_start)
+                if ahead > 0:
+                    time.sleep(ahead)
+    
+    def close(self):
+        self._running = False
+        self._server.close()
+
+class SocketRelay:
+    """Stands in for the relay process: its stdin is a TCP connection to the sink"""
+    
+    def __init__(self, port: int, buffer_size: int = 16384):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, buffer_size)
+        self.sock.connect(('127.0.0.1', port))
+        self.stdin = self.sock.makefile('wb')
+    
+    def close(self):
+        self.sock.close()
+
+class SyntheticEncoders:
+    """Publishes FLV video at each rung's bitrate on its own bus, like shared encoders"""
+    
+    def __init__(self, ladder, fps: int = 30, gop: int = 15):
+        from packet_bus import PacketBus
+        
+        self.buses = [PacketBus(f"{rung['quality']}@{rung['bitrate']}k") for rung in ladder]
+        self.ladder = ladder
+        self.fps = fps
+        self.gop = gop
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+    
+    def _run(self):
+        from packet_bus import FlvTag, TAG_VIDEO
+        
+        start = time.monotonic()
+        frame = 0
+        while self._running:
+            timestamp = int(frame * 1000 / self.fps)
+            for bus, rung in zip(self.buses, self.ladder):
+                if frame == 0:
+                    bus.publish(FlvTag(TAG_VIDEO, 0, b'\x17\x00\x00\x00\x00config'))
+                size = max(8, rung['bitrate'] * 1000 // 8 // self.fps)
+                flags = b'\x17\x01' if frame % self.gop == 0 else b'\x27\x01'
+                bus.publish(FlvTag(TAG_VIDEO, timestamp, flags + bytes(size - 2)))
+            frame += 1
+            time.sleep(max(0.0, start + frame / self.fps - time.monotonic()))
+    
+    def stop(self):
+        self._running = False
+        self._thread.join(timeout=1)
+
+class TestBitrateLadder(unittest.TestCase):
+    """Test ladder construction from the quality presets"""
+    
+    def test_ladder_descends_through_resolutions(self):
+        """Bitrate falls monotonically, stepping within a resolution before dropping it"""
+        from adaptive_bitrate import build_ladder
+        from broadcast_engine import StreamQuality
+        
+        ladder = build_ladder(StreamQuality.QUALITY_PRESETS, '720p')
+        bitrates = [rung['bitrate'] for rung in ladder]
+        
+        self.assertEqual(ladder[0], {'quality': '720p', 'bitrate': 4500, 'width': 1280, 'height': 720})
+        self.assertEqual(bitrates, sorted(bitrates, reverse=True))
+        self.assertEqual(len(set(bitrates)), len(bitrates))
+        self.assertEqual([rung['quality'] for rung in ladder[:4]], ['720p', '720p', '720p', '480p'])
+        self.assertEqual(ladder[-1]['quality'], '360p')
+    
+    def test_tier_limits_cap_the_ladder(self):
+        """Rungs above the tier's max bitrate or resolution are left out"""
+        from adaptive_bitrate import build_ladder
+        from broadcast_engine import StreamQuality
+        
+        ladder = build_ladder(StreamQuality.QUALITY_PRESETS, '1080p', max_bitrate=4500)
+        self.assertEqual((ladder[0]['quality'], ladder[0]['bitrate']), ('720p', 4500))
+        
+        ladder = build_ladder(StreamQuality.QUALITY_PRESETS, '1080p', max_bitrate=10000, max_quality='480p')
+        self.assertEqual((ladder[0]['quality'], ladder[0]['bitrate']), ('480p', 2000))
+        
+        # A cap below every rung still leaves the lowest one
+        ladder = build_ladder(StreamQuality.QUALITY_PRESETS, '720p', max_bitrate=100)
+        self.assertEqual(len(ladder), 1)
+        self.assertEqual(ladder[0]['quality'], '360p')
+    
+    def test_engine_applies_tier_limits(self):
+        """start_platform_stream's config carries the tier limits into the ladder"""
+        import tempfile
+        from broadcast_engine import BroadcastEngine
+        
+        engine = BroadcastEngine()
+        engine.restart_history_path = os.path.join(tempfile.mkdtemp(), 'restart_history.json')
+        engine.stream_quality = '1080p'
+        
+        abr = engine._create_abr_controller('twitch', {'tier_limits': {'max_bitrate': 4500, 'resolution': '720p'}})
+        self.assertEqual((abr.rung['quality'], abr.rung['bitrate']), ('720p', 4500))
+        self.assertIsNone(engine._create_abr_controller('twitch', {'adaptive_bitrate': False}))
+
+class TestAdaptiveBitrateController(unittest.TestCase):
+    """Test the control loop on synthetic samples"""
+    
+    LADDER = [{'quality': 'hi', 'bitrate': 4000}, {'quality': 'mid', 'bitrate': 2000},
+              {'quality': 'lo', 'bitrate': 1000}]
+    
+    def make_controller(self, **kwargs):
+        from adaptive_bitrate import AdaptiveBitrateController
+        
+        options = dict(audio_kbps=0, up_hold=10.0, min_interval=4.0, smoothing=1.0)
+        options.update(kwargs)
+        return AdaptiveBitrateController('test', self.LADDER, **options)
+    
+    def run_link(self, controller, link, seconds, link_kbps, queued=None):
+        """Feed one sample per second of a link carrying `link_kbps` while the current rung is produced"""
+        if queued is not None:
+            link['queued'] = queued
+        decisions = []
+        for _ in range(seconds):
+            available = link['queued'] + controller.rung['bitrate'] * 1000 // 8
+            delivered = min(available, link_kbps * 1000 // 8)
+            link['queued'] = available - delivered
+            link['sent'] += delivered
+            decision = controller.sample(link['now'], link['sent'], link['queued'])
+            if decision is not None:
+                decisions.append((link['now'], decision))
+            link['now'] += 1
+        return decisions
+    
+    def new_link(self):
+        return {'now': 0, 'sent': 0, 'queued': 0}
+    
+    def test_congestion_steps_down_to_what_the_link_carries(self):
+        """A backlog on a slow link jumps straight to the rung the throughput fits"""
+        controller = self.make_controller()
+        decisions = self.run_link(controller, self.new_link(), 5, link_kbps=1500)
+        
+        self.assertEqual(decisions, [(2, 2)])  # 1500 * 0.85 only fits the 1000k rung
+        self.assertEqual(controller.downshifts, 1)
+        self.assertEqual(controller.state, 'draining')
+    
+    def test_step_up_waits_for_hold(self):
+        """A clear link is probed one rung at a time, only after the hold"""
+        controller = self.make_controller()
+        controller.index = 2
+        decisions = self.run_link(controller, self.new_link(), 25, link_kbps=10000)
+        
+        self.assertEqual([index for _, index in decisions], [1, 0])
+        self.assertGreaterEqual(decisions[0][0], 10)
+        self.assertGreaterEqual(decisions[1][0] - decisions[0][0], 10)
+    
+    def test_draining_backlog_holds_position(self):
+        """A backlog the link is draining triggers nothing"""
+        controller = self.make_controller()
+        controller.index = 1
+        link = self.new_link()
+        decisions = self.run_link(controller, link, 4, link_kbps=3000, queued=1000000)
+        
+        self.assertEqual(decisions, [])
+        self.assertEqual(controller.state, 'draining')
+        self.assertLess(link['queued'], 1000000)
+    
+    def test_failed_probe_doubles_hold(self):
+        """Congestion right after stepping up backs off further probes of that rung"""
+        controller = self.make_controller(up_hold=5.0)
+        controller.index = 1
+        link = self.new_link()
+        decisions = self.run_link(controller, link, 8, link_kbps=10000)
+        self.assertEqual(decisions, [(6, 0)])
+        
+        decisions = self.run_link(controller, link, 6, link_kbps=2500)
+        self.assertEqual([index for _, index in decisions], [1])
+        self.assertEqual(controller.failed_probes, 1)
+        self.assertEqual(controller.up_hold(0), 10.0)
+
+class TestThrottledRecovery(unittest.TestCase):
+    """Test the controller against a real socket whose bandwidth drops and returns"""
+    
+    def test_recovers_from_bandwidth_drop(self):
+        """The destination steps down, drains its backlog and climbs back after the link recovers"""
+        from adaptive_bitrate import AdaptiveBitrateController
+        from broadcast_engine import DestinationOutput
+        
+        ladder = [{'quality': 'hi', 'bitrate': 1600}, {'quality': 'mid', 'bitrate': 800},
+                  {'quality': 'lo', 'bitrate': 400}]
+        sink = ThrottledSink(rate_kbps=4000)
+        relay = SocketRelay(sink.port)
+        encoders = SyntheticEncoders(ladder)
+        output = DestinationOutput('local', relay)
+        controller = AdaptiveBitrateController('local', ladder, interval=0.25, backlog_high=0.5,
+                                               backlog_low=0.2, up_hold=1.0, min_interval=1.0,
+                                               audio_kbps=0)
+        output.switcher.switch_to(encoders.buses[0])
+        
+        def run_until(condition, timeout):
+            deadline = time.monotonic() + timeout
+            while time.monotonic() < deadline:
+                time.sleep(controller.interval)
+                rung = controller.sample(time.monotonic(), output.bytes_written, output.queued_bytes,
+                                         switching=output.switcher.pending is not None)
+                if rung is not None:
+                    output.switcher.switch_to(encoders.buses[rung])
+                if condition():
+                    return True
+            return False
+        
+        try:
+            self.assertTrue(run_until(lambda: output.switcher.bus is encoders.buses[0], 2))
+            time.sleep(1)
+            self.assertEqual(controller.downshifts, 0)
+            
+            # Uplink drops below the top rung: step down, then drain the backlog
+            sink.set_rate(1200)
+            self.assertTrue(run_until(lambda: controller.index > 0 and output.switcher.bus is not encoders.buses[0], 10))
+            self.assertLessEqual(controller.rung['bitrate'], 1200)
+            self.assertTrue(run_until(lambda: controller.state == 'stable', 10))
+            self.assertLess(output.queued_bytes * 8 / 1000.0 / controller.rung['bitrate'], 0.5)
+            
+            # Bandwidth returns: the probe climbs back to the top rung
+            sink.set_rate(4000)
+            self.assertTrue(run_until(lambda: output.switcher.bus is encoders.buses[0], 10))
+            self.assertGreaterEqual(controller.upshifts, 1)
+        finally:
+            encoders.stop()
+            output.close()
+            relay.close()
+            sink.close()
+
+if __name__ == '__main__':
+    unittest.main()
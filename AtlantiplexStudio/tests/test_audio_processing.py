@@ -0,0 +1,430 @@
+import unittest
+import sys
+import os
+from unittest.mock import patch
+
+import numpy as np
+
+# Add studio root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+def reference_biquad(coefficients, signal):
+    """Plain per-sample direct form II transposed biquad"""
+    b0, b1, b2, a1, a2 = coefficients
+    output = np.zeros_like(signal)
+    z1 = np.zeros(signal.shape[1])
+    z2 = np.zeros(signal.shape[1])
+    for n in range(signal.shape[0]):
+        x = signal[n]
+        y = b0 * x + z1
+        z1 = b1 * x - a1 * y + z2
+        z2 = b2 * x - a2 * y
+        output[n] = y
+    return output
+
+class TestBlockFilters(unittest.TestCase):
+    """Test the vectorized block filters"""
+    
+    def test_block_filter_matches_sample_recursion(self):
+        """Block processing is seamless across block boundaries"""
+        from audio_processing import BlockLinearFilter, design_biquad
+        
+        coefficients = design_biquad('highpass', 48000, 120.0)
+        signal = np.random.default_rng(1).standard_normal((4096, 2))
+        
+        block_filter = BlockLinearFilter(coefficients, channels=2)
+        blocks = [block_filter.process(signal[i:i + 1024]) for i in range(0, 4096, 1024)]
+        
+        np.testing.assert_allclose(np.concatenate(blocks), reference_biquad(coefficients, signal), atol=1e-9)
+    
+    def test_highpass_removes_dc(self):
+        """High-pass filter removes a DC offset"""
+        from audio_processing import HighPassFilter
+        
+        effect = HighPassFilter(44100, 2, {'cutoff': 80})
+        block = np.full((1024, 2), 0.5)
+        for _ in range(20):
+            output = effect.process(block)
+        self.assertLess(np.max(np.abs(output)), 1e-3)
+
+class TestDynamics(unittest.TestCase):
+    """Test noise gate and compressor"""
+    
+    def test_noise_gate_closes_on_quiet_input(self):
+        """Noise gate attenuates input below threshold"""
+        from audio_processing import NoiseGate
+        
+        gate = NoiseGate(44100, 2, {'threshold_db': -40, 'release_ms': 10})
+        quiet = np.full((1024, 2), 10 ** (-60 / 20))
+        for _ in range(10):
+            output = gate.process(quiet)
+        self.assertLess(np.max(np.abs(output)), 1e-4)
+        
+        loud = np.full((1024, 2), 0.5)
+        for _ in range(5):
+            output = gate.process(loud)
+        np.testing.assert_allclose(output[-1], 0.5, rtol=1e-3)
+    
+    def test_compressor_reduces_loud_input(self):
+        """Compressor pulls levels above threshold toward the ratio"""
+        from audio_processing import Compressor
+        
+        compressor = Compressor(44100, 2, {'threshold_db': -20, 'ratio': 4, 'knee_db': 0, 'attack_ms': 1})
+        loud = np.full((1024, 2), 10 ** (-4 / 20))
+        for _ in range(20):
+            output = compressor.process(loud)
+        
+        # 16 dB over threshold at 4:1 leaves 4 dB over, i.e. -16 dBFS
+        level_db = 20 * np.log10(np.abs(output[-1, 0]))
+        self.assertAlmostEqual(level_db, -16.0, delta=0.1)
+
+class TestAudioMixer(unittest.TestCase):
+    """Test mixer balance and effects wiring"""
+    
+    def setUp(self):
+        from broadcast_engine import AudioMixer
+        self.mixer = AudioMixer()
+    
+    def test_balance_applied(self):
+        """Hard-left balance silences the right channel"""
+        self.mixer.add_source('mic', {'balance': -1.0})
+        block = np.full((1024, 2), 1000, dtype=np.int16)
+        
+        mixed = self.mixer.mix_audio({'mic': block})
+        self.assertTrue(np.all(mixed[:, 0] == 1000))
+        self.assertTrue(np.all(mixed[:, 1] == 0))
+    
+    def test_mix_does_not_wrap(self):
+        """Summing loud sources clips instead of wrapping around"""
+        self.mixer.add_source('a', {})
+        self.mixer.add_source('b', {})
+        block = np.full((1024, 2), 30000, dtype=np.int16)
+        
+        mixed = self.mixer.mix_audio({'a': block, 'b': block})
+        self.assertTrue(np.all(mixed == 32767))
+    
+    def test_effect_cost_in_stats(self):
+        """Per-effect CPU cost is reported per source"""
+        self.mixer.add_source('guest', {'effects': ['highpass', {'type': 'compressor', 'ratio': 2}]})
+        block = np.zeros((1024, 2), dtype=np.int16)
+        for _ in range(3):
+            self.mixer.mix_audio({'guest': block})
+        
+        effects = self.mixer.get_stats()['sources']['guest']['effects']
+        self.assertEqual([e['type'] for e in effects], ['highpass', 'compressor'])
+        self.assertTrue(all(e['total_cpu_ms'] > 0 for e in effects))
+    
+    def test_voice_ducks_music(self):
+        """Music drops by the duck depth while voice is active and recovers after"""
+        self.mixer.add_source('voice', {'role': 'voice'})
+        self.mixer.add_source('music', {'role': 'music'})
+        self.mixer.set_ducking({'depth_db': 12, 'attack_ms': 10, 'release_ms': 100})
+        music = np.full((1024, 2), 8000, dtype=np.int16)
+        speech = np.full((1024, 2), 4000, dtype=np.int16)
+        silence = np.zeros((1024, 2), dtype=np.int16)
+        
+        for _ in range(10):
+            self.mixer.mix_audio({'voice': speech, 'music': music})
+        self.assertAlmostEqual(self.mixer.ducker.gain_db, -12.0, delta=0.1)
+        mixed = self.mixer.mix_audio({'voice': silence, 'music': music})
+        self.assertLess(mixed[0, 0], 3000)
+        
+        for _ in range(40):
+            mixed = self.mixer.mix_audio({'voice': silence, 'music': music})
+        self.assertTrue(np.all(mixed == 8000))
+    
+    def test_sources_added_and_removed_mid_block(self):
+        """A block mixes and meters the sources it started with; changes land at the next block"""
+        block = np.full((1024, 2), 1000, dtype=np.int16)
+        self.mixer.add_source('host', {})
+        self.mixer.add_source('guest', {})
+        pull = self.mixer._pull_block
+        
+        def pull_and_change(source_info):
+            if source_info['id'] == 'host':
+                self.mixer.remove_source('guest')
+                for index in range(16):
+                    self.mixer.add_source(f'caller_{index}', {})
+                self.mixer.push_audio('caller_0', block)
+            return pull(source_info)
+        
+        with patch.object(self.mixer, '_pull_block', side_effect=pull_and_change):
+            mixed = self.mixer.mix_audio({'host': block, 'guest': block})
+        self.assertTrue(np.all(mixed == 2000))
+        self.assertEqual(set(self.mixer.get_levels()['sources']), {'host', 'guest'})
+        
+        mixed = self.mixer.mix_audio({'host': block})
+        self.assertTrue(np.all(mixed == 2000))
+        self.assertEqual(len(self.mixer.get_levels()['sources']), 17)
+        self.assertNotIn('guest', self.mixer.get_levels()['sources'])
+
+class TestResampling(unittest.TestCase):
+    """Test the sample-rate conversion and channel mapping stage"""
+    
+    def test_resampled_sine_keeps_frequency_and_level(self):
+        """A 44.1 kHz tone comes out at 48 kHz with unity gain"""
+        from audio_processing import PolyphaseResampler
+        
+        resampler = PolyphaseResampler(44100, 48000, channels=1)
+        tone = np.sin(2 * np.pi * 1000 * np.arange(44100) / 44100)[:, None]
+        output = np.concatenate([resampler.process(tone[i:i + 1024]) for i in range(0, 44100, 1024)])
+        
+        self.assertAlmostEqual(len(output), 48000, delta=2)
+        steady = output[2000:46000, 0]
+        expected = np.sin(2 * np.pi * 1000 * (np.arange(2000, 46000) - 16 * 48000 / 44100) / 48000)
+        np.testing.assert_allclose(steady, expected, atol=2e-3)
+    
+    def test_block_boundaries_are_seamless(self):
+        """Splitting the input differently gives identical output"""
+        from audio_processing import PolyphaseResampler
+        
+        signal = np.random.default_rng(3).standard_normal((6000, 2)).astype(np.float32)
+        whole = PolyphaseResampler(16000, 48000, 2).process(signal)
+        
+        chunked_resampler = PolyphaseResampler(16000, 48000, 2)
+        chunked = np.concatenate([chunked_resampler.process(signal[i:i + 333]) for i in range(0, 6000, 333)])
+        np.testing.assert_allclose(chunked, whole, atol=1e-5)
+    
+    def test_filter_banks_are_cached_per_rate_pair(self):
+        """Sources sharing a rate pair share one filter bank"""
+        from audio_processing import PolyphaseResampler
+        
+        first = PolyphaseResampler(44100, 48000, 2)
+        second = PolyphaseResampler(44100, 48000, 1)
+        self.assertIs(first.bank, second.bank)
+    
+    def test_mono_guest_is_mapped_to_stereo(self):
+        """Mono input lands on both mixer channels"""
+        from broadcast_engine import AudioMixer
+        
+        mixer = AudioMixer()
+        mixer.add_source('guest', {'channels': 1})
+        mixed = mixer.mix_audio({'guest': np.full(1024, 2000, dtype=np.int16)})
+        self.assertTrue(np.all(mixed == 2000))
+
+class TestJitterBuffer(unittest.TestCase):
+    """Test per-source jitter buffering"""
+    
+    def setUp(self):
+        from audio_processing import JitterBuffer
+        self.buffer = JitterBuffer(1024, 2, 48000)
+        self.out = np.zeros((1024, 2), dtype=np.float32)
+    
+    def test_late_block_is_concealed_and_target_grows(self):
+        """An underrun repeats the last block faded and deepens the cushion"""
+        self.buffer.write(np.full((1024, 2), 0.4, dtype=np.float32))
+        self.assertTrue(self.buffer.read(self.out))
+        
+        self.assertTrue(self.buffer.read(self.out))
+        np.testing.assert_allclose(self.out, 0.2)
+        stats = self.buffer.get_stats()
+        self.assertEqual(stats['underruns'], 1)
+        self.assertGreater(stats['target_ms'], 1024 / 48.0)
+        
+        # Playback resumes only once the deeper target is buffered
+        self.buffer.write(np.full((1024, 2), 0.1, dtype=np.float32))
+        self.buffer.read(self.out)
+        self.assertTrue(self.buffer.priming)
+        self.buffer.write(np.full((1024, 2), 0.1, dtype=np.float32))
+        self.buffer.read(self.out)
+        self.assertFalse(self.buffer.priming)
+        np.testing.assert_allclose(self.out, 0.1)
+    
+    def test_silent_source_goes_idle(self):
+        """A buffer that never received audio reports idle"""
+        self.assertFalse(self.buffer.read(self.out))
+        self.assertEqual(self.buffer.get_stats()['underruns'], 0)
+    
+    def test_fast_producer_clock_is_corrected(self):
+        """A producer running 2000 ppm fast neither overruns nor grows without bound"""
+        chunk = np.full((1026, 2), 0.25, dtype=np.float32)
+        corrected = False
+        for _ in range(3000):
+            self.buffer.write(chunk)
+            self.buffer.read(self.out)
+            corrected = corrected or self.buffer.correction > 0
+        
+        stats = self.buffer.get_stats()
+        self.assertTrue(corrected)
+        self.assertEqual(stats['overruns'], 0)
+        self.assertLess(stats['depth_ms'], 60.0)
+        np.testing.assert_allclose(self.out, 0.25, rtol=1e-5)
+
+class TestMetering(unittest.TestCase):
+    """Test level and loudness metering"""
+    
+    def test_stereo_sine_loudness(self):
+        """A -20 dBFS 1 kHz tone on both channels reads about -20 LUFS"""
+        from broadcast_engine import AudioMixer
+        
+        mixer = AudioMixer()
+        mixer.add_source('tone', {})
+        tone = 0.1 * np.sin(2 * np.pi * 1000 * np.arange(1024 * 188) / 48000)
+        samples = np.rint(np.repeat(tone[:, None], 2, axis=1) * 32768).astype(np.int16)
+        for start in range(0, len(samples), 1024):
+            mixer.mix_audio({'tone': samples[start:start + 1024]})
+        
+        levels = mixer.get_levels()
+        for reading in (levels['master'], levels['sources']['tone']):
+            self.assertAlmostEqual(reading['short_term_lufs'], -20.0, delta=0.3)
+            self.assertAlmostEqual(reading['integrated_lufs'], -20.0, delta=0.3)
+            self.assertAlmostEqual(reading['peak_db'][0], -20.0, delta=0.1)
+            self.assertAlmostEqual(reading['rms_db'][0], -23.0, delta=0.1)
+    
+    def test_silence_is_gated_out(self):
+        """Silent stretches do not drag integrated loudness down"""
+        from audio_processing import MeterBank
+        
+        meters = MeterBank(48000, 1024, 2)
+        slot = meters.allocate('guest')
+        meters.begin_block()
+        loud = np.full((1024, 2), 0.0)
+        loud[::2] = 0.2
+        for index in range(400):
+            meters.inputs[slot] = loud if index % 2 == 0 else 0.0
+            meters.process()
+        with_gaps = meters.snapshot()['guest']['integrated_lufs']
+        
+        steady = MeterBank(48000, 1024, 2)
+        steady.allocate('guest')
+        steady.begin_block()
+        for index in range(400):
+            steady.inputs[0] = loud if index < 200 else 0.0
+            steady.process()
+        self.assertAlmostEqual(steady.snapshot()['guest']['integrated_lufs'], with_gaps, delta=3.5)
+        self.assertIsNotNone(with_gaps)
+    
+    def test_peaks_held_until_snapshot(self):
+        """A transient between UI pushes is still reported"""
+        from audio_processing import MeterBank
+        
+        meters = MeterBank(48000, 1024, 2)
+        meters.allocate('mic')
+        meters.begin_block()
+        meters.inputs[0, 10] = 0.5
+        meters.process()
+        meters.process()
+        
+        self.assertAlmostEqual(meters.snapshot()['mic']['peak_db'][0], -6.0, delta=0.1)
+        self.assertLess(meters.snapshot()['mic']['peak_db'][0], -100.0)
+    
+    def test_slot_changes_wait_for_the_next_block(self):
+        """A meter added mid-block is neither metered nor able to outgrow the arrays in use"""
+        from audio_processing import MeterBank
+        
+        meters = MeterBank(48000, 1024, 2, initial_slots=1)
+        meters.allocate('host')
+        inputs, slots = meters.begin_block()
+        inputs[slots['host']] = 0.5
+        
+        meters.allocate('guest')
+        meters.release('host')
+        meters.process()
+        self.assertEqual(set(meters.snapshot()), {'host'})
+        
+        inputs, slots = meters.begin_block()
+        self.assertEqual(set(slots), {'guest'})
+        self.assertEqual(len(inputs), 2)
+        self.assertFalse(inputs.any())
+
+class TestMixMinus(unittest.TestCase):
+    """Test mix-minus return feeds"""
+    
+    def setUp(self):
+        from broadcast_engine import AudioMixer
+        self.mixer = AudioMixer()
+    
+    def test_return_feed_excludes_own_voice(self):
+        """Each guest hears everything except itself"""
+        levels = {'host': 100, 'guest_a': 1000, 'guest_b': 3000}
+        for source_id in levels:
+            self.mixer.add_source(source_id, {'mix_minus': source_id != 'host'})
+        
+        blocks = {sid: np.full((1024, 2), level, dtype=np.int16) for sid, level in levels.items()}
+        self.mixer.mix_audio(blocks)
+        
+        feed_a = self.mixer.read_return_feed('guest_a', 1024)
+        feed_b = self.mixer.read_return_feed('guest_b', 1024)
+        self.assertTrue(np.all(feed_a == 3100))
+        self.assertTrue(np.all(feed_b == 1100))
+        self.assertIsNone(self.mixer.read_return_feed('host', 1024))
+    
+    def test_scales_to_manticore_guest_limit(self):
+        """999 guests are mixed in a single pass with independent feeds"""
+        blocks = {}
+        for index in range(999):
+            self.mixer.add_source(f'guest_{index}', {'mix_minus': True})
+            blocks[f'guest_{index}'] = np.full((1024, 2), index % 7, dtype=np.int16)
+        
+        mixed = self.mixer.mix_audio(blocks)
+        total = int(mixed[0, 0])
+        self.assertEqual(total, sum(index % 7 for index in range(999)))
+        
+        feed = self.mixer.read_return_feed('guest_500', 1024)
+        self.assertEqual(int(feed[0, 0]), total - 500 % 7)
+    
+    def test_slow_reader_counts_overrun(self):
+        """A reader that falls more than the ring behind skips ahead"""
+        self.mixer.add_source('guest', {'mix_minus': True})
+        self.mixer.add_source('music', {})
+        block = np.full((1024, 2), 50, dtype=np.int16)
+        for _ in range(20):
+            self.mixer.mix_audio({'guest': block, 'music': block})
+        
+        feed = self.mixer.read_return_feed('guest', 1024)
+        self.assertEqual(len(feed), 1024)
+        self.assertEqual(self.mixer.get_stats()['mix_minus']['guest']['overruns'], 1)
+    
+    def test_source_changes_mid_block_keep_returns_consistent(self):
+        """A guest removed mid-block still gets that block's return; a new one starts at the next"""
+        block = np.full((1024, 2), 1000, dtype=np.int16)
+        self.mixer.add_source('host', {})
+        self.mixer.add_source('guest', {'mix_minus': True})
+        pull = self.mixer._pull_block
+        
+        def pull_and_change(source_info):
+            if source_info['id'] == 'host':
+                self.mixer.remove_source('guest')
+                self.mixer.add_source('caller', {'mix_minus': True})
+                self.mixer.update_source('host', {'mix_minus': True})
+                self.mixer.push_audio('caller', block)
+            return pull(source_info)
+        
+        with patch.object(self.mixer, '_pull_block', side_effect=pull_and_change):
+            mixed = self.mixer.mix_audio({'host': block, 'guest': block})
+        self.assertTrue(np.all(mixed == 2000))
+        self.assertTrue(np.all(self.mixer.read_return_feed('guest', 1024) == 1000))
+        self.assertIsNone(self.mixer.read_return_feed('caller', 1024))
+        
+        mixed = self.mixer.mix_audio({'host': block})
+        self.assertTrue(np.all(mixed == 2000))
+        self.assertEqual(set(self.mixer.get_stats()['mix_minus']), {'host', 'caller'})
+        self.assertTrue(np.all(self.mixer.read_return_feed('caller', 1024) == 1000))
+        self.assertTrue(np.all(self.mixer.read_return_feed('host', 1024) == 1000))
+    
+    def test_allocation_during_a_block_waits_for_the_next_one(self):
+        """Slots added from the API thread mid-block don't disturb the block in flight"""
+        from audio_processing import MixMinusBank
+        bank = MixMinusBank(4, 2, initial_slots=1)
+        bank.allocate('guest_a')
+        contributions, slots = bank.begin_block()
+        contributions[slots['guest_a']] = 0.25
+        
+        # Would have grown the arrays under the mixer's feet
+        bank.allocate('guest_b')
+        bank.release('guest_a')
+        bus = contributions.sum(axis=0) + 0.5
+        bank.write_returns(bus, contributions)
+        
+        self.assertEqual(set(slots), {'guest_a'})
+        self.assertTrue(np.all(bank.read('guest_a', 4) == 16384))
+        self.assertIsNone(bank.read('guest_b', 4))
+        
+        contributions, slots = bank.begin_block()
+        self.assertEqual(set(slots), {'guest_b'})
+        self.assertEqual(len(contributions), 2)
+        self.assertFalse(contributions.any())
+        self.assertEqual(len(bank.read('guest_b', 4)), 0)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,185 @@
+import unittest
+import sys
+import os
+import json
+import shutil
+import tempfile
+from types import SimpleNamespace
+from unittest.mock import Mock, patch
+
+# Add studio root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from broadcast_engine import StreamQuality
+
+def candidates(*names):
+    return [{'key': f"{name}@{StreamQuality.get_quality(name)['bitrate']}k",
+             'settings': StreamQuality.get_quality(name)} for name in names]
+
+class TestCapacityPlanner(unittest.TestCase):
+    """Test the CPU model and admission decisions"""
+    
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.profile_path = os.path.join(self.directory, 'capacity_profile.json')
+    
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+    
+    def make_planner(self, cores=4, **kwargs):
+        from capacity_planner import CapacityPlanner
+        
+        return CapacityPlanner(self.profile_path, cores=cores, **kwargs)
+    
+    def test_estimate_scales_with_pixel_rate(self):
+        """Without a benchmark, cost follows resolution and frame rate"""
+        planner = self.make_planner()
+        cost_720 = planner.encoder_cost(StreamQuality.get_quality('720p'))
+        cost_1080 = planner.encoder_cost(StreamQuality.get_quality('1080p'))
+        
+        self.assertAlmostEqual((cost_1080 - 0.02) / (cost_720 - 0.02), 2.25, places=2)
+        self.assertLess(planner.encoder_cost(StreamQuality.get_quality('720p'), preset='ultrafast'), cost_720)
+    
+    def test_benchmark_profile_overrides_estimate(self):
+        """Measurements saved for this host replace the estimate; another host's are ignored"""
+        from capacity_planner import host_signature
+        
+        benchmarks = {'1280x720/veryfast': {'cores': 1.5, 'speed': 2.0, 'fps': 30}}
+        with open(self.profile_path, 'w') as f:
+            json.dump({'host': host_signature(), 'benchmarks': benchmarks}, f)
+        planner = self.make_planner()
+        self.assertAlmostEqual(planner.encoder_cost(StreamQuality.get_quality('720p')), 1.52)
+        self.assertAlmostEqual(planner.encoder_cost(dict(StreamQuality.get_quality('720p'), fps=60)), 3.02)
+        
+        with open(self.profile_path, 'w') as f:
+            json.dump({'host': 'another box x64', 'benchmarks': benchmarks}, f)
+        self.assertEqual(self.make_planner().benchmarks, {})
+    
+    def test_downgrades_before_rejecting(self):
+        """A request that does not fit takes the best lower rung that does"""
+        planner = self.make_planner(budget=0.7)  # 2.3 cores for encoders
+        running = {'1080p@8000k': StreamQuality.get_quality('1080p')}
+        
+        decision = planner.admit('twitch', candidates('1080p', '720p', '480p', '360p'), {}, 0)
+        self.assertTrue(decision['allowed'])
+        self.assertFalse(decision['downgraded'])
+        
+        # With 1080p running, a second 720p encoder does not fit but 480p does
+        decision = planner.admit('youtube', candidates('720p', '480p', '360p'), running, 1)
+        self.assertEqual(decision['key'], '480p@2000k')
+        self.assertTrue(decision['downgraded'])
+        
+        decision = planner.admit('youtube', candidates('720p', '480p'), running, 1, allow_downgrade=False)
+        self.assertFalse(decision['allowed'])
+        self.assertIn('cores', decision['reason'])
+    
+    def test_shared_encoder_costs_only_a_relay(self):
+        """Joining a running encoder fits even when a new encoder would not"""
+        planner = self.make_planner(budget=0.7)
+        running = {'1080p@8000k': StreamQuality.get_quality('1080p')}
+        
+        decision = planner.admit('facebook', candidates('1080p', '720p'), running, 1)
+        self.assertTrue(decision['allowed'])
+        self.assertTrue(decision['shared'])
+        self.assertEqual(decision['key'], '1080p@8000k')
+    
+    def test_first_encoder_is_always_admitted(self):
+        """A host below one encoder's cost still streams at the cheapest rung"""
+        planner = self.make_planner(cores=1)
+        decision = planner.admit('twitch', candidates('1080p', '720p'), {}, 0)
+        self.assertTrue(decision['allowed'])
+        self.assertEqual(decision['key'], '720p@4500k')
+
+class TestEngineAdmission(unittest.TestCase):
+    """Test admission and tier destination limits in start_platform_stream"""
+    
+    def setUp(self):
+        from broadcast_engine import BroadcastEngine
+        from capacity_planner import CapacityPlanner
+        
+        self.directory = tempfile.mkdtemp()
+        self.engine = BroadcastEngine()
+        self.engine.restart_history_path = os.path.join(self.directory, 'restart_history.json')
+        self.engine.planner = CapacityPlanner(os.path.join(self.directory, 'capacity_profile.json'), cores=2)
+    
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+    
+    def test_tier_destination_limit(self):
+        """Free tier (no multistream) allows one destination; paid tiers their `destinations`"""
+        self.engine.active_streams['youtube'] = {'encoder': '720p@4500k'}
+        config = {'rtmp_url': 'rtmp://example/live', 'stream_key': 'key'}
+        
+        result = self.engine.start_platform_stream('twitch', dict(config, tier_limits={'multistream': False}))
+        self.assertIn('1 simultaneous destination', result['error'])
+        
+        self.engine.active_streams['facebook'] = {'encoder': '720p@4500k'}
+        result = self.engine.start_platform_stream('twitch', dict(config, tier_limits={'multistream': True, 'destinations': 2}))
+        self.assertIn('2 simultaneous destination', result['error'])
+        self.assertIsNone(self.engine._destination_limit({'tier_limits': {}}))
+    
+    def test_adaptive_ladder_starts_at_admitted_rung(self):
+        """A downgraded adaptive destination never probes above what was admitted"""
+        self.engine.stream_quality = '1080p'
+        abr = self.engine._create_abr_controller('twitch', {})
+        self.engine.planner.reserved_cores = 1.7  # no budget left: only the first-encoder fallback applies
+        
+        decision = self.engine._admit('twitch', {}, abr)
+        self.assertTrue(decision['allowed'])
+        self.assertEqual(abr.ladder[0], decision['rung'])
+        self.assertEqual(abr.rung['quality'], '360p')
+    
+    def run_encoders(self, *keys):
+        for key in keys:
+            name, bitrate = key.rstrip('k').split('@')
+            quality = dict(StreamQuality.get_quality(name), bitrate=int(bitrate))
+            self.engine.encoders[key] = SimpleNamespace(key=key, quality=quality)
+    
+    def add_destination(self, platform, encoder, abr=None, config=None):
+        output = SimpleNamespace(bytes_written=0, queued_bytes=0, switcher=SimpleNamespace(pending=None))
+        self.engine.active_streams[platform] = {'output': output, 'abr': abr, 'progress': None,
+                                                'encoder': encoder, 'config': config or {}}
+        return output
+    
+    def test_abr_step_up_must_fit_the_budget(self):
+        """A probe onto an encoder that isn't running is refused when it would exceed the budget"""
+        self.engine.stream_quality = '720p'
+        abr = self.engine._create_abr_controller('twitch', {})
+        abr.index, abr.throughput_kbps = 1, 6000.0
+        output = self.add_destination('twitch', '720p@3400k', abr)
+        self.add_destination('youtube', '480p@2000k')
+        self.run_encoders('720p@3400k', '480p@2000k')
+        
+        with patch.object(abr, 'sample', side_effect=lambda *args, **kwargs: abr._change(0.0, 0, 'up')), \
+             patch.object(self.engine, '_move_destination') as move, \
+             patch.object(self.engine.supervisor, 'call_later'):
+            self.engine._abr_tick('twitch', output)
+        
+        move.assert_not_called()
+        self.assertEqual(abr.rung['bitrate'], 3400)
+        self.assertEqual(abr.up_hold(0), abr.base_up_hold * 2)
+        self.assertTrue(abr.changes[-1]['cpu_limited'])
+        self.assertEqual(abr.upshifts, 0)
+    
+    def test_quality_change_keeps_the_admitted_ladder_cut(self):
+        """Raising quality moves each destination to the best rung that fits, or leaves it where it is"""
+        self.engine.stream_quality = '480p'
+        self.engine.planner.cores = 3
+        abr = self.engine._create_abr_controller('twitch', {})
+        self.add_destination('twitch', '480p@2000k', abr)
+        self.add_destination('youtube', '720p@4500k', config={'adaptive_bitrate': False, 'allow_downgrade': False})
+        self.run_encoders('480p@2000k', '720p@4500k')
+        
+        with patch.object(self.engine, '_move_destination',
+                          side_effect=lambda platform, quality, bitrate=None: SimpleNamespace(
+                              key=self.engine._encoder_key(quality, bitrate))) as move:
+            result = self.engine.update_stream_quality('1080p')
+        
+        # 1080p does not fit next to the running encoders; 720p@4500k is already running
+        move.assert_called_once_with('twitch', '720p', 4500)
+        self.assertEqual(abr.ladder[0]['bitrate'], 4500)
+        self.assertEqual(result['switching'], ['twitch'])
+        self.assertEqual(result['rejected'], ['youtube'])
+
+if __name__ == '__main__':
+    unittest.main()
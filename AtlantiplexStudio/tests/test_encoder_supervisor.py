@@ -0,0 +1,219 @@
+import unittest
+import sys
+import os
+import json
+import time
+import shutil
+import tempfile
+import subprocess
+from datetime import datetime
+
+# Add studio root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+PROGRESS_BLOCK = """frame=300
+fps=30.00
+stream_0_0_q=23.0
+bitrate=4512.3kbits/s
+total_size=5640000
+out_time_us=10000000
+out_time=00:00:10.000000
+dup_frames=2
+drop_frames=1
+speed=1.01x
+progress=continue
+"""
+
+class FakeProcess:
+    """Stands in for a running encoder"""
+    
+    def poll(self):
+        return None
+
+class TestProgressParsing(unittest.TestCase):
+    """Test FFmpeg -progress parsing"""
+    
+    def test_block_is_parsed(self):
+        """A complete block yields typed throughput figures"""
+        from encoder_supervisor import ProgressParser
+        
+        parser = ProgressParser()
+        snapshots = [parser.feed(line) for line in PROGRESS_BLOCK.splitlines()]
+        progress = snapshots[-1]
+        
+        self.assertTrue(all(s is None for s in snapshots[:-1]))
+        self.assertEqual(progress['frame'], 300)
+        self.assertAlmostEqual(progress['bitrate_kbps'], 4512.3)
+        self.assertAlmostEqual(progress['speed'], 1.01)
+        self.assertEqual(progress['drop_frames'], 1)
+        self.assertEqual(progress['out_time_s'], 10.0)
+    
+    def test_unavailable_values(self):
+        """N/A values parse to None and never count as healthy"""
+        from encoder_supervisor import ProgressParser, is_keeping_up
+        
+        parser = ProgressParser()
+        for line in ('bitrate=N/A', 'speed=N/A'):
+            parser.feed(line)
+        progress = parser.feed('progress=continue')
+        self.assertIsNone(progress['bitrate_kbps'])
+        self.assertFalse(is_keeping_up(progress))
+    
+    def test_supervisor_streams_reports(self):
+        """Reports are delivered while the process is still running"""
+        from encoder_supervisor import EncoderSupervisor
+        
+        received = []
+        supervisor = EncoderSupervisor(lambda platform, process, progress: received.append((platform, progress)))
+        script = f"import sys, time; sys.stdout.write({PROGRESS_BLOCK!r}); sys.stdout.flush(); time.sleep(2)"
+        process = subprocess.Popen([sys.executable, '-c', script], stdout=subprocess.PIPE)
+        supervisor.watch('youtube', process)
+        
+        deadline = time.time() + 5
+        while not received and time.time() < deadline:
+            time.sleep(0.05)
+        self.assertIsNone(process.poll())
+        self.assertEqual(received[0][0], 'youtube')
+        process.wait()
+        supervisor.stop()
+
+class TestDiagnostics(unittest.TestCase):
+    """Test the bounded stderr ring"""
+    
+    def test_ring_is_bounded_and_counts_warnings(self):
+        """Old lines fall out of the ring; counters keep the totals"""
+        from encoder_supervisor import DiagnosticLog
+        
+        log = DiagnosticLog(max_bytes=1024)
+        for i in range(200):
+            log.feed(f"[flv @ 0x1] [warning] Non-monotonous DTS in output stream 0:1 ({i})\n".encode())
+        log.feed(b"[tcp @ 0x2] [error] Connection reset by peer\r")
+        
+        self.assertLessEqual(log.size, 1024)
+        self.assertEqual(log.counters['warnings'], 200)
+        self.assertEqual(log.counters['non_monotonic_dts'], 200)
+        self.assertEqual(log.counters['connection_errors'], 1)
+        self.assertIn('Connection reset', log.tail(1))
+    
+    def test_chatty_stderr_never_blocks(self):
+        """A process writing far more than a pipe buffer to stderr keeps running"""
+        from encoder_supervisor import DiagnosticLog, EncoderSupervisor
+        
+        supervisor = EncoderSupervisor(lambda *args: None)
+        log = DiagnosticLog()
+        script = "import sys\nfor i in range(20000): sys.stderr.write('[warning] frame %d late\\n' % i)"
+        process = subprocess.Popen([sys.executable, '-c', script], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        supervisor.watch('twitch', process, log)
+        
+        self.assertEqual(process.wait(timeout=10), 0)
+        self.assertTrue(log.finished.wait(timeout=5))
+        self.assertEqual(log.counters['warnings'], 20000)
+        self.assertIn('frame 19999 late', log.tail(1))
+        supervisor.stop()
+
+class TestProgressHealth(unittest.TestCase):
+    """Test throughput-based stream health"""
+    
+    def setUp(self):
+        from broadcast_engine import BroadcastEngine
+        from encoder_supervisor import ProgressParser
+        
+        self.engine = BroadcastEngine()
+        self.engine.restart_history_path = os.path.join(tempfile.mkdtemp(), 'restart_history.json')
+        self.process = FakeProcess()
+        self.engine.active_streams['twitch'] = {
+            'process': self.process, 'status': 'starting', 'started_at': datetime.now(),
+            'progress': None, 'slow_reports': 0
+        }
+        self.parser = ProgressParser()
+    
+    def report(self, speed, total_size):
+        block = PROGRESS_BLOCK.replace('speed=1.01x', f'speed={speed}x').replace('total_size=5640000', f'total_size={total_size}')
+        for line in block.splitlines():
+            progress = self.parser.feed(line)
+        self.engine._on_encoder_progress('twitch', self.process, progress)
+    
+    def test_speed_drives_status(self):
+        """Real-time speed goes live; sustained slow speed degrades"""
+        self.report(1.0, 1000)
+        self.assertEqual(self.engine.active_streams['twitch']['status'], 'live')
+        self.assertTrue(self.engine._check_stream_health('twitch', self.process))
+        
+        for _ in range(3):
+            self.report(0.9, 2000)
+        self.assertEqual(self.engine.active_streams['twitch']['status'], 'degraded')
+        self.assertFalse(self.engine._check_stream_health('twitch', self.process))
+    
+    def test_statistics_accumulate_deltas(self):
+        """Byte counters add per-report deltas rather than re-adding totals"""
+        self.report(1.0, 1000)
+        self.report(1.0, 3000)
+        self.assertEqual(self.engine.stats['bytes_sent'], 3000)
+        self.assertAlmostEqual(self.engine.stats['current_bitrate'], 4512.3)
+        
+        # frames_sent follows the relay's own frame counter, and the 5 s monitor tick adds nothing
+        self.assertEqual(self.engine.stats['frames_sent'], 300)
+        self.engine._update_statistics()
+        self.assertEqual(self.engine.stats['frames_sent'], 300)
+
+class TestRestartPolicy(unittest.TestCase):
+    """Test restart backoff and the circuit breaker"""
+    
+    def test_backoff_grows_with_jitter_and_opens_circuit(self):
+        """Delays double up to the cap, then the circuit opens"""
+        from encoder_supervisor import RestartTracker
+        
+        tracker = RestartTracker('twitch', base_delay=2, max_delay=10, max_failures=5, cooldown=300)
+        delays = [tracker.record_failure(1) for _ in range(4)]
+        for attempt, delay in enumerate(delays, start=1):
+            ceiling = min(10, 2 * 2 ** (attempt - 1))
+            self.assertTrue(ceiling / 2 <= delay <= ceiling)
+        self.assertEqual(tracker.state, 'backoff')
+        
+        self.assertEqual(tracker.record_failure(1), 300)
+        self.assertEqual(tracker.state, 'open')
+        tracker.record_attempt()
+        self.assertEqual(tracker.state, 'half_open')
+    
+    def test_stable_stream_starts_fresh_count(self):
+        """A failure after a long healthy run counts as the first"""
+        from encoder_supervisor import RestartTracker
+        
+        tracker = RestartTracker('youtube', stable_after=60)
+        tracker.record_failure(1)
+        tracker.record_failure(1)
+        tracker.record_live()
+        tracker.live_since -= 120
+        tracker.record_failure(1)
+        self.assertEqual(tracker.consecutive_failures, 1)
+        self.assertEqual(tracker.total_failures, 3)
+    
+    @unittest.skipIf(shutil.which('ffmpeg'), 'needs restarts to fail')
+    def test_failure_handling_never_blocks_and_keeps_count(self):
+        """Restarts run in the background and failed retries keep counting until the circuit opens"""
+        from broadcast_engine import BroadcastEngine
+        
+        engine = BroadcastEngine()
+        engine.restart_history_path = os.path.join(tempfile.mkdtemp(), 'restart_history.json')
+        engine.restart_policy.update({'base_delay': 0.01, 'max_delay': 0.02, 'max_failures': 3})
+        config = {'rtmp_url': 'rtmp://127.0.0.1:9/live', 'stream_key': 'key'}
+        
+        started = time.time()
+        engine._handle_stream_failure('twitch', config, exit_code=1, error='Connection refused')
+        self.assertLess(time.time() - started, 0.5)
+        
+        tracker = engine.restart_trackers['twitch']
+        deadline = time.time() + 5
+        while tracker.state != 'open' and time.time() < deadline:
+            time.sleep(0.02)
+        self.assertEqual(tracker.state, 'open')
+        self.assertEqual(tracker.total_restarts, 2)
+        
+        self.assertTrue(engine.stop_platform_stream('twitch')['cancelled_restart'])
+        with open(engine.restart_history_path) as f:
+            saved = json.load(f)
+        self.assertEqual(saved['twitch']['total_failures'], 3)
+        engine.supervisor.stop()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+import unittest
+import sys
+import os
+import time
+import threading
+
+import numpy as np
+
+# Add studio root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from frame_queue import FrameQueue
+
+def fill(frames, count, start_slot=0):
+    """Queue pictures 0..count-1, one slot each"""
+    for i in range(count):
+        frames.put(i, start_slot + i, 1)
+
+def drain(frames):
+    frames.close()
+    items = []
+    while True:
+        item = frames.get()
+        if item is None:
+            return items
+        items.append(item)
+
+class TestFrameQueue(unittest.TestCase):
+    """Test overflow policies; every policy must keep the slot count"""
+    
+    def test_unbounded_keeps_everything(self):
+        frames = FrameQueue()
+        fill(frames, 100)
+        self.assertEqual(len(drain(frames)), 100)
+        self.assertEqual(frames.dropped, 0)
+    
+    def test_drop_oldest(self):
+        """The oldest picture gives its slots to the next one"""
+        frames = FrameQueue(4, 'drop-oldest')
+        fill(frames, 6)
+        items = drain(frames)
+        self.assertEqual([data for data, _ in items], [2, 3, 4, 5])
+        self.assertEqual([copies for _, copies in items], [3, 1, 1, 1])
+        self.assertEqual(frames.get_stats()['dropped'], 2)
+    
+    def test_drop_non_reference_keeps_keyframe_slots(self):
+        """Pictures on keyframe slots survive; the newest other one becomes a repeat"""
+        frames = FrameQueue(4, 'drop-non-reference', keyframe_interval=4)
+        fill(frames, 4, start_slot=8)  # slot 8 is a keyframe
+        frames.put(4, 12, 1)  # keyframe slot, so picture 3 (slot 11) is repeated instead
+        items = drain(frames)
+        self.assertEqual([data for data, _ in items], [0, 1, 2, 4])
+        self.assertEqual(sum(copies for _, copies in items), 5)
+    
+    def test_half_rate_engages_and_recovers(self):
+        """After an overflow every other picture repeats until the queue drains to a quarter"""
+        frames = FrameQueue(8, 'half-rate')
+        fill(frames, 9)
+        self.assertTrue(frames.half_rate)
+        
+        self.assertTrue(frames.put('a', 9, 1))
+        self.assertFalse(frames.put('b', 10, 1))  # merged into 'a'
+        self.assertTrue(frames.put('c', 11, 1))
+        
+        written = []
+        while len(frames) > 2:
+            written.append(frames.get())
+        self.assertFalse(frames.half_rate)
+        written += drain(frames)
+        self.assertEqual(sum(copies for _, copies in written), 12)  # 9 + a, b, c
+    
+    def test_wait_time_is_measured(self):
+        frames = FrameQueue(4)
+        frames.put('a', 0, 1)
+        time.sleep(0.05)
+        frames.get()
+        self.assertGreaterEqual(frames.get_stats()['wait_max_ms'], 40)
+
+class SlowPipe:
+    """An encoder stdin that takes `delay` per write"""
+    
+    def __init__(self, delay):
+        self.delay = delay
+        self.writes = 0
+    
+    def write(self, data):
+        time.sleep(self.delay)
+        self.writes += 1
+    
+    def flush(self):
+        pass
+    
+    def close(self):
+        pass
+
+class TestEncoderFeederBackpressure(unittest.TestCase):
+    """A slow encoder sheds its own frames without blocking the caller"""
+    
+    def test_slow_encoder_does_not_block_submit(self):
+        from broadcast_engine import EncoderFeeder
+        
+        video, audio = SlowPipe(0.01), SlowPipe(0)
+        feeder = EncoderFeeder('slow', video, audio, fps=100, sample_rate=48000, channels=2,
+                               origin_pts=0.0, queue_frames=4, drop_policy='drop-oldest')
+        frame = np.zeros((4, 4, 3), dtype=np.uint8)
+        started = time.monotonic()
+        for i in range(100):
+            feeder.submit_video(frame, i / 100)
+        self.assertLess(time.monotonic() - started, 0.5)  # 100 writes take 1 s
+        
+        stats = feeder.get_stats()['queue']['video']
+        self.assertLessEqual(stats['max_depth'], 4)
+        self.assertGreater(stats['dropped'], 0)
+        self.assertTrue(feeder.lagging)
+        
+        feeder.close()
+        self.assertEqual(video.writes, 100)  # every slot is still written, as repeats
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,204 @@
+import unittest
+import sys
+import os
+import time
+import threading
+
+# Add studio root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from functools import partial
+
+import flv_fixtures
+from flv_fixtures import AVC_RECORD, PPS, SPS, audio_config, audio_tag, video_config, video_tag
+from packet_bus import PacketBus
+
+# 30 fps on an exact millisecond grid, 2 s GOPs
+publish = partial(flv_fixtures.publish, gop=60, frame_ms=1000 / 30, size=3000, audio_size=300)
+
+def read_pes_timestamp(field):
+    return (((field[0] >> 1) & 0x07) << 30) | (field[1] << 22) | ((field[2] >> 1) << 15) | (field[3] << 7) | (field[4] >> 1)
+
+class TestTsMuxer(unittest.TestCase):
+    """Test the FLV to MPEG-TS remux"""
+    
+    def setUp(self):
+        from hls_origin import TsMuxer
+        
+        self.muxer = TsMuxer()
+        self.muxer.set_config(video_config())
+        self.muxer.set_config(audio_config())
+    
+    def test_psi_sections_carry_valid_crc(self):
+        """PAT and PMT are single packets whose section CRC checks out"""
+        from hls_origin import crc32_mpeg, PMT_PID, VIDEO_PID, AUDIO_PID
+        
+        psi = self.muxer.psi()
+        self.assertEqual(len(psi), 376)
+        for packet in (psi[:188], psi[188:]):
+            self.assertEqual(packet[0], 0x47)
+            section_length = ((packet[6] & 0x0F) << 8) | packet[7]
+            section = packet[5:8 + section_length]
+            self.assertEqual(crc32_mpeg(section), 0)  # CRC over data plus CRC is zero
+        
+        pmt = psi[188:]
+        self.assertEqual(((pmt[1] & 0x1F) << 8) | pmt[2], PMT_PID)
+        self.assertEqual(((pmt[13] & 0x1F) << 8) | pmt[14], VIDEO_PID)  # PCR PID
+        self.assertEqual([pmt[17], pmt[22]], [0x1B, 0x0F])
+        self.assertEqual(((pmt[23] & 0x1F) << 8) | pmt[24], AUDIO_PID)
+    
+    def test_keyframe_is_annexb_with_parameter_sets(self):
+        """A keyframe PES starts with an AUD, SPS and PPS, and carries PCR and random access"""
+        data = self.muxer.mux(video_tag(1000, True, size=500, cts=40))
+        self.assertEqual(len(data) % 188, 0)
+        self.assertTrue(all(data[i] == 0x47 for i in range(0, len(data), 188)))
+        
+        adaptation_length = data[4]
+        self.assertEqual(data[5] & 0x50, 0x50)  # random access and PCR flags
+        pes = data[5 + adaptation_length:]
+        self.assertEqual(pes[:4], b'\x00\x00\x01\xe0')
+        pts, dts = read_pes_timestamp(pes[9:14]), read_pes_timestamp(pes[14:19])
+        self.assertEqual(pts - dts, 40 * 90)
+        
+        payload = pes[19:]
+        self.assertTrue(payload.startswith(b'\x00\x00\x00\x01\x09\xf0\x00\x00\x00\x01' + SPS + b'\x00\x00\x00\x01' + PPS))
+        self.assertIn(b'\x00\x00\x00\x01\x65', payload)
+    
+    def test_continuity_counters_per_pid(self):
+        """Each PID counts its own packets modulo 16"""
+        data = b''.join(self.muxer.mux(video_tag(i * 33, i == 0, size=2000)) for i in range(5))
+        counters = [data[i + 3] & 0x0F for i in range(0, len(data), 188)]
+        self.assertEqual(counters, [i % 16 for i in range(len(counters))])
+    
+    def test_aac_gets_adts_header(self):
+        """AAC frames are wrapped in ADTS headers describing the sequence header's config"""
+        data = self.muxer.mux(audio_tag(0, 100))
+        pes = data[4 + 1 + data[4]:]  # stuffed through the adaptation field
+        adts = pes[14:21]
+        self.assertEqual(adts[:2], b'\xff\xf1')
+        self.assertEqual((adts[2] >> 2) & 0x0F, 3)  # 48 kHz
+        self.assertEqual((((adts[3] & 0x03) << 11) | (adts[4] << 3) | (adts[5] >> 5)), 107)
+
+class TestLLHlsOrigin(unittest.TestCase):
+    """Test partial segments, the playlist and blocking requests"""
+    
+    def setUp(self):
+        from hls_origin import LLHlsOrigin
+        
+        self.bus = PacketBus('720p@4500k')
+        self.origin = LLHlsOrigin(segment_s=2.0, part_s=0.5, window=3)
+        self.origin.switcher.switch_to(self.bus)
+    
+    def tearDown(self):
+        self.origin.stop()
+    
+    def drain(self):
+        deadline = time.time() + 5
+        while not self.origin._queue.empty() and time.time() < deadline:
+            time.sleep(0.01)
+        time.sleep(0.05)
+    
+    def test_parts_and_segments_follow_targets(self):
+        """Parts stay within the part target; segments start with an independent part"""
+        publish(self.bus, 0, 400)
+        self.drain()
+        
+        segments = list(self.origin.segments)
+        self.assertGreaterEqual(len(segments), 3)
+        for segment in segments:
+            self.assertTrue(segment.parts[0].independent)
+            self.assertAlmostEqual(segment.duration, 2.0, places=2)
+            self.assertTrue(all(part.duration <= 0.5 for part in segment.parts))
+            self.assertEqual(segment.data, b''.join(part.data for part in segment.parts))
+            self.assertEqual(segment.data[:3], b'\x47\x40\x00')  # starts with a PAT
+    
+    def test_playlist_lists_recent_parts_and_preload_hint(self):
+        """The playlist slides with the window and ends with a hint for the next part"""
+        origin = self.origin
+        origin.window = 6
+        publish(self.bus, 0, 600)  # 20 s of video
+        self.drain()
+        playlist = origin.playlist
+        
+        first_listed = origin.segments[-6].msn
+        self.assertIn(f'#EXT-X-MEDIA-SEQUENCE:{first_listed}', playlist)
+        self.assertIn('#EXT-X-SERVER-CONTROL:CAN-BLOCK-RELOAD=YES,PART-HOLD-BACK=1.500', playlist)
+        self.assertNotIn(f'{origin.session}_{first_listed - 1}.ts', playlist)
+        self.assertEqual(playlist.count('#EXTINF'), 6)
+        # Parts are only listed within three target durations of the live edge
+        self.assertNotIn(f'{origin.session}_{first_listed}.0.ts', playlist)
+        self.assertIn(f'{origin.session}_{origin.segments[-1].msn}.0.ts', playlist)
+        self.assertTrue(playlist.rstrip().endswith(
+            f'#EXT-X-PRELOAD-HINT:TYPE=PART,URI="{origin.session}_{origin.open.msn}.{len(origin.open.parts)}.ts"'))
+    
+    def test_quality_change_marks_discontinuity(self):
+        """New sequence headers start a segment flagged as a discontinuity"""
+        publish(self.bus, 0, 120)
+        other_record = AVC_RECORD[:-1] + b'\x81'
+        publish(self.bus, 4000, 120, config=other_record)
+        self.drain()
+        
+        self.assertIn('#EXT-X-DISCONTINUITY\n', self.origin.playlist)
+        discontinuous = [segment for segment in self.origin.segments if segment.discontinuity]
+        self.assertEqual(discontinuous[0].start_ts, 4000)
+    
+    def test_blocking_reload_waits_for_the_part(self):
+        """A reload for a future part returns once it exists; too far ahead is a bad request"""
+        publish(self.bus, 0, 61)
+        self.drain()
+        live = self.origin.open
+        wanted = (live.msn, len(live.parts) + 1)
+        
+        result = {}
+        def reload():
+            result['playlist'] = self.origin.get_playlist(*wanted, timeout=5)
+        thread = threading.Thread(target=reload)
+        thread.start()
+        time.sleep(0.2)
+        self.assertTrue(thread.is_alive())
+        
+        publish(self.bus, 2033, 40)
+        thread.join(timeout=5)
+        status, playlist = result['playlist']
+        self.assertEqual(status, 200)
+        self.assertIn(f'URI="{self.origin.session}_{wanted[0]}.{wanted[1]}.ts"', playlist)
+        
+        self.assertEqual(self.origin.get_playlist(live.msn + 5, 0)[0], 400)
+        self.assertEqual(self.origin.get_playlist(live.msn + 1, 0, timeout=0.1)[0], 503)
+    
+    def test_http_responses_and_cache_headers(self):
+        """Playlists are not cached unless blocking; segments and parts are immutable"""
+        from flask import Flask
+        import broadcast_engine
+        
+        app = Flask(__name__)
+        broadcast_engine.setup_broadcast_api(app)
+        client = app.test_client()
+        publish(self.bus, 0, 200)
+        self.drain()
+        
+        broadcast_engine.broadcast_engine.hls = self.origin
+        try:
+            response = client.get('/hls/index.m3u8')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.headers['Content-Type'], 'application/vnd.apple.mpegurl')
+            self.assertEqual(response.headers['Cache-Control'], 'no-cache')
+            self.assertEqual(response.headers['Access-Control-Allow-Origin'], '*')
+            
+            msn = self.origin.open.msn
+            response = client.get(f'/hls/index.m3u8?_HLS_msn={msn}&_HLS_part=0')
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.headers['Cache-Control'].startswith('public, max-age='))
+            
+            response = client.get(f'/hls/{self.origin.session}_{msn - 1}.1.ts')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.headers['Content-Type'], 'video/mp2t')
+            self.assertIn('immutable', response.headers['Cache-Control'])
+            self.assertEqual(response.data, self.origin.segments[-1].parts[1].data)
+            
+            self.assertEqual(client.get('/hls/oldsession_0.ts').status_code, 404)
+        finally:
+            broadcast_engine.broadcast_engine.hls = None
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+import unittest
+import sys
+import os
+
+# Add studio root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from load_harness import RtmpSink, compare
+
+class TestLoadHarness(unittest.TestCase):
+    """Test the sink's latency window and result comparison"""
+    
+    def test_window_latency_uses_relay_base(self):
+        """Latency is arrival minus PTS on the media clock, counting only the window"""
+        sink = RtmpSink(19350, clock_ms=lambda: 0.0)
+        # The relay started at media time 5000 ms; pictures arrive 120-180 ms after their PTS
+        sink.arrivals = [(5000 + pts + delay, pts) for pts, delay in ((0, 150), (33, 120), (66, 180), (100, 150))]
+        
+        window = sink.window(5152, 5300, base_ts=5000)
+        self.assertEqual(window['frames'], 3)
+        self.assertEqual(window['latency_ms']['max'], 180)
+        self.assertEqual(window['latency_ms']['p50'], 150)
+        self.assertIsNone(sink.window(5152, 5300, base_ts=None)['latency_ms'])
+    
+    def test_compare_matches_runs_by_destination_count(self):
+        def results(fps, p95, cpu, counts):
+            return {'runs': [{
+                'destinations': count,
+                'outputs': {'load1': {'fps': fps, 'latency_ms': {'p95': p95}}},
+                'totals': {'dropped_frames': 0, 'cpu_percent': cpu}
+            } for count in counts]}
+        
+        rows = compare(results(30.0, 200.0, 80.0, [1, 2]), results(29.5, 250.0, 95.5, [2, 4]))
+        self.assertEqual([row['destinations'] for row in rows], [2, 4])
+        self.assertEqual(rows[0]['latency_p95_ms']['delta'], 50.0)
+        self.assertEqual(rows[0]['cpu_percent']['delta'], 15.5)
+        self.assertIsNone(rows[1]['fps']['previous'])
+
+if __name__ == '__main__':
+    unittest.main()
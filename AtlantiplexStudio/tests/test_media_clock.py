@@ -0,0 +1,91 @@
+import unittest
+import sys
+import os
+
+import numpy as np
+
+# Add studio root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+class TestTimelines(unittest.TestCase):
+    """Test PTS placement onto constant-rate encoder inputs"""
+    
+    def test_video_duplicates_and_drops_by_pts(self):
+        """Late frames fill skipped slots, early repeats are dropped"""
+        from media_clock import VideoTimeline
+        
+        timeline = VideoTimeline(fps=30, origin_pts=10.0)
+        self.assertEqual(timeline.place(10.0), 1)
+        self.assertEqual(timeline.place(10.0 + 3 / 30), 3)  # two slots were missed
+        self.assertEqual(timeline.place(10.0 + 3.2 / 30), 0)  # slot already written
+        self.assertEqual(timeline.duplicated, 2)
+        self.assertEqual(timeline.dropped, 1)
+        self.assertAlmostEqual(timeline.position, 4 / 30)
+    
+    def test_audio_drift_is_nudged_away(self):
+        """A slow audio clock is stretched until the encoder catches up"""
+        from media_clock import AudioTimeline
+        
+        timeline = AudioTimeline(48000, 2)
+        block = np.zeros((1024, 2), dtype=np.int16)
+        pts = 0.0
+        for _ in range(1000):
+            timeline.place(block, pts)
+            pts += 1024 / 48000 * 1.002  # blocks arrive 0.2% slower than real time
+        
+        self.assertLess(abs(timeline.drift), 0.005)
+        self.assertGreater(timeline.correction, 0)
+        self.assertEqual(timeline.resyncs, 0)
+    
+    def test_audio_gap_is_padded(self):
+        """A gap past the resync threshold is filled with silence"""
+        from media_clock import AudioTimeline
+        
+        timeline = AudioTimeline(48000, 2)
+        block = np.ones((1024, 2), dtype=np.int16)
+        timeline.place(block, 0.0)
+        output = timeline.place(block, 1.0)
+        
+        self.assertEqual(len(output), 48000)
+        self.assertEqual(timeline.resyncs, 1)
+        self.assertTrue(np.all(output[:48000 - 1024] == 0))
+
+class TestStamping(unittest.TestCase):
+    """Test PTS stamping in the compositor and mixer"""
+    
+    def test_mixer_blocks_are_contiguous(self):
+        """Mixed blocks carry back-to-back PTS from the resync point"""
+        from broadcast_engine import AudioMixer
+        
+        mixer = AudioMixer()
+        mixer.resync(5.0)
+        mixer.mix_audio()
+        mixer.mix_audio()
+        self.assertAlmostEqual(mixer.last_pts, 5.0 + 1024 / 48000)
+        self.assertAlmostEqual(mixer.next_pts, 5.0 + 2 * 1024 / 48000)
+    
+    def test_compositor_stamps_from_clock(self):
+        """Composed frames are stamped with the master clock when it runs"""
+        from broadcast_engine import VideoCompositor
+        from media_clock import MediaClock
+        
+        clock = MediaClock()
+        compositor = VideoCompositor(64, 36, 30, clock=clock)
+        compositor.compose_frame({})
+        compositor.compose_frame({})
+        self.assertAlmostEqual(compositor.last_pts, 1 / 30)
+        
+        clock.start()
+        compositor.compose_frame({})
+        self.assertLess(compositor.last_pts, 1.0)
+    
+    def test_audio_uses_separate_pipe(self):
+        """Audio is read from its own pipe rather than sharing stdin"""
+        from broadcast_engine import BroadcastEngine, StreamQuality
+        
+        cmd = BroadcastEngine()._build_ffmpeg_command(StreamQuality.get_quality('720p'), audio_fd=7)
+        inputs = [cmd[i + 1] for i, arg in enumerate(cmd) if arg == '-i']
+        self.assertEqual(inputs, ['pipe:0', 'pipe:7'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import unittest
+import sys
+import os
+
+# Add studio root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from functools import partial
+
+from flv_fixtures import audio_tag as audio, publish, video_config, video_tag as video
+from packet_bus import FLV_HEADER, FlvReader, KeyframeSwitcher, PacketBus
+
+# Short GOPs so splices happen within a few frames
+run_encoder = partial(publish, gop=4)
+
+class TestFlv(unittest.TestCase):
+    """Test FLV tag serialization and demuxing"""
+    
+    def test_round_trip_in_fragments(self):
+        """Tags split across arbitrary reads come back intact"""
+        tags = [video_config(), video(40, keyframe=True), audio(0x1234567)]
+        stream = FLV_HEADER + b''.join(tag.to_bytes() for tag in tags)
+        
+        reader = FlvReader()
+        parsed = []
+        for i in range(0, len(stream), 7):
+            parsed.extend(reader.feed(stream[i:i + 7]))
+        
+        self.assertEqual([(t.tag_type, t.timestamp, t.data) for t in parsed],
+                         [(t.tag_type, t.timestamp, t.data) for t in tags])
+        self.assertTrue(parsed[0].is_config)
+        self.assertTrue(parsed[1].is_keyframe)
+
+class TestKeyframeSwitcher(unittest.TestCase):
+    """Test keyframe-aligned splicing between encoders"""
+    
+    def setUp(self):
+        self.output = []
+        self.switches = []
+        self.switcher = KeyframeSwitcher(self.output.append, 'youtube',
+                                         lambda old, new, info: self.switches.append(info))
+    
+    def test_join_waits_for_keyframe_with_headers(self):
+        """A late joiner starts with sequence headers and a keyframe"""
+        bus = PacketBus('720p')
+        run_encoder(bus, 0, 2)
+        self.switcher.switch_to(bus)
+        bus.publish(video(66))
+        bus.publish(audio(71))
+        run_encoder(bus, 99, 4)
+        
+        self.assertTrue(self.output[0].is_config and self.output[1].is_config)
+        self.assertTrue(self.output[2].is_keyframe)
+        self.assertEqual(self.output[2].timestamp, 99)
+    
+    def test_switch_is_hitless(self):
+        """The new encoder takes over at its keyframe without a frame gap"""
+        old, new = PacketBus('720p@4500k'), PacketBus('1080p@8000k')
+        self.switcher.switch_to(old)
+        run_encoder(old, 0, 10)
+        
+        # The new encoder starts mid-GOP of the old one; old frames keep flowing meanwhile
+        self.switcher.switch_to(new)
+        run_encoder(new, 330 - 2 * 33, 1, gop=1)  # keyframe before the splice point is ignored
+        run_encoder(old, 330, 2)
+        run_encoder(new, 330 + 2 * 33, 8)
+        run_encoder(old, 396, 8)
+        
+        videos = [t.timestamp for t in self.output if t.is_video and not t.is_config]
+        self.assertEqual(videos, sorted(set(videos)))
+        self.assertEqual(self.switches[-1]['gap_ms'], 33)
+        self.assertIs(self.switcher.bus, new)
+        self.assertEqual(old.subscriber_count, 0)
+        
+        audios = [t.timestamp for t in self.output if t.is_audio and not t.is_config]
+        self.assertEqual(audios, sorted(set(audios)))
+    
+    def test_switch_between_aligned_encoders(self):
+        """A keyframe sharing the last forwarded timestamp still splices, one tick later"""
+        old, new = PacketBus('720p@4500k'), PacketBus('720p@3400k')
+        self.switcher.switch_to(old)
+        run_encoder(old, 0, 4)
+        self.switcher.switch_to(new)
+        
+        # Same frame grid, and the old encoder always publishes first
+        for i in range(4, 8):
+            old.publish(video(i * 33))
+            new.publish(video(i * 33, keyframe=(i == 4)))
+        
+        self.assertIs(self.switcher.bus, new)
+        self.assertEqual(self.switches[-1]['at'], 4 * 33 + 1)
+        videos = [t.timestamp for t in self.output if t.is_video and not t.is_config]
+        self.assertEqual(videos, sorted(set(videos)))
+
+if __name__ == '__main__':
+    unittest.main()
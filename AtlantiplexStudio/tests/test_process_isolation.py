@@ -0,0 +1,83 @@
+import unittest
+import sys
+import os
+import time
+import threading
+
+# Add studio root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from process_isolation import CpuAccounting, IsolationPolicy
+
+class TestIsolationPolicy(unittest.TestCase):
+    """Test core layouts and launcher prefixes"""
+    
+    def test_default_layout_on_larger_hosts(self):
+        """Media gets its own core, server and relays share one, encoders take the rest"""
+        policy = IsolationPolicy({}, cores=list(range(8)))
+        self.assertEqual(policy.sets['media'], [0])
+        self.assertEqual(policy.sets['server'], [1])
+        self.assertEqual(policy.sets['relay'], [1])
+        self.assertEqual(policy.sets['encoder'], list(range(2, 8)))
+    
+    def test_small_hosts_share_every_core(self):
+        """Below four cores nothing is pinned, so no taskset prefix is added"""
+        policy = IsolationPolicy({}, cores=[0, 1])
+        self.assertTrue(all(cores == [0, 1] for cores in policy.sets.values()))
+        self.assertFalse(any(part.endswith('taskset') for part in policy.launcher('encoder')))
+    
+    def test_launcher_prefix(self):
+        """Pinned roles are wrapped in taskset, and lowered roles in nice and ionice"""
+        policy = IsolationPolicy({'encoder_cores': [4, 5, 99]}, cores=list(range(8)))
+        policy.tools = {'taskset': 'taskset', 'nice': 'nice', 'ionice': 'ionice'}
+        self.assertEqual(policy.sets['encoder'], [4, 5])  # cores outside the usable set are dropped
+        self.assertEqual(policy.launcher('encoder'), ['taskset', '-c', '4,5', 'ionice', '-t', '-c', '2', '-n', '0'])
+        self.assertEqual(policy.launcher('relay'),
+                         ['taskset', '-c', '1', 'nice', '-n', '2', 'ionice', '-t', '-c', '2', '-n', '2'])
+        
+        policy.enabled = False
+        self.assertEqual(policy.launcher('encoder'), [])
+
+class TestCpuAccounting(unittest.TestCase):
+    """Test /proc sampling"""
+    
+    @unittest.skipUnless(os.path.exists('/proc/self/stat'), 'needs /proc')
+    def test_process_rate_between_samples(self):
+        """The first sample has no rate; a busy interval shows up as CPU percent"""
+        accounting = CpuAccounting()
+        first = accounting.process(os.getpid())
+        self.assertIsNone(first['cpu_percent'])
+        self.assertGreaterEqual(first['threads'], 1)
+        self.assertGreater(first['rss_mb'], 0)
+        
+        deadline = time.monotonic() + 0.3
+        while time.monotonic() < deadline:
+            pass
+        second = accounting.process(os.getpid())
+        self.assertGreater(second['cpu_percent'], 20)
+        self.assertIsNone(accounting.process(2 ** 22 + 1))
+    
+    @unittest.skipUnless(os.path.exists('/proc/self/task'), 'needs /proc')
+    def test_thread_sample(self):
+        """Threads are sampled from this process's task directory"""
+        accounting = CpuAccounting()
+        ready, done = threading.Event(), threading.Event()
+        ids = {}
+        def worker():
+            ids['tid'] = threading.get_native_id()
+            ready.set()
+            done.wait(5)
+        thread = threading.Thread(target=worker)
+        thread.start()
+        ready.wait(5)
+        try:
+            stats = accounting.thread(ids['tid'])
+            self.assertEqual(stats['tid'], ids['tid'])
+            self.assertIn('last_cpu', stats)
+            self.assertNotIn('rss_mb', stats)
+        finally:
+            done.set()
+            thread.join()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import unittest
+import sys
+import os
+import tempfile
+import threading
+import subprocess
+
+# Add studio root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+# A publisher session: header, AVC config, then 10 frames 33ms apart starting at `start`
+PUBLISHER = """
+import sys
+sys.path.insert(0, {root!r})
+from packet_bus import FLV_HEADER, FlvTag
+out = sys.stdout.buffer
+out.write(FLV_HEADER)
+out.write(FlvTag(9, {start}, bytes([0x17, 0, 0, 0, 0]) + b'avcC').to_bytes())
+for i in range(10):
+    out.write(FlvTag(9, {start} + i * 33, bytes([0x17 if i % 5 == 0 else 0x27, 1, 0, 0, 0]) + b'nal').to_bytes())
+out.flush()
+"""
+
+def publisher(start=0):
+    root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+    script = PUBLISHER.format(root=root, start=start)
+    return subprocess.Popen([sys.executable, '-c', script], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+class TestIngestRelay(unittest.TestCase):
+    """Test the pass-through ingest feeding the packet bus"""
+    
+    def test_sessions_continue_on_one_timeline(self):
+        """A reconnecting publisher's timestamps carry on after the last session"""
+        from broadcast_engine import IngestRelay
+        from encoder_supervisor import DiagnosticLog
+        
+        closed = threading.Event()
+        ingest = IngestRelay('rtmp://127.0.0.1:1935/live/test', on_closed=lambda relay: closed.set())
+        received = []
+        ingest.bus.subscribe(lambda bus, tag: received.append(tag))
+        
+        ingest.attach(publisher(), DiagnosticLog())
+        self.assertTrue(closed.wait(10))
+        closed.clear()
+        
+        # OBS restarts its timestamps at zero on reconnect
+        ingest.attach(publisher(), DiagnosticLog())
+        self.assertTrue(closed.wait(10))
+        
+        frames = [tag.timestamp for tag in received if tag.is_video and not tag.is_config]
+        self.assertEqual(len(frames), 20)
+        self.assertEqual(frames, sorted(set(frames)))
+        self.assertEqual(frames[10] - frames[9], 33)
+        self.assertEqual(ingest.sessions, 2)
+        self.assertEqual(ingest.bus.gop_ms, 165)
+    
+    def test_stopped_ingest_does_not_report_closure(self):
+        """An intentional stop is not treated as a publisher disconnect"""
+        from broadcast_engine import IngestRelay
+        from encoder_supervisor import DiagnosticLog
+        
+        closed = threading.Event()
+        ingest = IngestRelay('rtmp://127.0.0.1:1935/live/test', on_closed=lambda relay: closed.set())
+        process = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)'],
+                                   stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        ingest.attach(process, DiagnosticLog())
+        ingest.stop()
+        
+        self.assertFalse(closed.wait(1))
+        self.assertFalse(ingest.connected)
+
+class TestRelayMode(unittest.TestCase):
+    """Test relay mode on the broadcast engine"""
+    
+    def setUp(self):
+        from broadcast_engine import BroadcastEngine, IngestRelay
+        
+        self.engine = BroadcastEngine()
+        self.engine.restart_history_path = os.path.join(tempfile.mkdtemp(), 'restart_history.json')
+        self.ingest = IngestRelay('rtmp://0.0.0.0:1935/live/test')
+    
+    def test_ingest_listens_and_copies(self):
+        """The listener accepts a publisher and remuxes without an encoder"""
+        cmd = self.engine._build_ingest_command('rtmp://0.0.0.0:1935/live/test')
+        
+        self.assertLess(cmd.index('-listen'), cmd.index('-i'))
+        self.assertEqual(cmd[cmd.index('-c') + 1], 'copy')
+        self.assertNotIn('libx264', cmd)
+        self.assertEqual(cmd[-1], 'pipe:1')
+    
+    def test_relay_mode_has_no_quality_to_change(self):
+        """The publisher owns the encode; quality changes are refused"""
+        self.engine.ingest = self.ingest
+        
+        result = self.engine.update_stream_quality('480p')
+        
+        self.assertIn('error', result)
+        self.assertEqual(self.engine.get_stream_status()['mode'], 'relay')
+        self.assertEqual(self.engine.stop_relay_ingest()['mode'], 'encode')
+        self.assertIsNone(self.engine.ingest)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,165 @@
+import unittest
+import sys
+import os
+
+import numpy as np
+
+# Add studio root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from broadcast_engine import BroadcastEngine, VideoCompositor
+from render_plan import RenderPlan, StaticFrameCache, scene_sources
+from scene_manager import BroadcastScene, SceneManager, SceneSource
+
+class TestRenderPlan(unittest.TestCase):
+    """Test compiled plans against the compositor's layout rules"""
+    
+    def setUp(self):
+        self.compositor = VideoCompositor(320, 180, 30)
+        self.frame = np.full((90, 160, 3), 200, dtype=np.uint8)
+    
+    def test_places_scales_and_fades_sources(self):
+        self.compositor.add_source('cam', {'position': {'x': 10, 'y': 20}, 'size': {'width': 80, 'height': 40}, 'opacity': 0.5})
+        frame = self.compositor.compose_frame({'cam': self.frame})
+        
+        self.assertEqual(frame.shape, (180, 320, 3))
+        self.assertEqual(frame[20, 10, 0], 100)
+        self.assertEqual(frame[59, 89, 0], 100)
+        self.assertEqual(frame[60, 90, 0], 0)
+    
+    def test_z_order_visibility_and_bounds(self):
+        self.compositor.add_source('back', {'z_index': 0, 'size': {'width': 320, 'height': 180}})
+        self.compositor.add_source('front', {'z_index': 1, 'size': {'width': 50, 'height': 50}})
+        self.compositor.add_source('hidden', {'z_index': 2, 'visible': False})
+        self.compositor.add_source('outside', {'z_index': 3, 'position': {'x': 300, 'y': 0}, 'size': {'width': 50, 'height': 50}})
+        
+        plan = RenderPlan.compile(self.compositor.sources, 320, 180)
+        self.assertEqual([layer.source_id for layer in plan.layers], ['back', 'front'])
+        
+        frame = plan.compose({'back': self.frame, 'front': np.full((50, 50, 3), 9, dtype=np.uint8)})
+        self.assertEqual(frame[0, 0, 0], 9)
+        self.assertEqual(frame[100, 100, 0], 200)
+    
+    def test_source_changes_recompile_the_program(self):
+        self.compositor.add_source('cam', {'size': {'width': 320, 'height': 180}})
+        self.compositor.compose_frame({'cam': self.frame})
+        first = self.compositor.program
+        self.compositor.compose_frame({'cam': self.frame})
+        self.assertIs(self.compositor.program, first)
+        
+        self.compositor.update_source('cam', {'visible': False})
+        frame = self.compositor.compose_frame({'cam': self.frame})
+        self.assertIsNot(self.compositor.program, first)
+        self.assertFalse(frame.any())
+    
+    def test_scene_sources_scale_and_prerender_static_media(self):
+        scene = BroadcastScene('s1', 'Colors')
+        background = SceneSource('bg', 'Background', 'color', {'color': '#ff0000'})
+        camera = SceneSource('cam', 'Camera', 'camera', {})
+        camera.set_position(960, 540)
+        camera.set_size(960, 540)
+        scene.add_source(background)
+        scene.add_source(camera)
+        
+        sources = scene_sources(scene, 320, 180)
+        self.assertEqual(sources['cam']['position'], {'x': 160, 'y': 90})
+        self.assertEqual(sources['cam']['size'], {'width': 160, 'height': 90})
+        self.assertEqual(sources['cam']['z_index'], 1)
+        
+        plan = RenderPlan.compile(sources, 320, 180)
+        self.assertEqual(plan.layers[0].pixels.shape, (180, 320, 3))
+        self.assertIsNone(plan.layers[1].pixels)
+        frame = plan.compose({})
+        self.assertEqual(list(frame[0, 0]), [0, 0, 255])
+    
+    def test_static_frames_are_decoded_once_per_media(self):
+        scene = BroadcastScene('s1', 'Colors')
+        background = SceneSource('bg', 'Background', 'color', {'color': '#ff0000'})
+        scene.add_source(background)
+        scene.add_source(SceneSource('cam', 'Camera', 'camera', {}))
+        frames = StaticFrameCache()
+        
+        first = scene_sources(scene, 320, 180, frames)
+        background.set_position(100, 100)
+        moved = scene_sources(scene, 320, 180, frames)
+        self.assertEqual(frames.decodes, 2)
+        self.assertIs(moved['bg']['config']['static_frame'], first['bg']['config']['static_frame'])
+        
+        background.settings['color'] = '#00ff00'
+        recolored = scene_sources(scene, 320, 180, frames)
+        self.assertEqual(frames.decodes, 3)
+        self.assertEqual(list(recolored['bg']['config']['static_frame'][0, 0]), [0, 255, 0])
+
+class TestPreviewProgram(unittest.TestCase):
+    """Test preview warming and take through the scene manager"""
+    
+    def setUp(self):
+        self.engine = BroadcastEngine()
+        self.engine.initialize_streaming('720p')
+        self.compositor = self.engine.video_compositor
+        self.scenes = SceneManager()
+        self.scenes.attach_renderer(self.engine)
+        self.gaming = next(scene for scene in self.scenes.get_all_scenes() if scene.scene_type == 'gaming')
+    
+    def test_take_swaps_the_prewarmed_plan(self):
+        program = self.scenes.active_scene_id
+        self.assertTrue(self.scenes.set_preview(self.gaming.id))
+        slot = self.compositor.preview
+        self.assertTrue(slot.ready.wait(5))
+        self.assertIsNotNone(slot.plan)
+        
+        self.assertTrue(self.scenes.take())
+        self.assertIs(self.compositor.program, slot.plan)
+        self.assertEqual(self.compositor.program_scene_id, self.gaming.id)
+        self.assertEqual(self.scenes.active_scene_id, self.gaming.id)
+        self.assertTrue(self.gaming.is_active)
+        # The old program is warmed in preview for the next take
+        self.assertEqual(self.scenes.preview_scene_id, program)
+        
+        self.compositor.compose_frame(self.engine.frame_sources)
+        take = self.compositor.last_take
+        self.assertEqual(take['scene_id'], self.gaming.id)
+        self.assertTrue(take['prewarmed'])
+        self.assertGreaterEqual(take['time_to_first_frame_ms'], 0)
+    
+    def test_switch_without_preview_is_taken_cold(self):
+        preview = self.compositor.prepare_preview('other')
+        self.assertTrue(self.scenes.switch_scene(self.gaming.id))
+        self.assertEqual(self.compositor.program_scene_id, self.gaming.id)
+        # A cold take compiles on its own and leaves the preview alone
+        self.assertIs(self.compositor.preview, preview)
+        
+        self.compositor.compose_frame(self.engine.frame_sources)
+        self.assertFalse(self.compositor.last_take['prewarmed'])
+    
+    def test_take_refuses_a_scene_that_is_not_in_preview(self):
+        self.assertFalse(self.compositor.take('missing'))
+        self.assertFalse(self.scenes.take())
+        self.assertFalse(self.scenes.set_preview('missing'))
+    
+    def test_editing_the_preview_scene_warms_it_again(self):
+        self.scenes.set_preview(self.gaming.id)
+        first = self.compositor.preview
+        self.assertTrue(first.ready.wait(5))
+        self.scenes.add_source_to_scene(self.gaming.id, 'color', 'Backdrop', {})
+        self.assertIsNot(self.compositor.preview, first)
+        self.assertTrue(self.compositor.preview.ready.wait(5))
+        self.assertEqual(len(self.compositor.preview.plan.layers), len(first.plan.layers) + 1)
+    
+    def test_editing_the_program_scene_is_not_a_take(self):
+        self.assertTrue(self.scenes.switch_scene(self.gaming.id))
+        self.compositor.compose_frame(self.engine.frame_sources)
+        take, plan = self.compositor.last_take, self.compositor.program
+        decodes = self.engine.static_frames.decodes
+        
+        source = next(iter(self.gaming.get_all_sources()))
+        self.assertTrue(self.scenes.update_source_properties(self.gaming.id, source.id, {'position': {'x': 8, 'y': 8}}))
+        self.assertIsNot(self.compositor.program, plan)
+        self.assertEqual(self.compositor.program_scene_id, self.gaming.id)
+        self.assertEqual(self.engine.static_frames.decodes, decodes)
+        
+        self.compositor.compose_frame(self.engine.frame_sources)
+        self.assertIs(self.compositor.last_take, take)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import unittest
+import sys
+import os
+import time
+import shutil
+import tempfile
+
+# Add studio root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from functools import partial
+
+import flv_fixtures
+from packet_bus import FlvReader, PacketBus
+
+publish = partial(flv_fixtures.publish, size=1000)
+
+class TestReplayBuffer(unittest.TestCase):
+    """Test the GOP-segmented replay ring"""
+    
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.bus = PacketBus('720p@4500k')
+    
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+    
+    def make_buffer(self, **kwargs):
+        from replay_buffer import ReplayBuffer
+        
+        replay = ReplayBuffer(directory=self.directory, **kwargs)
+        replay.switcher.switch_to(self.bus)
+        return replay
+    
+    def test_memory_is_capped_by_bytes(self):
+        """Whole GOPs are evicted to stay under the byte cap"""
+        replay = self.make_buffer(max_bytes=200000, window_s=600)
+        publish(self.bus, 0, 900)
+        
+        self.assertLessEqual(replay.bytes, 200000 + replay.gops[-1].bytes)
+        self.assertGreater(replay.evicted_gops, 0)
+        self.assertTrue(all(gop.tags[0].is_keyframe for gop in replay.gops))
+        self.assertEqual(replay.bytes, sum(gop.bytes for gop in replay.gops))
+        self.assertEqual(replay.get_stats()['bytes'], replay.bytes)
+    
+    def test_window_bounds_duration(self):
+        """GOPs older than the window are dropped"""
+        replay = self.make_buffer(window_s=5)
+        publish(self.bus, 0, 900)  # ~30s of video in 1s GOPs
+        
+        # Eviction is whole GOPs, so the ring holds the window plus at most two GOPs
+        self.assertGreaterEqual(replay.duration_s, 5.0)
+        self.assertLessEqual(replay.duration_s, 5.0 + 2 * 0.99)
+    
+    def test_clip_starts_at_keyframe_with_headers(self):
+        """A saved clip is a standalone FLV: headers, a keyframe, timestamps from zero"""
+        replay = self.make_buffer()
+        publish(self.bus, 1000, 300)
+        
+        clip = replay.save_clip(seconds=4, name='clip')
+        self.assertEqual(clip['status'], 'saving')
+        deadline = time.time() + 5
+        while replay.clips[-1]['status'] == 'saving' and time.time() < deadline:
+            time.sleep(0.05)
+        self.assertEqual(replay.clips[-1]['status'], 'saved')
+        
+        with open(os.path.join(self.directory, 'clip.flv'), 'rb') as f:
+            tags = FlvReader().feed(f.read())
+        self.assertTrue(tags[0].is_config and tags[1].is_config)
+        self.assertTrue(tags[2].is_keyframe)
+        self.assertEqual(tags[2].timestamp, 0)
+        
+        videos = [t.timestamp for t in tags if t.is_video and not t.is_config]
+        self.assertGreaterEqual(videos[-1], 4000)
+        self.assertLess(videos[-1], 4000 + 1000)
+        self.assertEqual(videos, sorted(videos))
+    
+    def test_saving_does_not_hold_up_packets(self):
+        """Packets keep flowing into the ring while a clip is written"""
+        replay = self.make_buffer()
+        publish(self.bus, 0, 300)
+        before = replay.bytes
+        
+        replay.save_clip(seconds=10, name='busy')
+        publish(self.bus, 300 * 33, 30)
+        
+        self.assertGreater(replay.bytes, before)
+    
+    def test_clip_name_cannot_leave_the_directory(self):
+        """Path separators in a requested name are stripped"""
+        replay = self.make_buffer()
+        publish(self.bus, 0, 60)
+        
+        clip = replay.save_clip(seconds=1, name='../../escape')
+        self.assertEqual(clip['name'], 'escape')
+        self.assertEqual(os.path.dirname(clip['path']), self.directory)
+        self.assertTrue(replay.save_clip(seconds=1, name='../..')['name'].startswith('replay_'))
+
+if __name__ == '__main__':
+    unittest.main()
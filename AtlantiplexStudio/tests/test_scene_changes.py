@@ -0,0 +1,116 @@
+import unittest
+import sys
+import os
+import copy
+
+# Add studio root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from scene_manager import SceneManager
+
+def apply_patch(document, ops):
+    """Minimal JSON Patch (add/replace/remove on objects), as a client would apply it"""
+    for op in ops:
+        *parents, key = [part.replace('~1', '/').replace('~0', '~') for part in op['path'].split('/')[1:]]
+        target = document
+        for part in parents:
+            target = target[part]
+        if op['op'] == 'remove':
+            del target[key]
+        else:
+            target[key] = copy.deepcopy(op['value'])
+
+class TestSceneChangeLog(unittest.TestCase):
+    """Test versioned scene changes and client sync"""
+    
+    def setUp(self):
+        self.manager = SceneManager()
+        self.scene = self.manager.create_scene("Talk Show", "custom")
+    
+    def sync(self, snapshot):
+        result = self.manager.changes_since(snapshot['version'])
+        self.assertFalse(result['reset'])
+        for change in result['changes']:
+            apply_patch(snapshot, change['ops'])
+        snapshot['version'] = result['version']
+        return snapshot
+    
+    def test_patches_reproduce_the_snapshot(self):
+        client = self.manager.get_snapshot()
+        
+        camera = self.manager.add_source_to_scene(self.scene.id, 'camera', 'Cam/1', {})
+        self.manager.add_source_to_scene(self.scene.id, 'text', 'Title', {})
+        self.manager.update_source_in_scene(self.scene.id, camera.id, {'position': {'x': 5, 'y': 6}, 'volume': 3,
+                                                                       'settings': {'device': '/dev/video0'}})
+        self.manager.update_source_properties(self.scene.id, camera.id, {'is_muted': True})
+        copy_scene = self.manager.duplicate_scene(self.scene.id, "Talk Show 2")
+        self.manager.switch_scene(copy_scene.id)
+        self.manager.set_preview(self.scene.id)
+        removed = self.manager.create_scene("Scratch", "custom")
+        self.manager.delete_scene(removed.id)
+        
+        self.assertEqual(self.sync(client), self.manager.get_snapshot())
+        self.assertEqual(client['scenes'][self.scene.id]['sources'][camera.id]['volume'], 1.0)
+    
+    def test_geometry_attribute_edits_are_recorded(self):
+        """Edits to slot attributes like `x` sync as their position, size and crop paths"""
+        client = self.manager.get_snapshot()
+        camera = self.manager.add_source_to_scene(self.scene.id, 'camera', 'Cam', {})
+        self.manager.update_source_properties(self.scene.id, camera.id, {'x': 42, 'height': 360, 'crop_left': 10})
+        
+        ops = self.manager.changes_since(self.manager.version - 1)['changes'][0]['ops']
+        self.assertEqual(ops[0], {'op': 'replace', 'path': f'/scenes/{self.scene.id}/sources/{camera.id}/position/x',
+                                  'value': 42})
+        self.assertEqual(self.sync(client), self.manager.get_snapshot())
+        self.assertEqual(client['scenes'][self.scene.id]['sources'][camera.id]['size']['height'], 360)
+    
+    def test_versions_are_contiguous_and_incremental(self):
+        start = self.manager.version
+        camera = self.manager.add_source_to_scene(self.scene.id, 'camera', 'Cam', {})
+        self.manager.update_source_in_scene(self.scene.id, camera.id, {'is_visible': False})
+        
+        result = self.manager.changes_since(start)
+        self.assertEqual([change['version'] for change in result['changes']], [start + 1, start + 2])
+        self.assertEqual(result['changes'][1]['ops'][0],
+                         {'op': 'replace', 'path': f'/scenes/{self.scene.id}/sources/{camera.id}/is_visible', 'value': False})
+        self.assertEqual(self.manager.changes_since(self.manager.version)['changes'], [])
+    
+    def test_history_is_not_rewritten_by_later_edits(self):
+        camera = self.manager.add_source_to_scene(self.scene.id, 'camera', 'Cam', {})
+        added = self.manager.changes_since(self.manager.version - 1)['changes'][0]
+        camera.set_position(999, 999)
+        self.assertEqual(added['ops'][0]['value']['position'], {'x': 100, 'y': 100})
+    
+    def test_clients_too_far_behind_get_a_snapshot(self):
+        manager = SceneManager(change_log_size=3)
+        for i in range(5):
+            manager.create_scene(f"Scene {i}", "custom")
+        
+        result = manager.changes_since(1)
+        self.assertTrue(result['reset'])
+        self.assertEqual(result['snapshot']['version'], 5)
+        self.assertEqual(len(result['snapshot']['scenes']), 10)
+        self.assertEqual(len(manager.changes_since(2)['changes']), 3)
+        self.assertTrue(manager.changes_since(99)['reset'])
+    
+    def test_subscribers_receive_each_change(self):
+        received = []
+        self.manager.subscribe(received.append)
+        self.manager.subscribe(lambda change: 1 / 0)  # a failing subscriber doesn't stop the change
+        self.manager.set_preview(self.scene.id)
+        self.manager.unsubscribe(received.append)
+        self.manager.delete_scene(self.scene.id)
+        
+        self.assertEqual(len(received), 1)
+        self.assertEqual(received[0]['ops'], [{'op': 'replace', 'path': '/preview_scene_id', 'value': self.scene.id}])
+    
+    def test_scene_list_for_ui(self):
+        self.manager.add_source_to_scene(self.scene.id, 'camera', 'Cam', {})
+        scenes = self.manager.get_scene_list_for_ui()
+        self.assertEqual(scenes['version'], self.manager.version)
+        listed = next(scene for scene in scenes['scenes'] if scene['id'] == self.scene.id)
+        self.assertEqual(listed['sources'][0]['name'], 'Cam')
+        self.assertEqual(len(self.manager.get_all_sources_in_scene(self.scene.id)), 1)
+
+if __name__ == '__main__':
+    unittest.main()
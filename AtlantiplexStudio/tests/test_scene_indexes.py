@@ -0,0 +1,85 @@
+import unittest
+import sys
+import os
+
+# Add studio root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from scene_manager import BroadcastScene, SceneManager, SceneSource
+
+class TestSceneIndexes(unittest.TestCase):
+    """Test name, type and source-name lookups stay in step with the scene store"""
+    
+    def setUp(self):
+        self.manager = SceneManager()
+    
+    def names(self, scenes):
+        return [scene.name for scene in scenes]
+    
+    def test_default_scenes_are_indexed(self):
+        self.assertEqual(self.manager.get_scene_by_name("Gaming Stream").scene_type, 'gaming')
+        self.assertEqual(len(self.manager.get_scenes_by_type('interview')), 1)
+        self.assertIsNone(self.manager.get_scene_by_name("Nope"))
+    
+    def test_create_duplicate_import_and_delete(self):
+        show = self.manager.create_scene("Show", "custom")
+        camera = self.manager.add_source_to_scene(show.id, 'camera', 'Desk Cam', {})
+        copy = self.manager.duplicate_scene(show.id, "Show Copy")
+        imported = self.manager.import_scene_config({'scene': {'name': 'Imported', 'scene_type': 'custom',
+                                                               'sources': {'a': {'name': 'Desk Cam'}}}})
+        
+        self.assertIs(self.manager.get_scene_by_name("Show Copy"), copy)
+        self.assertEqual(self.names(self.manager.get_scenes_by_type('custom')), ["Show", "Show Copy", "Imported"])
+        self.assertEqual(self.names(self.manager.get_scenes_using_source('Desk Cam')), ["Show", "Imported"])
+        self.assertEqual(self.names(self.manager.get_scenes_using_source('Copy of Desk Cam')), ["Show Copy"])
+        
+        self.manager.remove_source_from_scene(show.id, camera.id)
+        self.assertTrue(self.manager.delete_scene(imported.id))
+        self.assertEqual(self.manager.get_scenes_using_source('Desk Cam'), [])
+        self.assertIsNone(self.manager.get_scene_by_name("Imported"))
+        self.assertEqual(self.names(self.manager.get_scenes_by_type('custom')), ["Show", "Show Copy"])
+    
+    def test_repeated_source_names_are_counted(self):
+        show = self.manager.create_scene("Show", "custom")
+        first = self.manager.add_source_to_scene(show.id, 'image', 'Logo', {})
+        self.manager.add_source_to_scene(show.id, 'image', 'Logo', {})
+        self.manager.remove_source_from_scene(show.id, first.id)
+        self.assertEqual(self.names(self.manager.get_scenes_using_source('Logo')), ["Show"])
+    
+    def test_renamed_source_moves_in_the_index(self):
+        show = self.manager.create_scene("Show", "custom")
+        source = self.manager.add_source_to_scene(show.id, 'camera', 'Cam A', {})
+        self.manager.update_source_properties(show.id, source.id, {'name': 'Cam B'})
+        self.assertEqual(self.manager.get_scenes_using_source('Cam A'), [])
+        self.assertEqual(self.names(self.manager.get_scenes_using_source('Cam B')), ["Show"])
+    
+    def test_switch_and_preview_by_name(self):
+        self.assertTrue(self.manager.switch_scene("Talking Head"))
+        self.assertEqual(self.manager.get_active_scene().name, "Talking Head")
+        self.assertTrue(self.manager.set_preview("Green Screen"))
+        self.assertEqual(self.manager.preview_scene_id, self.manager.get_scene_by_name("Green Screen").id)
+        self.assertFalse(self.manager.switch_scene("Missing"))
+    
+    def test_replaced_and_reindexed_scenes(self):
+        scene = BroadcastScene('fixed-id', 'Lobby', 'custom')
+        scene.add_source(SceneSource('s1', 'Music', 'microphone', {}))
+        self.manager['fixed-id'] = scene
+        self.assertIs(self.manager.get_scene_by_name('Lobby'), scene)
+        
+        scene.name = 'Foyer'
+        scene.add_source(SceneSource('s2', 'Clock', 'text', {}))
+        self.manager.reindex_scene('fixed-id')
+        self.assertIsNone(self.manager.get_scene_by_name('Lobby'))
+        self.assertIs(self.manager.get_scene_by_name('Foyer'), scene)
+        self.assertEqual(self.manager.get_scenes_using_source('Clock'), [scene])
+    
+    def test_lookups_scale_with_the_library(self):
+        for i in range(2000):
+            scene = self.manager.create_scene(f"Studio scene {i}", 'custom')
+            self.manager.add_source_to_scene(scene.id, 'camera', f"Cam {i % 50}", {})
+        self.assertEqual(self.manager.get_scene_by_name("Studio scene 1999").name, "Studio scene 1999")
+        self.assertEqual(len(self.manager.get_scenes_using_source('Cam 7')), 40)
+        self.assertEqual(len(self.manager.get_scenes_by_type('custom')), 2000)
+
+if __name__ == '__main__':
+    unittest.main()
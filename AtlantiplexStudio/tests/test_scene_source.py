@@ -0,0 +1,71 @@
+import unittest
+import sys
+import os
+
+# Add studio root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import scene_benchmark
+from scene_manager import BroadcastScene, SceneManager, SceneSource
+
+class TestSceneSource(unittest.TestCase):
+    """Test the slot-based source and its memoized serialization"""
+    
+    def setUp(self):
+        self.source = SceneSource('cam', 'Camera', 'camera', {'device': 'default'})
+    
+    def test_fixed_layout(self):
+        self.assertFalse(hasattr(self.source, '__dict__'))
+        with self.assertRaises(AttributeError):
+            self.source.unknown = 1
+        
+        self.source.position = {'x': 10, 'y': 20}
+        self.source.size = {'width': 640, 'height': 360}
+        self.assertEqual((self.source.x, self.source.y, self.source.width, self.source.height), (10, 20, 640, 360))
+        self.assertEqual(self.source.crop, {'top': 0, 'left': 0, 'bottom': 1080, 'right': 1920})
+    
+    def test_serialization_is_memoized_until_a_change(self):
+        first = self.source.to_dict()
+        self.assertIs(self.source.to_dict(), first)
+        
+        self.source.set_position(100, 50)
+        moved = self.source.to_dict()
+        self.assertIsNot(moved, first)
+        self.assertEqual(moved['position'], {'x': 100, 'y': 50})
+        
+        for change in (lambda: self.source.set_size(320, 240), lambda: self.source.set_volume(0.5),
+                       lambda: self.source.set_visibility(False), lambda: setattr(self.source, 'rotation', 90)):
+            before = self.source.to_dict()
+            change()
+            self.assertIsNot(self.source.to_dict(), before)
+        self.assertEqual(self.source.to_dict()['size'], {'width': 320, 'height': 240})
+        self.assertEqual(self.source.to_dict()['rotation'], 90)
+        
+        # Settings are shared with the serialized form
+        self.source.settings['device'] = '/dev/video1'
+        self.assertEqual(self.source.to_dict()['settings']['device'], '/dev/video1')
+    
+    def test_scene_and_manager_use_the_memo(self):
+        scene = BroadcastScene('s1', 'Scene')
+        scene.add_source(self.source)
+        self.assertIs(scene.to_dict()['sources']['cam'], self.source.to_dict())
+        
+        manager = SceneManager()
+        manager.scenes[scene.id] = scene
+        self.assertTrue(manager.update_source_properties(scene.id, 'cam', {'position': {'x': 7, 'y': 8},
+                                                                           'set_position': None}))
+        self.assertEqual(scene.to_dict()['sources']['cam']['position'], {'x': 7, 'y': 8})
+        self.assertTrue(callable(self.source.set_position))
+
+class TestSceneBenchmark(unittest.TestCase):
+    """Test the benchmark runs and reports what it measured"""
+    
+    def test_small_run(self):
+        results = scene_benchmark.run(studios=2, scenes_per_studio=2, sources_per_scene=3, edit_fraction=0.5)
+        self.assertGreater(results['sources'], 12)
+        self.assertGreater(results['memory']['bytes_per_source'], 0)
+        self.assertEqual(results['serialize']['edited_sources'], (results['sources'] + 1) // 2)
+        self.assertGreaterEqual(results['serialize']['cold_ms'], 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+import unittest
+import sys
+import os
+import json
+import time
+import shutil
+import tempfile
+import subprocess
+from unittest import mock
+
+# Add studio root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from flv_fixtures import publish
+from packet_bus import FlvReader, PacketBus
+
+class TestSegmentRecorder(unittest.TestCase):
+    """Test segmented recording from encoded packets"""
+    
+    def setUp(self):
+        from segment_recorder import SegmentRecorder
+        
+        self.directory = tempfile.mkdtemp()
+        self.bus = PacketBus('720p@4500k')
+        self.recorder = SegmentRecorder(self.directory, segment_s=3, name='show')
+        self.recorder.switcher.switch_to(self.bus)
+    
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+    
+    def read_index(self):
+        with open(os.path.join(self.recorder.path, 'index.json')) as f:
+            return json.load(f)
+    
+    def wait_for_writer(self):
+        deadline = time.time() + 5
+        while not self.recorder._queue.empty() and time.time() < deadline:
+            time.sleep(0.01)
+        time.sleep(0.05)
+    
+    def test_segments_cut_at_keyframes(self):
+        """Every segment is self-contained: headers, then a keyframe"""
+        publish(self.bus, 0, 300)  # 10s
+        self.recorder.stop()
+        
+        # Keyframes every 0.99s: a segment closes at the first keyframe 3s or more after it began
+        index = self.read_index()
+        self.assertEqual([s['start_s'] for s in index['segments']], [0.0, 3.96, 7.92])
+        self.assertIsNone(index['current'])
+        self.assertIsNotNone(index['stopped_at'])
+        
+        for segment in index['segments']:
+            with open(os.path.join(self.recorder.path, segment['file']), 'rb') as f:
+                data = f.read()
+            tags = FlvReader().feed(data)
+            self.assertEqual(len(data), segment['bytes'])
+            self.assertTrue(tags[0].is_config and tags[1].is_config)
+            self.assertTrue(tags[2].is_keyframe)
+            self.assertEqual(tags[2].timestamp, int(segment['start_s'] * 1000))
+    
+    def test_crash_loses_at_most_the_open_segment(self):
+        """Closed segments are already indexed and complete while recording continues"""
+        publish(self.bus, 0, 300)
+        self.wait_for_writer()
+        
+        index = self.read_index()
+        self.assertEqual(len(index['segments']), 2)
+        self.assertEqual(index['current'], 'segment_00003.flv')
+        for segment in index['segments']:
+            self.assertEqual(os.path.getsize(os.path.join(self.recorder.path, segment['file'])), segment['bytes'])
+        self.recorder.stop()
+    
+    def test_new_sequence_headers_start_a_segment(self):
+        """A quality switch mid-segment begins a new segment at the splice keyframe"""
+        publish(self.bus, 0, 45)
+        publish(self.bus, 45 * 33, 30, config=b'avcC-480p')
+        self.recorder.stop()
+        
+        index = self.read_index()
+        self.assertEqual(len(index['segments']), 2)
+        self.assertEqual(index['segments'][1]['start_s'], round(45 * 33 / 1000.0, 3))
+        with open(os.path.join(self.recorder.path, index['segments'][1]['file']), 'rb') as f:
+            tags = FlvReader().feed(f.read())
+        self.assertTrue(next(tag for tag in tags if tag.is_video).data.endswith(b'avcC-480p'))
+    
+    def test_remux_updates_index_before_removing_the_flv(self):
+        """A remuxed segment is listed under its new name before its FLV is deleted"""
+        from segment_recorder import SegmentRecorder
+        
+        def fake_ffmpeg(cmd, **kwargs):
+            with open(cmd[-1], 'wb') as f:
+                f.write(b'mp4' * 10)
+            return subprocess.CompletedProcess(cmd, 0, b'', b'')
+        
+        listed_at_removal = []
+        real_remove = os.remove
+        
+        def remove(path):
+            listed_at_removal.append([segment['file'] for segment in self.read_index()['segments']])
+            real_remove(path)
+        
+        self.recorder.stop()
+        with mock.patch('segment_recorder.subprocess.run', side_effect=fake_ffmpeg), \
+             mock.patch('segment_recorder.os.remove', side_effect=remove):
+            self.recorder = SegmentRecorder(self.directory, segment_s=3, name='remuxed', container='mp4')
+            self.recorder.switcher.switch_to(self.bus)
+            publish(self.bus, 0, 150)
+            self.recorder.stop()
+        
+        index = self.read_index()
+        self.assertEqual([segment['file'] for segment in index['segments']], ['segment_00001.mp4', 'segment_00002.mp4'])
+        self.assertEqual(index['segments'][0]['bytes'], 30)
+        self.assertEqual(listed_at_removal[0][0], 'segment_00001.mp4')
+        self.assertFalse(any(name.endswith('.flv') for name in os.listdir(self.recorder.path)))
+    
+    def test_recording_name_cannot_leave_the_directory(self):
+        """Path separators in a requested name are stripped"""
+        from segment_recorder import SegmentRecorder
+        
+        self.recorder.stop()
+        self.recorder = SegmentRecorder(self.directory, name='../../escape')
+        self.recorder.stop()
+        self.assertEqual(self.recorder.name, 'escape')
+        self.assertEqual(os.path.dirname(self.recorder.path), self.directory)
+        self.assertTrue(os.path.isfile(os.path.join(self.directory, 'escape', 'index.json')))
+
+if __name__ == '__main__':
+    unittest.main()
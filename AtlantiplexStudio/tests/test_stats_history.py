@@ -0,0 +1,73 @@
+import unittest
+import sys
+import os
+import subprocess
+from unittest import mock
+
+# Add studio root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from stats_history import StatsRing, tcp_rtts
+
+class TestStatsRing(unittest.TestCase):
+    """Test the ring buffer and its window queries"""
+    
+    def fill(self, ring, seconds, start=1000.0):
+        for i in range(seconds):
+            ring.append({'bitrate_kbps': 4000 + i, 'fps': 30, 'dropped': i % 10 == 0}, at=start + i)
+        return start + seconds - 1
+    
+    def test_wraps_and_keeps_the_newest(self):
+        ring = StatsRing(100)
+        now = self.fill(ring, 250)
+        self.assertEqual(ring.count, 100)
+        
+        times, values = ring.recent(3600, now=now)
+        self.assertEqual(len(times), 100)
+        self.assertEqual(times[0], now - 99)
+        self.assertEqual(list(values[-3:, 0]), [4247, 4248, 4249])
+    
+    def test_summary_over_window(self):
+        """min/avg/p95 per field; fields never sampled are None"""
+        ring = StatsRing(3600)
+        now = self.fill(ring, 600)
+        summary = ring.summary(60, now=now)
+        
+        self.assertEqual(summary['samples'], 60)
+        bitrate = summary['fields']['bitrate_kbps']
+        self.assertEqual(bitrate['min'], 4540)
+        self.assertEqual(bitrate['avg'], 4569.5)
+        self.assertAlmostEqual(bitrate['p95'], 4596.05, places=1)
+        self.assertEqual(bitrate['last'], 4599)
+        self.assertEqual(summary['fields']['dropped']['avg'], 0.1)
+        self.assertIsNone(summary['fields']['rtt_ms'])
+    
+    def test_sparkline_buckets(self):
+        ring = StatsRing(3600)
+        now = self.fill(ring, 600)
+        spark = ring.sparkline('bitrate_kbps', 600, points=60, now=now)
+        
+        self.assertEqual(len(spark['points']), 60)
+        self.assertEqual(spark['step_s'], 10)
+        self.assertEqual(spark['points'][0], 4004.5)
+        self.assertEqual(spark['text'][0], '▁')
+        self.assertEqual(spark['text'][-1], '█')
+        self.assertEqual(ring.sparkline('fps', 600, now=now + 3600)['points'], [])
+
+class TestTcpRtt(unittest.TestCase):
+    """Test `ss` output parsing"""
+    
+    def test_rtt_per_pid(self):
+        output = (
+            '0 0 10.0.0.2:51000 52.1.1.1:1935 users:(("ffmpeg",pid=4242,fd=3))\n'
+            '\t cubic wscale:7,7 rto:240 rtt:38.5/4.1 ato:40 mss:1448 cwnd:10\n'
+            '0 0 10.0.0.2:51002 52.1.1.2:443 users:(("python",pid=99,fd=7))\n'
+            '\t cubic rto:204 rtt:2.1/0.5 mss:1448\n'
+        )
+        result = subprocess.CompletedProcess([], 0, stdout=output, stderr='')
+        with mock.patch('stats_history.subprocess.run', return_value=result):
+            self.assertEqual(tcp_rtts([4242]), {4242: 38.5})
+        self.assertEqual(tcp_rtts([]), {})
+
+if __name__ == '__main__':
+    unittest.main()